@@ -39,6 +39,7 @@ from .blame import Blame, BlameHunk
 from .blob import BlobIO
 from .callbacks import Payload, RemoteCallbacks, CheckoutCallbacks, StashApplyCallbacks
 from .callbacks import git_clone_options, git_fetch_options, get_credentials
+from .commit_graph import ChangedPathFilters, CommitGraph, CommitGraphEntry
 from .config import Config
 from .credentials import *
 from .errors import check_error, Passthrough
@@ -47,9 +48,12 @@ from .filter import Filter
 from .index import Index, IndexEntry
 from .legacyenums import *
 from .packbuilder import PackBuilder
+from .reachability import Reachability
+from .status import ChangeSource, InotifyChangeSource, StatusCache
 from .remotes import Remote
 from .repository import Repository
 from .settings import Settings
+from .similarity import DbmSignatureStore, SignatureCache, SignatureStore
 from .submodules import Submodule
 from .utils import to_bytes, to_str
 
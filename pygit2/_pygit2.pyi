@@ -1,12 +1,15 @@
-from typing import Iterator, Literal, Optional, overload
+from array import array
+from typing import BinaryIO, Iterable, Iterator, Literal, Optional, Sequence, overload
 from io import IOBase
 from . import Index, Submodule
+from .similarity import SignatureCache
 from .enums import (
     ApplyLocation,
     BranchType,
     DeltaStatus,
     DiffFind,
     DiffFlag,
+    DiffFormat,
     DiffOption,
     DiffStatsFormat,
     FileMode,
@@ -98,6 +101,7 @@ class AlreadyExistsError(ValueError): ...
 
 class Blob(Object):
     data: bytes
+    data_view: memoryview
     is_binary: bool
     size: int
     def diff(
@@ -114,6 +118,7 @@ class Blob(Object):
         old_as_path: str = ...,
         buffer_as_path: str = ...,
     ) -> Patch: ...
+    def __buffer__(self, flags: int) -> memoryview: ...
 
 class Branch(Reference):
     branch_name: str
@@ -141,11 +146,18 @@ class Commit(Object):
     tree: Tree
     tree_id: Oid
 
+class DeltasIter:
+    def __iter__(self) -> DeltasIter: ...
+    def __next__(self) -> DiffDelta: ...
+    def __len__(self) -> int: ...
+    def __getitem__(self, index: int) -> DiffDelta: ...
+
 class Diff:
-    deltas: Iterator[DiffDelta]
+    deltas: DeltasIter
     patch: str | None
     patchid: Oid
     stats: DiffStats
+    def delta_table(self) -> dict[str, bytes | array | tuple[bytes, array]]: ...
     def find_similar(
         self,
         flags: DiffFind = DiffFind.FIND_BY_CONFIG,
@@ -154,10 +166,25 @@ class Diff:
         rename_from_rewrite_threshold: int = 50,
         break_rewrite_threshold: int = 60,
         rename_limit: int = 1000,
+        workers: int = 0,
+        cache: Optional[SignatureCache] = None,
     ) -> None: ...
     def merge(self, diff: Diff) -> None: ...
+    def numstat(self, workers: int = 1) -> tuple[array, array]: ...
+    def patch_text(self, workers: int = 1) -> str: ...
+    def patches(self, workers: int = 1) -> Iterator[Patch]: ...
+    def write_patch(
+        self,
+        file: BinaryIO | int,
+        format: DiffFormat | None = DiffFormat.PATCH,
+        stats: DiffStatsFormat = DiffStatsFormat.NONE,
+        width: int = 80,
+        chunk_size: int = 65536,
+    ) -> None: ...
     @staticmethod
-    def from_c(diff, repo) -> Diff: ...
+    def from_c(
+        diff, repo, flags=None, context_lines: int = 3, interhunk_lines: int = 0
+    ) -> Diff: ...
     @staticmethod
     def parse_diff(git_diff: str | bytes) -> Diff: ...
     def __getitem__(self, index: int) -> Patch: ...  # Diff_getitem
@@ -240,7 +267,15 @@ class Odb:
     def add_backend(self, backend: OdbBackend, priority: int) -> None: ...
     def add_disk_alternate(self, path: str) -> None: ...
     def exists(self, oid: _OidArg) -> bool: ...
+    def iter_raw(self, chunk_size: int = 1024) -> Iterator[bytes]: ...
     def read(self, oid: _OidArg) -> tuple[int, int, bytes]: ...
+    def read_header(self, oid: _OidArg) -> tuple[int, int]: ...
+    def read_headers(
+        self, oids: Iterable[_OidArg] | bytes, workers: int = 1
+    ) -> tuple[array, array]: ...
+    def read_many(
+        self, oids: Iterable[_OidArg] | bytes, workers: int = 1
+    ) -> list[tuple[int, bytes]]: ...
     def write(self, type: int, data: bytes) -> Oid: ...
     def __contains__(self, other: _OidArg) -> bool: ...
     def __iter__(self) -> Iterator[Oid]: ...  # Odb_as_iter
@@ -249,6 +284,7 @@ class OdbBackend:
     def __init__(self, *args, **kwargs) -> None: ...
     def exists(self, oid: _OidArg) -> bool: ...
     def exists_prefix(self, partial_id: _OidArg) -> Oid: ...
+    def iter_raw(self, chunk_size: int = 1024) -> Iterator[bytes]: ...
     def read(self, oid: _OidArg) -> tuple[int, bytes]: ...
     def read_header(self, oid: _OidArg) -> tuple[int, int]: ...
     def read_prefix(self, oid: _OidArg) -> tuple[int, bytes, Oid]: ...
@@ -346,7 +382,24 @@ class Repository:
     workdir: str
     def __init__(self, *args, **kwargs) -> None: ...
     def TreeBuilder(self, src: Tree | _OidArg = ...) -> TreeBuilder: ...
+    def _blame(
+        self,
+        units: list[tuple[bytes, int, int]],
+        flags: int,
+        min_match_characters: int,
+        newest_commit: bytes,
+        oldest_commit: bytes,
+        workers: int,
+    ) -> list[list[tuple]]: ...
     def _disown(self, *args, **kwargs) -> None: ...
+    def _diff_trees(
+        self,
+        old_ids: bytes,
+        new_ids: bytes,
+        flags: int,
+        renames: bool,
+        workers: int,
+    ) -> list[list[tuple[str, str, str]]]: ...
     def _from_c(self, *args, **kwargs) -> None: ...
     def add_worktree(self, name: str, path: str, ref: Reference = ...) -> Worktree: ...
     def applies(
@@ -447,13 +500,35 @@ class Repository:
     def revparse_single(self, revision: str) -> Object: ...
     def set_odb(self, odb: Odb) -> None: ...
     def set_refdb(self, refdb: Refdb) -> None: ...
+    @overload
     def status(
-        self, untracked_files: str = 'all', ignored: bool = False
+        self,
+        untracked_files: str = 'all',
+        ignored: bool = False,
+        paths: Sequence[str] | None = None,
+        workers: int = 1,
+        renames: bool = False,
+        as_table: Literal[False] = False,
+        literal_paths: bool = False,
     ) -> dict[str, int]: ...
+    @overload
+    def status(
+        self,
+        untracked_files: str = 'all',
+        ignored: bool = False,
+        paths: Sequence[str] | None = None,
+        workers: int = 1,
+        renames: bool = False,
+        *,
+        as_table: Literal[True],
+        literal_paths: bool = False,
+    ) -> dict[str, array | tuple[bytes, array]]: ...
     def status_file(self, path: str) -> int: ...
+    def use_commit_graph(self, enabled: bool = True) -> None: ...
     def walk(
         self, oid: _OidArg | None, sort_mode: SortMode = SortMode.NONE
     ) -> Walker: ...
+    def write_commit_graph(self) -> None: ...
 
 class RevSpec:
     flags: int
@@ -542,7 +617,12 @@ class TreeBuilder:
     def __len__(self) -> int: ...
 
 class Walker:
+    def fill_ids(self, buffer: bytearray | memoryview) -> int: ...
     def hide(self, oid: _OidArg) -> None: ...
+    def iter_ids(self) -> Iterator[Oid]: ...
+    def next_batch(
+        self, n: int, fields: Sequence[str] | None = None
+    ) -> dict[str, bytes | array | tuple[bytes, array]]: ...
     def push(self, oid: _OidArg) -> None: ...
     def reset(self) -> None: ...
     def simplify_first_parent(self) -> None: ...
@@ -23,6 +23,11 @@
 # the Free Software Foundation, 51 Franklin Street, Fifth Floor,
 # Boston, MA 02110-1301, USA.
 
+# Standard Library
+from array import array
+from bisect import bisect_right
+import struct
+
 # Import from pygit2
 from .ffi import ffi, C
 from .utils import GenericIterator
@@ -45,79 +50,128 @@ def wrap_signature(csig):
 class BlameHunk:
     @classmethod
     def _from_c(cls, blame, ptr):
+        return cls._from_values(
+            (
+                ptr.lines_in_hunk,
+                Oid(raw=bytes(ffi.buffer(ffi.addressof(ptr, 'final_commit_id'))[:])),
+                ptr.final_start_line_number,
+                wrap_signature(ptr.final_signature),
+                Oid(raw=bytes(ffi.buffer(ffi.addressof(ptr, 'orig_commit_id'))[:])),
+                ffi.string(ptr.orig_path).decode('utf-8') if ptr.orig_path else None,
+                ptr.orig_start_line_number,
+                wrap_signature(ptr.orig_signature),
+                # Casting directly to bool via cffi does not seem to work
+                int(ffi.cast('int', ptr.boundary)) != 0,
+            )
+        )
+
+    @classmethod
+    def _from_values(cls, values):
+        # The fields of git_blame_hunk, in order
         hunk = cls.__new__(cls)
-        hunk._blame = blame
-        hunk._hunk = ptr
+        hunk._values = values
         return hunk
 
     @property
     def lines_in_hunk(self):
         """Number of lines"""
-        return self._hunk.lines_in_hunk
+        return self._values[0]
 
     @property
     def boundary(self):
         """Tracked to a boundary commit"""
-        # Casting directly to bool via cffi does not seem to work
-        return int(ffi.cast('int', self._hunk.boundary)) != 0
+        return self._values[8]
 
     @property
     def final_start_line_number(self):
         """Final start line number"""
-        return self._hunk.final_start_line_number
+        return self._values[2]
 
     @property
     def final_committer(self):
         """Final committer"""
-        return wrap_signature(self._hunk.final_signature)
+        return self._values[3]
 
     @property
     def final_commit_id(self):
-        return Oid(
-            raw=bytes(ffi.buffer(ffi.addressof(self._hunk, 'final_commit_id'))[:])
-        )
+        return self._values[1]
 
     @property
     def orig_start_line_number(self):
         """Origin start line number"""
-        return self._hunk.orig_start_line_number
+        return self._values[6]
 
     @property
     def orig_committer(self):
         """Original committer"""
-        return wrap_signature(self._hunk.orig_signature)
+        return self._values[7]
 
     @property
     def orig_commit_id(self):
-        return Oid(
-            raw=bytes(ffi.buffer(ffi.addressof(self._hunk, 'orig_commit_id'))[:])
-        )
+        return self._values[4]
 
     @property
     def orig_path(self):
         """Original path"""
-        path = self._hunk.orig_path
-        if not path:
-            return None
-
-        return ffi.string(path).decode('utf-8')
+        return self._values[5]
 
 
 class Blame:
     @classmethod
-    def _from_c(cls, repo, ptr):
+    def _from_c(cls, repo, ptr, path=None, commit_id=None):
         blame = cls.__new__(cls)
         blame._repo = repo
         blame._blame = ptr
+        blame._hunks = None
+        blame._path = path
+        blame._commit_id = commit_id
+        return blame
+
+    @classmethod
+    def _from_values(cls, repo, hunks, path, commit_id):
+        # A blame made in Python, e.g. by Repository.blame with a base, the
+        # hunks are the values of BlameHunk
+        blame = cls.__new__(cls)
+        blame._repo = repo
+        blame._blame = None
+        blame._hunks = hunks
+        blame._starts = None
+        blame._path = path
+        blame._commit_id = commit_id
         return blame
 
     def __del__(self):
-        C.git_blame_free(self._blame)
+        if self._blame is not None:
+            C.git_blame_free(self._blame)
+
+    @property
+    def path(self):
+        """Path of the file blamed"""
+        return self._path
+
+    @property
+    def commit_id(self):
+        """Id of the newest commit considered, the version of the file
+        blamed"""
+        return self._commit_id
+
+    def _values(self):
+        if self._hunks is None:
+            return [hunk._values for hunk in self]
+        return self._hunks
 
     def __len__(self):
+        if self._hunks is not None:
+            return len(self._hunks)
+
         return C.git_blame_get_hunk_count(self._blame)
 
     def __getitem__(self, index):
+        if self._hunks is not None:
+            if index < 0 or index >= len(self._hunks):
+                raise IndexError
+            return BlameHunk._from_values(self._hunks[index])
+
         chunk = C.git_blame_get_hunk_byindex(self._blame, index)
         if not chunk:
             raise IndexError
@@ -137,6 +191,14 @@ class Blame:
         if line_no < 0:
             raise IndexError
 
+        if self._hunks is not None:
+            if self._starts is None:
+                self._starts = [values[2] for values in self._hunks]
+            i = bisect_right(self._starts, line_no) - 1
+            if i < 0 or line_no >= self._starts[i] + self._hunks[i][0]:
+                raise IndexError
+            return BlameHunk._from_values(self._hunks[i])
+
         chunk = C.git_blame_get_hunk_byline(self._blame, line_no)
         if not chunk:
             raise IndexError
@@ -145,3 +207,227 @@ class Blame:
 
     def __iter__(self):
         return GenericIterator(self)
+
+    def line_table(self):
+        """Return the blame line by line, as columns, without creating any
+        BlameHunk object. The result is a dict with:
+
+        - first_line: the number of the first line blamed, 1 unless the
+          blame was for a range of lines.
+        - commit: array('I'), for every line, the index of the commit it
+          comes from in the following tables.
+        - orig_line: array('I'), for every line, its number in the commit
+          it comes from.
+        - commit_ids: bytes, the raw oids (20 bytes each) of the commits.
+        - committers: list, the committers of the commits.
+
+        For example, the commit id of the i-th line is::
+
+            k = table['commit'][i]
+            table['commit_ids'][20 * k : 20 * k + 20]
+        """
+        commits = _Table()
+        committers = []
+        commit = array('I')
+        orig_line = array('I')
+        first_line = None
+
+        if self._hunks is not None:
+            hunks = (
+                (values[0], values[1].raw, values[2], values[6], values[3])
+                for values in self._hunks
+            )
+        else:
+            hunks = (self._c_line_hunk(i) for i in range(len(self)))
+
+        for lines, commit_id, start, orig_start, signature in hunks:
+            if first_line is None:
+                first_line = start
+            index = commits.index(commit_id)
+            if index == len(committers):
+                if not isinstance(signature, Signature):
+                    signature = wrap_signature(signature)
+                committers.append(signature)
+            commit.extend(array('I', [index]) * lines)
+            orig_line.extend(range(orig_start, orig_start + lines))
+
+        return {
+            'first_line': first_line or 1,
+            'commit': commit,
+            'orig_line': orig_line,
+            'commit_ids': b''.join(commits),
+            'committers': committers,
+        }
+
+    def _c_line_hunk(self, index):
+        ptr = C.git_blame_get_hunk_byindex(self._blame, index)
+        return (
+            ptr.lines_in_hunk,
+            bytes(ffi.buffer(ffi.addressof(ptr, 'final_commit_id'))[:]),
+            ptr.final_start_line_number,
+            ptr.orig_start_line_number,
+            ptr.final_signature,
+        )
+
+    #
+    # Snapshots
+    #
+    def to_bytes(self):
+        """Return the blame in a compact binary format, to be stored and
+        loaded later with `Blame.from_bytes()`, e.g. to be the base of an
+        incremental blame (see `Repository.blame()`). The commits, paths
+        and signatures are stored once.
+        """
+        commits, signatures, paths = _Table(), _Table(), _Table()
+        hunks = []
+        for values in self._values():
+            lines, final_id, final_start, final_sig = values[:4]
+            orig_id, orig_path, orig_start, orig_sig, boundary = values[4:]
+            hunks.append(
+                _snapshot_hunk.pack(
+                    lines,
+                    final_start,
+                    orig_start,
+                    commits.index(final_id.raw),
+                    commits.index(orig_id.raw),
+                    signatures.index(_signature_key(final_sig)),
+                    signatures.index(_signature_key(orig_sig)),
+                    paths.index(orig_path),
+                    boundary,
+                )
+            )
+
+        commit_id = self._commit_id.raw if self._commit_id else bytes(20)
+        chunks = [
+            _snapshot_header.pack(
+                SNAPSHOT_SIGNATURE,
+                SNAPSHOT_VERSION,
+                commit_id,
+                len(commits),
+                len(signatures),
+                len(paths),
+                len(hunks),
+            ),
+            _pack_str(self._path),
+        ]
+        chunks.extend(commits)
+        for key in signatures:
+            name, email, time, offset = key
+            chunks += [
+                _pack_str(name),
+                _pack_str(email),
+                _snapshot_time.pack(time, offset),
+            ]
+        chunks.extend(_pack_str(path) for path in paths)
+        chunks.extend(hunks)
+        return b''.join(chunks)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Return the blame stored with `Blame.to_bytes()`. Raises
+        ValueError if the data is not a blame snapshot."""
+        data = memoryview(data)
+        try:
+            header = _snapshot_header.unpack_from(data)
+        except struct.error:
+            raise ValueError('not a blame snapshot')
+
+        signature, version, commit_id, ncommits, nsignatures, npaths, nhunks = header
+        if signature != SNAPSHOT_SIGNATURE or version != SNAPSHOT_VERSION:
+            raise ValueError('not a blame snapshot, or of an unsupported version')
+
+        try:
+            pos = _snapshot_header.size
+            path, pos = _unpack_str(data, pos)
+            commits = []
+            for _ in range(ncommits):
+                commits.append(Oid(raw=bytes(data[pos : pos + 20])))
+                pos += 20
+            signatures = []
+            for _ in range(nsignatures):
+                name, pos = _unpack_str(data, pos)
+                email, pos = _unpack_str(data, pos)
+                time, offset = _snapshot_time.unpack_from(data, pos)
+                pos += _snapshot_time.size
+                signatures.append(Signature(name, email, time, offset, 'utf-8'))
+            paths = []
+            for _ in range(npaths):
+                value, pos = _unpack_str(data, pos)
+                paths.append(value)
+
+            hunks = []
+            for _ in range(nhunks):
+                lines, final_start, orig_start, *indexes, boundary = (
+                    _snapshot_hunk.unpack_from(data, pos)
+                )
+                pos += _snapshot_hunk.size
+                final_id, orig_id, final_sig, orig_sig, orig_path = indexes
+                hunks.append(
+                    (
+                        lines,
+                        commits[final_id],
+                        final_start,
+                        _get(signatures, final_sig),
+                        commits[orig_id],
+                        _get(paths, orig_path),
+                        orig_start,
+                        _get(signatures, orig_sig),
+                        bool(boundary),
+                    )
+                )
+        except (struct.error, IndexError, UnicodeDecodeError):
+            raise ValueError('truncated or corrupted blame snapshot')
+
+        commit_id = Oid(raw=commit_id) if any(commit_id) else None
+        return cls._from_values(None, hunks, path, commit_id)
+
+
+#
+# The snapshot format: a header with the id of the commit blamed and the
+# sizes of the tables, the path, the tables of commits (raw oids),
+# signatures and paths, then the hunks referring to them. Strings are utf-8
+# with their length first, integers little endian.
+#
+SNAPSHOT_SIGNATURE = b'PGBL'
+SNAPSHOT_VERSION = 1
+
+_snapshot_header = struct.Struct('<4sB20sIIII')
+_snapshot_time = struct.Struct('<qi')
+_snapshot_hunk = struct.Struct('<IIIIIiiiB')
+_snapshot_len = struct.Struct('<i')
+
+
+def _signature_key(signature):
+    if signature is None:
+        return None
+    return (signature.name, signature.email, signature.time, signature.offset)
+
+
+def _get(table, index):
+    return None if index < 0 else table[index]
+
+
+def _pack_str(value):
+    if value is None:
+        return _snapshot_len.pack(-1)
+    value = value.encode('utf-8')
+    return _snapshot_len.pack(len(value)) + value
+
+
+def _unpack_str(data, pos):
+    (size,) = _snapshot_len.unpack_from(data, pos)
+    pos += _snapshot_len.size
+    if size < 0:
+        return None, pos
+    if pos + size > len(data):
+        raise struct.error('truncated string')
+    return bytes(data[pos : pos + size]).decode('utf-8'), pos + size
+
+
+class _Table(dict):
+    """Distinct values, numbered in the order they are added; None is -1."""
+
+    def index(self, value):
+        if value is None:
+            return -1
+        return self.setdefault(value, len(self))
@@ -1,9 +1,6 @@
 import io
-import threading
-import time
 from contextlib import AbstractContextManager
 from typing import Optional
-from queue import Queue
 
 from ._pygit2 import Blob, Oid
 from .enums import BlobFilter
@@ -12,9 +9,9 @@ from .enums import BlobFilter
 class _BlobIO(io.RawIOBase):
     """Low-level wrapper for streaming blob content.
 
-    The underlying libgit2 git_writestream filter chain will be run
-    in a separate thread. The GIL will be released while running
-    libgit2 filtering.
+    Reads are served by a native reader, which copies the blob contents
+    straight into the caller's buffer. When filtering, the libgit2 filter
+    chain is run once, with the GIL released, when the stream is opened.
     """
 
     def __init__(
@@ -25,27 +22,14 @@ class _BlobIO(io.RawIOBase):
         commit_id: Optional[Oid] = None,
     ):
         super().__init__()
-        self._blob = blob
-        self._queue = Queue(maxsize=1)
-        self._ready = threading.Event()
-        self._writer_closed = threading.Event()
-        self._chunk: Optional[bytes] = None
-        self._thread = threading.Thread(
-            target=self._blob._write_to_queue,
-            args=(self._queue, self._ready, self._writer_closed),
-            kwargs={
-                'as_path': as_path,
-                'flags': int(flags),
-                'commit_id': commit_id,
-            },
-            daemon=True,
+        self._reader = blob._open_reader(
+            as_path=as_path, flags=int(flags), commit_id=commit_id
         )
-        self._thread.start()
 
     def __exit__(self, exc_type, exc_value, traceback):
         self.close()
 
-    def isatty():
+    def isatty(self):
         return False
 
     def readable(self):
@@ -58,42 +42,16 @@ class _BlobIO(io.RawIOBase):
         return False
 
     def readinto(self, b, /):
-        try:
-            while self._chunk is None:
-                self._ready.wait()
-                if self._queue.empty():
-                    if self._writer_closed.is_set():
-                        # EOF
-                        return 0
-                    self._ready.clear()
-                    time.sleep(0)
-                    continue
-                chunk = self._queue.get()
-                if chunk:
-                    self._chunk = chunk
-
-            if len(self._chunk) <= len(b):
-                bytes_written = len(self._chunk)
-                b[:bytes_written] = self._chunk
-                self._chunk = None
-                return bytes_written
-            bytes_written = len(b)
-            b[:] = self._chunk[:bytes_written]
-            self._chunk = self._chunk[bytes_written:]
-            return bytes_written
-        except KeyboardInterrupt:
-            return 0
+        self._checkClosed()
+        return self._reader.readinto(b)
+
+    def readall(self):
+        self._checkClosed()
+        return self._reader.read()
 
     def close(self):
-        try:
-            self._ready.wait()
-            self._writer_closed.wait()
-            while self._queue is not None and not self._queue.empty():
-                self._queue.get()
-            self._thread.join()
-        except KeyboardInterrupt:
-            pass
-        self._queue = None
+        super().close()
+        self._reader = None
 
 
 class BlobIO(io.BufferedReader, AbstractContextManager):
@@ -122,6 +80,9 @@ class BlobIO(io.BufferedReader, AbstractContextManager):
         ...     # Read the filtered content which would be returned upon
         ...     # running 'git checkout -- my_file.txt'
         ...     filtered_data = f.read()
+
+    Large reads with `readinto` into a preallocated buffer bypass the
+    internal buffer, and the data is copied only once, into that buffer.
     """
 
     def __init__(
@@ -130,6 +91,7 @@ class BlobIO(io.BufferedReader, AbstractContextManager):
         as_path: Optional[str] = None,
         flags: BlobFilter = BlobFilter.CHECK_FOR_BINARY,
         commit_id: Optional[Oid] = None,
+        chunk_size: int = io.DEFAULT_BUFFER_SIZE,
     ):
         """Wrap the specified blob.
 
@@ -143,9 +105,11 @@ class BlobIO(io.BufferedReader, AbstractContextManager):
             commit_id: Commit to load attributes from when
                 ATTRIBUTES_FROM_COMMIT is specified in `flags`
                 (only applicable when `as_path` is set).
+            chunk_size: Size of the internal buffer, i.e. of the chunks read
+                from the blob for reads smaller than that.
         """
         raw = _BlobIO(blob, as_path=as_path, flags=flags, commit_id=commit_id)
-        super().__init__(raw)
+        super().__init__(raw, buffer_size=chunk_size)
 
     def __exit__(self, exc_type, exc_value, traceback):
         self.close()
@@ -85,11 +85,15 @@ class Branches:
         if branch.type == ReferenceType.SYMBOLIC:
             branch = branch.resolve()
 
-        return (
-            self._commit is None
-            or branch.target == self._commit
-            or self._repository.descendant_of(branch.target, self._commit)
-        )
+        if self._commit is None or branch.target == self._commit:
+            return True
+
+        # Use the reachability index if it has been built
+        reachability = self._repository.reachability
+        if reachability.is_built:
+            return reachability.contains(branch.target, self._commit)
+
+        return self._repository.descendant_of(branch.target, self._commit)
 
     def with_commit(self, commit):
         assert self._commit is None
@@ -0,0 +1,456 @@
+# Copyright 2010-2024 The pygit2 contributors
+#
+# This file is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License, version 2,
+# as published by the Free Software Foundation.
+#
+# In addition to the permissions in the GNU General Public License,
+# the authors give you unlimited permission to link the compiled
+# version of this file into combinations with other programs,
+# and to distribute those combinations without any restriction
+# coming from the use of this file.  (The General Public License
+# restrictions do apply in other respects; for example, they cover
+# modification of the file, and distribution when not linked into
+# a combined executable.)
+#
+# This file is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; see the file COPYING.  If not, write to
+# the Free Software Foundation, 51 Franklin Street, Fifth Floor,
+# Boston, MA 02110-1301, USA.
+
+"""
+Read access to the commit-graph file, see
+https://git-scm.com/docs/gitformat-commit-graph
+
+Also the changed-path Bloom filters, read from the commit-graph (as written by
+``git commit-graph write --changed-paths``) or from a pygit2 specific file
+with the same layout.
+"""
+
+from collections.abc import Mapping
+import mmap
+import os
+import struct
+
+from ._pygit2 import GIT_OID_RAWSZ, Commit, InvalidSpecError, Oid
+
+
+GRAPH_SIGNATURE = b'CGPH'
+GRAPH_PARENT_NONE = 0x70000000
+GRAPH_EXTRA_EDGES = 0x80000000
+
+CHUNK_OID_FANOUT = b'OIDF'
+CHUNK_OID_LOOKUP = b'OIDL'
+CHUNK_COMMIT_DATA = b'CDAT'
+CHUNK_EXTRA_EDGES = b'EDGE'
+CHUNK_BLOOM_INDEXES = b'BIDX'
+CHUNK_BLOOM_DATA = b'BDAT'
+
+# The file written by write_changed_paths, in objects/info
+CHANGED_PATHS_FILE = 'pygit2-changed-paths'
+CHANGED_PATHS_SIGNATURE = b'PGCP'
+
+# Same settings as git
+BLOOM_NUM_HASHES = 7
+BLOOM_BITS_PER_ENTRY = 10
+BLOOM_MAX_CHANGED_PATHS = 512
+BLOOM_SEEDS = 0x293AE76F, 0x7E646E2C
+
+
+class CommitGraphEntry:
+    """A commit as stored in the commit-graph file.
+
+    Attributes:
+
+    id
+        The Oid of the commit.
+
+    tree_id
+        The Oid of the commit's tree.
+
+    parent_ids
+        The list of the Oids of the commit's parents.
+
+    generation
+        The generation number (topological level) of the commit: 1 for
+        commits without parents, otherwise one more than the maximum
+        generation of its parents.
+
+    commit_time
+        The commit time, in seconds since the epoch.
+    """
+
+    __slots__ = 'id', 'tree_id', 'parent_ids', 'generation', 'commit_time'
+
+    def __init__(self, id, tree_id, parent_ids, generation, commit_time):
+        self.id = id
+        self.tree_id = tree_id
+        self.parent_ids = parent_ids
+        self.generation = generation
+        self.commit_time = commit_time
+
+    def __repr__(self):
+        return f'<pygit2.CommitGraphEntry id={self.id} generation={self.generation}>'
+
+
+class _ChunkFile:
+    """Base class of the files in the commit-graph format: a header, a table
+    of chunks, and the commits sorted by id, see the OIDF and OIDL chunks.
+    """
+
+    signatures = ()
+    required_chunks = CHUNK_OID_FANOUT, CHUNK_OID_LOOKUP
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            self._parse()
+        except Exception:
+            self.close()
+            raise
+
+    def _parse(self):
+        data = self._data
+        if len(data) < 8:
+            raise ValueError('commit-graph is too short')
+
+        signature, version, hash_version, n_chunks = struct.unpack_from('>4sBBB', data)
+        if signature not in self.signatures:
+            raise ValueError('invalid commit-graph signature')
+        if version != 1 or hash_version != 1:
+            raise ValueError('unsupported commit-graph version')
+
+        chunks = {}
+        for i in range(n_chunks):
+            chunk_id, offset = struct.unpack_from('>4sQ', data, 8 + i * 12)
+            chunks[chunk_id] = offset
+
+        for chunk_id in self.required_chunks:
+            if chunk_id not in chunks:
+                raise ValueError(f'missing {chunk_id.decode()} chunk in commit-graph')
+
+        self._fanout = struct.unpack_from('>256I', data, chunks[CHUNK_OID_FANOUT])
+        self._lookup = chunks[CHUNK_OID_LOOKUP]
+        return chunks
+
+    def close(self):
+        """Release the memory map of the file."""
+        self._data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self._fanout[255]
+
+    def _raw_id(self, pos):
+        start = self._lookup + pos * GIT_OID_RAWSZ
+        return self._data[start : start + GIT_OID_RAWSZ]
+
+    def _find(self, oid):
+        if isinstance(oid, str):
+            oid = Oid(hex=oid)
+        raw = oid.raw
+
+        first = raw[0]
+        lo = self._fanout[first - 1] if first else 0
+        hi = self._fanout[first]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            value = self._raw_id(mid)
+            if value == raw:
+                return mid
+            if value < raw:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        return -1
+
+    def __contains__(self, oid):
+        return self._find(oid) >= 0
+
+    def __iter__(self):
+        for pos in range(len(self)):
+            yield Oid(raw=self._raw_id(pos))
+
+
+class CommitGraph(_ChunkFile, Mapping):
+    """A commit-graph file, memory mapped.
+
+    Usually it is got with `Repository.read_commit_graph()`. A read-only
+    mapping, with the commit ids as keys and `CommitGraphEntry` objects as
+    values. Use it as a context manager, or call `close()`, to
+    release the memory map.
+    """
+
+    signatures = (GRAPH_SIGNATURE,)
+    required_chunks = CHUNK_OID_FANOUT, CHUNK_OID_LOOKUP, CHUNK_COMMIT_DATA
+
+    def _parse(self):
+        chunks = super()._parse()
+        self._commit_data = chunks[CHUNK_COMMIT_DATA]
+        self._extra_edges = chunks.get(CHUNK_EXTRA_EDGES)
+
+    def _entry(self, pos):
+        data = self._data
+        start = self._commit_data + pos * (GIT_OID_RAWSZ + 16)
+        tree_id = Oid(raw=data[start : start + GIT_OID_RAWSZ])
+        parent1, parent2, high, low = struct.unpack_from(
+            '>IIII', data, start + GIT_OID_RAWSZ
+        )
+
+        parents = []
+        if parent1 != GRAPH_PARENT_NONE:
+            parents.append(parent1)
+        if parent2 & GRAPH_EXTRA_EDGES:
+            edge = self._extra_edges + (parent2 & ~GRAPH_EXTRA_EDGES) * 4
+            while True:
+                (parent,) = struct.unpack_from('>I', data, edge)
+                parents.append(parent & ~GRAPH_EXTRA_EDGES)
+                if parent & GRAPH_EXTRA_EDGES:
+                    break
+                edge += 4
+        elif parent2 != GRAPH_PARENT_NONE:
+            parents.append(parent2)
+
+        return CommitGraphEntry(
+            Oid(raw=self._raw_id(pos)),
+            tree_id,
+            [Oid(raw=self._raw_id(x)) for x in parents],
+            high >> 2,
+            (high & 0x3) << 32 | low,
+        )
+
+    def __getitem__(self, oid):
+        pos = self._find(oid)
+        if pos < 0:
+            raise KeyError(oid)
+
+        return self._entry(pos)
+
+    def get(self, oid, default=None):
+        pos = self._find(oid)
+        if pos < 0:
+            return default
+
+        return self._entry(pos)
+
+
+#
+# Changed-path Bloom filters
+#
+def _murmur3(data, seed, signed=False):
+    """Return the 32 bits murmur3 hash of the given bytes. With signed=True
+    the bytes are sign extended, like version 1 of the git filters does.
+    """
+    c1, c2 = 0xCC9E2D51, 0x1B873593
+    mask = 0xFFFFFFFF
+
+    if signed:
+        data = [x | 0xFFFFFF00 if x & 0x80 else x for x in data]
+
+    h = seed
+    n = len(data) - len(data) % 4
+    for i in range(0, n, 4):
+        k = data[i] | data[i + 1] << 8 | data[i + 2] << 16 | data[i + 3] << 24
+        k = (k * c1) & mask
+        k = (k << 15 | (k & mask) >> 17) & mask
+        k = (k * c2) & mask
+        h ^= k
+        h = (h << 13 | h >> 19) & mask
+        h = (h * 5 + 0xE6546B64) & mask
+
+    k = 0
+    tail = len(data) - n
+    if tail == 3:
+        k ^= data[n + 2] << 16
+    if tail >= 2:
+        k ^= data[n + 1] << 8
+    if tail >= 1:
+        k ^= data[n]
+        k = (k * c1) & mask
+        k = (k << 15 | (k & mask) >> 17) & mask
+        k = (k * c2) & mask
+        h ^= k
+
+    h ^= len(data)
+    h ^= h >> 16
+    h = (h * 0x85EBCA6B) & mask
+    h ^= h >> 13
+    h = (h * 0xC2B2AE35) & mask
+    h ^= h >> 16
+    return h
+
+
+def _bloom_key(path, version=2, num_hashes=BLOOM_NUM_HASHES):
+    """Return the hashes of the given path (bytes), as computed by git."""
+    signed = version == 1
+    h0 = _murmur3(path, BLOOM_SEEDS[0], signed)
+    h1 = _murmur3(path, BLOOM_SEEDS[1], signed)
+    return [(h0 + i * h1) & 0xFFFFFFFF for i in range(num_hashes)]
+
+
+def _bloom_filter(paths, keys):
+    """Return the filter of the given changed paths, each one with its parent
+    directories. The hashes of the paths are cached in the keys dict.
+    """
+    entries = set()
+    for path in paths:
+        entries.add(path)
+        while b'/' in path:
+            path = path.rpartition(b'/')[0]
+            entries.add(path)
+
+    if len(paths) > BLOOM_MAX_CHANGED_PATHS:
+        return b'\xff'
+
+    nbits = max(((len(entries) * BLOOM_BITS_PER_ENTRY + 7) // 8), 1) * 8
+    data = bytearray(nbits // 8)
+    for path in entries:
+        key = keys.get(path)
+        if key is None:
+            key = keys[path] = _bloom_key(path)
+        for h in key:
+            pos = h % nbits
+            data[pos >> 3] |= 1 << (pos & 7)
+
+    return bytes(data)
+
+
+class ChangedPathFilters(_ChunkFile):
+    """The changed-path Bloom filters of the commits, memory mapped. They
+    tell whether a commit may have changed a path, compared with its first
+    parent, so history queries limited to some paths can skip most tree
+    diffs.
+
+    Usually it is got with `Repository.read_changed_paths()`. Use it as a
+    context manager, or call `close()`, to release the memory map.
+    """
+
+    signatures = GRAPH_SIGNATURE, CHANGED_PATHS_SIGNATURE
+    required_chunks = (
+        CHUNK_OID_FANOUT,
+        CHUNK_OID_LOOKUP,
+        CHUNK_BLOOM_INDEXES,
+        CHUNK_BLOOM_DATA,
+    )
+
+    def _parse(self):
+        chunks = super()._parse()
+        self._indexes = chunks[CHUNK_BLOOM_INDEXES]
+        self._bloom_data = chunks[CHUNK_BLOOM_DATA] + 12
+        self.version, self._num_hashes, _ = struct.unpack_from(
+            '>III', self._data, chunks[CHUNK_BLOOM_DATA]
+        )
+        if self.version not in (1, 2):
+            raise ValueError('unsupported changed-path filters version')
+        self._keys = {}
+
+    def _key(self, path):
+        key = self._keys.get(path)
+        if key is None:
+            raw = path.strip('/').encode('utf-8')
+            key = _bloom_key(raw, self.version, self._num_hashes)
+            self._keys[path] = key
+
+        return key
+
+    def maybe_changed(self, oid, path):
+        """Return False if the commit did not change the path (a file or a
+        directory), compared with its first parent, and True if it may have
+        changed it. Returns None if there is no filter for the commit.
+        """
+        pos = self._find(oid)
+        if pos < 0:
+            return None
+
+        data = self._data
+        start = (
+            struct.unpack_from('>I', data, self._indexes + (pos - 1) * 4)[0]
+            if pos
+            else 0
+        )
+        end = struct.unpack_from('>I', data, self._indexes + pos * 4)[0]
+        if start == end:
+            return None
+
+        nbits = (end - start) * 8
+        start += self._bloom_data
+        for h in self._key(path):
+            bit = h % nbits
+            if not data[start + (bit >> 3)] & (1 << (bit & 7)):
+                return False
+
+        return True
+
+
+def write_changed_paths(repo, path, workers=1):
+    """Write the changed-path filters of the commits reachable from the
+    references of the repository to the given file. Returns the number of
+    commits.
+    """
+    walker = repo.walk(None)
+    for name in repo.references:
+        try:
+            commit = repo.references[name].peel(Commit)
+        except (InvalidSpecError, KeyError, ValueError):
+            continue
+        walker.push(commit.id)
+    if not repo.head_is_unborn:
+        walker.push(repo.head.target)
+
+    keys = {}
+    filters = []
+    for oid, changes in repo.diff_commits(walker, workers=workers):
+        paths = [x[2].encode('utf-8') for x in changes]
+        filters.append((oid.raw, _bloom_filter(paths, keys)))
+    filters.sort()
+
+    fanout = [0] * 256
+    for raw, _ in filters:
+        fanout[raw[0]] += 1
+    for i in range(1, 256):
+        fanout[i] += fanout[i - 1]
+
+    indexes = []
+    end = 0
+    for _, data in filters:
+        end += len(data)
+        indexes.append(end)
+
+    bloom_header = struct.pack('>III', 2, BLOOM_NUM_HASHES, BLOOM_BITS_PER_ENTRY)
+    chunks = [
+        (CHUNK_OID_FANOUT, struct.pack('>256I', *fanout)),
+        (CHUNK_OID_LOOKUP, b''.join(raw for raw, _ in filters)),
+        (CHUNK_BLOOM_INDEXES, struct.pack(f'>{len(indexes)}I', *indexes)),
+        (CHUNK_BLOOM_DATA, bloom_header + b''.join(data for _, data in filters)),
+    ]
+
+    header = struct.pack('>4sBBBB', CHANGED_PATHS_SIGNATURE, 1, 1, len(chunks), 0)
+    offset = len(header) + (len(chunks) + 1) * 12
+    table = []
+    for chunk_id, chunk in chunks:
+        table.append(struct.pack('>4sQ', chunk_id, offset))
+        offset += len(chunk)
+    table.append(struct.pack('>4sQ', b'\0\0\0\0', offset))
+
+    tmp = f'{path}.lock'
+    with open(tmp, 'wb') as f:
+        f.write(header)
+        f.write(b''.join(table))
+        for _, chunk in chunks:
+            f.write(chunk)
+    os.replace(tmp, path)
+
+    return len(filters)
@@ -4,6 +4,7 @@ void git_repository_free(git_repository *repo);
 int git_repository_state_cleanup(git_repository *repo);
 int git_repository_config(git_config **out, git_repository *repo);
 int git_repository_config_snapshot(git_config **out, git_repository *repo);
+const char *git_repository_commondir(const git_repository *repo);
 
 typedef enum {
 	GIT_REPOSITORY_INIT_BARE              = 1,
@@ -464,6 +464,28 @@ class DiffFlag(IntFlag):
     'file size value is known correct'
 
 
+class DiffFormat(IntEnum):
+    """Possible output formats for diff data, see `Diff.write_patch`."""
+
+    PATCH = _pygit2.GIT_DIFF_FORMAT_PATCH
+    'Full git diff, equivalent of `git diff`'
+
+    PATCH_HEADER = _pygit2.GIT_DIFF_FORMAT_PATCH_HEADER
+    'Just the file headers of the patch'
+
+    RAW = _pygit2.GIT_DIFF_FORMAT_RAW
+    'Like `git diff --raw`'
+
+    NAME_ONLY = _pygit2.GIT_DIFF_FORMAT_NAME_ONLY
+    'Like `git diff --name-only`'
+
+    NAME_STATUS = _pygit2.GIT_DIFF_FORMAT_NAME_STATUS
+    'Like `git diff --name-status`'
+
+    PATCH_ID = _pygit2.GIT_DIFF_FORMAT_PATCH_ID
+    'The patch used to compute the patch id, like `git patch-id`'
+
+
 class DiffOption(IntFlag):
     """
     Flags for diff options.  A combination of these flags can be passed
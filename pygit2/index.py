@@ -27,7 +27,8 @@ import warnings
 import weakref
 
 # Import from pygit2
-from ._pygit2 import Oid, Tree, Diff
+from ._pygit2 import GIT_OID_RAWSZ, Oid, Tree, Diff
+from ._pygit2 import _index_add_many, _index_entries, _index_remove_many
 from .enums import DiffOption, FileMode
 from .errors import check_error
 from .ffi import ffi, C
@@ -102,6 +103,71 @@ class Index:
     def __iter__(self):
         return GenericIterator(self)
 
+    def entries_table(self, fields=None):
+        """Return the requested data of all the entries at once, as columns
+        with one item per entry in index order. No IndexEntry object is
+        created, which makes this much faster than iterating over the index
+        for large indexes.
+
+        Returns a dict mapping every requested field to its column:
+
+        * path: a tuple (data, offsets) where data is the bytes of all the
+          paths joined, and offsets is an array('Q') with n+1 items, the path
+          of the i-th entry being data[offsets[i]:offsets[i+1]].
+        * id: bytes, the raw oids (20 bytes each).
+        * mode: array('I').
+        * stage: array('B'), 0 unless the entry is part of a conflict.
+        * flags: array('H').
+        * file_size: array('I'), as recorded in the index (truncated to 32
+          bits).
+        * mtime, ctime: array('i'), seconds since the epoch.
+        * mtime_ns, ctime_ns: array('I'), the nanoseconds part.
+
+        By default the path, id, mode, stage, file_size and mtime fields are
+        returned.
+
+        Example::
+
+            >>> table = index.entries_table(['path', 'mode'])
+            >>> data, offsets = table['path']
+            >>> for i, mode in enumerate(table['mode']):
+            ...     if mode == FileMode.LINK:
+            ...         print(data[offsets[i]:offsets[i + 1]].decode())
+        """
+        return _index_entries(self._pointer, fields)
+
+    def iter_entries(self, fields=('path', 'id', 'mode')):
+        """Iterate over the entries as tuples of the requested fields, in the
+        given order. The fields are those of `entries_table()`, with the path
+        as a str and the id as an Oid; the data is read from the index in a
+        single call.
+
+        Example::
+
+            >>> for path, mode in index.iter_entries(['path', 'mode']):
+            ...     print(path, mode)
+        """
+        fields = tuple(fields)
+        table = self.entries_table(fields)
+
+        columns = []
+        for name in fields:
+            column = table[name]
+            if name == 'path':
+                data, offsets = column
+                column = [
+                    to_str(data[offsets[i] : offsets[i + 1]])
+                    for i in range(len(offsets) - 1)
+                ]
+            elif name == 'id':
+                column = [
+                    Oid(raw=column[i : i + GIT_OID_RAWSZ])
+                    for i in range(0, len(column), GIT_OID_RAWSZ)
+                ]
+            columns.append(column)
+
+        return zip(*columns)
+
     def read(self, force=True):
         """
         Update the contents of the Index by reading from a file.
@@ -177,6 +243,21 @@ class Index:
         err = C.git_index_remove(self._index, to_bytes(path), level)
         check_error(err, io=True)
 
+    def remove_many(self, paths, level=0):
+        """Remove the entries of the given paths from the Index, at the given
+        stage.
+
+        All the paths are checked first: if one of them is not in the Index,
+        OSError is raised and nothing is removed.
+
+        Unlike `add_many()`, the removal is not batched: the entries are
+        removed one at a time, each time moving the entries after it, so
+        removing m of n entries takes O(n*m). libgit2 has no bulk removal,
+        and rebuilding the Index instead would check every kept entry again
+        and drop the resolve-undo data.
+        """
+        _index_remove_many(self._pointer, paths, level)
+
     def remove_all(self, pathspecs):
         """Remove all index entries matching pathspecs."""
         with StrArray(pathspecs) as arr:
@@ -216,6 +297,43 @@ class Index:
 
         check_error(err, io=True)
 
+    def add_many(self, paths, oids, modes):
+        """Add or update the entries given as parallel sequences in the Index,
+        as `add()` does with IndexEntry objects, in a single call.
+
+        Parameters:
+
+        paths
+            A sequence of paths (str, bytes or path-like).
+
+        oids
+            A sequence of Oid objects or hex strings, or the raw oids packed
+            in a bytes-like object (20 bytes each), e.g. the id column of
+            `entries_table()`.
+
+        modes
+            A sequence of FileMode or int, e.g. an array('I').
+
+        The arguments are all converted and checked before the Index is
+        changed, so a bad oid or mode leaves it untouched. So does a bad
+        path, raising ValueError: an empty, ``.``, ``..`` or ``.git``
+        component (e.g. ``'a/../b'`` or ``'a/'``), or a path that would be
+        both a file and a directory, among the paths or with the entries of
+        the Index. A path that libgit2 still rejects, depending on the
+        configuration (e.g. ``git~1`` with core.protectNTFS), raises
+        GitError after the entries added before it are put back. A path
+        given more than once is added with its last oid and mode.
+
+        Example::
+
+            >>> table = other.entries_table(['path', 'id', 'mode'])
+            >>> data, offsets = table['path']
+            >>> paths = [data[offsets[i]:offsets[i + 1]]
+            ...          for i in range(len(offsets) - 1)]
+            >>> index.add_many(paths, table['id'], table['mode'])
+        """
+        _index_add_many(self._pointer, paths, oids, modes)
+
     def diff_to_workdir(
         self,
         flags: DiffOption = DiffOption.NORMAL,
@@ -255,7 +373,9 @@ class Index:
         err = C.git_diff_index_to_workdir(cdiff, repo._repo, self._index, copts)
         check_error(err)
 
-        return Diff.from_c(bytes(ffi.buffer(cdiff)[:]), repo)
+        return Diff.from_c(
+            bytes(ffi.buffer(cdiff)[:]), repo, flags, context_lines, interhunk_lines
+        )
 
     def diff_to_tree(
         self,
@@ -306,7 +426,9 @@ class Index:
         err = C.git_diff_tree_to_index(cdiff, repo._repo, ctree[0], self._index, copts)
         check_error(err)
 
-        return Diff.from_c(bytes(ffi.buffer(cdiff)[:]), repo)
+        return Diff.from_c(
+            bytes(ffi.buffer(cdiff)[:]), repo, flags, context_lines, interhunk_lines
+        )
 
     #
     # Conflicts
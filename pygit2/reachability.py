@@ -0,0 +1,295 @@
+# Copyright 2010-2024 The pygit2 contributors
+#
+# This file is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License, version 2,
+# as published by the Free Software Foundation.
+#
+# In addition to the permissions in the GNU General Public License,
+# the authors give you unlimited permission to link the compiled
+# version of this file into combinations with other programs,
+# and to distribute those combinations without any restriction
+# coming from the use of this file.  (The General Public License
+# restrictions do apply in other respects; for example, they cover
+# modification of the file, and distribution when not linked into
+# a combined executable.)
+#
+# This file is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; see the file COPYING.  If not, write to
+# the Free Software Foundation, 51 Franklin Street, Fifth Floor,
+# Boston, MA 02110-1301, USA.
+
+from __future__ import annotations
+from array import array
+from typing import TYPE_CHECKING
+
+from ._pygit2 import Commit, Oid
+from .enums import SortMode
+
+# Need BaseRepository for type hints, but don't let it cause a circular dependency
+if TYPE_CHECKING:
+    from .repository import BaseRepository
+
+
+# A reachability bitmap is kept for 1 in `stride` commits, with the stride
+# growing with the size of the history to bound the memory used
+_MIN_STRIDE = 64
+_MAX_SAMPLES = 512
+
+
+class Reachability:
+    """Reachability index of the commits of a repository.
+
+    The index gives every commit reachable from the references (and HEAD) a
+    position in topological order, and keeps a bitmap, with one bit per
+    commit, of the commits reachable from every reference tip and from a
+    sample of the other commits. Containment queries then become bit tests
+    and bitmap operations, with at most a short walk to the nearest commits
+    with a bitmap.
+
+    The index is built on first use, or explicitly with `build()`. Commits
+    never change their ancestry, so the index stays valid when references
+    move; queries about commits not in the index fall back to a regular
+    graph walk. Call `build()` again to index new commits.
+
+    Accessed as `Repository.reachability`.
+    """
+
+    def __init__(self, repository: BaseRepository):
+        self._repository = repository
+        self.clear()
+
+    def clear(self):
+        """Drop the index, freeing its memory."""
+        self._positions = None  # raw oid -> position
+        self._ids = b''
+        self._parent_offsets = None
+        self._parents = None
+        self._bitmaps = {}  # position -> bitmap, for the tips and samples
+
+    @property
+    def is_built(self) -> bool:
+        """Whether the index has been built."""
+        return self._positions is not None
+
+    def _tips(self):
+        repository = self._repository
+        tips = set()
+        references = list(repository.references.iterator())
+        if not repository.head_is_unborn:
+            references.append(repository.lookup_reference('HEAD'))
+
+        for reference in references:
+            try:
+                commit = reference.peel(Commit)
+            except (KeyError, ValueError):
+                # Dangling symbolic references, tags to trees or blobs
+                continue
+            tips.add(commit.id)
+
+        return tips
+
+    def build(self):
+        """(Re)build the index with the commits reachable from the references
+        and HEAD.
+        """
+        self.clear()
+
+        tips = self._tips()
+        walker = self._repository.walk(None, SortMode.TOPOLOGICAL | SortMode.REVERSE)
+        for oid in tips:
+            walker.push(oid)
+
+        table = walker.next_batch(-1, ['id', 'parent_count', 'parent_ids'])
+        ids = table['id']
+        n = len(ids) // 20
+        positions = {ids[i * 20 : i * 20 + 20]: i for i in range(n)}
+
+        # Parents of every commit by position, in CSR layout
+        raw_parents = table['parent_ids']
+        parents = array(
+            'I',
+            [
+                positions[raw_parents[i : i + 20]]
+                for i in range(0, len(raw_parents), 20)
+            ],
+        )
+        parent_offsets = array('Q', [0])
+        offset = 0
+        for count in table['parent_count']:
+            offset += count
+            parent_offsets.append(offset)
+
+        # Bitmaps are kept for the reference tips and for a sample of the
+        # other commits, chosen so that at most about `stride` commits are
+        # walked from any commit before reaching a bitmap. One bitmap per
+        # commit would make the build quadratic in time and memory. cost[i]
+        # bounds the number of commits walked from i, 0 if it has a bitmap.
+        stride = max(_MIN_STRIDE, n // _MAX_SAMPLES)
+        tip_positions = {positions[x.raw] for x in tips}
+        cost = array('I', bytes(4 * n))
+        sampled = []
+        for i in range(n):
+            c = 1
+            for j in range(parent_offsets[i], parent_offsets[i + 1]):
+                c += cost[parents[j]]
+            if c > stride or i in tip_positions:
+                sampled.append(i)
+            else:
+                cost[i] = c
+
+        self._positions = positions
+        self._ids = ids
+        self._parent_offsets = parent_offsets
+        self._parents = parents
+
+        # In topological order, the bitmaps of the ancestors are ready first
+        for i in sampled:
+            self._bitmaps[i] = self._bitmap(i)
+
+    def _lookup(self, oid):
+        if not self.is_built:
+            self.build()
+
+        if isinstance(oid, Commit):
+            oid = oid.id
+        elif not isinstance(oid, Oid):
+            oid = self._repository.expand_id(oid)
+
+        return oid, self._positions.get(oid.raw)
+
+    def _bitmap(self, position):
+        bitmap = self._bitmaps.get(position)
+        if bitmap is not None:
+            return bitmap
+
+        # Walk down until we reach commits with a bitmap. The walked
+        # commits are marked in a bytearray, converted once at the end:
+        # setting bits one by one in the int would copy it every time.
+        bitmaps = self._bitmaps
+        parents = self._parents
+        parent_offsets = self._parent_offsets
+        bits = bytearray((position >> 3) + 1)
+        bitmap = 0
+        stack = [position]
+        while stack:
+            i = stack.pop()
+            if bits[i >> 3] >> (i & 7) & 1:
+                continue
+            bits[i >> 3] |= 1 << (i & 7)
+            if i != position:
+                tip = bitmaps.get(i)
+                if tip is not None:
+                    bitmap |= tip
+                    continue
+            stack.extend(parents[parent_offsets[i] : parent_offsets[i + 1]])
+
+        return bitmap | int.from_bytes(bits, 'little')
+
+    def _reaches(self, position, target):
+        # Positions are in topological order, the ancestors of a commit are
+        # always before it
+        if target > position:
+            return False
+
+        bitmap = self._bitmaps.get(position)
+        if bitmap is not None:
+            return bool(bitmap >> target & 1)
+
+        seen = set()
+        stack = [position]
+        while stack:
+            i = stack.pop()
+            if i == target:
+                return True
+            if i < target or i in seen:
+                continue
+            seen.add(i)
+            bitmap = self._bitmaps.get(i)
+            if bitmap is not None:
+                if bitmap >> target & 1:
+                    return True
+                continue
+            stack.extend(
+                self._parents[self._parent_offsets[i] : self._parent_offsets[i + 1]]
+            )
+
+        return False
+
+    def __contains__(self, oid) -> bool:
+        """Whether the commit is in the index."""
+        return self._lookup(oid)[1] is not None
+
+    def __len__(self) -> int:
+        """Number of commits in the index."""
+        if not self.is_built:
+            self.build()
+
+        return len(self._positions)
+
+    def descendant_of(self, oid, ancestor) -> bool:
+        """Same as `Repository.descendant_of`, return True if the commit
+        ``oid`` is a descendant of ``ancestor`` (a commit is not a descendant
+        of itself).
+        """
+        oid, i = self._lookup(oid)
+        ancestor, j = self._lookup(ancestor)
+        if i is None or j is None:
+            return self._repository.descendant_of(oid, ancestor)
+
+        return i != j and self._reaches(i, j)
+
+    def contains(self, tip, oid) -> bool:
+        """Return True if the commit ``oid`` is reachable from ``tip``,
+        including when they are the same commit.
+        """
+        tip, i = self._lookup(tip)
+        oid, j = self._lookup(oid)
+        if i is None or j is None:
+            return tip == oid or self._repository.descendant_of(tip, oid)
+
+        return self._reaches(i, j)
+
+    def with_commit(self, oid) -> list[str]:
+        """Return the names of the references from which the given commit is
+        reachable, like ``git for-each-ref --contains``.
+        """
+        names = []
+        for reference in self._repository.references.iterator():
+            try:
+                tip = reference.peel(Commit).id
+            except (KeyError, ValueError):
+                continue
+            if self.contains(tip, oid):
+                names.append(reference.name)
+
+        return names
+
+    def ancestors(self, oid) -> list[Oid]:
+        """Return the ids of the commits reachable from the given commit,
+        itself included, in topological order (parents first).
+        """
+        oid, i = self._lookup(oid)
+        if i is None:
+            walker = self._repository.walk(oid, SortMode.TOPOLOGICAL | SortMode.REVERSE)
+            return list(walker.iter_ids())
+
+        bitmap = self._bitmap(i)
+        ids = self._ids
+        return [
+            Oid(raw=ids[j * 20 : j * 20 + 20]) for j in range(i + 1) if bitmap >> j & 1
+        ]
+
+    def count(self, oid) -> int:
+        """Return the number of commits reachable from the given commit,
+        itself included.
+        """
+        oid, i = self._lookup(oid)
+        if i is None:
+            return len(self.ancestors(oid))
+
+        return bin(self._bitmap(i)).count('1')
@@ -23,7 +23,9 @@
 # the Free Software Foundation, 51 Franklin Street, Fifth Floor,
 # Boston, MA 02110-1301, USA.
 
+from bisect import bisect_right
 from io import BytesIO
+import os
 from os import PathLike
 from string import hexdigits
 from time import time
@@ -36,9 +38,11 @@ from ._pygit2 import Oid, GIT_OID_HEXSZ, GIT_OID_MINPREFIXLEN
 from ._pygit2 import Reference, Tree, Commit, Blob, Signature
 from ._pygit2 import InvalidSpecError
 
-from .blame import Blame
+from .blame import Blame, BlameHunk
 from .branches import Branches
 from .callbacks import git_checkout_options, git_stash_apply_options
+from .commit_graph import CHANGED_PATHS_FILE, ChangedPathFilters, CommitGraph
+from .commit_graph import write_changed_paths
 from .config import Config
 from .enums import (
     AttrCheck,
@@ -54,15 +58,34 @@ from .enums import (
     ObjectType,
     RepositoryOpenFlag,
     RepositoryState,
+    SortMode,
 )
 from .errors import check_error
 from .ffi import ffi, C
 from .index import Index, IndexEntry
 from .packbuilder import PackBuilder
+from .reachability import Reachability
+from .status import InotifyChangeSource, StatusCache
 from .references import References
+from .similarity import SignatureCache
 from .remotes import RemoteCollection
 from .submodules import SubmoduleCollection
-from .utils import to_bytes, StrArray
+from .utils import to_bytes, to_str, StrArray
+
+
+def _blame_continues(hunk, next_hunk):
+    """Whether the next hunk, of the following range of lines, would have
+    been part of the hunk if the file had been blamed at once.
+    """
+    lines, final_id, final_start, _, orig_id, orig_path, orig_start, _, boundary = hunk
+    return (
+        next_hunk[1] == final_id
+        and next_hunk[4] == orig_id
+        and next_hunk[5] == orig_path
+        and next_hunk[8] == boundary
+        and next_hunk[2] == final_start + lines
+        and next_hunk[6] == orig_start + lines
+    )
 
 
 class BaseRepository(_Repository):
@@ -72,6 +95,7 @@ class BaseRepository(_Repository):
 
     def _common_init(self):
         self.branches = Branches(self)
+        self.reachability = Reachability(self)
         self.references = References(self)
         self.remotes = RemoteCollection(self)
         self.submodules = SubmoduleCollection(self)
@@ -90,6 +114,13 @@ class BaseRepository(_Repository):
         """
         return self.odb.read(*args, **kwargs)
 
+    def read_many(self, oids, workers=1):
+        """read_many(oids, workers=1) -> list of (type, data)
+
+        Read many objects at once from the repository, see `Odb.read_many`.
+        """
+        return self.odb.read_many(oids, workers)
+
     def write(self, *args, **kwargs):
         """write(type, data) -> Oid
 
@@ -578,6 +609,7 @@ class BaseRepository(_Repository):
         oldest_commit=None,
         min_line=None,
         max_line=None,
+        base=None,
     ):
         """
         Return a Blame object for a single file.
@@ -606,10 +638,39 @@ class BaseRepository(_Repository):
         max_line
             The last line in the file to blame.
 
+        base
+            A previous blame of the file, a `Blame` or a snapshot of one
+            (see `Blame.to_bytes()`), for an ancestor of *newest_commit*.
+            Then only the commits since the one of the base are walked, the
+            lines older than it are taken from the base. Must have been made
+            with the same flags, and without *oldest_commit*.
+
         Examples::
 
             repo.blame('foo.c', flags=enums.BlameFlag.IGNORE_WHITESPACE)
+
+            # After a push, from a blame kept since the previous one
+            blame = repo.blame('foo.c', base=Blame.from_bytes(snapshot))
+            snapshot = blame.to_bytes()
         """
+        if newest_commit and not isinstance(newest_commit, Oid):
+            newest_commit = Oid(hex=newest_commit)
+        commit_id = newest_commit or self.head.peel(Commit).id
+
+        if base is not None:
+            if oldest_commit:
+                raise ValueError('cannot blame from a base with oldest_commit')
+            if not isinstance(base, Blame):
+                base = Blame.from_bytes(base)
+            return self._blame_from_base(
+                to_str(path),
+                base,
+                flags,
+                min_match_characters,
+                commit_id,
+                min_line,
+                max_line,
+            )
 
         options = ffi.new('git_blame_options *')
         C.git_blame_options_init(options, C.GIT_BLAME_OPTIONS_VERSION)
@@ -618,8 +679,6 @@ class BaseRepository(_Repository):
         if min_match_characters:
             options.min_match_characters = min_match_characters
         if newest_commit:
-            if not isinstance(newest_commit, Oid):
-                newest_commit = Oid(hex=newest_commit)
             ffi.buffer(ffi.addressof(options, 'newest_commit'))[:] = newest_commit.raw
         if oldest_commit:
             if not isinstance(oldest_commit, Oid):
@@ -634,7 +693,188 @@ class BaseRepository(_Repository):
         err = C.git_blame_file(cblame, self._repo, to_bytes(path), options)
         check_error(err)
 
-        return Blame._from_c(self, cblame[0])
+        return Blame._from_c(self, cblame[0], to_str(path), commit_id)
+
+    def _blame_from_base(
+        self, path, base, flags, min_match_characters, commit_id, min_line, max_line
+    ):
+        if base.commit_id is None:
+            raise ValueError('the commit of the base blame is not known')
+
+        flags = int(flags)
+        min_match_characters = min_match_characters or 0
+        unit = (to_bytes(path), min_line or 0, max_line or 0)
+        [hunks] = self._blame(
+            [unit], flags, min_match_characters, commit_id.raw, base.commit_id.raw, 1
+        )
+
+        # The lines that reached the commit of the base, by their number there
+        base_hunks = base._values()
+        starts = [values[2] for values in base_hunks]
+        result = []
+        missing = []  # Ranges of lines not in the base
+        for values in hunks:
+            lines, final_id, final_start, _, _, orig_path, orig_start, _, boundary = (
+                values
+            )
+            if not boundary:
+                result.append(values)
+                continue
+            if final_id != base.commit_id or orig_path != base.path:
+                # A root commit, or a commit merged since the base whose
+                # parents were not walked
+                missing.append((to_bytes(path), final_start, final_start + lines - 1))
+                continue
+
+            line, end = orig_start, orig_start + lines
+            while line < end:
+                i = bisect_right(starts, line) - 1
+                start = final_start + line - orig_start
+                if i < 0 or line >= starts[i] + base_hunks[i][0]:
+                    stop = starts[i + 1] if i + 1 < len(starts) else end
+                    stop = min(stop, end)
+                    missing.append((to_bytes(path), start, start + stop - line - 1))
+                else:
+                    stop = min(end, starts[i] + base_hunks[i][0])
+                    b = base_hunks[i]
+                    orig = b[6] + line - b[2]
+                    result.append(
+                        (stop - line, b[1], start, b[3], b[4], b[5], orig, b[7], b[8])
+                    )
+                line = stop
+
+        # Blame the rest in full
+        if missing:
+            for hunks in self._blame(
+                missing, flags, min_match_characters, commit_id.raw, b'', 1
+            ):
+                result.extend(hunks)
+
+        result.sort(key=lambda values: values[2])
+        joined = []
+        for values in result:
+            if joined and _blame_continues(joined[-1], values):
+                values = (joined[-1][0] + values[0],) + joined[-1][1:]
+                joined[-1] = values
+            else:
+                joined.append(values)
+
+        return Blame._from_values(self, joined, path, commit_id)
+
+    def blame_iter(
+        self,
+        paths,
+        flags: BlameFlag = BlameFlag.NORMAL,
+        min_match_characters=None,
+        newest_commit=None,
+        oldest_commit=None,
+        workers=1,
+        chunk_lines=None,
+        cancel=None,
+    ):
+        """
+        Blame one or more files with the GIL released, and yield their
+        ``(path, hunk)`` pairs, file after file and in the order of the
+        lines, as they are resolved. The hunks are the same as with
+        `Repository.blame()`.
+
+        The work is done in batches of as many files, or ranges of lines,
+        as *workers*; the batches run in threads, each one with its own
+        handle of the repository, and nothing is blamed past the batch
+        being consumed.
+
+        Parameters:
+
+        paths
+            Path, or iterable of paths, of the files to blame.
+
+        flags, min_match_characters, newest_commit, oldest_commit
+            As in `Repository.blame()`.
+
+        workers
+            Number of threads.
+
+        chunk_lines
+            Split the files in ranges of this number of lines, blamed
+            independently, so the first hunks of a large file come sooner
+            and its ranges are blamed in parallel. Every range walks the
+            history until its own lines are resolved, so the total work
+            grows with the number of ranges.
+
+        cancel
+            An object with an ``is_set()`` method, e.g. a
+            `threading.Event`, checked before every batch: once set, the
+            iteration stops. Closing the generator stops it as well.
+
+        Examples::
+
+            for path, hunk in repo.blame_iter(paths, workers=8):
+                ...
+        """
+        if isinstance(paths, (str, bytes, PathLike)):
+            paths = [paths]
+
+        def raw(commit):
+            if not commit:
+                return b''
+            if not isinstance(commit, Oid):
+                commit = Oid(hex=commit)
+            return commit.raw
+
+        newest, oldest = raw(newest_commit), raw(oldest_commit)
+        tip = None
+        units = []
+        for path in paths:
+            path = to_str(path)
+            if not chunk_lines:
+                units.append((path, 0, 0))
+                continue
+
+            if tip is None:
+                tip = self[newest_commit] if newest else self.head.peel(Commit)
+            data = tip.tree[path].data
+            nlines = data.count(b'\n')
+            if data and not data.endswith(b'\n'):
+                nlines += 1
+            if nlines <= chunk_lines:
+                units.append((path, 0, 0))
+                continue
+            for start in range(1, nlines + 1, chunk_lines):
+                units.append((path, start, min(start + chunk_lines - 1, nlines)))
+
+        batch_size = max(workers, 1)
+        pending = None
+        for i in range(0, len(units), batch_size):
+            if cancel is not None and cancel.is_set():
+                break
+
+            batch = units[i : i + batch_size]
+            results = self._blame(
+                [(to_bytes(path), start, end) for path, start, end in batch],
+                int(flags),
+                min_match_characters or 0,
+                newest,
+                oldest,
+                workers,
+            )
+            for (path, start, _), hunks in zip(batch, results):
+                for values in hunks:
+                    # The ranges of a file split some hunks, join them back
+                    if (
+                        start > 1
+                        and pending[0] == path
+                        and _blame_continues(pending[1], values)
+                    ):
+                        pending = (path, (pending[1][0] + values[0],) + pending[1][1:])
+                        start = 0
+                        continue
+                    if pending:
+                        yield pending[0], BlameHunk._from_values(pending[1])
+                    pending = (path, values)
+                    start = 0
+
+        if pending:
+            yield pending[0], BlameHunk._from_values(pending[1])
 
     #
     # Index
@@ -1265,6 +1505,321 @@ class BaseRepository(_Repository):
                 info.mode = entry.mode
                 archive.addfile(info, BytesIO(content))
 
+    #
+    # Walking the history
+    #
+    def walk(self, oid, sort_mode=SortMode.NONE, paths=None):
+        """Start traversing the history from the given commit, returns a
+        `Walker`. The following SortMode values can be used to control the
+        walk:
+
+        * NONE. Sort the output with the same default method from
+          `git`: reverse chronological order. This is the default sorting for
+          new walkers.
+        * TOPOLOGICAL. Sort the repository contents in topological order
+          (no parents before all of its children are shown); this sorting mode
+          can be combined with time sorting to produce `git`'s `--date-order``.
+        * TIME. Sort the repository contents by commit time; this sorting
+          mode can be combined with topological sorting.
+        * REVERSE.  Iterate through the repository contents in reverse
+          order; this sorting mode can be combined with any of the above.
+
+        Example:
+
+          >>> from pygit2 import Repository
+          >>> from pygit2.enums import SortMode
+          >>> repo = Repository('.git')
+          >>> for commit in repo.walk(repo.head.target, SortMode.TOPOLOGICAL):
+          ...    print(commit.message)
+          >>> for commit in repo.walk(repo.head.target, paths=['README.md']):
+          ...    print(commit.message)
+
+        Parameters:
+
+        oid
+            The commit to start the walk from, or None for an empty walker.
+
+        sort_mode
+            An `enums.SortMode` value.
+
+        paths
+            If given, the walk is limited to the commits that changed any of
+            these paths, see `Repository.log_path()`; a generator of commits
+            is returned instead of a `Walker`.
+        """
+        if paths is None:
+            return super().walk(oid, sort_mode)
+
+        return self.log_path(paths, oid, sort_mode)
+
+    def log_path(self, paths, oid=None, sort_mode=SortMode.NONE):
+        """Yield the commits that changed any of the given paths, like
+        ``git log --full-history -- <paths>``.
+
+        A commit changed a path (a file or a directory) when its tree differs
+        from the tree of any of its parents for the path, or when it has no
+        parents and the path exists. Trees are not diffed, only the entries
+        of the paths are compared; and if the repository has changed-path
+        filters (see `Repository.write_changed_paths()`), the commits with
+        at most one parent that did not change any of the paths are skipped
+        without reading their trees.
+
+        Parameters:
+
+        paths
+            A path, or a list of paths, relative to the root of the
+            repository.
+
+        oid
+            The commit to start the walk from, HEAD by default.
+
+        sort_mode
+            An `enums.SortMode` value, see `Repository.walk`.
+        """
+        if isinstance(paths, str):
+            paths = [paths]
+        paths = [path.strip('/') for path in paths]
+        if oid is None:
+            oid = self.head.target
+
+        def entries(tree):
+            ids = []
+            for path in paths:
+                try:
+                    ids.append(tree[path].id)
+                except KeyError:
+                    ids.append(None)
+            return ids
+
+        filters = self.read_changed_paths()
+        try:
+            for commit in super().walk(oid, sort_mode):
+                if filters is not None and len(commit.parent_ids) < 2:
+                    maybe = [filters.maybe_changed(commit.id, x) for x in paths]
+                    if not any(x is None or x for x in maybe):
+                        continue
+
+                ids = entries(commit.tree)
+                if commit.parents:
+                    if any(entries(x.tree) != ids for x in commit.parents):
+                        yield commit
+                elif any(x is not None for x in ids):
+                    yield commit
+        finally:
+            if filters is not None:
+                filters.close()
+
+    def walk_table(self, oid, sort_mode=SortMode.NONE, fields=None):
+        """Walk the whole history from the given commit, and return the
+        requested commit data as columns instead of Commit objects.
+
+        See `Walker.next_batch` for the available fields and the format of
+        the returned dict.
+
+        Parameters:
+
+        oid
+            The commit to start the walk from.
+
+        sort_mode
+            An `enums.SortMode` value, see `Repository.walk`.
+
+        fields
+            The list of fields to return, or None for the default fields.
+        """
+        return self.walk(oid, sort_mode).next_batch(-1, fields)
+
+    def diff_commits(
+        self,
+        commits,
+        flags=DiffOption.NORMAL,
+        renames=False,
+        workers=1,
+        chunk_size=1024,
+    ):
+        """Diff many commits at once, and yield the paths changed by each
+        one. The diffs are done in batches, with the GIL released, and
+        without creating any Diff object.
+
+        Yields a ``(id, changes)`` tuple per commit, in the given order,
+        where ``changes`` is a list of ``(status, old_path, new_path)``
+        tuples: the status char of the delta (see
+        `DiffDelta.status_char()`), and the paths on both sides, the same
+        string unless renamed.
+
+        Parameters:
+
+        commits
+            An iterable of commits, e.g. a `Walker`, each one compared with
+            its first parent, or with the empty tree if it has none. Items
+            may also be ``(old, new)`` pairs of commits or trees, None being
+            the empty tree. Commits and trees may be given as objects, Oids
+            or hex strings.
+
+        flags
+            A combination of enums.DiffOption constants.
+
+        renames
+            Whether to detect renames.
+
+        workers
+            Number of threads, each with its own handle of the repository,
+            the commits of a batch are split between.
+
+        chunk_size
+            Number of commits per batch.
+        """
+        zero = bytes(20)
+
+        def raw(x):
+            if x is None:
+                return zero
+            if isinstance(x, (Commit, Tree)):
+                return x.id.raw
+            if isinstance(x, str):
+                return Oid(hex=x).raw
+            return x.raw
+
+        old_ids, new_ids, ids = [], [], []
+        for item in commits:
+            if isinstance(item, tuple):
+                old, new = item
+            else:
+                new = item if isinstance(item, Commit) else self[item]
+                old = new.parent_ids[0] if new.parent_ids else None
+
+            old_ids.append(raw(old))
+            new_ids.append(raw(new))
+            ids.append(Oid(raw=new_ids[-1]))
+            if len(ids) == chunk_size:
+                yield from self._diff_commits_batch(
+                    old_ids, new_ids, ids, flags, renames, workers
+                )
+                old_ids, new_ids, ids = [], [], []
+
+        if ids:
+            yield from self._diff_commits_batch(
+                old_ids, new_ids, ids, flags, renames, workers
+            )
+
+    def _diff_commits_batch(self, old_ids, new_ids, ids, flags, renames, workers):
+        changes = self._diff_trees(
+            b''.join(old_ids), b''.join(new_ids), int(flags), renames, workers
+        )
+        return zip(ids, changes)
+
+    def read_commit_graph(self):
+        """Return the commit-graph of the repository as a `CommitGraph`
+        object, or None if the repository has no commit-graph file.
+
+        The commit-graph is written with `Repository.write_commit_graph()`
+        or by ``git commit-graph write``. Only single-file graphs are
+        supported, split commit-graph chains are ignored.
+        """
+        commondir = ffi.string(C.git_repository_commondir(self._repo)).decode()
+        path = os.path.join(commondir, 'objects', 'info', 'commit-graph')
+        if not os.path.exists(path):
+            return None
+
+        return CommitGraph(path)
+
+    def _changed_paths_path(self):
+        commondir = ffi.string(C.git_repository_commondir(self._repo)).decode()
+        return os.path.join(commondir, 'objects', 'info', CHANGED_PATHS_FILE)
+
+    def write_changed_paths(self, workers=1):
+        """Write the changed-path Bloom filters of the commits reachable from
+        the references, used by `Repository.log_path()`.
+
+        The filters are computed with `Repository.diff_commits()`, and are
+        compatible with those of ``git commit-graph write --changed-paths``,
+        but they are written to a pygit2 specific file. Like the
+        commit-graph, the file is not updated automatically; commits without
+        a filter are diffed.
+
+        Parameters:
+
+        workers
+            Number of threads to diff the commits with.
+        """
+        write_changed_paths(self, self._changed_paths_path(), workers)
+
+    def read_changed_paths(self):
+        """Return the changed-path filters of the repository as a
+        `ChangedPathFilters` object, or None if there are none.
+
+        The filters are read from the commit-graph, if written by ``git
+        commit-graph write --changed-paths``, or else from the file written
+        by `Repository.write_changed_paths()`.
+        """
+        commondir = ffi.string(C.git_repository_commondir(self._repo)).decode()
+        for path in (
+            os.path.join(commondir, 'objects', 'info', 'commit-graph'),
+            self._changed_paths_path(),
+        ):
+            if os.path.exists(path):
+                try:
+                    return ChangedPathFilters(path)
+                except ValueError:
+                    pass
+
+        return None
+
+    #
+    # Status
+    #
+    def status_cache(
+        self, change_source=None, untracked_files='all', ignored=False, workers=1
+    ):
+        """Return a `StatusCache`, which keeps the status of the working tree
+        and updates it incrementally, scanning only the paths that changed.
+
+        Parameters:
+
+        change_source
+            An object with ``changed_paths()`` and ``close()`` methods, see
+            `ChangeSource`. By default an `InotifyChangeSource` is used where
+            inotify is available; elsewhere, and with a source that reports
+            None, every call to `StatusCache.status()` does a full scan.
+
+        untracked_files, ignored
+            As in `Repository.status()`.
+
+        workers
+            Number of threads used for full scans, as in
+            `Repository.status()`.
+        """
+        if self.is_bare:
+            raise ValueError('cannot get the status of a bare repository')
+
+        if change_source is None:
+            try:
+                change_source = InotifyChangeSource(self.workdir)
+            except OSError:
+                pass
+
+        return StatusCache(self, change_source, untracked_files, ignored, workers)
+
+    #
+    # Similarity
+    #
+    _signature_cache = None
+
+    @property
+    def signature_cache(self) -> SignatureCache:
+        """The `SignatureCache` used by default by `Diff.find_similar()` with
+        workers, created on first use. It only lives in memory; set another
+        one, e.g. with a `DbmSignatureStore`, to keep the signatures across
+        processes.
+        """
+        if self._signature_cache is None:
+            self._signature_cache = SignatureCache()
+        return self._signature_cache
+
+    @signature_cache.setter
+    def signature_cache(self, cache: SignatureCache):
+        self._signature_cache = cache
+
     #
     # Ahead-behind, which mostly lives on its own namespace
     #
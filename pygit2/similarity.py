@@ -0,0 +1,141 @@
+# Copyright 2010-2024 The pygit2 contributors
+#
+# This file is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License, version 2,
+# as published by the Free Software Foundation.
+#
+# In addition to the permissions in the GNU General Public License,
+# the authors give you unlimited permission to link the compiled
+# version of this file into combinations with other programs,
+# and to distribute those combinations without any restriction
+# coming from the use of this file.  (The General Public License
+# restrictions do apply in other respects; for example, they cover
+# modification of the file, and distribution when not linked into
+# a combined executable.)
+#
+# This file is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; see the file COPYING.  If not, write to
+# the Free Software Foundation, 51 Franklin Street, Fifth Floor,
+# Boston, MA 02110-1301, USA.
+
+"""
+Caches of the similarity signatures of the blobs, see `Diff.find_similar()`.
+"""
+
+from __future__ import annotations
+from collections import OrderedDict
+import dbm
+import os
+from typing import Optional, Protocol
+
+
+class SignatureStore(Protocol):
+    """The interface of the second level stores of `SignatureCache`.
+
+    The keys are the raw oid of a blob followed by a byte for the
+    whitespace options, the values are packed signatures; both are bytes.
+    Any object with these methods can be used, e.g. to share the signatures
+    between machines.
+    """
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        """Return the value of the key, or None."""
+
+    def __setitem__(self, key: bytes, value: bytes) -> None:
+        """Store the value of the key."""
+
+    def close(self) -> None:
+        """Release the resources of the store."""
+
+
+class DbmSignatureStore:
+    """A `SignatureStore` on disk, in a `dbm` database.
+
+    The signatures only depend on the contents of the blobs, so the same
+    database can be used with any number of repositories.
+    """
+
+    def __init__(self, path: str | os.PathLike[str]):
+        self._db = dbm.open(os.fspath(path), 'c')
+
+    def get(self, key):
+        return self._db.get(key)
+
+    def __setitem__(self, key, value):
+        self._db[key] = value
+
+    def close(self):
+        self._db.close()
+
+
+class SignatureCache:
+    """The signatures of the blobs computed by `Diff.find_similar()`, so the
+    blobs seen by a diff are not read and hashed again by the next ones.
+
+    The signatures are kept in memory, the least recently used first dropped
+    when there are more than *maxsize* (a signature takes 1 KiB at most).
+    With a *store*, e.g. a `DbmSignatureStore`, the signatures are also
+    written to it, and the ones missing from memory looked up in it.
+
+    The lookups are counted in `hits` and `misses`.
+    """
+
+    def __init__(self, maxsize: int = 16384, store: Optional[SignatureStore] = None):
+        if maxsize < 1:
+            raise ValueError('maxsize must be at least 1')
+
+        self.maxsize = maxsize
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+        self._signatures = OrderedDict()
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        value = self._signatures.get(key)
+        if value is not None:
+            self._signatures.move_to_end(key)
+            self.hits += 1
+            return value
+
+        if self.store is not None:
+            value = self.store.get(key)
+            if value is not None:
+                self._add(key, value)
+                self.hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    def __setitem__(self, key: bytes, value: bytes):
+        self._add(key, value)
+        if self.store is not None:
+            self.store[key] = value
+
+    def _add(self, key, value):
+        self._signatures[key] = value
+        self._signatures.move_to_end(key)
+        if len(self._signatures) > self.maxsize:
+            self._signatures.popitem(last=False)
+
+    def clear(self):
+        """Drop the signatures kept in memory, and reset the counters. The
+        store is left as is.
+        """
+        self._signatures.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        """Close the store, if any."""
+        if self.store is not None:
+            self.store.close()
+            self.store = None
@@ -0,0 +1,296 @@
+# Copyright 2010-2024 The pygit2 contributors
+#
+# This file is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License, version 2,
+# as published by the Free Software Foundation.
+#
+# In addition to the permissions in the GNU General Public License,
+# the authors give you unlimited permission to link the compiled
+# version of this file into combinations with other programs,
+# and to distribute those combinations without any restriction
+# coming from the use of this file.  (The General Public License
+# restrictions do apply in other respects; for example, they cover
+# modification of the file, and distribution when not linked into
+# a combined executable.)
+#
+# This file is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; see the file COPYING.  If not, write to
+# the Free Software Foundation, 51 Franklin Street, Fifth Floor,
+# Boston, MA 02110-1301, USA.
+
+"""
+Incremental working tree status.
+"""
+
+from __future__ import annotations
+import ctypes
+import ctypes.util
+import errno
+import os
+import struct
+from typing import TYPE_CHECKING, Iterable, Optional, Protocol
+
+# Need BaseRepository for type hints, but don't let it cause a circular dependency
+if TYPE_CHECKING:
+    from .repository import BaseRepository
+
+
+class ChangeSource(Protocol):
+    """The interface of the sources of changed paths used by `StatusCache`.
+
+    Any object with these methods can be used, e.g. to plug the events of
+    an external file system monitor.
+    """
+
+    def changed_paths(self) -> Optional[Iterable[str]]:
+        """Return the paths, relative to the root of the working tree, of the
+        files and directories that changed since the previous call. Return
+        None if that is not known (e.g. events were lost), so the next status
+        is a full scan.
+        """
+
+    def close(self) -> None:
+        """Release the resources of the source."""
+
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+IN_WATCH_MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_ONLYDIR
+)
+
+_event = struct.Struct('iIII')
+
+
+class InotifyChangeSource:
+    """A `ChangeSource` backed by inotify(7), Linux only.
+
+    Watches every directory of the working tree, except ``.git``. The kernel
+    limits the number of watches per user, see
+    ``/proc/sys/fs/inotify/max_user_watches``; raises OSError when the limit
+    is reached.
+    """
+
+    def __init__(self, workdir: str | os.PathLike[str]):
+        path = ctypes.util.find_library('c')
+        libc = ctypes.CDLL(path, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError(errno.ENOSYS, 'inotify is not available')
+
+        self._libc = libc
+        self._root = os.fsencode(workdir)
+        self._watches = {}  # watch descriptor -> relative directory (bytes)
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+
+        try:
+            self._add_tree(b'')
+        except Exception:
+            self.close()
+            raise
+
+    def _add_tree(self, relpath):
+        for dirpath, dirnames, _ in os.walk(os.path.join(self._root, relpath)):
+            if b'.git' in dirnames:
+                dirnames.remove(b'.git')
+
+            wd = self._libc.inotify_add_watch(self._fd, dirpath, IN_WATCH_MASK)
+            if wd < 0:
+                error = ctypes.get_errno()
+                if error in (errno.ENOENT, errno.ENOTDIR):
+                    continue  # removed meanwhile
+                raise OSError(error, os.strerror(error), dirpath)
+
+            relative = os.path.relpath(dirpath, self._root)
+            self._watches[wd] = b'' if relative == b'.' else relative
+
+    def changed_paths(self):
+        changed = set()
+        overflow = False
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+
+            offset = 0
+            while offset < len(data):
+                wd, mask, _cookie, size = _event.unpack_from(data, offset)
+                offset += _event.size
+                name = data[offset : offset + size].rstrip(b'\0')
+                offset += size
+
+                if mask & IN_Q_OVERFLOW:
+                    overflow = True
+                    continue
+
+                directory = self._watches.get(wd)
+                if directory is None:
+                    continue
+                if mask & IN_IGNORED:
+                    del self._watches[wd]
+                    continue
+                if not name:
+                    # The directory itself
+                    if directory:
+                        changed.add(os.fsdecode(directory))
+                    continue
+
+                path = os.path.join(directory, name) if directory else name
+                if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                    if name == b'.git':
+                        continue
+                    self._add_tree(path)
+                changed.add(os.fsdecode(path))
+
+        if overflow:
+            return None
+
+        return changed
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class StatusCache:
+    """Cache of the status of the working tree, updated incrementally.
+
+    The first call to `status()` does a full scan. Later calls only examine
+    the paths reported by the change source, unless HEAD or the index file
+    changed, a ``.gitignore`` file changed, or the source does not know what
+    changed; then the status is fully scanned again.
+
+    Changes to the in-memory index that are not written to disk, and to
+    ignore rules outside the working tree (e.g. ``.git/info/exclude``), are
+    not noticed; call `invalidate()` in that case.
+
+    Created with `Repository.status_cache()`.
+
+    Attributes:
+
+    full_scans
+        Number of full scans done so far.
+
+    incremental_scans
+        Number of incremental updates done so far.
+    """
+
+    def __init__(
+        self,
+        repository: BaseRepository,
+        change_source: Optional[ChangeSource] = None,
+        untracked_files: str = 'all',
+        ignored: bool = False,
+        workers: int = 1,
+    ):
+        self._repository = repository
+        self._source = change_source
+        self._options = {'untracked_files': untracked_files, 'ignored': ignored}
+        self._workers = workers
+        self._entries = None
+        self._state = None
+        self.full_scans = 0
+        self.incremental_scans = 0
+
+    def _repository_state(self):
+        repository = self._repository
+        head = None if repository.head_is_unborn else repository.head.target
+        try:
+            st = os.stat(os.path.join(repository.path, 'index'))
+        except FileNotFoundError:
+            return head, None
+
+        return head, (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def invalidate(self):
+        """Drop the cached status, so the next call does a full scan."""
+        self._entries = None
+
+    def status(self) -> dict:
+        """Return the status of the working tree, as `Repository.status()`."""
+        changed = None
+        if self._source is not None:
+            changed = self._source.changed_paths()
+
+        state = self._repository_state()
+        if (
+            self._entries is None
+            or changed is None
+            or state != self._state
+            or any(os.path.basename(x) == '.gitignore' for x in changed)
+        ):
+            self._state = state
+            self._entries = self._repository.status(
+                workers=self._workers, **self._options
+            )
+            self.full_scans += 1
+        elif changed:
+            self._update(sorted(changed))
+            self.incremental_scans += 1
+
+        return dict(self._entries)
+
+    def _update(self, paths):
+        prefixes = tuple(f'{x}/' for x in paths)
+        exact = set(paths)
+
+        def is_stale(key):
+            # Untracked directories are reported with a trailing slash
+            if key.endswith('/') and any(x.startswith(key) for x in paths):
+                return True
+            return key in exact or key.startswith(prefixes)
+
+        # The paths are names, not patterns
+        options = dict(self._options, literal_paths=True)
+        entries = {k: v for k, v in self._entries.items() if not is_stale(k)}
+        if self._workers > 1:
+            # The jobs rescan their paths one at a time
+            entries.update(
+                self._repository.status(paths=paths, workers=self._workers, **options)
+            )
+        else:
+            # One path at a time: given several paths in different
+            # directories, libgit2 walks the whole working tree
+            for path in paths:
+                entries.update(self._repository.status(paths=[path], **options))
+        self._entries = entries
+
+    def close(self):
+        """Close the change source."""
+        if self._source is not None:
+            self._source.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -27,6 +27,7 @@
 
 #define PY_SSIZE_T_CLEAN
 #include <Python.h>
+#include <structmember.h>
 #include <git2.h>
 #include <git2/sys/errors.h>
 #include "diff.h"
@@ -39,6 +40,7 @@
 extern PyObject *GitError;
 
 extern PyTypeObject BlobType;
+extern PyTypeObject BlobReaderType;
 
 PyDoc_STRVAR(Blob_diff__doc__,
   "diff([blob: Blob, flag: int = GIT_DIFF_NORMAL, old_as_path: str, new_as_path: str]) -> Patch\n"
@@ -141,123 +143,20 @@ Blob_diff_to_buffer(Blob *self, PyObject *args, PyObject *kwds)
 }
 
 
-struct blob_filter_stream {
-    git_writestream stream;
-    PyObject *py_queue;
-    PyObject *py_ready;
-    PyObject *py_closed;
-    Py_ssize_t chunk_size;
-};
-
-static int blob_filter_stream_write(
-    git_writestream *s, const char *buffer, size_t len)
-{
-    struct blob_filter_stream *stream = (struct blob_filter_stream *)s;
-    const char *pos = buffer;
-    const char *endpos = buffer + len;
-    Py_ssize_t chunk_size;
-    PyObject *result;
-    PyGILState_STATE gil = PyGILState_Ensure();
-    int err = 0;
-
-    while (pos < endpos)
-    {
-        chunk_size = endpos - pos;
-        if (stream->chunk_size < chunk_size)
-            chunk_size = stream->chunk_size;
-        result = PyObject_CallMethod(stream->py_queue, "put", "y#", pos, chunk_size);
-        if (result == NULL)
-        {
-            PyErr_Clear();
-            git_error_set(GIT_ERROR_OS, "failed to put chunk to queue");
-            err = GIT_ERROR;
-            goto done;
-        }
-        Py_DECREF(result);
-        result = PyObject_CallMethod(stream->py_ready, "set", NULL);
-        if (result == NULL)
-        {
-            PyErr_Clear();
-            git_error_set(GIT_ERROR_OS, "failed to signal queue ready");
-            err = GIT_ERROR;
-            goto done;
-        }
-        pos += chunk_size;
-    }
-
-done:
-    PyGILState_Release(gil);
-    return err;
-}
-
-static int blob_filter_stream_close(git_writestream *s)
-{
-    struct blob_filter_stream *stream = (struct blob_filter_stream *)s;
-    PyGILState_STATE gil = PyGILState_Ensure();
-    PyObject *result;
-    int err = 0;
-
-    /* Signal closed and then ready in that order so consumers can block on
-     * ready.wait() and then check for indicated EOF (via closed.is_set()) */
-    result = PyObject_CallMethod(stream->py_closed, "set", NULL);
-    if (result == NULL)
-    {
-        PyErr_Clear();
-        git_error_set(GIT_ERROR_OS, "failed to signal writer closed");
-        err = GIT_ERROR;
-    }
-    result = PyObject_CallMethod(stream->py_ready, "set", NULL);
-    if (result == NULL)
-    {
-        PyErr_Clear();
-        git_error_set(GIT_ERROR_OS, "failed to signal queue ready");
-        err = GIT_ERROR;
-    }
-
-    PyGILState_Release(gil);
-    return err;
-}
-
-static void blob_filter_stream_free(git_writestream *s)
-{
-}
-
-
-#define STREAM_CHUNK_SIZE (8 * 1024)
-
-
-PyDoc_STRVAR(Blob__write_to_queue__doc__,
-  "_write_to_queue(queue: queue.Queue, closed: threading.Event, chunk_size: int = io.DEFAULT_BUFFER_SIZE, [as_path: str = None, flags: enums.BlobFilter = enums.BlobFilter.CHECK_FOR_BINARY, commit_id: oid = None]) -> None\n"
+PyDoc_STRVAR(Blob__open_reader__doc__,
+  "_open_reader([as_path: str = None, flags: enums.BlobFilter = enums.BlobFilter.CHECK_FOR_BINARY, commit_id: oid = None]) -> BlobReader\n"
   "\n"
-  "Write the contents of the blob in chunks to `queue`.\n"
-  "If `as_path` is None, the raw contents of blob will be written to the queue,\n"
-  "otherwise the contents of the blob will be filtered.\n"
+  "Return a reader of the contents of the blob, with readinto(buffer) and\n"
+  "read(size=-1) methods.\n"
+  "If `as_path` is None, the raw contents of blob are read, directly from\n"
+  "the data loaded by libgit2. Otherwise the contents of the blob are\n"
+  "filtered first, with the GIL released.\n"
   "\n"
   "In most cases, the higher level `BlobIO` wrapper should be used when\n"
   "streaming blob content instead of calling this method directly.\n"
   "\n"
-  "Note that this method will block the current thread until all chunks have\n"
-  "been written to the queue. The GIL will be released while running\n"
-  "libgit2 filtering.\n"
-  "\n"
-  "Returns: The filtered content.\n"
-  "\n"
   "Parameters:\n"
   "\n"
-  "queue: queue.Queue\n"
-  "    Destination queue.\n"
-  "\n"
-  "ready: threading.Event\n"
-  "    Event to signal consumers that the data is available for reading.\n"
-  "    This event is also set upon closing the writer in order to indicate \n"
-  "    EOF.\n"
-  "\n"
-  "closed: threading.Event\n"
-  "    Event to signal consumers that the writer is closed.\n"
-  "\n"
-  "chunk_size : int\n"
-  "    Maximum size of chunks to be written to `queue`.\n"
-  "\n"
   "as_path : str\n"
   "    When set, the blob contents will be filtered as if it had this\n"
   "    filename (used for attribute lookups).\n"
@@ -270,47 +169,31 @@ PyDoc_STRVAR(Blob__write_to_queue__doc__,
   "    specified in `flags` (only applicable when `as_path` is set).\n");
 
 PyObject *
-Blob__write_to_queue(Blob *self, PyObject *args, PyObject *kwds)
+Blob__open_reader(Blob *self, PyObject *args, PyObject *kwds)
 {
-    PyObject *py_queue = NULL;
-    PyObject *py_ready = NULL;
-    PyObject *py_closed = NULL;
-    Py_ssize_t chunk_size = STREAM_CHUNK_SIZE;
     char *as_path = NULL;
     PyObject *py_oid = NULL;
     int err;
-    char *keywords[] = {"queue", "ready", "closed", "chunk_size", "as_path", "flags", "commit_id", NULL};
+    char *keywords[] = {"as_path", "flags", "commit_id", NULL};
     git_blob_filter_options opts = GIT_BLOB_FILTER_OPTIONS_INIT;
     git_filter_options filter_opts = GIT_FILTER_OPTIONS_INIT;
     git_filter_list *fl = NULL;
-    git_blob *blob = NULL;
-    const git_oid *blob_oid;
-    struct blob_filter_stream writer;
-
-    if (!PyArg_ParseTupleAndKeywords(args, kwds, "OOO|nzIO", keywords,
-                                     &py_queue, &py_ready, &py_closed,
-                                     &chunk_size, &as_path, &opts.flags,
-                                     &py_oid))
+    BlobReader *reader;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "|zIO", keywords,
+                                     &as_path, &opts.flags, &py_oid))
         return NULL;
 
     if (Object__load((Object*)self) == NULL) { return NULL; } // Lazy load
 
-    /* we load our own copy of this blob since libgit2 objects are not
-     * thread-safe */
-    blob_oid = Object__id((Object*)self);
-    err = git_blob_lookup(&blob, git_blob_owner(self->blob), blob_oid);
-    if (err < 0)
-        return Error_set(err);
-
     if (as_path != NULL &&
         !((opts.flags & GIT_BLOB_FILTER_CHECK_FOR_BINARY) != 0 &&
-          git_blob_is_binary(blob)))
+          git_blob_is_binary(self->blob)))
     {
         if (py_oid != NULL && py_oid != Py_None)
         {
-            err = py_oid_to_git_oid(py_oid, &opts.attr_commit_id);
-            if (err < 0)
-                return Error_set(err);
+            if (py_oid_to_git_oid(py_oid, &opts.attr_commit_id) == 0)
+                return NULL;
         }
 
         if ((opts.flags & GIT_BLOB_FILTER_NO_SYSTEM_ATTRIBUTES) != 0)
@@ -321,51 +204,51 @@ Blob__write_to_queue(Blob *self, PyObject *args, PyObject *kwds)
             filter_opts.flags |= GIT_FILTER_ATTRIBUTES_FROM_COMMIT;
         git_oid_cpy(&filter_opts.attr_commit_id, &opts.attr_commit_id);
 
-        err = git_filter_list_load_ext(&fl, git_blob_owner(blob), blob,
-                                       as_path, GIT_FILTER_TO_WORKTREE,
-                                       &filter_opts);
+        err = git_filter_list_load_ext(&fl, git_blob_owner(self->blob),
+                                       self->blob, as_path,
+                                       GIT_FILTER_TO_WORKTREE, &filter_opts);
         if (err < 0)
-        {
-            if (blob != NULL)
-                git_blob_free(blob);
             return Error_set(err);
-        }
     }
 
-    memset(&writer, 0, sizeof(struct blob_filter_stream));
-    writer.stream.write = blob_filter_stream_write;
-    writer.stream.close = blob_filter_stream_close;
-    writer.stream.free = blob_filter_stream_free;
-    writer.py_queue = py_queue;
-    writer.py_ready = py_ready;
-    writer.py_closed = py_closed;
-    writer.chunk_size = chunk_size;
-    Py_INCREF(writer.py_queue);
-    Py_INCREF(writer.py_ready);
-    Py_INCREF(writer.py_closed);
-
-    Py_BEGIN_ALLOW_THREADS;
-    err = git_filter_list_stream_blob(fl, blob, &writer.stream);
-    Py_END_ALLOW_THREADS;
+    reader = PyObject_New(BlobReader, &BlobReaderType);
+    if (reader == NULL) {
+        git_filter_list_free(fl);
+        return NULL;
+    }
+
+    Py_INCREF(self);
+    reader->blob = self;
+    reader->filtered.ptr = NULL;
+    reader->filtered.reserved = 0;
+    reader->filtered.size = 0;
+    reader->pos = 0;
+
+    /* No filter applies, read straight from the blob */
+    if (fl == NULL) {
+        reader->data = git_blob_rawcontent(self->blob);
+        reader->size = (Py_ssize_t)git_blob_rawsize(self->blob);
+        return (PyObject*)reader;
+    }
+
+    Py_BEGIN_ALLOW_THREADS
+    err = git_filter_list_apply_to_blob(&reader->filtered, fl, self->blob);
+    Py_END_ALLOW_THREADS
     git_filter_list_free(fl);
-    if (writer.py_queue != NULL)
-        Py_DECREF(writer.py_queue);
-    if (writer.py_ready != NULL)
-        Py_DECREF(writer.py_ready);
-    if (writer.py_closed != NULL)
-        Py_DECREF(writer.py_closed);
-    if (blob != NULL)
-        git_blob_free(blob);
-    if (err < 0)
+    if (err < 0) {
+        Py_DECREF(reader);
         return Error_set(err);
+    }
 
-    Py_RETURN_NONE;
+    reader->data = reader->filtered.ptr;
+    reader->size = (Py_ssize_t)reader->filtered.size;
+    return (PyObject*)reader;
 }
 
 static PyMethodDef Blob_methods[] = {
     METHOD(Blob, diff, METH_VARARGS | METH_KEYWORDS),
     METHOD(Blob, diff_to_buffer, METH_VARARGS | METH_KEYWORDS),
-    METHOD(Blob, _write_to_queue, METH_VARARGS | METH_KEYWORDS),
+    METHOD(Blob, _open_reader, METH_VARARGS | METH_KEYWORDS),
     {NULL}
 };
 
@@ -411,10 +294,27 @@ PyDoc_STRVAR(Blob_data__doc__,
     "    build\n"
     "    dist\n");
 
+PyDoc_STRVAR(Blob_data_view__doc__,
+    "A read-only memoryview of the contents of the blob. Unlike Blob.data,\n"
+    "the contents are not copied: the memoryview refers directly to the data\n"
+    "loaded by libgit2, and keeps the blob alive while in use. The same as\n"
+    "memoryview(blob).\n"
+    "\n"
+    "Example, hash a large blob without copying it:\n"
+    "\n"
+    "    >>> hashlib.sha256(blob.data_view).hexdigest()\n");
+
+PyObject *
+Blob_data_view__get__(Blob *self)
+{
+    return PyMemoryView_FromObject((PyObject *)self);
+}
+
 PyGetSetDef Blob_getseters[] = {
     GETTER(Blob, size),
     GETTER(Blob, is_binary),
     {"data", (getter)Object_read_raw, NULL, Blob_data__doc__, NULL},
+    GETTER(Blob, data_view),
     {NULL}
 };
 
@@ -477,3 +377,111 @@ PyTypeObject BlobType = {
     0,                                         /* tp_alloc          */
     0,                                         /* tp_new            */
 };
+
+
+PyDoc_STRVAR(BlobReader_readinto__doc__,
+  "readinto(buffer) -> int\n"
+  "\n"
+  "Copy the next bytes of the blob into the given writable buffer, return\n"
+  "the number of bytes copied, 0 at the end.");
+
+PyObject *
+BlobReader_readinto(BlobReader *self, PyObject *py_buffer)
+{
+    Py_buffer view;
+    Py_ssize_t n;
+
+    if (PyObject_GetBuffer(py_buffer, &view, PyBUF_WRITABLE) < 0)
+        return NULL;
+
+    n = self->pos < self->size ? self->size - self->pos : 0;
+    if (view.len < n)
+        n = view.len;
+
+    memcpy(view.buf, self->data + self->pos, n);
+    self->pos += n;
+
+    PyBuffer_Release(&view);
+    return PyLong_FromSsize_t(n);
+}
+
+PyDoc_STRVAR(BlobReader_read__doc__,
+  "read(size: int = -1) -> bytes\n"
+  "\n"
+  "Read up to size bytes, or to the end of the blob if size is negative.");
+
+PyObject *
+BlobReader_read(BlobReader *self, PyObject *args)
+{
+    Py_ssize_t size = -1;
+    Py_ssize_t n;
+    PyObject *result;
+
+    if (!PyArg_ParseTuple(args, "|n", &size))
+        return NULL;
+
+    n = self->pos < self->size ? self->size - self->pos : 0;
+    if (size >= 0 && size < n)
+        n = size;
+
+    result = PyBytes_FromStringAndSize(self->data + self->pos, n);
+    if (result != NULL)
+        self->pos += n;
+
+    return result;
+}
+
+static PyMethodDef BlobReader_methods[] = {
+    METHOD(BlobReader, readinto, METH_O),
+    METHOD(BlobReader, read, METH_VARARGS),
+    {NULL}
+};
+
+PyMemberDef BlobReader_members[] = {
+    RMEMBER(BlobReader, size, T_PYSSIZET, "Size of the contents, after filtering."),
+    RMEMBER(BlobReader, pos, T_PYSSIZET, "Current position."),
+    {NULL}
+};
+
+static void
+BlobReader_dealloc(BlobReader *self)
+{
+    git_buf_dispose(&self->filtered);
+    Py_CLEAR(self->blob);
+    PyObject_Del(self);
+}
+
+PyDoc_STRVAR(BlobReader__doc__, "Blob contents reader.");
+
+PyTypeObject BlobReaderType = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    "_pygit2.BlobReader",                      /* tp_name           */
+    sizeof(BlobReader),                        /* tp_basicsize      */
+    0,                                         /* tp_itemsize       */
+    (destructor)BlobReader_dealloc,            /* tp_dealloc        */
+    0,                                         /* tp_print          */
+    0,                                         /* tp_getattr        */
+    0,                                         /* tp_setattr        */
+    0,                                         /* tp_compare        */
+    0,                                         /* tp_repr           */
+    0,                                         /* tp_as_number      */
+    0,                                         /* tp_as_sequence    */
+    0,                                         /* tp_as_mapping     */
+    0,                                         /* tp_hash           */
+    0,                                         /* tp_call           */
+    0,                                         /* tp_str            */
+    0,                                         /* tp_getattro       */
+    0,                                         /* tp_setattro       */
+    0,                                         /* tp_as_buffer      */
+    Py_TPFLAGS_DEFAULT,                        /* tp_flags          */
+    BlobReader__doc__,                         /* tp_doc            */
+    0,                                         /* tp_traverse       */
+    0,                                         /* tp_clear          */
+    0,                                         /* tp_richcompare    */
+    0,                                         /* tp_weaklistoffset */
+    0,                                         /* tp_iter           */
+    0,                                         /* tp_iternext       */
+    BlobReader_methods,                        /* tp_methods        */
+    BlobReader_members,                        /* tp_members        */
+    0,                                         /* tp_getset         */
+};
@@ -28,10 +28,20 @@
 #define PY_SSIZE_T_CLEAN
 #include <Python.h>
 #include <structmember.h>
+#include <errno.h>
+#include <git2/sys/hashsig.h>
+#include "hashsig.h"
+#ifdef _WIN32
+#include <io.h>
+#define write(fd, buf, count) _write(fd, buf, (unsigned int)(count))
+#else
+#include <unistd.h>
+#endif
 #include "diff.h"
 #include "error.h"
 #include "oid.h"
 #include "patch.h"
+#include "repository.h"
 #include "types.h"
 #include "utils.h"
 
@@ -45,14 +55,34 @@ extern PyTypeObject DiffFileType;
 extern PyTypeObject DiffHunkType;
 extern PyTypeObject DiffLineType;
 extern PyTypeObject DiffStatsType;
+extern PyTypeObject DiffPatchesIterType;
 extern PyTypeObject RepositoryType;
 
 extern PyObject *DeltaStatusEnum;
 extern PyObject *DiffFlagEnum;
 extern PyObject *FileModeEnum;
 
+static void
+diff_clear_cache(Diff *self)
+{
+    Py_CLEAR(self->stats);
+    free(self->numstat);
+    self->numstat = NULL;
+    self->numstat_n = 0;
+    self->version++;
+}
+
 PyObject *
 wrap_diff(git_diff *diff, Repository *repo)
+{
+    return wrap_diff_with_options(diff, repo, NULL);
+}
+
+/* The options are remembered so the diff can be made again by the workers
+ * of Diff.patches() and Diff.patch_text() */
+PyObject *
+wrap_diff_with_options(git_diff *diff, Repository *repo,
+                       const git_diff_options *opts)
 {
     Diff *py_diff;
 
@@ -61,6 +91,20 @@ wrap_diff(git_diff *diff, Repository *repo)
         Py_XINCREF(repo);
         py_diff->repo = repo;
         py_diff->diff = diff;
+        py_diff->has_opts = (opts != NULL);
+        py_diff->stats = NULL;
+        py_diff->numstat = NULL;
+        py_diff->numstat_n = 0;
+        py_diff->version = 0;
+        git_diff_options_init(&py_diff->opts, GIT_DIFF_OPTIONS_VERSION);
+        if (opts) {
+            py_diff->opts.flags = opts->flags;
+            py_diff->opts.ignore_submodules = opts->ignore_submodules;
+            py_diff->opts.context_lines = opts->context_lines;
+            py_diff->opts.interhunk_lines = opts->interhunk_lines;
+            py_diff->opts.id_abbrev = opts->id_abbrev;
+            py_diff->opts.max_size = opts->max_size;
+        }
     }
 
     return (PyObject*) py_diff;
@@ -76,14 +120,10 @@ wrap_diff_file(const git_diff_file *file)
 
     py_file = PyObject_New(DiffFile, &DiffFileType);
     if (py_file) {
-        py_file->id = git_oid_to_python(&file->id);
-        if (file->path) {
-            py_file->path = strdup(file->path);
-            py_file->raw_path = PyBytes_FromString(file->path);
-        } else {
-            py_file->path = NULL;
-            py_file->raw_path = NULL;
-        }
+        py_file->id = NULL;
+        py_file->raw_path = NULL;
+        git_oid_cpy(&py_file->oid, &file->id);
+        py_file->path = file->path ? strdup(file->path) : NULL;
         py_file->size = file->size;
         py_file->flags = file->flags;
         py_file->mode = file->mode;
@@ -100,14 +140,21 @@ wrap_diff_delta(const git_diff_delta *delta)
     if (!delta)
         Py_RETURN_NONE;
 
+    /* The DiffFile objects are only created when asked for */
     py_delta = PyObject_New(DiffDelta, &DiffDeltaType);
     if (py_delta) {
         py_delta->status = delta->status;
         py_delta->flags = delta->flags;
         py_delta->similarity = delta->similarity;
         py_delta->nfiles = delta->nfiles;
-        py_delta->old_file = wrap_diff_file(&delta->old_file);
-        py_delta->new_file = wrap_diff_file(&delta->new_file);
+        py_delta->old_file = NULL;
+        py_delta->new_file = NULL;
+        py_delta->old = delta->old_file;
+        py_delta->new = delta->new_file;
+        if (delta->old_file.path)
+            py_delta->old.path = strdup(delta->old_file.path);
+        if (delta->new_file.path)
+            py_delta->new.path = strdup(delta->new_file.path);
     }
 
     return (PyObject *) py_delta;
@@ -144,6 +191,7 @@ wrap_diff_stats(git_diff *diff)
     DiffStats *py_stats;
     int err;
 
+    /* The GIL is kept, another thread could change the diff */
     err = git_diff_get_stats(&stats, diff);
     if (err < 0)
         return Error_set(err);
@@ -228,10 +276,41 @@ DiffFile_mode__get__(DiffFile *self)
     return pygit2_enum(FileModeEnum, self->mode);
 }
 
+PyDoc_STRVAR(DiffFile_id__doc__, "Oid of the item.");
+
+PyObject *
+DiffFile_id__get__(DiffFile *self)
+{
+    if (self->id == NULL) {
+        self->id = git_oid_to_python(&self->oid);
+        if (self->id == NULL)
+            return NULL;
+    }
+
+    Py_INCREF(self->id);
+    return self->id;
+}
+
+PyDoc_STRVAR(DiffFile_raw_path__doc__, "Path to the entry (bytes).");
+
+PyObject *
+DiffFile_raw_path__get__(DiffFile *self)
+{
+    if (self->path == NULL)
+        Py_RETURN_NONE;
+
+    if (self->raw_path == NULL) {
+        self->raw_path = PyBytes_FromString(self->path);
+        if (self->raw_path == NULL)
+            return NULL;
+    }
+
+    Py_INCREF(self->raw_path);
+    return self->raw_path;
+}
+
 PyMemberDef DiffFile_members[] = {
-    MEMBER(DiffFile, id, T_OBJECT, "Oid of the item."),
     MEMBER(DiffFile, path, T_STRING, "Path to the entry."),
-    MEMBER(DiffFile, raw_path, T_OBJECT, "Path to the entry (bytes)."),
     MEMBER(DiffFile, size, T_LONG, "Size of the entry."),
     {NULL}
 };
@@ -244,6 +323,8 @@ PyMethodDef DiffFile_methods[] = {
 PyGetSetDef DiffFile_getsetters[] = {
     GETTER(DiffFile, flags),
     GETTER(DiffFile, mode),
+    GETTER(DiffFile, id),
+    GETTER(DiffFile, raw_path),
     {NULL},
 };
 
@@ -342,11 +423,42 @@ DiffDelta_flags__get__(DiffDelta *self)
     return pygit2_enum(DiffFlagEnum, self->flags);
 }
 
+static PyObject *
+diff_delta_file(PyObject **cache, const git_diff_file *file)
+{
+    if (*cache == NULL) {
+        *cache = wrap_diff_file(file);
+        if (*cache == NULL)
+            return NULL;
+    }
+
+    Py_INCREF(*cache);
+    return *cache;
+}
+
+PyDoc_STRVAR(DiffDelta_old_file__doc__, "\"from\" side of the diff.");
+
+PyObject *
+DiffDelta_old_file__get__(DiffDelta *self)
+{
+    return diff_delta_file(&self->old_file, &self->old);
+}
+
+PyDoc_STRVAR(DiffDelta_new_file__doc__, "\"to\" side of the diff.");
+
+PyObject *
+DiffDelta_new_file__get__(DiffDelta *self)
+{
+    return diff_delta_file(&self->new_file, &self->new);
+}
+
 static void
 DiffDelta_dealloc(DiffDelta *self)
 {
     Py_CLEAR(self->old_file);
     Py_CLEAR(self->new_file);
+    free((char*)self->old.path);
+    free((char*)self->new.path);
     PyObject_Del(self);
 }
 
@@ -358,8 +470,6 @@ static PyMethodDef DiffDelta_methods[] = {
 PyMemberDef DiffDelta_members[] = {
     MEMBER(DiffDelta, similarity, T_USHORT, "For renamed and copied."),
     MEMBER(DiffDelta, nfiles, T_USHORT, "Number of files in the delta."),
-    MEMBER(DiffDelta, old_file, T_OBJECT, "\"from\" side of the diff."),
-    MEMBER(DiffDelta, new_file, T_OBJECT, "\"to\" side of the diff."),
     {NULL}
 };
 
@@ -367,6 +477,8 @@ PyGetSetDef DiffDelta_getsetters[] = {
     GETTER(DiffDelta, is_binary),
     GETTER(DiffDelta, status),
     GETTER(DiffDelta, flags),
+    GETTER(DiffDelta, old_file),
+    GETTER(DiffDelta, new_file),
     {NULL}
 };
 
@@ -615,7 +727,33 @@ DeltasIter_dealloc(DeltasIter *self)
     PyObject_Del(self);
 }
 
-PyDoc_STRVAR(DeltasIter__doc__, "Deltas iterator object.");
+Py_ssize_t
+DeltasIter_len(DeltasIter *self)
+{
+    return (Py_ssize_t)self->n;
+}
+
+PyObject *
+DeltasIter_getitem(DeltasIter *self, Py_ssize_t i)
+{
+    if (i < 0 || (size_t)i >= self->n) {
+        PyErr_SetString(PyExc_IndexError, "delta index out of range");
+        return NULL;
+    }
+
+    return diff_get_delta_byindex(self->diff->diff, (size_t)i);
+}
+
+PySequenceMethods DeltasIter_as_sequence = {
+    (lenfunc)DeltasIter_len,                   /* sq_length */
+    0,                                         /* sq_concat */
+    0,                                         /* sq_repeat */
+    (ssizeargfunc)DeltasIter_getitem,          /* sq_item */
+};
+
+PyDoc_STRVAR(DeltasIter__doc__,
+  "Deltas iterator object. It also supports len() and indexing, by the\n"
+  "position of the delta in the diff.");
 
 PyTypeObject DeltasIterType = {
     PyVarObject_HEAD_INIT(NULL, 0)
@@ -629,7 +767,7 @@ PyTypeObject DeltasIterType = {
     0,                                         /* tp_compare        */
     0,                                         /* tp_repr           */
     0,                                         /* tp_as_number      */
-    0,                                         /* tp_as_sequence    */
+    &DeltasIter_as_sequence,                   /* tp_as_sequence    */
     0,                                         /* tp_as_mapping     */
     0,                                         /* tp_hash           */
     0,                                         /* tp_call           */
@@ -688,204 +826,1155 @@ Diff_deltas__get__(Diff *self)
     return (PyObject*)iter;
 }
 
-PyDoc_STRVAR(Diff_patch__doc__,
-    "Patch diff string. Can be None in some cases, such as empty commits.");
+/*
+ * Diff.delta_table(): the deltas as columns. The columns are filled from the
+ * git_diff_delta structs with the GIL released, in this order.
+ */
+enum {
+    DELTA_STATUS,
+    DELTA_FLAGS,
+    DELTA_SIMILARITY,
+    DELTA_NFILES,
+    DELTA_OLD_ID,
+    DELTA_NEW_ID,
+    DELTA_OLD_MODE,
+    DELTA_NEW_MODE,
+    DELTA_OLD_SIZE,
+    DELTA_NEW_SIZE,
+    DELTA_OLD_PATH,
+    DELTA_NEW_PATH,
+    DELTA_NCOLUMNS
+};
 
-PyObject *
-Diff_patch__get__(Diff *self)
-{
-    git_buf buf = {NULL};
+static const struct {
+    const char *name;
+    const char *typecode;   /* NULL for bytes */
+} delta_columns[DELTA_NCOLUMNS] = {
+    {"status", NULL},
+    {"flags", "I"},
+    {"similarity", "H"},
+    {"nfiles", "H"},
+    {"old_id", NULL},
+    {"new_id", NULL},
+    {"old_mode", "H"},
+    {"new_mode", "H"},
+    {"old_size", "Q"},
+    {"new_size", "Q"},
+    {"old_path", "Q"},      /* the typecode of the offsets */
+    {"new_path", "Q"},
+};
 
-    int err = git_diff_to_buf(&buf, self->diff, GIT_DIFF_FORMAT_PATCH);
-    if (err < 0)
-        return Error_set(err);
+static int
+delta_put_path(pgit_buf *buf, pgit_buf *offsets, const char *path)
+{
+    unsigned long long offset;
 
-    PyObject *py_patch = to_unicode_n(buf.ptr, buf.size, NULL, NULL);
+    if (path && pgit_buf_put(buf, path, strlen(path)) < 0)
+        return -1;
 
-    git_buf_dispose(&buf);
-    return py_patch;
+    offset = buf->size;
+    return pgit_buf_put(offsets, &offset, sizeof(offset));
 }
 
-
-static void
-DiffHunk_dealloc(DiffHunk *self)
+static int
+delta_put_file(pgit_buf *bufs, pgit_buf *offsets, int column,
+               const git_diff_file *file)
 {
-    Py_CLEAR(self->patch);
-    PyObject_Del(self);
-}
+    unsigned long long size = file->size;
+    uint16_t mode = file->mode;
 
-PyDoc_STRVAR(DiffHunk_old_start__doc__, "Old start.");
+    /* column is the old_id or new_id column, the others follow by 2 */
+    if (pgit_buf_put(&bufs[column], file->id.id, GIT_OID_RAWSZ) < 0 ||
+        pgit_buf_put(&bufs[column + 2], &mode, sizeof(mode)) < 0 ||
+        pgit_buf_put(&bufs[column + 4], &size, sizeof(size)) < 0 ||
+        delta_put_path(&bufs[column + 6], &offsets[column + 6], file->path) < 0)
+        return -1;
 
-PyObject *
-DiffHunk_old_start__get__(DiffHunk *self)
-{
-  return PyLong_FromLong(self->hunk->old_start);
+    return 0;
 }
 
-PyDoc_STRVAR(DiffHunk_old_lines__doc__, "Old lines.");
-
-PyObject *
-DiffHunk_old_lines__get__(DiffHunk *self)
+static int
+delta_put_all(pgit_buf *bufs, pgit_buf *offsets, git_diff *diff)
 {
-  return PyLong_FromLong(self->hunk->old_lines);
+    const git_diff_delta *delta;
+    unsigned long long zero = 0;
+    size_t i, n;
+    char status;
+
+    if (pgit_buf_put(&offsets[DELTA_OLD_PATH], &zero, sizeof(zero)) < 0 ||
+        pgit_buf_put(&offsets[DELTA_NEW_PATH], &zero, sizeof(zero)) < 0)
+        return -1;
+
+    n = git_diff_num_deltas(diff);
+    for (i = 0; i < n; i++) {
+        delta = git_diff_get_delta(diff, i);
+        status = git_diff_status_char(delta->status);
+        if (pgit_buf_put(&bufs[DELTA_STATUS], &status, 1) < 0 ||
+            pgit_buf_put(&bufs[DELTA_FLAGS], &delta->flags, sizeof(uint32_t)) < 0 ||
+            pgit_buf_put(&bufs[DELTA_SIMILARITY], &delta->similarity, sizeof(uint16_t)) < 0 ||
+            pgit_buf_put(&bufs[DELTA_NFILES], &delta->nfiles, sizeof(uint16_t)) < 0 ||
+            delta_put_file(bufs, offsets, DELTA_OLD_ID, &delta->old_file) < 0 ||
+            delta_put_file(bufs, offsets, DELTA_NEW_ID, &delta->new_file) < 0)
+            return -1;
+    }
+
+    return 0;
 }
 
-PyDoc_STRVAR(DiffHunk_new_start__doc__, "New start.");
+PyDoc_STRVAR(Diff_delta_table__doc__,
+  "delta_table() -> dict\n"
+  "\n"
+  "Return the deltas as columns, one item per delta in diff order, without\n"
+  "creating any DiffDelta or DiffFile object. The result is a dict with:\n"
+  "\n"
+  "* status: bytes, the status char of every delta (see\n"
+  "  DiffDelta.status_char), e.g. b'MAD'.\n"
+  "* flags: array('I'), the enums.DiffFlag of every delta.\n"
+  "* similarity, nfiles: array('H').\n"
+  "* old_id, new_id: bytes, the raw oids (20 bytes each).\n"
+  "* old_mode, new_mode: array('H'), the enums.FileMode of the files.\n"
+  "* old_size, new_size: array('Q').\n"
+  "* old_path, new_path: a tuple (data, offsets) where data is the bytes of\n"
+  "  all the paths joined, and offsets is an array('Q') with n+1 items, the\n"
+  "  path of the i-th delta being data[offsets[i]:offsets[i+1]].\n");
 
 PyObject *
-DiffHunk_new_start__get__(DiffHunk *self)
+Diff_delta_table(Diff *self)
 {
-  return PyLong_FromLong(self->hunk->new_start);
-}
+    pgit_buf bufs[DELTA_NCOLUMNS] = {PGIT_BUF_INIT};
+    pgit_buf offsets[DELTA_NCOLUMNS] = {PGIT_BUF_INIT};
+    PyObject *py_table = NULL, *py_value, *py_data, *py_offsets;
+    int i, err;
+
+    Py_BEGIN_ALLOW_THREADS
+    err = delta_put_all(bufs, offsets, self->diff);
+    Py_END_ALLOW_THREADS
+
+    if (err < 0) {
+        PyErr_NoMemory();
+        goto exit;
+    }
 
-PyDoc_STRVAR(DiffHunk_new_lines__doc__, "New lines.");
+    py_table = PyDict_New();
+    if (py_table == NULL)
+        goto exit;
+
+    for (i = 0; i < DELTA_NCOLUMNS; i++) {
+        if (i == DELTA_OLD_PATH || i == DELTA_NEW_PATH) {
+            py_value = NULL;
+            py_data = pgit_buf_to_bytes(&bufs[i]);
+            py_offsets = pgit_buf_to_array(&offsets[i], delta_columns[i].typecode);
+            if (py_data != NULL && py_offsets != NULL)
+                py_value = PyTuple_Pack(2, py_data, py_offsets);
+            Py_XDECREF(py_data);
+            Py_XDECREF(py_offsets);
+        } else if (delta_columns[i].typecode) {
+            py_value = pgit_buf_to_array(&bufs[i], delta_columns[i].typecode);
+        } else {
+            py_value = pgit_buf_to_bytes(&bufs[i]);
+        }
 
-PyObject *
-DiffHunk_new_lines__get__(DiffHunk *self)
-{
-  return PyLong_FromLong(self->hunk->new_lines);
+        if (py_value == NULL ||
+            PyDict_SetItemString(py_table, delta_columns[i].name, py_value) < 0) {
+            Py_XDECREF(py_value);
+            Py_CLEAR(py_table);
+            goto exit;
+        }
+        Py_DECREF(py_value);
+    }
+
+exit:
+    for (i = 0; i < DELTA_NCOLUMNS; i++) {
+        pgit_buf_dispose(&bufs[i]);
+        pgit_buf_dispose(&offsets[i]);
+    }
+    return py_table;
 }
 
-PyDoc_STRVAR(DiffHunk_header__doc__, "Header.");
+/*
+ * Parallel patches. libgit2 diffs must not be shared between threads, so
+ * every worker opens its own repository handle and makes its own copy of the
+ * diff, by merging the deltas into an empty diff made with the same options.
+ * Then the deltas are split between the workers.
+ */
 
-PyObject *
-DiffHunk_header__get__(DiffHunk *self)
-{
-    return to_unicode_n((const char *) &self->hunk->header,
-                        self->hunk->header_len, NULL, NULL);
-}
+#define DIFF_PATCHES_CHUNK 64   /* Deltas per worker, for Diff.patches() */
 
-PyDoc_STRVAR(DiffHunk_lines__doc__, "Lines.");
+typedef struct {
+    const git_diff *source;
+    const char *path;
+    const char *workdir;
+    const git_diff_options *opts;
+    git_repository *repo;
+    git_diff *diff;
+    int usable;
+    /* The deltas of a run: start, start + step... up to end */
+    size_t start;
+    size_t end;
+    size_t step;
+    size_t base;            /* The delta of patches[0], texts[0]... */
+    git_patch **patches;
+    git_buf *texts;
+    long long *insertions;
+    long long *deletions;
+    int error;
+    int error_class;
+    char *error_message;
+} diff_worker;
+
+typedef struct {
+    diff_worker *workers;
+    size_t n;
+} diff_workers;
 
-PyObject *
-DiffHunk_lines__get__(DiffHunk *self)
+static void
+diff_worker_open(void *payload)
 {
-    PyObject *py_lines;
-    PyObject *py_line;
-    const git_diff_line *line;
-    size_t i;
+    diff_worker *w = (diff_worker*)payload;
+    const git_diff_delta *a, *b;
+    size_t i, n;
     int err;
 
-    // TODO Replace by an iterator
-    py_lines = PyList_New(self->n_lines);
-    for (i = 0; i < self->n_lines; ++i) {
-        err = git_patch_get_line_in_hunk(&line, self->patch->patch, self->idx, i);
-        if (err < 0)
-            return Error_set(err);
-
-        py_line = wrap_diff_line(line, self);
-        if (py_line == NULL)
-            return NULL;
+    err = git_repository_open_ext(&w->repo, w->path, GIT_REPOSITORY_OPEN_NO_SEARCH, NULL);
+    if (err == 0 && w->workdir)
+        err = git_repository_set_workdir(w->repo, w->workdir, 0);
+    if (err == 0)
+        err = git_diff_tree_to_tree(&w->diff, w->repo, NULL, NULL, w->opts);
+    if (err == 0)
+        err = git_diff_merge(w->diff, w->source);
+    if (err < 0)
+        return;
+
+    /* The merge sorts the deltas, which may change the order of a diff
+     * transformed by find_similar */
+    n = git_diff_num_deltas(w->source);
+    if (git_diff_num_deltas(w->diff) != n)
+        return;
+
+    for (i = 0; i < n; i++) {
+        a = git_diff_get_delta(w->source, i);
+        b = git_diff_get_delta(w->diff, i);
+        if (a->status != b->status ||
+            strcmp(a->old_file.path, b->old_file.path) ||
+            strcmp(a->new_file.path, b->new_file.path))
+            return;
+    }
 
-        PyList_SetItem(py_lines, i, py_line);
-   }
-   return py_lines;
+    w->usable = 1;
 }
 
+/* The line counts of a delta, -1 for binary files like git diff --numstat.
+ * The patch is not made for binary and unmodified files. */
+static int
+diff_delta_numstat(git_diff *diff, size_t i, long long *insertions,
+                   long long *deletions)
+{
+    const git_diff_delta *delta = git_diff_get_delta(diff, i);
+    git_patch *patch = NULL;
+    size_t adds = 0, dels = 0;
+    int err;
 
-PyGetSetDef DiffHunk_getsetters[] = {
-    GETTER(DiffHunk, old_start),
-    GETTER(DiffHunk, old_lines),
-    GETTER(DiffHunk, new_start),
-    GETTER(DiffHunk, new_lines),
-    GETTER(DiffHunk, header),
-    GETTER(DiffHunk, lines),
-    {NULL}
-};
+    if (delta->flags & GIT_DIFF_FLAG_BINARY) {
+        *insertions = *deletions = -1;
+        return 0;
+    }
 
-PyDoc_STRVAR(DiffHunk__doc__, "DiffHunk object.");
+    if (delta->old_file.flags & delta->new_file.flags & GIT_DIFF_FLAG_VALID_ID &&
+        git_oid_equal(&delta->old_file.id, &delta->new_file.id)) {
+        *insertions = *deletions = 0;
+        return 0;
+    }
 
-PyTypeObject DiffHunkType = {
-    PyVarObject_HEAD_INIT(NULL, 0)
-    "_pygit2.DiffHunk",                        /* tp_name           */
-    sizeof(DiffHunk),                          /* tp_basicsize      */
-    0,                                         /* tp_itemsize       */
-    (destructor)DiffHunk_dealloc,              /* tp_dealloc        */
-    0,                                         /* tp_print          */
-    0,                                         /* tp_getattr        */
-    0,                                         /* tp_setattr        */
-    0,                                         /* tp_compare        */
-    0,                                         /* tp_repr           */
-    0,                                         /* tp_as_number      */
-    0,                                         /* tp_as_sequence    */
-    0,                                         /* tp_as_mapping     */
-    0,                                         /* tp_hash           */
-    0,                                         /* tp_call           */
-    0,                                         /* tp_str            */
-    0,                                         /* tp_getattro       */
-    0,                                         /* tp_setattro       */
-    0,                                         /* tp_as_buffer      */
-    Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE,  /* tp_flags          */
-    DiffHunk__doc__,                           /* tp_doc            */
-    0,                                         /* tp_traverse       */
-    0,                                         /* tp_clear          */
-    0,                                         /* tp_richcompare    */
-    0,                                         /* tp_weaklistoffset */
-    0,                                         /* tp_iter           */
-    0,                                         /* tp_iternext       */
-    0,                                         /* tp_methods        */
-    0,                                         /* tp_members        */
-    DiffHunk_getsetters,                       /* tp_getset         */
-    0,                                         /* tp_base           */
-    0,                                         /* tp_dict           */
-    0,                                         /* tp_descr_get      */
-    0,                                         /* tp_descr_set      */
-    0,                                         /* tp_dictoffset     */
-    0,                                         /* tp_init           */
-    0,                                         /* tp_alloc          */
-    0,                                         /* tp_new            */
-};
+    err = git_patch_from_diff(&patch, diff, i);
+    if (err == 0 && patch)
+        err = git_patch_line_stats(NULL, &adds, &dels, patch);
 
-PyDoc_STRVAR(DiffStats_insertions__doc__, "Total number of insertions");
+    if (err == 0 && patch && git_patch_get_delta(patch)->flags & GIT_DIFF_FLAG_BINARY) {
+        *insertions = *deletions = -1;
+    } else {
+        *insertions = (long long)adds;
+        *deletions = (long long)dels;
+    }
 
-PyObject *
-DiffStats_insertions__get__(DiffStats *self)
-{
-    return PyLong_FromSize_t(git_diff_stats_insertions(self->stats));
+    git_patch_free(patch);
+    return err;
 }
 
-PyDoc_STRVAR(DiffStats_deletions__doc__, "Total number of deletions");
-
-PyObject *
-DiffStats_deletions__get__(DiffStats *self)
+static void
+diff_worker_run(void *payload)
 {
-    return PyLong_FromSize_t(git_diff_stats_deletions(self->stats));
-}
+    diff_worker *w = (diff_worker*)payload;
+    const git_error *error;
+    git_patch *patch;
+    size_t i;
+    int err = 0;
+
+    for (i = w->start; err == 0 && i < w->end && w->insertions; i += w->step)
+        err = diff_delta_numstat(w->diff, i, &w->insertions[i - w->base],
+                                 &w->deletions[i - w->base]);
+
+    for (i = w->start; err == 0 && i < w->end && !w->insertions; i += w->step) {
+        patch = NULL;
+        err = git_patch_from_diff(&patch, w->diff, i);
+        if (err == 0 && w->texts) {
+            if (patch)
+                err = git_patch_to_buf(&w->texts[i - w->base], patch);
+            git_patch_free(patch);
+        } else if (err == 0) {
+            w->patches[i - w->base] = patch;
+        }
+    }
 
-PyDoc_STRVAR(DiffStats_files_changed__doc__, "Total number of files changed");
+    if (err < 0) {
+        w->error = err;
+        error = git_error_last();
+        if (error != NULL) {
+            w->error_class = error->klass;
+            w->error_message = strdup(error->message);
+        }
+    }
+}
 
-PyObject *
-DiffStats_files_changed__get__(DiffStats *self)
+static void
+diff_workers_free(diff_workers *workers)
 {
-    return PyLong_FromSize_t(git_diff_stats_files_changed(self->stats));
+    size_t i;
+
+    for (i = 0; i < workers->n; i++) {
+        git_diff_free(workers->workers[i].diff);
+        git_repository_free(workers->workers[i].repo);
+        free(workers->workers[i].error_message);
+    }
+    free(workers->workers);
+    free(workers);
 }
 
-PyDoc_STRVAR(DiffStats_format__doc__,
-    "format(format: enums.DiffStatsFormat, width: int) -> str\n"
-    "\n"
-    "Format the stats as a string.\n"
-    "\n"
-    "Returns: str.\n"
-    "\n"
-    "Parameters:\n"
-    "\n"
-    "format\n"
-    "    The format to use. A combination of DiffStatsFormat constants.\n"
-    "\n"
-    "width\n"
-    "    The width of the output. The output will be scaled to fit.");
+static void
+diff_workers_capsule_free(PyObject *capsule)
+{
+    diff_workers_free(PyCapsule_GetPointer(capsule, "pygit2.diff_workers"));
+}
 
-PyObject *
-DiffStats_format(DiffStats *self, PyObject *args, PyObject *kwds)
+/* Return a capsule with the workers, or None if the patches must be made by
+ * the calling thread: one worker, or the diff cannot be made again. */
+static PyObject *
+diff_workers_new(Diff *self, Py_ssize_t n)
 {
-    int err, format;
-    git_buf buf = { 0 };
-    Py_ssize_t width;
-    PyObject *str;
-    char *keywords[] = {"format", "width", NULL};
+    diff_workers *workers;
+    PyObject *capsule;
+    size_t i, ndeltas;
+    int usable = 1;
+
+    ndeltas = git_diff_num_deltas(self->diff);
+    if (n > 0 && (size_t)n > ndeltas)
+        n = (Py_ssize_t)ndeltas;
+    if (n <= 1 || !self->has_opts || self->repo == NULL ||
+        !pgit_repository_can_reopen(self->repo->repo))
+        Py_RETURN_NONE;
 
-    if (!PyArg_ParseTupleAndKeywords(args, kwds, "in", keywords, &format, &width))
-        return NULL;
+    workers = calloc(1, sizeof(diff_workers));
+    if (workers == NULL)
+        return PyErr_NoMemory();
+    workers->workers = calloc(n, sizeof(diff_worker));
+    if (workers->workers == NULL) {
+        free(workers);
+        return PyErr_NoMemory();
+    }
+    workers->n = n;
+
+    for (i = 0; i < workers->n; i++) {
+        workers->workers[i].source = self->diff;
+        workers->workers[i].path = git_repository_path(self->repo->repo);
+        workers->workers[i].workdir = git_repository_workdir(self->repo->repo);
+        workers->workers[i].opts = &self->opts;
+    }
+
+    /* The GIL is kept while the workers read the diff: merge or find_similar
+     * from another thread would change it. Then they use their own copy */
+    pgit_run_parallel(diff_worker_open, workers->workers, sizeof(diff_worker), workers->n);
+
+    for (i = 0; i < workers->n; i++)
+        usable &= workers->workers[i].usable;
+
+    /* e.g. a repository with custom backends cannot be opened again */
+    if (!usable) {
+        git_error_clear();
+        diff_workers_free(workers);
+        Py_RETURN_NONE;
+    }
+
+    capsule = PyCapsule_New(workers, "pygit2.diff_workers", diff_workers_capsule_free);
+    if (capsule == NULL)
+        diff_workers_free(workers);
+
+    return capsule;
+}
+
+/* Make the patches, or their text, of the deltas [start, end) */
+static int
+diff_workers_run(PyObject *capsule, size_t start, size_t end,
+                 git_patch **patches, git_buf *texts, long long *numstat)
+{
+    diff_workers *workers = PyCapsule_GetPointer(capsule, "pygit2.diff_workers");
+    diff_worker *w;
+    size_t i;
+    int err = 0;
+
+    for (i = 0; i < workers->n; i++) {
+        w = &workers->workers[i];
+        w->start = start + i;
+        w->end = end;
+        w->step = workers->n;
+        w->base = start;
+        w->patches = patches;
+        w->texts = texts;
+        w->insertions = numstat;
+        w->deletions = numstat ? numstat + (end - start) : NULL;
+    }
+
+    Py_BEGIN_ALLOW_THREADS
+    pgit_run_parallel(diff_worker_run, workers->workers, sizeof(diff_worker), workers->n);
+    Py_END_ALLOW_THREADS
+
+    for (i = 0; i < workers->n; i++) {
+        w = &workers->workers[i];
+        if (err == 0 && w->error < 0) {
+            err = w->error;
+            if (w->error_message)
+                git_error_set_str(w->error_class, w->error_message);
+            Error_set(err);
+        }
+        w->error = 0;
+        free(w->error_message);
+        w->error_message = NULL;
+    }
+
+    return err;
+}
+
+PyDoc_STRVAR(Diff_patch_text__doc__,
+  "patch_text(workers: int = 1) -> str\n"
+  "\n"
+  "Return the patch of the whole diff, like Diff.patch.\n"
+  "\n"
+  "With more than one worker the patches of the files are made by as many\n"
+  "threads, each with its own handle of the repository, and joined in\n"
+  "order. The diff must have been made by pygit2 from a repository, not\n"
+  "parsed; otherwise, or if the workers cannot reproduce its deltas (e.g.\n"
+  "after find_similar), a single thread is used.\n");
+
+PyObject *
+Diff_patch_text(Diff *self, PyObject *args, PyObject *kwds)
+{
+    static char *kwlist[] = {"workers", NULL};
+    PyObject *capsule, *py_text = NULL;
+    Py_ssize_t workers = 1;
+    git_buf buf = {NULL};
+    git_buf *texts;
+    pgit_buf text = PGIT_BUF_INIT;
+    size_t i, n;
+    int err;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "|n", kwlist, &workers))
+        return NULL;
+
+    capsule = diff_workers_new(self, workers);
+    if (capsule == NULL)
+        return NULL;
+
+    if (capsule == Py_None) {
+        Py_DECREF(capsule);
+        Py_BEGIN_ALLOW_THREADS
+        err = git_diff_to_buf(&buf, self->diff, GIT_DIFF_FORMAT_PATCH);
+        Py_END_ALLOW_THREADS
+        if (err < 0)
+            return Error_set(err);
+
+        py_text = to_unicode_n(buf.ptr, buf.size, NULL, NULL);
+        git_buf_dispose(&buf);
+        return py_text;
+    }
+
+    n = git_diff_num_deltas(self->diff);
+    texts = calloc(n, sizeof(git_buf));
+    if (texts == NULL) {
+        Py_DECREF(capsule);
+        return PyErr_NoMemory();
+    }
+
+    if (diff_workers_run(capsule, 0, n, NULL, texts, NULL) < 0)
+        goto exit;
+
+    for (i = 0; i < n; i++) {
+        if (pgit_buf_put(&text, texts[i].ptr, texts[i].size) < 0) {
+            PyErr_NoMemory();
+            goto exit;
+        }
+    }
+    py_text = to_unicode_n(text.ptr, text.size, NULL, NULL);
+
+exit:
+    for (i = 0; i < n; i++)
+        git_buf_dispose(&texts[i]);
+    free(texts);
+    pgit_buf_dispose(&text);
+    Py_DECREF(capsule);
+    return py_text;
+}
+
+/*
+ * Diff.write_patch(): libgit2 prints the diff with the GIL released, and the
+ * output is written in chunks. A file descriptor is written to without the
+ * GIL, a file object takes the GIL for every chunk.
+ */
+
+#define DIFF_WRITE_CHUNK_SIZE (64 * 1024)
+
+typedef struct {
+    PyObject *file;         /* NULL if writing to fd */
+    int fd;
+    pgit_buf buf;
+    size_t chunk_size;
+    PyThreadState *thread;  /* While the GIL is released */
+    int py_error;           /* A Python exception is set */
+    int no_memory;
+} diff_writer;
+
+static int
+diff_writer_flush(diff_writer *w)
+{
+    PyObject *view, *result;
+    size_t pos = 0;
+    Py_ssize_t n;
+    int err = 0;
+
+    if (w->file == NULL) {
+        while (pos < w->buf.size) {
+            n = write(w->fd, w->buf.ptr + pos, w->buf.size - pos);
+            if (n < 0 && errno == EINTR)
+                continue;
+            if (n < 0) {
+                PyEval_RestoreThread(w->thread);
+                PyErr_SetFromErrno(PyExc_OSError);
+                w->thread = PyEval_SaveThread();
+                w->py_error = 1;
+                return -1;
+            }
+            pos += n;
+        }
+        w->buf.size = 0;
+        return 0;
+    }
+
+    PyEval_RestoreThread(w->thread);
+    while (pos < w->buf.size) {
+        view = PyMemoryView_FromMemory(w->buf.ptr + pos, w->buf.size - pos, PyBUF_READ);
+        if (view == NULL) {
+            err = -1;
+            break;
+        }
+        result = PyObject_CallMethod(w->file, "write", "O", view);
+        Py_DECREF(view);
+        if (result == NULL) {
+            err = -1;
+            break;
+        }
+
+        /* Raw files may write less than asked, buffered files return None
+         * or the whole size */
+        n = (result == Py_None) ? (Py_ssize_t)(w->buf.size - pos) : PyLong_AsSsize_t(result);
+        Py_DECREF(result);
+        if (n < 0) {
+            if (!PyErr_Occurred())
+                PyErr_SetString(PyExc_OSError, "write() returned a negative size");
+            err = -1;
+            break;
+        }
+        pos += n;
+    }
+    w->thread = PyEval_SaveThread();
+
+    if (err < 0) {
+        w->py_error = 1;
+        return -1;
+    }
+
+    w->buf.size = 0;
+    return 0;
+}
+
+static int
+diff_writer_put(diff_writer *w, const char *data, size_t len)
+{
+    if (pgit_buf_put(&w->buf, data, len) < 0) {
+        w->no_memory = 1;
+        return -1;
+    }
+
+    if (w->buf.size >= w->chunk_size)
+        return diff_writer_flush(w);
+
+    return 0;
+}
+
+static int
+diff_writer_line_cb(const git_diff_delta *delta, const git_diff_hunk *hunk,
+                    const git_diff_line *line, void *payload)
+{
+    diff_writer *w = (diff_writer*)payload;
+    char origin = line->origin;
+
+    /* As git_diff_print_callback__to_buf */
+    if (origin == GIT_DIFF_LINE_ADDITION || origin == GIT_DIFF_LINE_DELETION ||
+        origin == GIT_DIFF_LINE_CONTEXT) {
+        if (diff_writer_put(w, &origin, 1) < 0)
+            return -1;
+    }
+
+    return diff_writer_put(w, line->content, line->content_len);
+}
+
+PyDoc_STRVAR(Diff_write_patch__doc__,
+  "write_patch(file: BinaryIO | int, format: enums.DiffFormat | None = enums.DiffFormat.PATCH, stats: enums.DiffStatsFormat = enums.DiffStatsFormat.NONE, width: int = 80, chunk_size: int = 65536)\n"
+  "\n"
+  "Write the diff to a binary file object or to a file descriptor, as it\n"
+  "is produced and in chunks, so the whole output is never in memory. The\n"
+  "GIL is released while producing the output, and while writing to a file\n"
+  "descriptor.\n"
+  "\n"
+  "Parameters:\n"
+  "\n"
+  "file\n"
+  "    An object with a write() method accepting bytes, or a file\n"
+  "    descriptor.\n"
+  "\n"
+  "format\n"
+  "    An enums.DiffFormat value, e.g. DiffFormat.NAME_STATUS for the\n"
+  "    equivalent of `git diff --name-status`. None writes no patch, only\n"
+  "    the stats.\n"
+  "\n"
+  "stats\n"
+  "    An enums.DiffStatsFormat combination. If not NONE the stats are\n"
+  "    written before the patch, e.g. DiffStatsFormat.FULL for the\n"
+  "    equivalent of `git diff --stat`.\n"
+  "\n"
+  "width\n"
+  "    The width of the stats output.\n"
+  "\n"
+  "chunk_size\n"
+  "    The output is written in chunks of about this size.\n");
+
+PyObject *
+Diff_write_patch(Diff *self, PyObject *args, PyObject *kwds)
+{
+    static char *kwlist[] = {"file", "format", "stats", "width", "chunk_size", NULL};
+    diff_writer w = {NULL, -1, PGIT_BUF_INIT, DIFF_WRITE_CHUNK_SIZE, NULL, 0, 0};
+    PyObject *py_file, *py_format = NULL;
+    git_diff_format_t format = GIT_DIFF_FORMAT_PATCH;
+    git_diff_stats *stats = NULL;
+    git_buf stats_buf = {NULL};
+    unsigned int stats_format = GIT_DIFF_STATS_NONE;
+    Py_ssize_t width = 80, chunk_size = DIFF_WRITE_CHUNK_SIZE;
+    int err = 0;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O|OInn", kwlist, &py_file,
+                                     &py_format, &stats_format, &width, &chunk_size))
+        return NULL;
+
+    if (py_format == Py_None) {
+        format = 0;
+    } else if (py_format != NULL) {
+        format = (git_diff_format_t)PyLong_AsLong(py_format);
+        if (PyErr_Occurred())
+            return NULL;
+    }
+
+    if (width <= 0 || chunk_size <= 0) {
+        PyErr_SetString(PyExc_ValueError, "width and chunk_size must be positive");
+        return NULL;
+    }
+    w.chunk_size = (size_t)chunk_size;
+
+    /* bool is a subclass of int, but True is surely not stdout */
+    if (PyBool_Check(py_file)) {
+        Error_type_error("file must be a file object or descriptor, not %.200s", py_file);
+        return NULL;
+    }
+
+    if (PyLong_Check(py_file)) {
+        w.fd = PyObject_AsFileDescriptor(py_file);
+        if (w.fd < 0)
+            return NULL;
+    } else {
+        w.file = py_file;
+    }
+
+    w.thread = PyEval_SaveThread();
+
+    if (stats_format != GIT_DIFF_STATS_NONE) {
+        err = git_diff_get_stats(&stats, self->diff);
+        if (err == 0)
+            err = git_diff_stats_to_buf(&stats_buf, stats, stats_format, (size_t)width);
+        if (err == 0)
+            err = diff_writer_put(&w, stats_buf.ptr, stats_buf.size);
+        git_buf_dispose(&stats_buf);
+        git_diff_stats_free(stats);
+    }
+
+    if (err == 0 && format)
+        err = git_diff_print(self->diff, format, diff_writer_line_cb, &w);
+    if (err == 0)
+        err = diff_writer_flush(&w);
+
+    PyEval_RestoreThread(w.thread);
+    pgit_buf_dispose(&w.buf);
+
+    if (w.py_error)
+        return NULL;
+    if (w.no_memory)
+        return PyErr_NoMemory();
+    if (err < 0)
+        return Error_set(err);
+
+    Py_RETURN_NONE;
+}
+
+PyDoc_STRVAR(Diff_numstat__doc__,
+  "numstat(workers: int = 1) -> tuple[array, array]\n"
+  "\n"
+  "Return the number of inserted and deleted lines of every delta, as two\n"
+  "array('q'), like `git diff --numstat`. Binary files count -1, and their\n"
+  "patch is not made if the diff already knows they are binary; nor is the\n"
+  "patch of files with the same id on both sides.\n"
+  "\n"
+  "With more than one worker the deltas are split between as many threads,\n"
+  "see Diff.patch_text, and the GIL is released while they make the patches\n"
+  "of their own copies of the diff. The result is computed once, until the\n"
+  "diff is changed by merge or find_similar.\n");
+
+PyObject *
+Diff_numstat(Diff *self, PyObject *args, PyObject *kwds)
+{
+    static char *kwlist[] = {"workers", NULL};
+    PyObject *capsule, *py_insertions = NULL, *py_deletions = NULL, *result = NULL;
+    Py_ssize_t workers = 1;
+    long long *numstat;
+    pgit_buf buf = PGIT_BUF_INIT;
+    size_t i, n, version;
+    int err = 0;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "|n", kwlist, &workers))
+        return NULL;
+
+    n = git_diff_num_deltas(self->diff);
+    if (self->numstat != NULL && self->numstat_n == n) {
+        numstat = self->numstat;
+    } else {
+        numstat = calloc(2 * n + 1, sizeof(long long));
+        if (numstat == NULL)
+            return PyErr_NoMemory();
+
+        version = self->version;
+        capsule = diff_workers_new(self, workers);
+        if (capsule == NULL) {
+            free(numstat);
+            return NULL;
+        }
+
+        if (capsule == Py_None) {
+            for (i = 0; err == 0 && i < n; i++)
+                err = diff_delta_numstat(self->diff, i, &numstat[i], &numstat[n + i]);
+            if (err < 0)
+                Error_set(err);
+        } else {
+            err = diff_workers_run(capsule, 0, n, NULL, NULL, numstat);
+        }
+        Py_DECREF(capsule);
+
+        if (err < 0) {
+            free(numstat);
+            return NULL;
+        }
+
+        /* Not cached if the diff was changed while the workers ran */
+        if (self->version == version) {
+            free(self->numstat);
+            self->numstat = numstat;
+            self->numstat_n = n;
+        }
+    }
+
+    /* Copies, the arrays are mutable */
+    buf.ptr = (char*)numstat;
+    buf.size = n * sizeof(long long);
+    py_insertions = pgit_buf_to_array(&buf, "q");
+    buf.ptr += buf.size;
+    py_deletions = pgit_buf_to_array(&buf, "q");
+    if (py_insertions && py_deletions)
+        result = PyTuple_Pack(2, py_insertions, py_deletions);
+
+    if (numstat != self->numstat)
+        free(numstat);
+    Py_XDECREF(py_insertions);
+    Py_XDECREF(py_deletions);
+    return result;
+}
+
+PyDoc_STRVAR(Diff_patches__doc__,
+  "patches(workers: int = 1) -> Iterator[Patch]\n"
+  "\n"
+  "Iterate over the patches of the diff, like iter(diff).\n"
+  "\n"
+  "With more than one worker the patches are made ahead, in chunks, by as\n"
+  "many threads, each with its own handle of the repository, and returned\n"
+  "in order. The same limits as for Diff.patch_text apply.\n");
+
+PyObject *
+Diff_patches(Diff *self, PyObject *args, PyObject *kwds)
+{
+    static char *kwlist[] = {"workers", NULL};
+    DiffPatchesIter *iter;
+    PyObject *capsule;
+    Py_ssize_t workers = 1;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "|n", kwlist, &workers))
+        return NULL;
+
+    capsule = diff_workers_new(self, workers);
+    if (capsule == NULL)
+        return NULL;
+
+    iter = PyObject_New(DiffPatchesIter, &DiffPatchesIterType);
+    if (iter == NULL) {
+        Py_DECREF(capsule);
+        return NULL;
+    }
+
+    Py_INCREF(self);
+    iter->diff = self;
+    iter->workers = NULL;
+    iter->patches = NULL;
+    iter->i = iter->chunk_start = iter->chunk_end = 0;
+    iter->n = git_diff_num_deltas(self->diff);
+
+    if (capsule == Py_None) {
+        Py_DECREF(capsule);
+        return (PyObject*)iter;
+    }
+
+    iter->workers = capsule;
+    iter->patches = calloc(DIFF_PATCHES_CHUNK * ((diff_workers*)PyCapsule_GetPointer(
+                               capsule, "pygit2.diff_workers"))->n, sizeof(git_patch*));
+    if (iter->patches == NULL) {
+        Py_DECREF(iter);
+        return PyErr_NoMemory();
+    }
+
+    return (PyObject*)iter;
+}
+
+static void
+DiffPatchesIter_free_chunk(DiffPatchesIter *self)
+{
+    size_t i;
+
+    for (i = self->i; i < self->chunk_end; i++) {
+        git_patch_free(self->patches[i - self->chunk_start]);
+        self->patches[i - self->chunk_start] = NULL;
+    }
+    self->chunk_end = self->i;
+}
+
+PyObject *
+DiffPatchesIter_iternext(DiffPatchesIter *self)
+{
+    diff_workers *workers;
+    git_patch *patch;
+    Patch *py_patch;
+    size_t end;
+
+    if (self->i >= self->n) {
+        PyErr_SetNone(PyExc_StopIteration);
+        return NULL;
+    }
+
+    if (self->workers == NULL)
+        return diff_get_patch_byindex(self->diff->diff, self->i++);
+
+    if (self->i >= self->chunk_end) {
+        workers = PyCapsule_GetPointer(self->workers, "pygit2.diff_workers");
+        end = self->i + DIFF_PATCHES_CHUNK * workers->n;
+        if (end > self->n)
+            end = self->n;
+
+        self->chunk_start = self->i;
+        self->chunk_end = end;
+        if (diff_workers_run(self->workers, self->i, end, self->patches, NULL, NULL) < 0) {
+            DiffPatchesIter_free_chunk(self);
+            return NULL;
+        }
+    }
+
+    patch = self->patches[self->i - self->chunk_start];
+    self->patches[self->i - self->chunk_start] = NULL;
+    self->i++;
+    if (patch == NULL)
+        Py_RETURN_NONE;
+
+    py_patch = (Patch*)wrap_patch(patch, NULL, NULL);
+    if (py_patch == NULL) {
+        git_patch_free(patch);
+        return NULL;
+    }
+
+    /* The patch uses the repository handle of the worker */
+    Py_INCREF(self->workers);
+    py_patch->owner = self->workers;
+    return (PyObject*)py_patch;
+}
+
+void
+DiffPatchesIter_dealloc(DiffPatchesIter *self)
+{
+    if (self->patches) {
+        DiffPatchesIter_free_chunk(self);
+        free(self->patches);
+    }
+    Py_CLEAR(self->workers);
+    Py_CLEAR(self->diff);
+    PyObject_Del(self);
+}
+
+PyDoc_STRVAR(DiffPatchesIter__doc__, "Patches iterator object.");
+
+PyTypeObject DiffPatchesIterType = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    "_pygit2.DiffPatchesIter",                 /* tp_name           */
+    sizeof(DiffPatchesIter),                   /* tp_basicsize      */
+    0,                                         /* tp_itemsize       */
+    (destructor)DiffPatchesIter_dealloc,       /* tp_dealloc        */
+    0,                                         /* tp_print          */
+    0,                                         /* tp_getattr        */
+    0,                                         /* tp_setattr        */
+    0,                                         /* tp_compare        */
+    0,                                         /* tp_repr           */
+    0,                                         /* tp_as_number      */
+    0,                                         /* tp_as_sequence    */
+    0,                                         /* tp_as_mapping     */
+    0,                                         /* tp_hash           */
+    0,                                         /* tp_call           */
+    0,                                         /* tp_str            */
+    0,                                         /* tp_getattro       */
+    0,                                         /* tp_setattro       */
+    0,                                         /* tp_as_buffer      */
+    Py_TPFLAGS_DEFAULT,                        /* tp_flags          */
+    DiffPatchesIter__doc__,                    /* tp_doc            */
+    0,                                         /* tp_traverse       */
+    0,                                         /* tp_clear          */
+    0,                                         /* tp_richcompare    */
+    0,                                         /* tp_weaklistoffset */
+    PyObject_SelfIter,                         /* tp_iter           */
+    (iternextfunc) DiffPatchesIter_iternext,   /* tp_iternext       */
+};
+
+PyDoc_STRVAR(Diff_patch__doc__,
+    "Patch diff string. Can be None in some cases, such as empty commits.");
+
+PyObject *
+Diff_patch__get__(Diff *self)
+{
+    git_buf buf = {NULL};
+
+    int err = git_diff_to_buf(&buf, self->diff, GIT_DIFF_FORMAT_PATCH);
+    if (err < 0)
+        return Error_set(err);
+
+    PyObject *py_patch = to_unicode_n(buf.ptr, buf.size, NULL, NULL);
+
+    git_buf_dispose(&buf);
+    return py_patch;
+}
+
+
+static void
+DiffHunk_dealloc(DiffHunk *self)
+{
+    Py_CLEAR(self->patch);
+    PyObject_Del(self);
+}
+
+PyDoc_STRVAR(DiffHunk_old_start__doc__, "Old start.");
+
+PyObject *
+DiffHunk_old_start__get__(DiffHunk *self)
+{
+  return PyLong_FromLong(self->hunk->old_start);
+}
+
+PyDoc_STRVAR(DiffHunk_old_lines__doc__, "Old lines.");
+
+PyObject *
+DiffHunk_old_lines__get__(DiffHunk *self)
+{
+  return PyLong_FromLong(self->hunk->old_lines);
+}
+
+PyDoc_STRVAR(DiffHunk_new_start__doc__, "New start.");
+
+PyObject *
+DiffHunk_new_start__get__(DiffHunk *self)
+{
+  return PyLong_FromLong(self->hunk->new_start);
+}
+
+PyDoc_STRVAR(DiffHunk_new_lines__doc__, "New lines.");
+
+PyObject *
+DiffHunk_new_lines__get__(DiffHunk *self)
+{
+  return PyLong_FromLong(self->hunk->new_lines);
+}
+
+PyDoc_STRVAR(DiffHunk_header__doc__, "Header.");
+
+PyObject *
+DiffHunk_header__get__(DiffHunk *self)
+{
+    return to_unicode_n((const char *) &self->hunk->header,
+                        self->hunk->header_len, NULL, NULL);
+}
+
+PyDoc_STRVAR(DiffHunk_lines__doc__, "Lines.");
+
+PyObject *
+DiffHunk_lines__get__(DiffHunk *self)
+{
+    PyObject *py_lines;
+    PyObject *py_line;
+    const git_diff_line *line;
+    size_t i;
+    int err;
+
+    // TODO Replace by an iterator
+    py_lines = PyList_New(self->n_lines);
+    for (i = 0; i < self->n_lines; ++i) {
+        err = git_patch_get_line_in_hunk(&line, self->patch->patch, self->idx, i);
+        if (err < 0)
+            return Error_set(err);
+
+        py_line = wrap_diff_line(line, self);
+        if (py_line == NULL)
+            return NULL;
+
+        PyList_SetItem(py_lines, i, py_line);
+   }
+   return py_lines;
+}
+
+
+PyGetSetDef DiffHunk_getsetters[] = {
+    GETTER(DiffHunk, old_start),
+    GETTER(DiffHunk, old_lines),
+    GETTER(DiffHunk, new_start),
+    GETTER(DiffHunk, new_lines),
+    GETTER(DiffHunk, header),
+    GETTER(DiffHunk, lines),
+    {NULL}
+};
+
+PyDoc_STRVAR(DiffHunk__doc__, "DiffHunk object.");
+
+PyTypeObject DiffHunkType = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    "_pygit2.DiffHunk",                        /* tp_name           */
+    sizeof(DiffHunk),                          /* tp_basicsize      */
+    0,                                         /* tp_itemsize       */
+    (destructor)DiffHunk_dealloc,              /* tp_dealloc        */
+    0,                                         /* tp_print          */
+    0,                                         /* tp_getattr        */
+    0,                                         /* tp_setattr        */
+    0,                                         /* tp_compare        */
+    0,                                         /* tp_repr           */
+    0,                                         /* tp_as_number      */
+    0,                                         /* tp_as_sequence    */
+    0,                                         /* tp_as_mapping     */
+    0,                                         /* tp_hash           */
+    0,                                         /* tp_call           */
+    0,                                         /* tp_str            */
+    0,                                         /* tp_getattro       */
+    0,                                         /* tp_setattro       */
+    0,                                         /* tp_as_buffer      */
+    Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE,  /* tp_flags          */
+    DiffHunk__doc__,                           /* tp_doc            */
+    0,                                         /* tp_traverse       */
+    0,                                         /* tp_clear          */
+    0,                                         /* tp_richcompare    */
+    0,                                         /* tp_weaklistoffset */
+    0,                                         /* tp_iter           */
+    0,                                         /* tp_iternext       */
+    0,                                         /* tp_methods        */
+    0,                                         /* tp_members        */
+    DiffHunk_getsetters,                       /* tp_getset         */
+    0,                                         /* tp_base           */
+    0,                                         /* tp_dict           */
+    0,                                         /* tp_descr_get      */
+    0,                                         /* tp_descr_set      */
+    0,                                         /* tp_dictoffset     */
+    0,                                         /* tp_init           */
+    0,                                         /* tp_alloc          */
+    0,                                         /* tp_new            */
+};
+
+PyDoc_STRVAR(DiffStats_insertions__doc__, "Total number of insertions");
+
+PyObject *
+DiffStats_insertions__get__(DiffStats *self)
+{
+    return PyLong_FromSize_t(git_diff_stats_insertions(self->stats));
+}
+
+PyDoc_STRVAR(DiffStats_deletions__doc__, "Total number of deletions");
+
+PyObject *
+DiffStats_deletions__get__(DiffStats *self)
+{
+    return PyLong_FromSize_t(git_diff_stats_deletions(self->stats));
+}
+
+PyDoc_STRVAR(DiffStats_files_changed__doc__, "Total number of files changed");
+
+PyObject *
+DiffStats_files_changed__get__(DiffStats *self)
+{
+    return PyLong_FromSize_t(git_diff_stats_files_changed(self->stats));
+}
+
+PyDoc_STRVAR(DiffStats_format__doc__,
+    "format(format: enums.DiffStatsFormat, width: int) -> str\n"
+    "\n"
+    "Format the stats as a string.\n"
+    "\n"
+    "Returns: str.\n"
+    "\n"
+    "Parameters:\n"
+    "\n"
+    "format\n"
+    "    The format to use. A combination of DiffStatsFormat constants.\n"
+    "\n"
+    "width\n"
+    "    The width of the output. The output will be scaled to fit.");
+
+PyObject *
+DiffStats_format(DiffStats *self, PyObject *args, PyObject *kwds)
+{
+    int err, format;
+    git_buf buf = { 0 };
+    Py_ssize_t width;
+    PyObject *str;
+    char *keywords[] = {"format", "width", NULL};
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "in", keywords, &format, &width))
+        return NULL;
 
     if (width <= 0) {
         PyErr_SetString(PyExc_ValueError, "width must be positive");
@@ -969,14 +2058,22 @@ PyDoc_STRVAR(Diff_from_c__doc__, "Method exposed for Index to hook into");
 PyObject *
 Diff_from_c(Diff *dummy, PyObject *args)
 {
-    PyObject *py_diff, *py_repository;
+    git_diff_options opts = GIT_DIFF_OPTIONS_INIT;
+    PyObject *py_diff, *py_repository, *py_flags = NULL;
     git_diff *diff;
     char *buffer;
     Py_ssize_t length;
 
-    if (!PyArg_ParseTuple(args, "OO!", &py_diff, &RepositoryType, &py_repository))
+    if (!PyArg_ParseTuple(args, "OO!|OII", &py_diff, &RepositoryType, &py_repository,
+                          &py_flags, &opts.context_lines, &opts.interhunk_lines))
         return NULL;
 
+    if (py_flags) {
+        opts.flags = (uint32_t)PyLong_AsUnsignedLong(py_flags);
+        if (PyErr_Occurred())
+            return NULL;
+    }
+
     /* Here we need to do the opposite conversion from the _pointer getters */
     if (PyBytes_AsStringAndSize(py_diff, &buffer, &length))
         return NULL;
@@ -989,7 +2086,10 @@ Diff_from_c(Diff *dummy, PyObject *args)
     /* the "buffer" contains the pointer */
     diff = *((git_diff **) buffer);
 
-    return wrap_diff(diff, (Repository *) py_repository);
+    if (py_flags == NULL)
+        return wrap_diff(diff, (Repository *) py_repository);
+
+    return wrap_diff_with_options(diff, (Repository *) py_repository, &opts);
 }
 
 PyDoc_STRVAR(Diff_merge__doc__,
@@ -1006,6 +2106,7 @@ Diff_merge(Diff *self, PyObject *args)
     if (!PyArg_ParseTuple(args, "O!", &DiffType, &py_diff))
         return NULL;
 
+    diff_clear_cache(self);
     err = git_diff_merge(self->diff, py_diff->diff);
     if (err < 0)
         return Error_set(err);
@@ -1014,8 +2115,753 @@ Diff_merge(Diff *self, PyObject *args)
 }
 
 
+/*
+ * Rename and copy detection with precomputed similarities, for
+ * Diff.find_similar(workers=N).
+ *
+ * The signatures of the candidate blobs are looked up in the signature
+ * cache, and the missing ones computed in parallel. Then the
+ * similarities of the pairs of a source (the old side of a deleted file...)
+ * and a target (the new side of an added file...) of close enough sizes are
+ * computed in parallel too, and only the pairs above the thresholds are
+ * kept. Finally git_diff_find_similar runs with a metric that looks them up,
+ * so libgit2 still decides the renames and copies.
+ */
+
+#define SIMILAR_DEFAULT_THRESHOLD 50
+#define SIMILAR_SMALL_SIZE 127
+
+/* The keys of the signature cache: the raw oid, then the options */
+#define SIMILAR_KEY_SIZE (GIT_OID_RAWSZ + 1)
+
+typedef struct {
+    git_oid id;
+    pgit_hashsig *sig;          /* NULL if the blob could not be hashed */
+    git_object_size_t size;
+    int src_idx;                /* In similar_ctx.sources, or -1 */
+    int tgt_idx;                /* In similar_ctx.targets, or -1 */
+    int nsrc;                   /* Number of deltas it is a source of */
+    int ntgt;
+    int self_pair;              /* A side of a delta checked for rewrites */
+    int skipped;                /* A target with an exact rename or copy */
+    int resolved;               /* Its blob was read, or it was in the cache */
+    int heap;                   /* Made by the metric callbacks */
+} similar_entry;
+
+typedef struct {
+    uint32_t src;
+    uint32_t tgt;
+    int score;
+} similar_pair;
+
+typedef struct {
+    similar_entry *entries;     /* Sorted by oid */
+    size_t nentries;
+    similar_entry **missing;
+    size_t nmissing;
+    similar_entry **sources;
+    size_t nsources;
+    similar_entry **targets;    /* Sorted by size */
+    size_t ntargets;
+    similar_entry **self_pairs; /* The old then new sides of the deltas */
+    size_t nself_pairs;
+    similar_pair *pairs;        /* Sorted by source then target */
+    size_t npairs;
+    int sig_opts;               /* git_hashsig_option_t */
+    int min_score;
+    int serial;                 /* In this thread, with the GIL held */
+} similar_ctx;
+
+typedef struct {
+    similar_ctx *ctx;
+    const char *path;           /* To open a repository, if repo is NULL */
+    git_repository *repo;
+    int own_repo;
+    size_t start;
+    size_t step;
+    pgit_buf pairs;
+    int error;
+    int error_class;
+    char *error_message;
+} similar_job;
+
+static int
+similar_entry_cmp(const void *a, const void *b)
+{
+    return git_oid_cmp(&((const similar_entry*)a)->id, &((const similar_entry*)b)->id);
+}
+
+static int
+similar_target_cmp(const void *a, const void *b)
+{
+    git_object_size_t x = (*(similar_entry* const*)a)->size;
+    git_object_size_t y = (*(similar_entry* const*)b)->size;
+    return (x > y) - (x < y);
+}
+
+static int
+similar_pair_cmp(const void *a, const void *b)
+{
+    const similar_pair *x = a, *y = b;
+    if (x->src != y->src)
+        return (x->src > y->src) - (x->src < y->src);
+    return (x->tgt > y->tgt) - (x->tgt < y->tgt);
+}
+
+static similar_entry *
+similar_find(similar_ctx *ctx, const git_oid *id)
+{
+    similar_entry key;
+
+    git_oid_cpy(&key.id, id);
+    return bsearch(&key, ctx->entries, ctx->nentries, sizeof(similar_entry),
+                   similar_entry_cmp);
+}
+
+/* Whether the file of a delta may be a rename or copy candidate */
+static int
+similar_is_candidate(const git_diff_file *file)
+{
+    return (file->flags & GIT_DIFF_FLAG_VALID_ID) &&
+           !git_oid_is_zero(&file->id) &&
+           (file->mode == GIT_FILEMODE_BLOB ||
+            file->mode == GIT_FILEMODE_BLOB_EXECUTABLE);
+}
+
+static void
+similar_job_error(similar_job *job, int err)
+{
+    const git_error *error = git_error_last();
+
+    job->error = err;
+    if (error != NULL) {
+        job->error_class = error->klass;
+        job->error_message = strdup(error->message);
+    }
+}
+
+static void
+similar_job_signatures(void *payload)
+{
+    similar_job *job = (similar_job*)payload;
+    similar_ctx *ctx = job->ctx;
+    similar_entry *entry;
+    git_blob *blob;
+    size_t i;
+    int err;
+
+    /* libgit2 repositories must not be shared between threads */
+    if (job->repo == NULL) {
+        err = git_repository_open_ext(&job->repo, job->path,
+                                      GIT_REPOSITORY_OPEN_NO_SEARCH, NULL);
+        if (err < 0) {
+            similar_job_error(job, err);
+            return;
+        }
+        job->own_repo = 1;
+    }
+
+    for (i = job->start; i < ctx->nmissing; i += job->step) {
+        entry = ctx->missing[i];
+        /* Not in the object database, e.g. a file of the working
+         * directory, libgit2 will give the contents to the metric */
+        if (git_blob_lookup(&blob, job->repo, &entry->id) < 0) {
+            git_error_clear();
+            continue;
+        }
+
+        entry->resolved = 1;
+        entry->size = git_blob_rawsize(blob);
+        entry->sig = malloc(sizeof(pgit_hashsig));
+        if (entry->sig != NULL &&
+            pgit_hashsig_create(entry->sig, git_blob_rawcontent(blob),
+                                (size_t)entry->size, ctx->sig_opts) < 0) {
+            free(entry->sig);
+            entry->sig = NULL;
+            git_error_clear();
+        }
+        if (entry->sig != NULL)
+            entry->sig->blob_size = entry->size;
+        git_blob_free(blob);
+    }
+}
+
+static void
+similar_job_scores(void *payload)
+{
+    similar_job *job = (similar_job*)payload;
+    similar_ctx *ctx = job->ctx;
+    similar_entry *src, *tgt;
+    similar_pair pair;
+    git_object_size_t lo, hi;
+    size_t i, j, a, b, mid;
+    int score;
+
+    for (i = job->start; i < ctx->nsources; i += job->step) {
+        src = ctx->sources[i];
+        if (src->sig == NULL)
+            continue;
+
+        /* Like libgit2, skip the pairs of files over 127 bytes whose sizes
+         * differ more than 8 times. The targets are sorted by size, find
+         * the first one of size / 8 */
+        lo = (src->size + 7) / 8;
+        hi = src->size * 8;
+        a = 0;
+        b = ctx->ntargets;
+        while (a < b) {
+            mid = (a + b) / 2;
+            if (ctx->targets[mid]->size < lo)
+                a = mid + 1;
+            else
+                b = mid;
+        }
+
+        for (j = 0; j < ctx->ntargets; j++) {
+            tgt = ctx->targets[j];
+            if (src->size > SIMILAR_SMALL_SIZE && tgt->size > SIMILAR_SMALL_SIZE) {
+                if (j < a) {
+                    j = a - 1;
+                    continue;
+                }
+                if (tgt->size > hi)
+                    break;
+            }
+
+            /* Exact renames are found by libgit2 before the metric is
+             * used, skip the targets that will have one */
+            if (tgt->sig == NULL || tgt->skipped)
+                continue;
+
+            score = pgit_hashsig_compare(src->sig, tgt->sig);
+            if (score < ctx->min_score)
+                continue;
+
+            pair.src = (uint32_t)src->src_idx;
+            pair.tgt = (uint32_t)tgt->tgt_idx;
+            pair.score = score;
+            if (pgit_buf_put(&job->pairs, &pair, sizeof(pair)) < 0) {
+                job->error = GIT_ERROR;
+                return;
+            }
+        }
+    }
+
+    /* The similarity of the two sides of a modified file, to find the
+     * rewrites, whatever it is */
+    for (i = job->start; i < ctx->nself_pairs; i += job->step) {
+        src = ctx->self_pairs[2 * i];
+        tgt = ctx->self_pairs[2 * i + 1];
+        pair.src = (uint32_t)src->src_idx;
+        pair.tgt = (uint32_t)tgt->tgt_idx;
+        pair.score = 0;
+        if (src->sig && tgt->sig) {
+            pair.score = pgit_hashsig_compare(src->sig, tgt->sig);
+            if (pair.score < 0)
+                pair.score = 0;
+        }
+        if (pgit_buf_put(&job->pairs, &pair, sizeof(pair)) < 0) {
+            job->error = GIT_ERROR;
+            return;
+        }
+    }
+}
+
+static similar_entry *
+similar_heap_entry(similar_ctx *ctx)
+{
+    similar_entry *entry = calloc(1, sizeof(similar_entry));
+
+    if (entry == NULL)
+        return NULL;
+
+    entry->sig = malloc(sizeof(pgit_hashsig));
+    if (entry->sig == NULL) {
+        free(entry);
+        return NULL;
+    }
+    entry->src_idx = entry->tgt_idx = -1;
+    entry->heap = 1;
+    return entry;
+}
+
+static int
+similar_file_signature(void **out, const git_diff_file *file,
+                       const char *fullpath, void *payload)
+{
+    similar_ctx *ctx = (similar_ctx*)payload;
+    similar_entry *entry;
+    int err;
+
+    entry = similar_heap_entry(ctx);
+    if (entry == NULL)
+        return -1;
+
+    err = pgit_hashsig_create_fromfile(entry->sig, fullpath, ctx->sig_opts);
+    if (err < 0) {
+        free(entry->sig);
+        free(entry);
+        return err;
+    }
+
+    *out = entry;
+    return 0;
+}
+
+static int
+similar_buffer_signature(void **out, const git_diff_file *file,
+                         const char *buf, size_t buflen, void *payload)
+{
+    similar_ctx *ctx = (similar_ctx*)payload;
+    similar_entry *entry;
+    int err;
+
+    /* The similarities of the skipped targets are known anyway, below the
+     * thresholds */
+    entry = similar_find(ctx, &file->id);
+    if (entry != NULL && (entry->resolved || entry->skipped)) {
+        *out = entry;
+        return 0;
+    }
+
+    entry = similar_heap_entry(ctx);
+    if (entry == NULL)
+        return -1;
+
+    err = pgit_hashsig_create(entry->sig, buf, buflen, ctx->sig_opts);
+    if (err < 0) {
+        free(entry->sig);
+        free(entry);
+        return err;
+    }
+
+    *out = entry;
+    return 0;
+}
+
+static void
+similar_free_signature(void *sig, void *payload)
+{
+    similar_entry *entry = (similar_entry*)sig;
+
+    if (entry->heap) {
+        free(entry->sig);
+        free(entry);
+    }
+}
+
+static int
+similar_similarity(int *score, void *siga, void *sigb, void *payload)
+{
+    similar_ctx *ctx = (similar_ctx*)payload;
+    similar_entry *a = (similar_entry*)siga, *b = (similar_entry*)sigb;
+    similar_pair key, *pair;
+
+    if (a->src_idx >= 0 && b->tgt_idx >= 0) {
+        key.src = (uint32_t)a->src_idx;
+        key.tgt = (uint32_t)b->tgt_idx;
+        pair = bsearch(&key, ctx->pairs, ctx->npairs, sizeof(similar_pair),
+                       similar_pair_cmp);
+        /* Not computed: below the lowest threshold */
+        *score = pair ? pair->score : 0;
+        return 0;
+    }
+
+    if (a->sig == NULL || b->sig == NULL) {
+        *score = 0;
+        return 0;
+    }
+
+    *score = pgit_hashsig_compare(a->sig, b->sig);
+    return *score < 0 ? *score : 0;
+}
+
+/* Resolve GIT_DIFF_FIND_BY_CONFIG like libgit2, with diff.renames */
+static int
+similar_resolve_flags(git_repository *repo, uint32_t *flags)
+{
+    git_config *cfg;
+    const char *value;
+    int err, boolean;
+
+    if ((*flags & GIT_DIFF_FIND_ALL) != GIT_DIFF_FIND_BY_CONFIG)
+        return 0;
+
+    err = git_repository_config_snapshot(&cfg, repo);
+    if (err < 0)
+        return err;
+
+    err = git_config_get_string(&value, cfg, "diff.renames");
+    if (err == GIT_ENOTFOUND) {
+        git_error_clear();
+        *flags |= GIT_DIFF_FIND_RENAMES;
+        err = 0;
+    } else if (err == 0) {
+        if (git_config_parse_bool(&boolean, value) == 0 && !boolean)
+            ;
+        else if (PyOS_stricmp(value, "copies") == 0 || PyOS_stricmp(value, "copy") == 0)
+            *flags |= GIT_DIFF_FIND_RENAMES | GIT_DIFF_FIND_COPIES;
+        else
+            *flags |= GIT_DIFF_FIND_RENAMES;
+        git_error_clear();
+    }
+
+    git_config_free(cfg);
+    return err;
+}
+
+static PyObject *
+similar_cache_key(similar_ctx *ctx, similar_entry *entry)
+{
+    char raw[SIMILAR_KEY_SIZE];
+
+    memcpy(raw, entry->id.id, GIT_OID_RAWSZ);
+    raw[GIT_OID_RAWSZ] = (char)ctx->sig_opts;
+    return PyBytes_FromStringAndSize(raw, sizeof(raw));
+}
+
+/* Look up the signatures with cache.get(key), the values that are not
+ * packed signatures (e.g. of another version) are ignored */
+static int
+similar_cache_lookup(PyObject *cache, similar_ctx *ctx)
+{
+    PyObject *key, *value;
+    similar_entry *entry;
+    char *data;
+    Py_ssize_t len;
+    size_t i;
+    int err;
+
+    for (i = 0; i < ctx->nentries; i++) {
+        entry = &ctx->entries[i];
+        if (entry->src_idx < 0 && entry->tgt_idx < 0)
+            continue;
+
+        if (cache == Py_None) {
+            ctx->missing[ctx->nmissing++] = entry;
+            continue;
+        }
+
+        key = similar_cache_key(ctx, entry);
+        if (key == NULL)
+            return -1;
+        value = PyObject_CallMethod(cache, "get", "O", key);
+        Py_DECREF(key);
+        if (value == NULL)
+            return -1;
+
+        err = -1;
+        if (PyBytes_Check(value)) {
+            PyBytes_AsStringAndSize(value, &data, &len);
+            entry->sig = malloc(sizeof(pgit_hashsig));
+            if (entry->sig == NULL) {
+                Py_DECREF(value);
+                PyErr_NoMemory();
+                return -1;
+            }
+            err = pgit_hashsig_unpack(entry->sig, (unsigned char*)data, (size_t)len);
+            if (err == 0 && entry->sig->opt != ctx->sig_opts)
+                err = -1;
+        }
+        Py_DECREF(value);
+
+        if (err < 0) {
+            free(entry->sig);
+            entry->sig = NULL;
+            ctx->missing[ctx->nmissing++] = entry;
+            continue;
+        }
+        entry->size = entry->sig->blob_size;
+        entry->resolved = 1;
+    }
+
+    return 0;
+}
+
+/* Add the signatures computed to the cache, with cache[key] = value */
+static int
+similar_cache_store(PyObject *cache, similar_ctx *ctx)
+{
+    PyObject *key, *value;
+    similar_entry *entry;
+    unsigned char packed[PGIT_HASHSIG_PACKED_SIZE];
+    size_t i, len;
+    int err;
+
+    if (cache == Py_None)
+        return 0;
+
+    for (i = 0; i < ctx->nmissing; i++) {
+        entry = ctx->missing[i];
+        if (entry->sig == NULL)
+            continue;
+
+        len = pgit_hashsig_pack(entry->sig, packed);
+        key = similar_cache_key(ctx, entry);
+        value = PyBytes_FromStringAndSize((char*)packed, (Py_ssize_t)len);
+        err = (key && value) ? PyObject_SetItem(cache, key, value) : -1;
+        Py_XDECREF(key);
+        Py_XDECREF(value);
+        if (err < 0)
+            return -1;
+    }
+
+    return 0;
+}
+
+static int
+similar_run(similar_job *jobs, size_t njobs, pgit_job_fn fn)
+{
+    size_t i;
+    int err = 0;
+
+    if (jobs[0].ctx->serial) {
+        for (i = 0; i < njobs; i++)
+            fn(&jobs[i]);
+    } else {
+        Py_BEGIN_ALLOW_THREADS
+        pgit_run_parallel(fn, jobs, sizeof(similar_job), njobs);
+        Py_END_ALLOW_THREADS
+    }
+
+    for (i = 0; i < njobs; i++) {
+        err = jobs[i].error;
+        if (err < 0 && jobs[i].error_message == NULL) {
+            /* Failed to grow the buffer of pairs */
+            PyErr_NoMemory();
+            return -1;
+        }
+        if (err < 0) {
+            git_error_set_str(jobs[i].error_class, jobs[i].error_message);
+            Error_set(err);
+            return -1;
+        }
+    }
+
+    return 0;
+}
+
+static int
+diff_find_similar_parallel(Diff *self, git_diff_find_options *opts,
+                           Py_ssize_t workers, PyObject *cache)
+{
+    git_diff_similarity_metric metric;
+    similar_ctx ctx;
+    similar_job *jobs = NULL;
+    similar_entry *a, *b;
+    const git_diff_delta *delta;
+    size_t i, n, nentries, njobs, npairs;
+    uint32_t flags;
+    int copies, rewrites, is_src, is_tgt, err = 0, result = -1;
+
+    memset(&ctx, 0, sizeof(ctx));
+    flags = opts->flags;
+    err = similar_resolve_flags(self->repo->repo, &flags);
+    if (err < 0) {
+        Error_set(err);
+        return -1;
+    }
+    opts->flags = flags;
+
+    /* The signatures libgit2 makes */
+    if (flags & GIT_DIFF_FIND_IGNORE_WHITESPACE)
+        ctx.sig_opts = GIT_HASHSIG_IGNORE_WHITESPACE;
+    else if (flags & GIT_DIFF_FIND_DONT_IGNORE_WHITESPACE)
+        ctx.sig_opts = GIT_HASHSIG_NORMAL;
+    else
+        ctx.sig_opts = GIT_HASHSIG_SMART_WHITESPACE;
+    ctx.sig_opts |= GIT_HASHSIG_ALLOW_SMALL_FILES;
+
+    copies = (flags & (GIT_DIFF_FIND_COPIES | GIT_DIFF_FIND_COPIES_FROM_UNMODIFIED)) != 0;
+    rewrites = (flags & (GIT_DIFF_FIND_RENAMES_FROM_REWRITES | GIT_DIFF_FIND_REWRITES |
+                         GIT_DIFF_BREAK_REWRITES)) != 0;
+
+    /* The lowest threshold a pair of a source and a target is tested with */
+#define THRESHOLD(x) ((x) ? (int)(x) : SIMILAR_DEFAULT_THRESHOLD)
+    ctx.min_score = 100;
+    if (flags & GIT_DIFF_FIND_RENAMES)
+        ctx.min_score = THRESHOLD(opts->rename_threshold);
+    if (rewrites && THRESHOLD(opts->rename_from_rewrite_threshold) < ctx.min_score)
+        ctx.min_score = THRESHOLD(opts->rename_from_rewrite_threshold);
+#undef THRESHOLD
+
+    /* But with copies, the best source of a target is kept whatever its
+     * score, and one under the thresholds still keeps the target from being
+     * a copy of another source: every similarity counts */
+    if (copies)
+        ctx.min_score = 1;
+
+    /* The candidates, two per delta at most */
+    n = git_diff_num_deltas(self->diff);
+    ctx.entries = calloc(2 * n + 1, sizeof(similar_entry));
+    ctx.missing = calloc(2 * n + 1, sizeof(similar_entry*));
+    ctx.sources = calloc(2 * n + 1, sizeof(similar_entry*));
+    ctx.targets = calloc(2 * n + 1, sizeof(similar_entry*));
+    ctx.self_pairs = calloc(2 * n + 1, sizeof(similar_entry*));
+    if (!ctx.entries || !ctx.missing || !ctx.sources || !ctx.targets || !ctx.self_pairs) {
+        PyErr_NoMemory();
+        goto exit;
+    }
+
+    for (i = 0; i < n; i++) {
+        delta = git_diff_get_delta(self->diff, i);
+        if (similar_is_candidate(&delta->old_file))
+            git_oid_cpy(&ctx.entries[ctx.nentries++].id, &delta->old_file.id);
+        if (similar_is_candidate(&delta->new_file))
+            git_oid_cpy(&ctx.entries[ctx.nentries++].id, &delta->new_file.id);
+    }
+
+    qsort(ctx.entries, ctx.nentries, sizeof(similar_entry), similar_entry_cmp);
+    for (i = 0, nentries = 0; i < ctx.nentries; i++) {
+        if (nentries == 0 || !git_oid_equal(&ctx.entries[i].id, &ctx.entries[nentries - 1].id))
+            ctx.entries[nentries++] = ctx.entries[i];
+    }
+    ctx.nentries = nentries;
+    for (i = 0; i < nentries; i++)
+        ctx.entries[i].src_idx = ctx.entries[i].tgt_idx = -1;
+
+    for (i = 0; i < n; i++) {
+        delta = git_diff_get_delta(self->diff, i);
+        is_src = delta->status == GIT_DELTA_DELETED ||
+                 (delta->status == GIT_DELTA_MODIFIED && (copies || rewrites)) ||
+                 (delta->status == GIT_DELTA_UNMODIFIED &&
+                  (flags & GIT_DIFF_FIND_COPIES_FROM_UNMODIFIED));
+        is_tgt = delta->status == GIT_DELTA_ADDED ||
+                 (delta->status == GIT_DELTA_UNTRACKED &&
+                  (flags & GIT_DIFF_FIND_FOR_UNTRACKED)) ||
+                 (delta->status == GIT_DELTA_MODIFIED && rewrites);
+
+        a = is_src && similar_is_candidate(&delta->old_file) ?
+            similar_find(&ctx, &delta->old_file.id) : NULL;
+        b = is_tgt && similar_is_candidate(&delta->new_file) ?
+            similar_find(&ctx, &delta->new_file.id) : NULL;
+        if (a != NULL) {
+            if (a->src_idx < 0) {
+                a->src_idx = (int)ctx.nsources;
+                ctx.sources[ctx.nsources++] = a;
+            }
+            a->nsrc++;
+        }
+        if (b != NULL) {
+            if (b->tgt_idx < 0) {
+                b->tgt_idx = (int)ctx.ntargets;
+                ctx.targets[ctx.ntargets++] = b;
+            }
+            b->ntgt++;
+        }
+        if (a != NULL && b != NULL && delta->status == GIT_DELTA_MODIFIED) {
+            a->self_pair = b->self_pair = 1;
+            ctx.self_pairs[2 * ctx.nself_pairs] = a;
+            ctx.self_pairs[2 * ctx.nself_pairs + 1] = b;
+            ctx.nself_pairs++;
+        }
+    }
+
+    /* The exact renames are found by libgit2 before using the metric, no
+     * need to score the targets that will have one. Not with copies, where
+     * the targets of a same source may end up with other sources */
+    for (i = 0; i < ctx.nentries; i++) {
+        a = &ctx.entries[i];
+        a->skipped = a->tgt_idx >= 0 && a->nsrc > 0 && !a->self_pair &&
+                     a->nsrc >= a->ntgt && !copies;
+    }
+
+    if (similar_cache_lookup(cache, &ctx) < 0)
+        goto exit;
+
+    /* Workers reopen the repository by its path. When they cannot, work on
+     * self->repo in this thread, keeping the GIL for its Python backends */
+    ctx.serial = !pgit_repository_can_reopen(self->repo->repo);
+    njobs = (ctx.serial || workers < 1) ? 1 : (size_t)workers;
+    jobs = calloc(njobs, sizeof(similar_job));
+    if (jobs == NULL) {
+        PyErr_NoMemory();
+        goto exit;
+    }
+    for (i = 0; i < njobs; i++) {
+        jobs[i].ctx = &ctx;
+        jobs[i].path = git_repository_path(self->repo->repo);
+        jobs[i].repo = (njobs == 1) ? self->repo->repo : NULL;
+        jobs[i].start = i;
+        jobs[i].step = njobs;
+    }
+
+    /* 1. The missing signatures */
+    if (ctx.nmissing > 0) {
+        if (similar_run(jobs, ctx.nmissing < njobs ? ctx.nmissing : njobs,
+                        similar_job_signatures) < 0)
+            goto exit;
+        if (similar_cache_store(cache, &ctx) < 0)
+            goto exit;
+    }
+
+    /* 2. The similarities, with the targets sorted by size */
+    qsort(ctx.targets, ctx.ntargets, sizeof(similar_entry*), similar_target_cmp);
+    for (i = 0; i < ctx.ntargets; i++) {
+        ctx.targets[i]->tgt_idx = (int)i;
+    }
+    if (similar_run(jobs, njobs, similar_job_scores) < 0)
+        goto exit;
+
+    npairs = 0;
+    for (i = 0; i < njobs; i++)
+        npairs += jobs[i].pairs.size / sizeof(similar_pair);
+    ctx.pairs = malloc((npairs + 1) * sizeof(similar_pair));
+    if (ctx.pairs == NULL) {
+        PyErr_NoMemory();
+        goto exit;
+    }
+    for (i = 0; i < njobs; i++) {
+        memcpy((char*)ctx.pairs + ctx.npairs * sizeof(similar_pair),
+               jobs[i].pairs.ptr, jobs[i].pairs.size);
+        ctx.npairs += jobs[i].pairs.size / sizeof(similar_pair);
+    }
+    qsort(ctx.pairs, ctx.npairs, sizeof(similar_pair), similar_pair_cmp);
+
+    /* 3. Let libgit2 decide, with the pruning done above there is no
+     * reason for a rename limit */
+    metric.file_signature = similar_file_signature;
+    metric.buffer_signature = similar_buffer_signature;
+    metric.free_signature = similar_free_signature;
+    metric.similarity = similar_similarity;
+    metric.payload = &ctx;
+    opts->metric = &metric;
+    opts->rename_limit = n;
+
+    /* The GIL is kept while the diff is changed, see Diff.numstat */
+    err = git_diff_find_similar(self->diff, opts);
+    if (err < 0) {
+        Error_set(err);
+        goto exit;
+    }
+
+    result = 0;
+
+exit:
+    if (jobs) {
+        for (i = 0; i < njobs; i++) {
+            if (jobs[i].own_repo)
+                git_repository_free(jobs[i].repo);
+            pgit_buf_dispose(&jobs[i].pairs);
+            free(jobs[i].error_message);
+        }
+        free(jobs);
+    }
+    if (ctx.entries) {
+        for (i = 0; i < ctx.nentries; i++)
+            free(ctx.entries[i].sig);
+    }
+    free(ctx.entries);
+    free(ctx.missing);
+    free(ctx.sources);
+    free(ctx.targets);
+    free(ctx.self_pairs);
+    free(ctx.pairs);
+    return result;
+}
+
 PyDoc_STRVAR(Diff_find_similar__doc__,
-  "find_similar(flags: enums.DiffFind = enums.DiffFind.FIND_BY_CONFIG, rename_threshold: int = 50, copy_threshold: int = 50, rename_from_rewrite_threshold: int = 50, break_rewrite_threshold: int = 60, rename_limit: int = 1000)\n"
+  "find_similar(flags: enums.DiffFind = enums.DiffFind.FIND_BY_CONFIG, rename_threshold: int = 50, copy_threshold: int = 50, rename_from_rewrite_threshold: int = 50, break_rewrite_threshold: int = 60, rename_limit: int = 1000, workers: int = 0, cache: SignatureCache | None = None)\n"
   "\n"
   "Transform a diff marking file renames, copies, etc.\n"
   "\n"
@@ -1024,7 +2870,19 @@ PyDoc_STRVAR(Diff_find_similar__doc__,
   "will, if requested, break modified files into add/remove pairs if the "
   "amount of change is above a threshold.\n"
   "\n"
-  "flags - Combination of enums.DiffFind.FIND_* and enums.DiffFind.BREAK_* constants."
+  "flags - Combination of enums.DiffFind.FIND_* and enums.DiffFind.BREAK_* constants.\n"
+  "\n"
+  "workers - With 1 or more, the similarities are computed beforehand, with\n"
+  "the GIL released and in as many threads: the signatures of the blobs\n"
+  "are computed once and cached, the targets of exact renames are not\n"
+  "scored, and like git the pairs of files whose sizes are too far apart\n"
+  "to reach the thresholds are skipped. Then rename_limit does not apply.\n"
+  "With 0, the default, libgit2 computes the similarities itself.\n"
+  "\n"
+  "cache - Where the signatures of the blobs are kept, a SignatureCache or\n"
+  "any object with get(key) and __setitem__(key, value), the keys and the\n"
+  "values are bytes. Defaults to Repository.signature_cache. Giving one\n"
+  "implies workers=1 at least.\n"
   );
 
 PyObject *
@@ -1032,17 +2890,47 @@ Diff_find_similar(Diff *self, PyObject *args, PyObject *kwds)
 {
     int err;
     git_diff_find_options opts = GIT_DIFF_FIND_OPTIONS_INIT;
+    Py_ssize_t workers = 0;
+    PyObject *cache = Py_None;
 
     char *keywords[] = {"flags", "rename_threshold", "copy_threshold",
                         "rename_from_rewrite_threshold",
-                        "break_rewrite_threshold", "rename_limit", NULL};
+                        "break_rewrite_threshold", "rename_limit", "workers",
+                        "cache", NULL};
 
-    if (!PyArg_ParseTupleAndKeywords(args, kwds, "|iHHHHI", keywords,
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "|iHHHHInO", keywords,
             &opts.flags, &opts.rename_threshold, &opts.copy_threshold,
             &opts.rename_from_rewrite_threshold, &opts.break_rewrite_threshold,
-            &opts.rename_limit))
+            &opts.rename_limit, &workers, &cache))
         return NULL;
 
+    diff_clear_cache(self);
+    if (cache != Py_None && workers < 1)
+        workers = 1;
+
+    if (workers > 0 && self->repo != NULL &&
+        !(opts.flags & GIT_DIFF_FIND_EXACT_MATCH_ONLY)) {
+        /* The cache of the repository, if it is a pygit2.Repository */
+        if (cache == Py_None) {
+            cache = PyObject_GetAttrString((PyObject*)self->repo, "signature_cache");
+            if (cache == NULL) {
+                if (!PyErr_ExceptionMatches(PyExc_AttributeError))
+                    return NULL;
+                PyErr_Clear();
+                cache = Py_None;
+                Py_INCREF(cache);
+            }
+        } else {
+            Py_INCREF(cache);
+        }
+
+        err = diff_find_similar_parallel(self, &opts, workers, cache);
+        Py_DECREF(cache);
+        if (err < 0)
+            return NULL;
+        Py_RETURN_NONE;
+    }
+
     err = git_diff_find_similar(self->diff, &opts);
     if (err < 0)
         return Error_set(err);
@@ -1077,12 +2965,25 @@ Diff_getitem(Diff *self, PyObject *value)
     return diff_get_patch_byindex(self->diff, i);
 }
 
-PyDoc_STRVAR(Diff_stats__doc__, "Accumulate diff statistics for all patches.");
+PyDoc_STRVAR(Diff_stats__doc__,
+  "Accumulate diff statistics for all patches. Computed once, until the\n"
+  "diff is changed by merge or find_similar.");
 
 PyObject *
 Diff_stats__get__(Diff *self)
 {
-    return wrap_diff_stats(self->diff);
+    PyObject *stats;
+
+    if (self->stats == NULL) {
+        stats = wrap_diff_stats(self->diff);
+        if (stats == NULL)
+            return NULL;
+        /* Another thread may have set it meanwhile */
+        Py_XSETREF(self->stats, stats);
+    }
+
+    Py_INCREF(self->stats);
+    return self->stats;
 }
 
 PyDoc_STRVAR(Diff_parse_diff__doc__,
@@ -1110,6 +3011,7 @@ Diff_parse_diff(PyObject *self, PyObject *py_str)
 static void
 Diff_dealloc(Diff *self)
 {
+    diff_clear_cache(self);
     git_diff_free(self->diff);
     Py_CLEAR(self->repo);
     PyObject_Del(self);
@@ -1130,7 +3032,12 @@ PyMappingMethods Diff_as_mapping = {
 };
 
 static PyMethodDef Diff_methods[] = {
+    METHOD(Diff, delta_table, METH_NOARGS),
     METHOD(Diff, merge, METH_VARARGS),
+    METHOD(Diff, numstat, METH_VARARGS | METH_KEYWORDS),
+    METHOD(Diff, patch_text, METH_VARARGS | METH_KEYWORDS),
+    METHOD(Diff, patches, METH_VARARGS | METH_KEYWORDS),
+    METHOD(Diff, write_patch, METH_VARARGS | METH_KEYWORDS),
     METHOD(Diff, find_similar, METH_VARARGS | METH_KEYWORDS),
     METHOD(Diff, from_c, METH_STATIC | METH_VARARGS),
     {"parse_diff", (PyCFunction) Diff_parse_diff,
@@ -1138,7 +3045,6 @@ static PyMethodDef Diff_methods[] = {
     {NULL}
 };
 
-/* TODO Implement Diff.patches, deprecate Diff_iter and Diff_getitem */
 
 PyDoc_STRVAR(Diff__doc__, "Diff objects.");
 
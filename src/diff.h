@@ -34,6 +34,8 @@
 #include "types.h"
 
 PyObject* wrap_diff(git_diff *diff, Repository *repo);
+PyObject* wrap_diff_with_options(git_diff *diff, Repository *repo,
+                                 const git_diff_options *opts);
 PyObject* wrap_diff_delta(const git_diff_delta *delta);
 PyObject* wrap_diff_file(const git_diff_file *file);
 PyObject* wrap_diff_hunk(Patch *patch, size_t idx);
@@ -0,0 +1,361 @@
+/*
+ * Copyright (C) the libgit2 contributors. All rights reserved.
+ *
+ * This file is part of libgit2, distributed under the GNU GPL v2 with
+ * a Linking Exception. For full terms see the included COPYING file.
+ *
+ * Imported from libgit2 (src/util/hashsig.c), with the signatures kept in
+ * plain structs that can be packed to bytes, see Diff.find_similar.
+ */
+
+#include <errno.h>
+#include <fcntl.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#ifdef _WIN32
+#include <io.h>
+#define read(fd, buf, count) _read(fd, buf, (unsigned int)(count))
+#define close _close
+#define open _open
+#else
+#include <unistd.h>
+#endif
+#include <git2.h>
+#include <git2/sys/hashsig.h>
+#include "hashsig.h"
+
+#ifndef O_BINARY
+#define O_BINARY 0
+#endif
+
+typedef uint64_t hashsig_state;
+
+#define HASHSIG_SCALE 100
+#define HASHSIG_MAX_RUN 80
+#define HASHSIG_HASH_START 0x012345678ABCDEF0ULL
+#define HASHSIG_HASH_SHIFT 5
+#define HASHSIG_HASH_MIX(S, CH) \
+    (S) = ((S) << HASHSIG_HASH_SHIFT) - (S) + (hashsig_state)(CH)
+#define HASHSIG_HEAP_MIN_SIZE 4
+
+#define HEAP_LCHILD_OF(I) (((I) << 1) + 1)
+#define HEAP_RCHILD_OF(I) (((I) << 1) + 2)
+#define HEAP_PARENT_OF(I) (((I) - 1) >> 1)
+
+#define PACKED_VERSION 1
+
+/* The mins heap keeps the smallest hashes, its top is the largest one; and
+ * the other way round for the maxs heap */
+typedef int (*hashsig_cmp)(uint32_t a, uint32_t b);
+
+static int
+hashsig_cmp_max(uint32_t a, uint32_t b)
+{
+    return (a < b) ? -1 : (a > b) ? 1 : 0;
+}
+
+static int
+hashsig_cmp_min(uint32_t a, uint32_t b)
+{
+    return (a > b) ? -1 : (a < b) ? 1 : 0;
+}
+
+static int
+hashsig_isspace_nonlf(int c)
+{
+    return c == ' ' || c == '\t' || c == '\f' || c == '\r' || c == '\v';
+}
+
+static void
+hashsig_heap_up(pgit_hashsig_heap *h, hashsig_cmp cmp, int el)
+{
+    int parent_el = HEAP_PARENT_OF(el);
+    uint32_t t;
+
+    while (el > 0 && cmp(h->values[parent_el], h->values[el]) > 0) {
+        t = h->values[el];
+        h->values[el] = h->values[parent_el];
+        h->values[parent_el] = t;
+        el = parent_el;
+        parent_el = HEAP_PARENT_OF(el);
+    }
+}
+
+static void
+hashsig_heap_down(pgit_hashsig_heap *h, hashsig_cmp cmp, int el)
+{
+    uint32_t v, lv, rv;
+    int lel, rel, swapel;
+
+    /* 'el < h->size / 2' tests if el is bottom row of heap */
+    while (el < h->size / 2) {
+        lel = HEAP_LCHILD_OF(el);
+        rel = HEAP_RCHILD_OF(el);
+
+        v = h->values[el];
+        lv = h->values[lel];
+        rv = h->values[rel];
+
+        if (cmp(v, lv) < 0 && cmp(v, rv) < 0)
+            break;
+
+        swapel = (cmp(lv, rv) < 0) ? lel : rel;
+
+        h->values[el] = h->values[swapel];
+        h->values[swapel] = v;
+
+        el = swapel;
+    }
+}
+
+static void
+hashsig_heap_insert(pgit_hashsig_heap *h, hashsig_cmp cmp, uint32_t val)
+{
+    /* if heap is not full, insert new element */
+    if (h->size < PGIT_HASHSIG_HEAP_SIZE) {
+        h->values[h->size++] = val;
+        hashsig_heap_up(h, cmp, h->size - 1);
+    }
+
+    /* if heap is full, pop top if new element should replace it */
+    else if (cmp(val, h->values[0]) > 0) {
+        h->size--;
+        h->values[0] = h->values[h->size];
+        hashsig_heap_down(h, cmp, 0);
+    }
+}
+
+static int
+hashsig_value_cmp(const void *a, const void *b)
+{
+    return hashsig_cmp_max(*(const uint32_t*)a, *(const uint32_t*)b);
+}
+
+static void
+hashsig_init(pgit_hashsig *sig, int opt, int *use_ignores)
+{
+    memset(sig, 0, sizeof(*sig));
+    sig->opt = opt;
+    *use_ignores = (opt & (GIT_HASHSIG_IGNORE_WHITESPACE | GIT_HASHSIG_SMART_WHITESPACE)) != 0;
+}
+
+static void
+hashsig_add_hashes(pgit_hashsig *sig, const uint8_t *data, size_t size,
+                   int *use_ignores_inout)
+{
+    const uint8_t *scan = data, *end = data + size;
+    hashsig_state state;
+    int use_ignores = *use_ignores_inout, len;
+    uint8_t ch;
+
+    while (scan < end) {
+        state = HASHSIG_HASH_START;
+
+        for (len = 0; scan < end && len < HASHSIG_MAX_RUN; ) {
+            ch = *scan;
+
+            if (use_ignores)
+                for (; scan < end && hashsig_isspace_nonlf(ch); ch = (scan < end) ? *scan : 0)
+                    ++scan;
+            else if (sig->opt & (GIT_HASHSIG_IGNORE_WHITESPACE | GIT_HASHSIG_SMART_WHITESPACE))
+                for (; scan < end && ch == '\r'; ch = (scan < end) ? *scan : 0)
+                    ++scan;
+
+            /* smart whitespace only skips leading whitespace of a line */
+            if (sig->opt & GIT_HASHSIG_SMART_WHITESPACE)
+                use_ignores = (ch == '\n');
+
+            if (scan < end)
+                ++scan;
+            else
+                break;
+
+            /* check if this is a newline */
+            if (ch == '\n') {
+                sig->lines++;
+                break;
+            }
+
+            HASHSIG_HASH_MIX(state, ch);
+            ++len;
+        }
+
+        if (len > 0) {
+            hashsig_heap_insert(&sig->mins, hashsig_cmp_min, (uint32_t)state);
+            hashsig_heap_insert(&sig->maxs, hashsig_cmp_max, (uint32_t)state);
+        }
+    }
+
+    *use_ignores_inout = use_ignores;
+}
+
+static int
+hashsig_finalize(pgit_hashsig *sig)
+{
+    if (sig->mins.size < HASHSIG_HEAP_MIN_SIZE &&
+        !(sig->opt & GIT_HASHSIG_ALLOW_SMALL_FILES)) {
+        git_error_set_str(GIT_ERROR_INVALID,
+                          "file too small for similarity signature calculation");
+        return GIT_EBUFS;
+    }
+
+    /* Both in ascending order, only the overlap matters to compare */
+    qsort(sig->mins.values, sig->mins.size, sizeof(uint32_t), hashsig_value_cmp);
+    qsort(sig->maxs.values, sig->maxs.size, sizeof(uint32_t), hashsig_value_cmp);
+    return 0;
+}
+
+int
+pgit_hashsig_create(pgit_hashsig *sig, const char *buf, size_t buflen, int opt)
+{
+    int use_ignores;
+
+    hashsig_init(sig, opt, &use_ignores);
+    hashsig_add_hashes(sig, (const uint8_t*)buf, buflen, &use_ignores);
+    return hashsig_finalize(sig);
+}
+
+int
+pgit_hashsig_create_fromfile(pgit_hashsig *sig, const char *path, int opt)
+{
+    uint8_t buf[0x1000];
+    int fd, use_ignores;
+    long buflen;
+
+    fd = open(path, O_RDONLY | O_BINARY);
+    if (fd < 0) {
+        git_error_set_str(GIT_ERROR_OS, strerror(errno));
+        return (errno == ENOENT) ? GIT_ENOTFOUND : GIT_ERROR;
+    }
+
+    /* Read by blocks like libgit2, the lines are split at the boundaries */
+    hashsig_init(sig, opt, &use_ignores);
+    while ((buflen = (long)read(fd, buf, sizeof(buf))) > 0)
+        hashsig_add_hashes(sig, buf, (size_t)buflen, &use_ignores);
+    close(fd);
+
+    if (buflen < 0) {
+        git_error_set_str(GIT_ERROR_OS, strerror(errno));
+        return GIT_ERROR;
+    }
+
+    return hashsig_finalize(sig);
+}
+
+static int
+hashsig_heap_compare(const pgit_hashsig_heap *a, const pgit_hashsig_heap *b)
+{
+    int matches = 0, i, j;
+
+    /* hash heaps are sorted - just look for overlap vs total */
+    for (i = 0, j = 0; i < a->size && j < b->size; ) {
+        if (a->values[i] < b->values[j])
+            ++i;
+        else if (a->values[i] > b->values[j])
+            ++j;
+        else {
+            ++i;
+            ++j;
+            ++matches;
+        }
+    }
+
+    return HASHSIG_SCALE * (matches * 2) / (a->size + b->size);
+}
+
+int
+pgit_hashsig_compare(const pgit_hashsig *a, const pgit_hashsig *b)
+{
+    /* if we have no elements in either file then each file is either
+     * empty or blank.  if we're ignoring whitespace then the files are
+     * similar, otherwise they're dissimilar.
+     */
+    if (a->mins.size == 0 && b->mins.size == 0) {
+        if ((!a->lines && !b->lines) || (a->opt & GIT_HASHSIG_IGNORE_WHITESPACE))
+            return HASHSIG_SCALE;
+        else
+            return 0;
+    }
+
+    /* if we have fewer than the maximum number of elements, then just use
+     * one array since the two arrays will be the same
+     */
+    if (a->mins.size < PGIT_HASHSIG_HEAP_SIZE)
+        return hashsig_heap_compare(&a->mins, &b->mins);
+    else
+        return (hashsig_heap_compare(&a->mins, &b->mins) +
+                hashsig_heap_compare(&a->maxs, &b->maxs)) / 2;
+}
+
+/*
+ * Packed signatures, little endian: the version, the options, the number of
+ * mins and maxs, the number of lines and the size of the blob (8 bytes
+ * each), then the mins and the maxs (4 bytes each).
+ */
+
+static void
+pack_uint(unsigned char *out, uint64_t value, int n)
+{
+    int i;
+
+    for (i = 0; i < n; i++)
+        out[i] = (unsigned char)(value >> (8 * i));
+}
+
+static uint64_t
+unpack_uint(const unsigned char *data, int n)
+{
+    uint64_t value = 0;
+    int i;
+
+    for (i = n - 1; i >= 0; i--)
+        value = (value << 8) | data[i];
+    return value;
+}
+
+size_t
+pgit_hashsig_pack(const pgit_hashsig *sig, unsigned char *out)
+{
+    unsigned char *p = out + 20;
+    int i;
+
+    out[0] = PACKED_VERSION;
+    out[1] = (unsigned char)sig->opt;
+    out[2] = (unsigned char)sig->mins.size;
+    out[3] = (unsigned char)sig->maxs.size;
+    pack_uint(out + 4, sig->lines, 8);
+    pack_uint(out + 12, sig->blob_size, 8);
+    for (i = 0; i < sig->mins.size; i++, p += 4)
+        pack_uint(p, sig->mins.values[i], 4);
+    for (i = 0; i < sig->maxs.size; i++, p += 4)
+        pack_uint(p, sig->maxs.values[i], 4);
+
+    return (size_t)(p - out);
+}
+
+/* Returns -1 if the data is not a valid packed signature */
+int
+pgit_hashsig_unpack(pgit_hashsig *sig, const unsigned char *data, size_t len)
+{
+    const unsigned char *p = data + 20;
+    int i;
+
+    if (len < 20 || data[0] != PACKED_VERSION ||
+        data[2] > PGIT_HASHSIG_HEAP_SIZE || data[3] > PGIT_HASHSIG_HEAP_SIZE ||
+        len != 20 + 4 * ((size_t)data[2] + data[3]))
+        return -1;
+
+    memset(sig, 0, sizeof(*sig));
+    sig->opt = data[1];
+    sig->mins.size = data[2];
+    sig->maxs.size = data[3];
+    sig->lines = unpack_uint(data + 4, 8);
+    sig->blob_size = unpack_uint(data + 12, 8);
+    for (i = 0; i < sig->mins.size; i++, p += 4)
+        sig->mins.values[i] = (uint32_t)unpack_uint(p, 4);
+    for (i = 0; i < sig->maxs.size; i++, p += 4)
+        sig->maxs.values[i] = (uint32_t)unpack_uint(p, 4);
+
+    return 0;
+}
@@ -0,0 +1,43 @@
+/*
+ * Copyright (C) the libgit2 contributors. All rights reserved.
+ *
+ * This file is part of libgit2, distributed under the GNU GPL v2 with
+ * a Linking Exception. For full terms see the included COPYING file.
+ */
+
+#ifndef INCLUDE_pygit2_hashsig_h
+#define INCLUDE_pygit2_hashsig_h
+
+#include <stddef.h>
+#include <stdint.h>
+
+/*
+ * The similarity signatures of libgit2 (git_hashsig), with the same
+ * options and scores, but with a known layout so they can be stored.
+ */
+
+#define PGIT_HASHSIG_HEAP_SIZE ((1 << 7) - 1)
+
+/* The size of a packed signature, at most */
+#define PGIT_HASHSIG_PACKED_SIZE (20 + 8 * PGIT_HASHSIG_HEAP_SIZE)
+
+typedef struct {
+    int size;
+    uint32_t values[PGIT_HASHSIG_HEAP_SIZE];
+} pgit_hashsig_heap;
+
+typedef struct {
+    pgit_hashsig_heap mins;
+    pgit_hashsig_heap maxs;
+    uint64_t lines;
+    uint64_t blob_size;     /* Not part of the signature, kept with it */
+    int opt;                /* git_hashsig_option_t */
+} pgit_hashsig;
+
+int pgit_hashsig_create(pgit_hashsig *sig, const char *buf, size_t buflen, int opt);
+int pgit_hashsig_create_fromfile(pgit_hashsig *sig, const char *path, int opt);
+int pgit_hashsig_compare(const pgit_hashsig *a, const pgit_hashsig *b);
+size_t pgit_hashsig_pack(const pgit_hashsig *sig, unsigned char *out);
+int pgit_hashsig_unpack(pgit_hashsig *sig, const unsigned char *data, size_t len);
+
+#endif
@@ -0,0 +1,754 @@
+/*
+ * Copyright 2010-2024 The pygit2 contributors
+ *
+ * This file is free software; you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License, version 2,
+ * as published by the Free Software Foundation.
+ *
+ * In addition to the permissions in the GNU General Public License,
+ * the authors give you unlimited permission to link the compiled
+ * version of this file into combinations with other programs,
+ * and to distribute those combinations without any restriction
+ * coming from the use of this file.  (The General Public License
+ * restrictions do apply in other respects; for example, they cover
+ * modification of the file, and distribution when not linked into
+ * a combined executable.)
+ *
+ * This file is distributed in the hope that it will be useful, but
+ * WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+ * General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with this program; see the file COPYING.  If not, write to
+ * the Free Software Foundation, 51 Franklin Street, Fifth Floor,
+ * Boston, MA 02110-1301, USA.
+ */
+
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+#include <git2.h>
+#include "error.h"
+#include "index.h"
+#include "oid.h"
+#include "utils.h"
+
+/*
+ * The Index class is implemented in Python with cffi, the git_index is
+ * passed here through its _pointer, like Tree.diff_to_index() does.
+ */
+static git_index *
+index_from_pointer(PyObject *py_pointer)
+{
+    char *buffer;
+    Py_ssize_t length;
+
+    if (PyBytes_AsStringAndSize(py_pointer, &buffer, &length) < 0)
+        return NULL;
+
+    if (length != sizeof(git_index *)) {
+        PyErr_SetString(PyExc_TypeError, "passed value is not a pointer");
+        return NULL;
+    }
+
+    return *((git_index **) buffer);
+}
+
+
+/* Columns that can be requested from Index.entries_table() */
+typedef enum {
+    INDEX_FIELD_BYTES,   /* raw bytes, one oid per entry */
+    INDEX_FIELD_ARRAY,   /* array.array, one item per entry */
+    INDEX_FIELD_STRING,  /* joined bytes plus an array of offsets */
+} index_field_kind;
+
+typedef enum {
+    INDEX_PATH,
+    INDEX_ID,
+    INDEX_MODE,
+    INDEX_STAGE,
+    INDEX_FLAGS,
+    INDEX_FILE_SIZE,
+    INDEX_MTIME,
+    INDEX_MTIME_NS,
+    INDEX_CTIME,
+    INDEX_CTIME_NS,
+    INDEX_NFIELDS
+} index_field;
+
+static const struct {
+    const char *name;
+    index_field_kind kind;
+    const char *typecode;
+} index_fields[INDEX_NFIELDS] = {
+    {"path", INDEX_FIELD_STRING, "Q"},
+    {"id", INDEX_FIELD_BYTES, NULL},
+    {"mode", INDEX_FIELD_ARRAY, "I"},
+    {"stage", INDEX_FIELD_ARRAY, "B"},
+    {"flags", INDEX_FIELD_ARRAY, "H"},
+    {"file_size", INDEX_FIELD_ARRAY, "I"},
+    {"mtime", INDEX_FIELD_ARRAY, "i"},
+    {"mtime_ns", INDEX_FIELD_ARRAY, "I"},
+    {"ctime", INDEX_FIELD_ARRAY, "i"},
+    {"ctime_ns", INDEX_FIELD_ARRAY, "I"},
+};
+
+#define INDEX_DEFAULT_FIELDS ((1 << INDEX_PATH) | \
+                              (1 << INDEX_ID) | \
+                              (1 << INDEX_MODE) | \
+                              (1 << INDEX_STAGE) | \
+                              (1 << INDEX_FILE_SIZE) | \
+                              (1 << INDEX_MTIME))
+
+static int
+index_parse_fields(PyObject *py_fields, unsigned int *mask)
+{
+    PyObject *iter, *item;
+    const char *name;
+    int i;
+
+    if (py_fields == NULL || py_fields == Py_None) {
+        *mask = INDEX_DEFAULT_FIELDS;
+        return 0;
+    }
+
+    iter = PyObject_GetIter(py_fields);
+    if (iter == NULL)
+        return -1;
+
+    *mask = 0;
+    while ((item = PyIter_Next(iter)) != NULL) {
+        name = PyUnicode_Check(item) ? PyUnicode_AsUTF8(item) : NULL;
+        if (name == NULL) {
+            if (!PyErr_Occurred())
+                Error_type_error("field name must be a str, not %.200s", item);
+            goto error;
+        }
+
+        for (i = 0; i < INDEX_NFIELDS; i++) {
+            if (strcmp(name, index_fields[i].name) == 0)
+                break;
+        }
+        if (i == INDEX_NFIELDS) {
+            PyErr_Format(PyExc_ValueError, "unknown field '%s'", name);
+            goto error;
+        }
+
+        *mask |= 1 << i;
+        Py_DECREF(item);
+    }
+
+    Py_DECREF(iter);
+    return PyErr_Occurred() ? -1 : 0;
+
+error:
+    Py_DECREF(item);
+    Py_DECREF(iter);
+    return -1;
+}
+
+/*
+ * Append the requested fields of one entry to the column buffers.
+ */
+static int
+index_put_entry(pgit_buf *bufs, pgit_buf *offsets, unsigned int mask,
+                const git_index_entry *entry)
+{
+    unsigned long long offset;
+    unsigned char stage;
+    int i, err = 0;
+
+    for (i = 0; i < INDEX_NFIELDS; i++) {
+        pgit_buf *buf = &bufs[i];
+
+        if (!(mask & (1 << i)))
+            continue;
+
+        switch (i) {
+            case INDEX_PATH:
+                err = pgit_buf_put(buf, entry->path, strlen(entry->path));
+                if (err == 0) {
+                    offset = buf->size;
+                    err = pgit_buf_put(&offsets[i], &offset, sizeof(offset));
+                }
+                break;
+            case INDEX_ID:
+                err = pgit_buf_put(buf, entry->id.id, GIT_OID_RAWSZ);
+                break;
+            case INDEX_MODE:
+                err = pgit_buf_put(buf, &entry->mode, sizeof(entry->mode));
+                break;
+            case INDEX_STAGE:
+                stage = (unsigned char) git_index_entry_stage(entry);
+                err = pgit_buf_put(buf, &stage, sizeof(stage));
+                break;
+            case INDEX_FLAGS:
+                err = pgit_buf_put(buf, &entry->flags, sizeof(entry->flags));
+                break;
+            case INDEX_FILE_SIZE:
+                err = pgit_buf_put(buf, &entry->file_size, sizeof(entry->file_size));
+                break;
+            case INDEX_MTIME:
+                err = pgit_buf_put(buf, &entry->mtime.seconds, sizeof(entry->mtime.seconds));
+                break;
+            case INDEX_MTIME_NS:
+                err = pgit_buf_put(buf, &entry->mtime.nanoseconds, sizeof(entry->mtime.nanoseconds));
+                break;
+            case INDEX_CTIME:
+                err = pgit_buf_put(buf, &entry->ctime.seconds, sizeof(entry->ctime.seconds));
+                break;
+            case INDEX_CTIME_NS:
+                err = pgit_buf_put(buf, &entry->ctime.nanoseconds, sizeof(entry->ctime.nanoseconds));
+                break;
+        }
+
+        if (err < 0)
+            return -1;
+    }
+
+    return 0;
+}
+
+static PyObject *
+index_build_table(pgit_buf *bufs, pgit_buf *offsets, unsigned int mask)
+{
+    PyObject *py_table, *py_value, *py_data, *py_offsets;
+    int i;
+
+    py_table = PyDict_New();
+    if (py_table == NULL)
+        return NULL;
+
+    for (i = 0; i < INDEX_NFIELDS; i++) {
+        if (!(mask & (1 << i)))
+            continue;
+
+        switch (index_fields[i].kind) {
+            case INDEX_FIELD_BYTES:
+                py_value = pgit_buf_to_bytes(&bufs[i]);
+                break;
+            case INDEX_FIELD_ARRAY:
+                py_value = pgit_buf_to_array(&bufs[i], index_fields[i].typecode);
+                break;
+            case INDEX_FIELD_STRING:
+                py_value = NULL;
+                py_data = pgit_buf_to_bytes(&bufs[i]);
+                py_offsets = pgit_buf_to_array(&offsets[i], index_fields[i].typecode);
+                if (py_data != NULL && py_offsets != NULL)
+                    py_value = PyTuple_Pack(2, py_data, py_offsets);
+                Py_XDECREF(py_data);
+                Py_XDECREF(py_offsets);
+                break;
+            default:
+                py_value = NULL;
+        }
+
+        if (py_value == NULL)
+            goto error;
+
+        if (PyDict_SetItemString(py_table, index_fields[i].name, py_value) < 0) {
+            Py_DECREF(py_value);
+            goto error;
+        }
+        Py_DECREF(py_value);
+    }
+
+    return py_table;
+
+error:
+    Py_DECREF(py_table);
+    return NULL;
+}
+
+char index_entries__doc__[] =
+  "_index_entries(pointer: bytes, fields: list[str] | None = None) -> dict\n"
+  "\n"
+  "Return the entries of the index as columns, see Index.entries_table().\n"
+  "For internal use only.";
+
+PyObject *
+index_entries(PyObject *self, PyObject *args, PyObject *kwds)
+{
+    static char *kwlist[] = {"pointer", "fields", NULL};
+    pgit_buf bufs[INDEX_NFIELDS] = {PGIT_BUF_INIT};
+    pgit_buf offsets[INDEX_NFIELDS] = {PGIT_BUF_INIT};
+    PyObject *py_pointer, *py_fields = NULL;
+    PyObject *py_table = NULL;
+    const git_index_entry *entry;
+    git_index *index;
+    unsigned long long zero = 0;
+    unsigned int mask;
+    size_t n, count;
+    int i, err = 0;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O!|O", kwlist,
+                                     &PyBytes_Type, &py_pointer, &py_fields))
+        return NULL;
+
+    index = index_from_pointer(py_pointer);
+    if (index == NULL)
+        return NULL;
+
+    if (index_parse_fields(py_fields, &mask) < 0)
+        return NULL;
+
+    if (mask & (1 << INDEX_PATH))
+        err = pgit_buf_put(&offsets[INDEX_PATH], &zero, sizeof(zero));
+
+    /* The index belongs to a Python object, so the GIL is kept while
+     * reading it: no other thread can change it under our feet. */
+    count = git_index_entrycount(index);
+    for (n = 0; n < count && err == 0; n++) {
+        entry = git_index_get_byindex(index, n);
+        if (entry == NULL)
+            break;
+
+        err = index_put_entry(bufs, offsets, mask, entry);
+    }
+
+    if (err == 0)
+        py_table = index_build_table(bufs, offsets, mask);
+
+    for (i = 0; i < INDEX_NFIELDS; i++) {
+        pgit_buf_dispose(&bufs[i]);
+        pgit_buf_dispose(&offsets[i]);
+    }
+
+    if (err < 0)
+        return PyErr_NoMemory();
+
+    return py_table;
+}
+
+
+/*
+ * The paths given to Index.add_many() and Index.remove_many(), converted
+ * at once so the index is not changed when one of them is invalid. The
+ * paths are stored NUL terminated in data, starts holds the offset of each.
+ */
+static int
+index_parse_paths(PyObject *py_paths, pgit_buf *data, pgit_buf *starts,
+                  Py_ssize_t *n)
+{
+    PyObject *seq, *py_path;
+    const char *path;
+    Py_ssize_t i, len;
+    size_t start;
+    int err = -1;
+
+    if (PyUnicode_Check(py_paths) || PyBytes_Check(py_paths)) {
+        Error_type_error("paths must be a sequence of paths, not %.200s", py_paths);
+        return -1;
+    }
+
+    seq = PySequence_Fast(py_paths, "paths must be a sequence");
+    if (seq == NULL)
+        return -1;
+
+    *n = PySequence_Fast_GET_SIZE(seq);
+    for (i = 0; i < *n; i++) {
+        py_path = PyOS_FSPath(PySequence_Fast_GET_ITEM(seq, i));
+        if (py_path == NULL)
+            goto end;
+
+        if (PyUnicode_Check(py_path))
+            path = PyUnicode_AsUTF8AndSize(py_path, &len);
+        else if (PyBytes_AsStringAndSize(py_path, (char **) &path, &len) < 0)
+            path = NULL;
+
+        if (path != NULL && (len == 0 || memchr(path, '\0', len) != NULL)) {
+            PyErr_Format(PyExc_ValueError, "invalid path %R", py_path);
+            path = NULL;
+        }
+
+        if (path != NULL) {
+            start = data->size;
+            if (pgit_buf_put(starts, &start, sizeof(start)) < 0 ||
+                pgit_buf_put(data, path, len + 1) < 0) {
+                PyErr_NoMemory();
+                path = NULL;
+            }
+        }
+
+        Py_DECREF(py_path);
+        if (path == NULL)
+            goto end;
+    }
+
+    err = 0;
+
+end:
+    Py_DECREF(seq);
+    return err;
+}
+
+static int
+index_parse_oids(PyObject *py_oids, pgit_buf *oids, Py_ssize_t n)
+{
+    PyObject *seq;
+    Py_buffer view;
+    git_oid oid;
+    size_t len;
+    Py_ssize_t i;
+    int err = -1;
+
+    /* Raw oids packed in a bytes-like object, e.g. from entries_table() */
+    if (PyObject_CheckBuffer(py_oids) && !PyUnicode_Check(py_oids)) {
+        if (PyObject_GetBuffer(py_oids, &view, PyBUF_SIMPLE) < 0)
+            return -1;
+
+        if (view.len != n * GIT_OID_RAWSZ)
+            PyErr_Format(PyExc_ValueError,
+                         "expected %zd bytes of raw oids, got %zd",
+                         n * GIT_OID_RAWSZ, view.len);
+        else if (pgit_buf_put(oids, view.buf, view.len) < 0)
+            PyErr_NoMemory();
+        else
+            err = 0;
+
+        PyBuffer_Release(&view);
+        return err;
+    }
+
+    if (PyUnicode_Check(py_oids)) {
+        Error_type_error("oids must be a sequence of oids, not %.200s", py_oids);
+        return -1;
+    }
+
+    seq = PySequence_Fast(py_oids, "oids must be a sequence");
+    if (seq == NULL)
+        return -1;
+
+    if (PySequence_Fast_GET_SIZE(seq) != n) {
+        PyErr_SetString(PyExc_ValueError, "paths and oids differ in length");
+        goto end;
+    }
+
+    for (i = 0; i < n; i++) {
+        len = py_oid_to_git_oid(PySequence_Fast_GET_ITEM(seq, i), &oid);
+        if (len == 0)
+            goto end;
+
+        if (len != GIT_OID_HEXSZ) {
+            PyErr_Format(PyExc_ValueError, "oid %R is too short",
+                         PySequence_Fast_GET_ITEM(seq, i));
+            goto end;
+        }
+
+        if (pgit_buf_put(oids, oid.id, GIT_OID_RAWSZ) < 0) {
+            PyErr_NoMemory();
+            goto end;
+        }
+    }
+
+    err = 0;
+
+end:
+    Py_DECREF(seq);
+    return err;
+}
+
+static int
+index_parse_modes(PyObject *py_modes, pgit_buf *modes, Py_ssize_t n)
+{
+    PyObject *seq, *py_mode;
+    unsigned long mode;
+    unsigned int value;
+    Py_ssize_t i;
+    int err = -1;
+
+    seq = PySequence_Fast(py_modes, "modes must be a sequence");
+    if (seq == NULL)
+        return -1;
+
+    if (PySequence_Fast_GET_SIZE(seq) != n) {
+        PyErr_SetString(PyExc_ValueError, "paths and modes differ in length");
+        goto end;
+    }
+
+    for (i = 0; i < n; i++) {
+        py_mode = PySequence_Fast_GET_ITEM(seq, i);
+        mode = PyLong_AsUnsignedLong(py_mode);
+        if (mode == (unsigned long) -1 && PyErr_Occurred())
+            goto end;
+
+        /* The modes accepted by git_index_add() */
+        if (mode != GIT_FILEMODE_BLOB && mode != GIT_FILEMODE_BLOB_EXECUTABLE &&
+            mode != GIT_FILEMODE_LINK && mode != GIT_FILEMODE_COMMIT) {
+            PyErr_Format(PyExc_ValueError, "invalid mode %R", py_mode);
+            goto end;
+        }
+
+        value = (unsigned int) mode;
+        if (pgit_buf_put(modes, &value, sizeof(value)) < 0) {
+            PyErr_NoMemory();
+            goto end;
+        }
+    }
+
+    err = 0;
+
+end:
+    Py_DECREF(seq);
+    return err;
+}
+
+typedef struct {
+    const char *path;
+    Py_ssize_t pos;
+} index_add_item;
+
+/* By path, and by position for the same path so the last one wins */
+static int
+index_add_item_cmp(const void *a, const void *b)
+{
+    const index_add_item *x = a, *y = b;
+    int cmp = strcmp(x->path, y->path);
+
+    if (cmp == 0)
+        cmp = (x->pos > y->pos) - (x->pos < y->pos);
+    return cmp;
+}
+
+static int
+index_add_item_path_cmp(const void *a, const void *b)
+{
+    return strcmp(((const index_add_item *) a)->path, ((const index_add_item *) b)->path);
+}
+
+/* Whether path names a file libgit2 may add, not counting the names that
+ * depend on the configuration (core.protectNTFS...) */
+static int
+index_valid_path(const char *path)
+{
+    const char *part = path, *end;
+    size_t len;
+
+    for (;;) {
+        end = strchr(part, '/');
+        len = end ? (size_t)(end - part) : strlen(part);
+        if (len == 0 ||
+            (len == 1 && part[0] == '.') ||
+            (len == 2 && part[0] == '.' && part[1] == '.') ||
+            (len == 4 && PyOS_strnicmp(part, ".git", 4) == 0))
+            return 0;
+        if (end == NULL)
+            return 1;
+        part = end + 1;
+    }
+}
+
+/* Whether an entry of stage 0 is under prefix, a path ending with a slash */
+static int
+index_has_dir(git_index *index, const char *prefix, size_t len)
+{
+    const git_index_entry *entry;
+    size_t pos;
+
+    if (git_index_find_prefix(&pos, index, prefix) < 0) {
+        git_error_clear();
+        return 0;
+    }
+
+    for (; (entry = git_index_get_byindex(index, pos)) != NULL; pos++) {
+        if (strncmp(entry->path, prefix, len) != 0)
+            return 0;
+        if (git_index_entry_stage(entry) == 0)
+            return 1;
+    }
+    return 0;
+}
+
+char index_add_many__doc__[] =
+  "_index_add_many(pointer: bytes, paths, oids, modes)\n"
+  "\n"
+  "Add the entries to the index, see Index.add_many(). For internal use only.";
+
+PyObject *
+index_add_many(PyObject *self, PyObject *args)
+{
+    pgit_buf paths = PGIT_BUF_INIT, starts = PGIT_BUF_INIT;
+    pgit_buf oids = PGIT_BUF_INIT, modes = PGIT_BUF_INIT;
+    PyObject *py_pointer, *py_paths, *py_oids, *py_modes;
+    PyObject *result = NULL;
+    index_add_item *order = NULL, key;
+    git_index_entry entry, *saved = NULL;
+    const git_index_entry *old;
+    git_index *index;
+    const char *path, *slash;
+    char *buf = NULL;
+    size_t len, max_len = 0;
+    Py_ssize_t i, j, n;
+    int err = 0, dir;
+
+    if (!PyArg_ParseTuple(args, "O!OOO", &PyBytes_Type, &py_pointer,
+                          &py_paths, &py_oids, &py_modes))
+        return NULL;
+
+    index = index_from_pointer(py_pointer);
+    if (index == NULL)
+        return NULL;
+
+    if (index_parse_paths(py_paths, &paths, &starts, &n) < 0 ||
+        index_parse_oids(py_oids, &oids, n) < 0 ||
+        index_parse_modes(py_modes, &modes, n) < 0)
+        goto end;
+
+    /* Insert in the order of the index (case sensitive): every entry is
+     * then added at the end or close to it, instead of moving half of
+     * the entries every time */
+    order = malloc(n * sizeof(index_add_item) + 1);
+    if (order == NULL) {
+        PyErr_NoMemory();
+        goto end;
+    }
+
+    for (i = 0; i < n; i++) {
+        order[i].path = paths.ptr + ((size_t *) starts.ptr)[i];
+        order[i].pos = i;
+        len = strlen(order[i].path);
+        if (len > max_len)
+            max_len = len;
+    }
+    qsort(order, n, sizeof(index_add_item), index_add_item_cmp);
+
+    /* Check the paths libgit2 would reject, and the files that would be
+     * directories too, among the paths or with the entries of the index
+     * (git_index_add would then remove the entries in the way) */
+    buf = malloc(max_len + 2);
+    if (buf == NULL) {
+        PyErr_NoMemory();
+        goto end;
+    }
+
+    for (i = 0; i < n; i++) {
+        path = order[i].path;
+        if (!index_valid_path(path)) {
+            PyErr_Format(PyExc_ValueError, "invalid path '%s'", path);
+            goto end;
+        }
+
+        /* The path with a slash, then its parent directories */
+        len = strlen(path);
+        memcpy(buf, path, len);
+        memcpy(buf + len, "/", 2);
+        dir = index_has_dir(index, buf, len + 1);
+        for (slash = strchr(path, '/'); !dir && slash; slash = strchr(slash + 1, '/')) {
+            buf[slash - path] = '\0';
+            key.path = buf;
+            key.pos = 0;
+            dir = bsearch(&key, order, n, sizeof(index_add_item), index_add_item_path_cmp) != NULL ||
+                  git_index_get_bypath(index, buf, 0) != NULL;
+            buf[slash - path] = '/';
+        }
+        if (dir) {
+            PyErr_Format(PyExc_ValueError,
+                         "'%s' appears as both a file and a directory", path);
+            goto end;
+        }
+    }
+
+    /* The entries replaced, to put them back if libgit2 rejects a path
+     * after all */
+    saved = calloc(n + 1, sizeof(git_index_entry));
+    if (saved == NULL) {
+        PyErr_NoMemory();
+        goto end;
+    }
+
+    memset(&entry, 0, sizeof(entry));
+    for (i = 0; i < n; i++) {
+        entry.path = order[i].path;
+        memcpy(entry.id.id, oids.ptr + order[i].pos * GIT_OID_RAWSZ, GIT_OID_RAWSZ);
+        entry.mode = ((unsigned int *) modes.ptr)[order[i].pos];
+
+        old = git_index_get_bypath(index, entry.path, 0);
+        if (old != NULL) {
+            saved[i] = *old;
+            saved[i].path = entry.path;
+        }
+
+        err = git_index_add(index, &entry);
+        if (err < 0) {
+            Error_set(err);
+            for (j = i - 1; j >= 0; j--) {
+                if (saved[j].path != NULL)
+                    git_index_add(index, &saved[j]);
+                else
+                    git_index_remove(index, order[j].path, 0);
+            }
+            goto end;
+        }
+    }
+
+    result = Py_None;
+    Py_INCREF(result);
+
+end:
+    pgit_buf_dispose(&paths);
+    pgit_buf_dispose(&starts);
+    pgit_buf_dispose(&oids);
+    pgit_buf_dispose(&modes);
+    free(order);
+    free(buf);
+    free(saved);
+    return result;
+}
+
+char index_remove_many__doc__[] =
+  "_index_remove_many(pointer: bytes, paths, level: int)\n"
+  "\n"
+  "Remove the entries from the index, see Index.remove_many(). For internal\n"
+  "use only.";
+
+PyObject *
+index_remove_many(PyObject *self, PyObject *args)
+{
+    pgit_buf paths = PGIT_BUF_INIT, starts = PGIT_BUF_INIT;
+    PyObject *py_pointer, *py_paths;
+    PyObject *result = NULL;
+    git_index *index;
+    const char *path;
+    Py_ssize_t i, n;
+    int level, err;
+
+    if (!PyArg_ParseTuple(args, "O!Oi", &PyBytes_Type, &py_pointer,
+                          &py_paths, &level))
+        return NULL;
+
+    index = index_from_pointer(py_pointer);
+    if (index == NULL)
+        return NULL;
+
+    if (index_parse_paths(py_paths, &paths, &starts, &n) < 0)
+        goto end;
+
+    /* Check every path first, so nothing is removed if one is missing */
+    for (i = 0; i < n; i++) {
+        path = paths.ptr + ((size_t *) starts.ptr)[i];
+        if (git_index_get_bypath(index, path, level) == NULL) {
+            PyErr_Format(PyExc_OSError, "index does not contain %s at stage %d",
+                         path, level);
+            goto end;
+        }
+    }
+
+    /* One at a time, see Index.remove_many() */
+    for (i = 0; i < n; i++) {
+        path = paths.ptr + ((size_t *) starts.ptr)[i];
+        err = git_index_remove(index, path, level);
+        /* A path given twice is already gone */
+        if (err < 0 && err != GIT_ENOTFOUND) {
+            Error_set(err);
+            goto end;
+        }
+    }
+
+    result = Py_None;
+    Py_INCREF(result);
+
+end:
+    pgit_buf_dispose(&paths);
+    pgit_buf_dispose(&starts);
+    return result;
+}
@@ -29,6 +29,7 @@
 #include <Python.h>
 #include "error.h"
 #include "object.h"
+#include "odb.h"
 #include "odb_backend.h"
 #include "oid.h"
 #include "types.h"
@@ -36,6 +37,7 @@
 #include <git2/odb.h>
 
 extern PyTypeObject OdbBackendType;
+extern PyTypeObject OdbIdsIterType;
 
 static git_otype
 int_to_loose_object_type(int type_id)
@@ -92,42 +94,269 @@ Odb_dealloc(Odb *self)
     Py_TYPE(self)->tp_free((PyObject *) self);
 }
 
-static int
-Odb_build_as_iter(const git_oid *oid, void *accum)
+/*
+ * Streaming of the object ids.
+ *
+ * git_odb_foreach cannot be suspended, so it runs in a producer thread that
+ * copies the raw ids into one of two fixed size buffers, and hands the full
+ * buffer over to the iterator. Two locks, used as binary semaphores, guard
+ * the handoff: "full" is released by the producer when a buffer is ready,
+ * "empty" by the consumer when it is done with it. So at most two chunks of
+ * ids are in memory, whatever the size of the object database.
+ *
+ * The stream is shared by the iterator and the producer thread, it is
+ * reference counted with the GIL held, and freed by the last one.
+ */
+
+struct pgit_odb_stream {
+    int refcount;
+    PyObject *owner;
+    pgit_odb_foreach_fn foreach;
+    PyThread_type_lock empty;
+    PyThread_type_lock full;
+    unsigned char *buffers[2];
+    size_t chunk_size;
+
+    /* Producer side */
+    int fill;
+    size_t fill_count;
+    int stopped;
+
+    /* Shared, written before releasing "full" or "empty" */
+    int ready;
+    size_t ready_count;
+    int eof;
+    int cancelled;
+    int error;
+    int error_class;
+    char *error_message;
+    PyObject *exc_type, *exc_value, *exc_traceback;
+
+    /* Consumer side */
+    size_t pos;
+    int holding;
+    int finished;
+};
+
+static void
+odb_stream_decref(pgit_odb_stream *stream)
 {
-    int err;
-    PyObject *py_oid = git_oid_to_python(oid);
-    if (py_oid == NULL)
-        return GIT_EUSER;
+    if (--stream->refcount > 0)
+        return;
+
+    Py_DECREF(stream->owner);
+    Py_XDECREF(stream->exc_type);
+    Py_XDECREF(stream->exc_value);
+    Py_XDECREF(stream->exc_traceback);
+    if (stream->empty)
+        PyThread_free_lock(stream->empty);
+    if (stream->full)
+        PyThread_free_lock(stream->full);
+    free(stream->buffers[0]);
+    free(stream->buffers[1]);
+    free(stream->error_message);
+    free(stream);
+}
 
-    err = PyList_Append((PyObject*)accum, py_oid);
-    Py_DECREF(py_oid);
-    if (err < 0)
+/* Called by the producer, without the GIL */
+static int
+odb_stream_handoff(pgit_odb_stream *stream, int eof)
+{
+    PyThread_acquire_lock(stream->empty, WAIT_LOCK);
+    if (stream->cancelled) {
+        stream->stopped = 1;
         return GIT_EUSER;
+    }
 
+    stream->ready = stream->fill;
+    stream->ready_count = stream->fill_count;
+    stream->eof = eof;
+    stream->fill ^= 1;
+    stream->fill_count = 0;
+    PyThread_release_lock(stream->full);
     return 0;
 }
 
-PyObject *
-Odb_as_iter(Odb *self)
+static int
+odb_stream_cb(const git_oid *oid, void *payload)
+{
+    pgit_odb_stream *stream = (pgit_odb_stream*)payload;
+
+    memcpy(stream->buffers[stream->fill] + stream->fill_count * GIT_OID_RAWSZ,
+           oid->id, GIT_OID_RAWSZ);
+    if (++stream->fill_count < stream->chunk_size)
+        return 0;
+
+    return odb_stream_handoff(stream, 0);
+}
+
+static void
+odb_stream_run(void *payload)
 {
+    pgit_odb_stream *stream = (pgit_odb_stream*)payload;
+    const git_error *error;
+    PyGILState_STATE gil;
     int err;
-    PyObject *accum = PyList_New(0);
-    PyObject *ret = NULL;
 
-    err = git_odb_foreach(self->odb, Odb_build_as_iter, (void*)accum);
-    if (err == GIT_EUSER)
-        goto exit;
-    if (err < 0) {
-        ret = Error_set(err);
-        goto exit;
+    /* Keep a thread state for the whole run, so Python exceptions raised by
+     * custom backends are not lost */
+    gil = PyGILState_Ensure();
+
+    Py_BEGIN_ALLOW_THREADS
+    err = stream->foreach(stream->owner, odb_stream_cb, stream);
+    Py_END_ALLOW_THREADS
+
+    if (err < 0 && !stream->stopped) {
+        stream->error = err;
+        if (PyErr_Occurred()) {
+            PyErr_Fetch(&stream->exc_type, &stream->exc_value, &stream->exc_traceback);
+        } else {
+            error = git_error_last();
+            if (error != NULL) {
+                stream->error_class = error->klass;
+                stream->error_message = strdup(error->message);
+            }
+        }
     }
+    PyErr_Clear();
 
-    ret = PyObject_GetIter(accum);
+    if (!stream->stopped) {
+        Py_BEGIN_ALLOW_THREADS
+        odb_stream_handoff(stream, 1);
+        Py_END_ALLOW_THREADS
+    }
 
-exit:
-    Py_DECREF(accum);
-    return ret;
+    odb_stream_decref(stream);
+    PyGILState_Release(gil);
+}
+
+/* Wait for the next chunk, return 1 when there is one, 0 at the end, and -1
+ * on error */
+static int
+odb_stream_next_chunk(pgit_odb_stream *stream)
+{
+    if (stream->holding) {
+        stream->holding = 0;
+        if (stream->eof) {
+            stream->finished = 1;
+            return 0;
+        }
+        PyThread_release_lock(stream->empty);
+    }
+
+    if (stream->finished)
+        return 0;
+
+    Py_BEGIN_ALLOW_THREADS
+    PyThread_acquire_lock(stream->full, WAIT_LOCK);
+    Py_END_ALLOW_THREADS
+
+    stream->holding = 1;
+    stream->pos = 0;
+    if (stream->eof && stream->error < 0) {
+        stream->holding = 0;
+        stream->finished = 1;
+        if (stream->exc_type) {
+            PyErr_Restore(stream->exc_type, stream->exc_value, stream->exc_traceback);
+            stream->exc_type = stream->exc_value = stream->exc_traceback = NULL;
+        } else {
+            if (stream->error_message)
+                git_error_set_str(stream->error_class, stream->error_message);
+            Error_set(stream->error);
+        }
+        return -1;
+    }
+
+    return 1;
+}
+
+static int
+odb_foreach(PyObject *owner, git_odb_foreach_cb cb, void *payload)
+{
+    return git_odb_foreach(((Odb*)owner)->odb, cb, payload);
+}
+
+PyObject *
+wrap_odb_ids_iter(PyObject *owner, pgit_odb_foreach_fn foreach, size_t chunk_size, int raw)
+{
+    OdbIdsIter *iter;
+    pgit_odb_stream *stream;
+
+    stream = calloc(1, sizeof(pgit_odb_stream));
+    if (stream == NULL)
+        return PyErr_NoMemory();
+
+    Py_INCREF(owner);
+    stream->refcount = 1;
+    stream->owner = owner;
+    stream->foreach = foreach;
+    stream->chunk_size = chunk_size;
+    stream->buffers[0] = malloc(chunk_size * GIT_OID_RAWSZ);
+    stream->buffers[1] = malloc(chunk_size * GIT_OID_RAWSZ);
+    stream->empty = PyThread_allocate_lock();
+    stream->full = PyThread_allocate_lock();
+    if (stream->buffers[0] == NULL || stream->buffers[1] == NULL ||
+        stream->empty == NULL || stream->full == NULL) {
+        odb_stream_decref(stream);
+        return PyErr_NoMemory();
+    }
+
+    /* "empty" starts released, "full" acquired */
+    PyThread_acquire_lock(stream->full, WAIT_LOCK);
+
+    iter = PyObject_New(OdbIdsIter, &OdbIdsIterType);
+    if (iter == NULL) {
+        odb_stream_decref(stream);
+        return NULL;
+    }
+    iter->stream = stream;
+    iter->raw = raw;
+
+    stream->refcount++;
+    if (PyThread_start_new_thread(odb_stream_run, stream) == PYTHREAD_INVALID_THREAD_ID) {
+        stream->refcount--;
+        stream->finished = 1;
+        Py_DECREF(iter);
+        PyErr_SetString(PyExc_RuntimeError, "can't start new thread");
+        return NULL;
+    }
+
+    return (PyObject*)iter;
+}
+
+PyObject *
+Odb_as_iter(Odb *self)
+{
+    return wrap_odb_ids_iter((PyObject*)self, odb_foreach, ODB_STREAM_CHUNK_SIZE, 0);
+}
+
+PyDoc_STRVAR(Odb_iter_raw__doc__,
+  "iter_raw(chunk_size: int = 1024) -> Iterator[bytes]\n"
+  "\n"
+  "Return an iterator over the ids of all the objects in the database, as\n"
+  "bytes objects with up to chunk_size raw ids (20 bytes each) packed\n"
+  "together. This avoids creating one Oid object per object in the\n"
+  "database.\n"
+  "\n"
+  "Iterating the object database, with this method or with iter(odb), is\n"
+  "lazy: the ids are read by a background thread, at most two chunks\n"
+  "ahead of the consumer.");
+
+PyObject *
+Odb_iter_raw(Odb *self, PyObject *args, PyObject *kwds)
+{
+    char *keywords[] = {"chunk_size", NULL};
+    Py_ssize_t chunk_size = ODB_STREAM_CHUNK_SIZE;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "|n", keywords, &chunk_size))
+        return NULL;
+
+    if (chunk_size <= 0) {
+        PyErr_SetString(PyExc_ValueError, "chunk_size must be positive");
+        return NULL;
+    }
+
+    return wrap_odb_ids_iter((PyObject*)self, odb_foreach, (size_t)chunk_size, 1);
 }
 
 
@@ -200,6 +429,374 @@ Odb_read(Odb *self, PyObject *py_hex)
     return tuple;
 }
 
+/*
+ * Batch reads. The ids are parsed with the GIL held, then the objects are read
+ * with the GIL released, optionally split between several threads.
+ */
+
+static int
+py_oids_to_git_oids(PyObject *py_oids, git_oid **oids_out, size_t **lens_out, size_t *count_out)
+{
+    PyObject *seq, *item;
+    Py_buffer view;
+    git_oid *oids = NULL;
+    size_t *lens = NULL;
+    size_t i, count;
+
+    /* Raw ids packed in a buffer, e.g. from Odb.iter_raw or Walker.fill_ids */
+    if (PyObject_CheckBuffer(py_oids)) {
+        if (PyObject_GetBuffer(py_oids, &view, PyBUF_SIMPLE) < 0)
+            return -1;
+
+        if (view.len % GIT_OID_RAWSZ) {
+            PyBuffer_Release(&view);
+            PyErr_SetString(PyExc_ValueError,
+                            "buffer length must be a multiple of 20");
+            return -1;
+        }
+
+        count = view.len / GIT_OID_RAWSZ;
+        oids = malloc((count ? count : 1) * sizeof(git_oid));
+        lens = malloc((count ? count : 1) * sizeof(size_t));
+        if (oids == NULL || lens == NULL) {
+            PyBuffer_Release(&view);
+            goto oom;
+        }
+
+        for (i = 0; i < count; i++) {
+            git_oid_fromraw(&oids[i], (const unsigned char*)view.buf + i * GIT_OID_RAWSZ);
+            lens[i] = GIT_OID_HEXSZ;
+        }
+
+        PyBuffer_Release(&view);
+        goto out;
+    }
+
+    /* A str would be taken as a sequence of 1 character prefixes */
+    if (PyUnicode_Check(py_oids)) {
+        Error_type_error("expected an iterable of oids or a buffer, not %.200s", py_oids);
+        return -1;
+    }
+
+    seq = PySequence_Fast(py_oids, "expected an iterable of oids or a buffer");
+    if (seq == NULL)
+        return -1;
+
+    count = (size_t)PySequence_Fast_GET_SIZE(seq);
+    oids = malloc((count ? count : 1) * sizeof(git_oid));
+    lens = malloc((count ? count : 1) * sizeof(size_t));
+    if (oids == NULL || lens == NULL) {
+        Py_DECREF(seq);
+        goto oom;
+    }
+
+    for (i = 0; i < count; i++) {
+        item = PySequence_Fast_GET_ITEM(seq, i);
+        lens[i] = py_oid_to_git_oid(item, &oids[i]);
+        if (lens[i] == 0) {
+            Py_DECREF(seq);
+            free(oids);
+            free(lens);
+            return -1;
+        }
+    }
+    Py_DECREF(seq);
+
+out:
+    *oids_out = oids;
+    *lens_out = lens;
+    *count_out = count;
+    return 0;
+
+oom:
+    free(oids);
+    free(lens);
+    PyErr_NoMemory();
+    return -1;
+}
+
+typedef struct {
+    git_odb *odb;
+    const git_oid *oids;
+    const size_t *lens;
+    int *errors;
+    git_odb_object **objects;   /* Full reads */
+    size_t *sizes;              /* Header reads */
+    git_object_t *types;
+    size_t count;
+    size_t start;
+    size_t step;
+} odb_batch_job;
+
+static void
+odb_batch_read(odb_batch_job *job)
+{
+    git_oid oid;
+    size_t i;
+
+    if (job->objects != NULL) {
+        for (i = job->start; i < job->count; i += job->step)
+            job->errors[i] = git_odb_read_prefix(&job->objects[i], job->odb,
+                                                 &job->oids[i], job->lens[i]);
+        return;
+    }
+
+    for (i = job->start; i < job->count; i += job->step) {
+        /* git_odb_read_header takes full ids only */
+        if (job->lens[i] < GIT_OID_HEXSZ) {
+            job->errors[i] = git_odb_exists_prefix(&oid, job->odb, &job->oids[i], job->lens[i]);
+            if (job->errors[i] < 0)
+                continue;
+        } else {
+            git_oid_cpy(&oid, &job->oids[i]);
+        }
+        job->errors[i] = git_odb_read_header(&job->sizes[i], &job->types[i], job->odb, &oid);
+    }
+}
+
+static void
+odb_batch_worker(void *payload)
+{
+    odb_batch_read((odb_batch_job*)payload);
+}
+
+/* Run the job on the given number of threads, without the GIL */
+static int
+odb_batch_run(odb_batch_job *job, Py_ssize_t workers)
+{
+    odb_batch_job *jobs;
+    Py_ssize_t i;
+
+    if (workers > (Py_ssize_t)job->count)
+        workers = (Py_ssize_t)job->count;
+
+    if (workers <= 1) {
+        Py_BEGIN_ALLOW_THREADS
+        odb_batch_read(job);
+        Py_END_ALLOW_THREADS
+        return 0;
+    }
+
+    jobs = calloc(workers, sizeof(odb_batch_job));
+    if (jobs == NULL) {
+        PyErr_NoMemory();
+        return -1;
+    }
+
+    for (i = 0; i < workers; i++) {
+        jobs[i] = *job;
+        jobs[i].start = i;
+        jobs[i].step = workers;
+    }
+
+    Py_BEGIN_ALLOW_THREADS
+    pgit_run_parallel(odb_batch_worker, jobs, sizeof(odb_batch_job), workers);
+    Py_END_ALLOW_THREADS
+
+    free(jobs);
+    return 0;
+}
+
+PyDoc_STRVAR(Odb_read_many__doc__,
+  "read_many(oids: Iterable[Oid | str] | bytes, workers: int = 1) -> list[tuple[int, bytes]]\n"
+  "\n"
+  "Read many objects at once, return the list of (type, data) tuples in\n"
+  "the same order as the given ids.\n"
+  "\n"
+  "The ids are either an iterable of Oid objects or hex strings, or a\n"
+  "bytes-like object with raw ids (20 bytes each) packed together, as\n"
+  "returned by Odb.iter_raw. The objects are read with the GIL released;\n"
+  "with workers > 1 the reads are split between that many threads.\n"
+  "\n"
+  "Raises KeyError with the first id that is not found.");
+
+PyObject *
+Odb_read_many(Odb *self, PyObject *args, PyObject *kwds)
+{
+    char *keywords[] = {"oids", "workers", NULL};
+    PyObject *py_oids;
+    Py_ssize_t workers = 1;
+    odb_batch_job job = {0};
+    git_oid *oids = NULL;
+    size_t *lens = NULL;
+    PyObject *py_result = NULL, *py_item;
+    size_t i;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O|n", keywords, &py_oids, &workers))
+        return NULL;
+
+    if (py_oids_to_git_oids(py_oids, &oids, &lens, &job.count) < 0)
+        return NULL;
+
+    job.odb = self->odb;
+    job.oids = oids;
+    job.lens = lens;
+    job.step = 1;
+    job.errors = calloc(job.count ? job.count : 1, sizeof(int));
+    job.objects = calloc(job.count ? job.count : 1, sizeof(git_odb_object*));
+    if (job.errors == NULL || job.objects == NULL) {
+        PyErr_NoMemory();
+        goto exit;
+    }
+
+    if (odb_batch_run(&job, workers) < 0)
+        goto exit;
+
+    for (i = 0; i < job.count; i++) {
+        if (job.errors[i] < 0) {
+            Error_set_oid(job.errors[i], &oids[i], lens[i]);
+            goto exit;
+        }
+    }
+
+    py_result = PyList_New(job.count);
+    if (py_result == NULL)
+        goto exit;
+
+    for (i = 0; i < job.count; i++) {
+        py_item = Py_BuildValue(
+            "(ny#)",
+            git_odb_object_type(job.objects[i]),
+            git_odb_object_data(job.objects[i]),
+            git_odb_object_size(job.objects[i]));
+        if (py_item == NULL) {
+            Py_CLEAR(py_result);
+            goto exit;
+        }
+        PyList_SET_ITEM(py_result, i, py_item);
+    }
+
+exit:
+    if (job.objects) {
+        for (i = 0; i < job.count; i++)
+            git_odb_object_free(job.objects[i]);
+    }
+    free(job.objects);
+    free(job.errors);
+    free(oids);
+    free(lens);
+    return py_result;
+}
+
+PyDoc_STRVAR(Odb_read_header__doc__,
+  "read_header(oid: Oid) -> tuple[int, int]\n"
+  "\n"
+  "Read the header of an object, return its (type, size), without reading\n"
+  "the object data. For packed objects stored as deltas, the header of the\n"
+  "base objects may still have to be read.");
+
+PyObject *
+Odb_read_header(Odb *self, PyObject *py_hex)
+{
+    git_oid oid, full;
+    git_object_t type;
+    size_t len, size;
+    int err;
+
+    len = py_oid_to_git_oid(py_hex, &oid);
+    if (len == 0)
+        return NULL;
+
+    Py_BEGIN_ALLOW_THREADS
+    if (len < GIT_OID_HEXSZ)
+        err = git_odb_exists_prefix(&full, self->odb, &oid, len);
+    else
+        err = git_oid_cpy(&full, &oid);
+    if (err == 0)
+        err = git_odb_read_header(&size, &type, self->odb, &full);
+    Py_END_ALLOW_THREADS
+
+    if (err < 0)
+        return Error_set_oid(err, &oid, len);
+
+    return Py_BuildValue("(in)", type, (Py_ssize_t)size);
+}
+
+PyDoc_STRVAR(Odb_read_headers__doc__,
+  "read_headers(oids: Iterable[Oid | str] | bytes, workers: int = 1) -> tuple[array, array]\n"
+  "\n"
+  "Read the headers of many objects at once, return two arrays with their\n"
+  "types (typecode 'b') and sizes (typecode 'Q'), in the same order as the\n"
+  "given ids. The object data is not inflated.\n"
+  "\n"
+  "The ids and workers arguments are the same as in Odb.read_many.");
+
+PyObject *
+Odb_read_headers(Odb *self, PyObject *args, PyObject *kwds)
+{
+    char *keywords[] = {"oids", "workers", NULL};
+    PyObject *py_oids;
+    Py_ssize_t workers = 1;
+    odb_batch_job job = {0};
+    git_oid *oids = NULL;
+    size_t *lens = NULL;
+    pgit_buf types = PGIT_BUF_INIT, sizes = PGIT_BUF_INIT;
+    PyObject *py_types = NULL, *py_sizes = NULL, *py_result = NULL;
+    size_t i;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O|n", keywords, &py_oids, &workers))
+        return NULL;
+
+    if (py_oids_to_git_oids(py_oids, &oids, &lens, &job.count) < 0)
+        return NULL;
+
+    job.odb = self->odb;
+    job.oids = oids;
+    job.lens = lens;
+    job.step = 1;
+    job.errors = calloc(job.count ? job.count : 1, sizeof(int));
+    job.types = calloc(job.count ? job.count : 1, sizeof(git_object_t));
+    job.sizes = calloc(job.count ? job.count : 1, sizeof(size_t));
+    if (job.errors == NULL || job.types == NULL || job.sizes == NULL) {
+        PyErr_NoMemory();
+        goto exit;
+    }
+
+    if (odb_batch_run(&job, workers) < 0)
+        goto exit;
+
+    for (i = 0; i < job.count; i++) {
+        if (job.errors[i] < 0) {
+            Error_set_oid(job.errors[i], &oids[i], lens[i]);
+            goto exit;
+        }
+    }
+
+    if (pgit_buf_grow(&types, job.count) < 0 ||
+        pgit_buf_grow(&sizes, job.count * sizeof(unsigned long long)) < 0) {
+        Error_set(GIT_ERROR);
+        goto exit;
+    }
+
+    for (i = 0; i < job.count; i++) {
+        signed char type = (signed char)job.types[i];
+        unsigned long long size = job.sizes[i];
+        pgit_buf_put(&types, &type, sizeof(type));
+        pgit_buf_put(&sizes, &size, sizeof(size));
+    }
+
+    py_types = pgit_buf_to_array(&types, "b");
+    if (py_types == NULL)
+        goto exit;
+    py_sizes = pgit_buf_to_array(&sizes, "Q");
+    if (py_sizes == NULL)
+        goto exit;
+
+    py_result = PyTuple_Pack(2, py_types, py_sizes);
+
+exit:
+    Py_XDECREF(py_types);
+    Py_XDECREF(py_sizes);
+    pgit_buf_dispose(&types);
+    pgit_buf_dispose(&sizes);
+    free(job.errors);
+    free(job.types);
+    free(job.sizes);
+    free(oids);
+    free(lens);
+    return py_result;
+}
+
 PyDoc_STRVAR(Odb_write__doc__,
     "write(type: int, data: bytes) -> Oid\n"
     "\n"
@@ -301,8 +898,12 @@ Odb_add_backend(Odb *self, PyObject *args)
 PyMethodDef Odb_methods[] = {
     METHOD(Odb, add_disk_alternate, METH_O),
     METHOD(Odb, read, METH_O),
+    METHOD(Odb, read_header, METH_O),
+    METHOD(Odb, read_headers, METH_VARARGS | METH_KEYWORDS),
+    METHOD(Odb, read_many, METH_VARARGS | METH_KEYWORDS),
     METHOD(Odb, write, METH_VARARGS),
     METHOD(Odb, exists, METH_O),
+    METHOD(Odb, iter_raw, METH_VARARGS | METH_KEYWORDS),
     METHOD(Odb, add_backend, METH_VARARGS),
     {NULL}
 };
@@ -435,3 +1036,80 @@ wrap_odb(git_odb *c_odb)
 
     return (PyObject *)py_odb;
 }
+
+
+static PyObject *
+OdbIdsIter_iternext(OdbIdsIter *self)
+{
+    pgit_odb_stream *stream = self->stream;
+    const unsigned char *chunk;
+    PyObject *result;
+    git_oid oid;
+
+    for (;;) {
+        if (stream->holding && stream->pos < stream->ready_count) {
+            chunk = stream->buffers[stream->ready];
+            if (self->raw) {
+                result = PyBytes_FromStringAndSize(
+                    (const char*)chunk + stream->pos * GIT_OID_RAWSZ,
+                    (stream->ready_count - stream->pos) * GIT_OID_RAWSZ);
+                stream->pos = stream->ready_count;
+                return result;
+            }
+
+            git_oid_fromraw(&oid, chunk + stream->pos * GIT_OID_RAWSZ);
+            stream->pos++;
+            return git_oid_to_python(&oid);
+        }
+
+        if (odb_stream_next_chunk(stream) <= 0)
+            return NULL;
+    }
+}
+
+static void
+OdbIdsIter_dealloc(OdbIdsIter *self)
+{
+    pgit_odb_stream *stream = self->stream;
+
+    /* Stop the producer if it is still running */
+    if (!stream->finished) {
+        stream->cancelled = 1;
+        PyThread_release_lock(stream->empty);
+    }
+
+    odb_stream_decref(stream);
+    PyObject_Del(self);
+}
+
+PyDoc_STRVAR(OdbIdsIter__doc__, "Object ids iterator object.");
+
+PyTypeObject OdbIdsIterType = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    "_pygit2.OdbIdsIter",                      /* tp_name           */
+    sizeof(OdbIdsIter),                        /* tp_basicsize      */
+    0,                                         /* tp_itemsize       */
+    (destructor)OdbIdsIter_dealloc,            /* tp_dealloc        */
+    0,                                         /* tp_print          */
+    0,                                         /* tp_getattr        */
+    0,                                         /* tp_setattr        */
+    0,                                         /* tp_compare        */
+    0,                                         /* tp_repr           */
+    0,                                         /* tp_as_number      */
+    0,                                         /* tp_as_sequence    */
+    0,                                         /* tp_as_mapping     */
+    0,                                         /* tp_hash           */
+    0,                                         /* tp_call           */
+    0,                                         /* tp_str            */
+    0,                                         /* tp_getattro       */
+    0,                                         /* tp_setattro       */
+    0,                                         /* tp_as_buffer      */
+    Py_TPFLAGS_DEFAULT,                        /* tp_flags          */
+    OdbIdsIter__doc__,                         /* tp_doc            */
+    0,                                         /* tp_traverse       */
+    0,                                         /* tp_clear          */
+    0,                                         /* tp_richcompare    */
+    0,                                         /* tp_weaklistoffset */
+    PyObject_SelfIter,                         /* tp_iter           */
+    (iternextfunc) OdbIdsIter_iternext,        /* tp_iternext       */
+};
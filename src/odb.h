@@ -39,4 +39,10 @@ git_odb_object *Odb_read_raw(git_odb *odb, const git_oid *oid, size_t len);
 
 PyObject *Odb_read(Odb *self, PyObject *py_hex);
 
+#define ODB_STREAM_CHUNK_SIZE 1024
+
+typedef int (*pgit_odb_foreach_fn)(PyObject *owner, git_odb_foreach_cb cb, void *payload);
+
+PyObject *wrap_odb_ids_iter(PyObject *owner, pgit_odb_foreach_fn foreach, size_t chunk_size, int raw);
+
 #endif
@@ -36,6 +36,7 @@
 #include <Python.h>
 #include "error.h"
 #include "object.h"
+#include "odb.h"
 #include "oid.h"
 #include "types.h"
 #include "utils.h"
@@ -56,73 +57,89 @@ typedef struct {
     PyObject *py_backend;
 } pgit_odb_backend;
 
+/*
+ * The callbacks below may be called by libgit2 with the GIL released, e.g.
+ * by Odb.read_many() or Diff.stats, so they take it before calling into
+ * Python, like pgit_odb_backend_foreach does.
+ */
 static int
 pgit_odb_backend_read(void **ptr, size_t *sz, git_object_t *type,
                       git_odb_backend *_be, const git_oid *oid)
 {
     pgit_odb_backend *be = (pgit_odb_backend *)_be;
+    PyGILState_STATE gil = PyGILState_Ensure();
+    PyObject *py_oid, *result = NULL;
+    Py_ssize_t type_value;
+    const char *bytes;
+    int err = GIT_EUSER;
 
-    PyObject *py_oid = git_oid_to_python(oid);
+    py_oid = git_oid_to_python(oid);
     if (py_oid == NULL)
-        return GIT_EUSER;
-
-    PyObject *result = PyObject_CallMethod(be->py_backend, "read_cb", "N", py_oid);
-    if (result == NULL)
-        return git_error_for_exc();
+        goto end;
 
-    const char *bytes;
-    Py_ssize_t type_value;
-    if (!PyArg_ParseTuple(result, "ny#", &type_value, &bytes, sz) || !bytes) {
-        Py_DECREF(result);
-        return GIT_EUSER;
+    result = PyObject_CallMethod(be->py_backend, "read_cb", "N", py_oid);
+    if (result == NULL) {
+        err = git_error_for_exc();
+        goto end;
     }
+
+    if (!PyArg_ParseTuple(result, "ny#", &type_value, &bytes, sz) || !bytes)
+        goto end;
     *type = (git_object_t)type_value;
 
     *ptr = git_odb_backend_data_alloc(_be, *sz);
-    if (!*ptr) {
-        Py_DECREF(result);
-        return GIT_EUSER;
-    }
+    if (!*ptr)
+        goto end;
 
     memcpy(*ptr, bytes, *sz);
-    Py_DECREF(result);
-    return 0;
+    err = 0;
+
+end:
+    Py_XDECREF(result);
+    PyGILState_Release(gil);
+    return err;
 }
 
 static int
 pgit_odb_backend_read_prefix(git_oid *oid_out, void **ptr, size_t *sz, git_object_t *type,
                              git_odb_backend *_be, const git_oid *short_id, size_t len)
 {
+    pgit_odb_backend *be = (pgit_odb_backend *)_be;
+    PyGILState_STATE gil;
+    PyObject *result, *py_oid_out;
+    Py_ssize_t type_value;
+    const char *bytes;
+    int err = GIT_EUSER;
+
     // short_id to hex
     char short_id_hex[GIT_OID_HEXSZ];
     git_oid_nfmt(short_id_hex, len, short_id);
 
     // Call callback
-    pgit_odb_backend *be = (pgit_odb_backend *)_be;
-    PyObject *result = PyObject_CallMethod(be->py_backend, "read_prefix_cb", "s#", short_id_hex, len);
-    if (result == NULL)
-        return git_error_for_exc();
+    gil = PyGILState_Ensure();
+    result = PyObject_CallMethod(be->py_backend, "read_prefix_cb", "s#", short_id_hex, len);
+    if (result == NULL) {
+        err = git_error_for_exc();
+        goto end;
+    }
 
     // Parse output from calback
-    PyObject *py_oid_out;
-    Py_ssize_t type_value;
-    const char *bytes;
-    if (!PyArg_ParseTuple(result, "ny#O", &type_value, &bytes, sz, &py_oid_out) || !bytes) {
-        Py_DECREF(result);
-        return GIT_EUSER;
-    }
+    if (!PyArg_ParseTuple(result, "ny#O", &type_value, &bytes, sz, &py_oid_out) || !bytes)
+        goto end;
     *type = (git_object_t)type_value;
 
     *ptr = git_odb_backend_data_alloc(_be, *sz);
-    if (!*ptr) {
-        Py_DECREF(result);
-        return GIT_EUSER;
-    }
+    if (!*ptr)
+        goto end;
 
     memcpy(*ptr, bytes, *sz);
     py_oid_to_git_oid(py_oid_out, oid_out);
-    Py_DECREF(result);
-    return 0;
+    err = 0;
+
+end:
+    Py_XDECREF(result);
+    PyGILState_Release(gil);
+    return err;
 }
 
 static int
@@ -130,24 +147,30 @@ pgit_odb_backend_read_header(size_t *len, git_object_t *type,
                              git_odb_backend *_be, const git_oid *oid)
 {
     pgit_odb_backend *be = (pgit_odb_backend *)_be;
+    PyGILState_STATE gil = PyGILState_Ensure();
+    PyObject *py_oid, *result = NULL;
+    Py_ssize_t type_value;
+    int err = GIT_EUSER;
 
-    PyObject *py_oid = git_oid_to_python(oid);
+    py_oid = git_oid_to_python(oid);
     if (py_oid == NULL)
-        return GIT_EUSER;
+        goto end;
 
-    PyObject *result = PyObject_CallMethod(be->py_backend, "read_header_cb", "N", py_oid);
-    if (result == NULL)
-        return git_error_for_exc();
-
-    Py_ssize_t type_value;
-    if (!PyArg_ParseTuple(result, "nn", &type_value, len)) {
-        Py_DECREF(result);
-        return GIT_EUSER;
+    result = PyObject_CallMethod(be->py_backend, "read_header_cb", "N", py_oid);
+    if (result == NULL) {
+        err = git_error_for_exc();
+        goto end;
     }
+
+    if (!PyArg_ParseTuple(result, "nn", &type_value, len))
+        goto end;
     *type = (git_object_t)type_value;
+    err = 0;
 
-    Py_DECREF(result);
-    return 0;
+end:
+    Py_XDECREF(result);
+    PyGILState_Release(gil);
+    return err;
 }
 
 static int
@@ -155,34 +178,51 @@ pgit_odb_backend_write(git_odb_backend *_be, const git_oid *oid,
         const void *data, size_t sz, git_object_t typ)
 {
     pgit_odb_backend *be = (pgit_odb_backend *)_be;
+    PyGILState_STATE gil = PyGILState_Ensure();
+    PyObject *py_oid, *result;
+    int err = GIT_EUSER;
 
-    PyObject *py_oid = git_oid_to_python(oid);
+    py_oid = git_oid_to_python(oid);
     if (py_oid == NULL)
-        return GIT_EUSER;
+        goto end;
 
-    PyObject *result = PyObject_CallMethod(be->py_backend, "write_cb", "Ny#n", py_oid, data, sz, typ);
-    if (result == NULL)
-        return git_error_for_exc();
+    result = PyObject_CallMethod(be->py_backend, "write_cb", "Ny#n", py_oid, data, sz, typ);
+    if (result == NULL) {
+        err = git_error_for_exc();
+        goto end;
+    }
 
     Py_DECREF(result);
-    return 0;
+    err = 0;
+
+end:
+    PyGILState_Release(gil);
+    return err;
 }
 
 static int
 pgit_odb_backend_exists(git_odb_backend *_be, const git_oid *oid)
 {
     pgit_odb_backend *be = (pgit_odb_backend *)_be;
+    PyGILState_STATE gil = PyGILState_Ensure();
+    PyObject *py_oid, *result;
+    int r = GIT_EUSER;
 
-    PyObject *py_oid = git_oid_to_python(oid);
+    py_oid = git_oid_to_python(oid);
     if (py_oid == NULL)
-        return GIT_EUSER;
+        goto end;
 
-    PyObject *result = PyObject_CallMethod(be->py_backend, "exists_cb", "N", py_oid);
-    if (result == NULL)
-        return git_error_for_exc();
+    result = PyObject_CallMethod(be->py_backend, "exists_cb", "N", py_oid);
+    if (result == NULL) {
+        r = git_error_for_exc();
+        goto end;
+    }
 
-    int r = PyObject_IsTrue(result);
+    r = PyObject_IsTrue(result);
     Py_DECREF(result);
+
+end:
+    PyGILState_Release(gil);
     return r;
 }
 
@@ -190,27 +230,43 @@ static int
 pgit_odb_backend_exists_prefix(git_oid *out, git_odb_backend *_be,
                                const git_oid *short_id, size_t len)
 {
+    pgit_odb_backend *be = (pgit_odb_backend *)_be;
+    PyGILState_STATE gil;
+    PyObject *py_oid;
+    int err = 0;
+
     // short_id to hex
     char short_id_hex[GIT_OID_HEXSZ];
     git_oid_nfmt(short_id_hex, len, short_id);
 
     // Call callback
-    pgit_odb_backend *be = (pgit_odb_backend *)_be;
-    PyObject *py_oid = PyObject_CallMethod(be->py_backend, "exists_prefix_cb", "s#", short_id_hex, len);
-    if (py_oid == NULL)
-        return git_error_for_exc();
+    gil = PyGILState_Ensure();
+    py_oid = PyObject_CallMethod(be->py_backend, "exists_prefix_cb", "s#", short_id_hex, len);
+    if (py_oid == NULL) {
+        err = git_error_for_exc();
+    } else {
+        py_oid_to_git_oid(py_oid, out);
+        Py_DECREF(py_oid);
+    }
 
-    py_oid_to_git_oid(py_oid, out);
-    Py_DECREF(py_oid);
-    return 0;
+    PyGILState_Release(gil);
+    return err;
 }
 
 static int
 pgit_odb_backend_refresh(git_odb_backend *_be)
 {
     pgit_odb_backend *be = (pgit_odb_backend *)_be;
-    PyObject_CallMethod(be->py_backend, "refresh_cb", NULL);
-    return git_error_for_exc();
+    PyGILState_STATE gil = PyGILState_Ensure();
+    PyObject *result;
+    int err;
+
+    result = PyObject_CallMethod(be->py_backend, "refresh_cb", NULL);
+    Py_XDECREF(result);
+    err = git_error_for_exc();
+
+    PyGILState_Release(gil);
+    return err;
 }
 
 static int
@@ -219,17 +275,48 @@ pgit_odb_backend_foreach(git_odb_backend *_be,
 {
     PyObject *item;
     git_oid oid;
+    int err = 0;
     pgit_odb_backend *be = (pgit_odb_backend *)_be;
+    PyGILState_STATE gil = PyGILState_Ensure();
     PyObject *iterator = PyObject_GetIter((PyObject *)be->py_backend);
     assert(iterator);
 
-    while ((item = PyIter_Next(iterator))) {
-        py_oid_to_git_oid(item, &oid);
-        cb(&oid, payload);
+    while (err == 0 && (item = PyIter_Next(iterator))) {
+        if (py_oid_to_git_oid(item, &oid) == 0) {
+            Py_DECREF(item);
+            break;
+        }
         Py_DECREF(item);
+
+        /* The callback may block, waiting for the consumer of the ids */
+        Py_BEGIN_ALLOW_THREADS
+        err = cb(&oid, payload);
+        Py_END_ALLOW_THREADS
     }
+    Py_DECREF(iterator);
 
-    return git_error_for_exc();
+    if (err == 0 || PyErr_Occurred())
+        err = git_error_for_exc();
+
+    PyGILState_Release(gil);
+    return err;
+}
+
+/* Whether some backends of the odb are implemented in Python */
+int
+pgit_odb_has_python_backend(git_odb *odb)
+{
+    git_odb_backend *backend;
+    size_t i, n;
+
+    n = git_odb_num_backends(odb);
+    for (i = 0; i < n; i++) {
+        if (git_odb_get_backend(&backend, odb, i) == 0 &&
+            backend->read == pgit_odb_backend_read)
+            return 1;
+    }
+
+    return 0;
 }
 
 static void
@@ -292,43 +379,51 @@ OdbBackend_dealloc(OdbBackend *self)
 }
 
 static int
-OdbBackend_build_as_iter(const git_oid *oid, void *accum)
+odb_backend_foreach(PyObject *owner, git_odb_foreach_cb cb, void *payload)
 {
-    int err;
-
-    PyObject *py_oid = git_oid_to_python(oid);
-    if (py_oid == NULL)
-        return GIT_EUSER;
-
-    err = PyList_Append((PyObject*)accum, py_oid);
-    Py_DECREF(py_oid);
+    git_odb_backend *backend = ((OdbBackend*)owner)->odb_backend;
+    return backend->foreach(backend, cb, payload);
+}
 
-    if (err < 0)
-        return GIT_EUSER;
+static PyObject *
+odb_backend_ids_iter(OdbBackend *self, size_t chunk_size, int raw)
+{
+    if (self->odb_backend == NULL || self->odb_backend->foreach == NULL) {
+        PyErr_SetString(PyExc_TypeError, "backend does not support iteration");
+        return NULL;
+    }
 
-    return 0;
+    return wrap_odb_ids_iter((PyObject*)self, odb_backend_foreach, chunk_size, raw);
 }
 
 PyObject *
 OdbBackend_as_iter(OdbBackend *self)
 {
-    PyObject *accum = PyList_New(0);
-    PyObject *iter = NULL;
+    return odb_backend_ids_iter(self, ODB_STREAM_CHUNK_SIZE, 0);
+}
+
+PyDoc_STRVAR(OdbBackend_iter_raw__doc__,
+    "iter_raw(chunk_size: int = 1024) -> Iterator[bytes]\n"
+    "\n"
+    "Return an iterator over the ids of all the objects in this backend, as\n"
+    "bytes objects with up to chunk_size raw ids (20 bytes each) packed\n"
+    "together. See Odb.iter_raw.");
+
+PyObject *
+OdbBackend_iter_raw(OdbBackend *self, PyObject *args, PyObject *kwds)
+{
+    char *keywords[] = {"chunk_size", NULL};
+    Py_ssize_t chunk_size = ODB_STREAM_CHUNK_SIZE;
 
-    int err = self->odb_backend->foreach(self->odb_backend, OdbBackend_build_as_iter, (void*)accum);
-    if (err == GIT_EUSER)
-        goto exit;
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "|n", keywords, &chunk_size))
+        return NULL;
 
-    if (err < 0) {
-        Error_set(err);
-        goto exit;
+    if (chunk_size <= 0) {
+        PyErr_SetString(PyExc_ValueError, "chunk_size must be positive");
+        return NULL;
     }
 
-    iter = PyObject_GetIter(accum);
-
-exit:
-    Py_DECREF(accum);
-    return iter;
+    return odb_backend_ids_iter(self, (size_t)chunk_size, 1);
 }
 
 PyDoc_STRVAR(OdbBackend_read__doc__,
@@ -524,6 +619,7 @@ PyMethodDef OdbBackend_methods[] = {
     METHOD(OdbBackend, read_header, METH_O),
     METHOD(OdbBackend, exists, METH_O),
     METHOD(OdbBackend, exists_prefix, METH_O),
+    METHOD(OdbBackend, iter_raw, METH_VARARGS | METH_KEYWORDS),
     METHOD(OdbBackend, refresh, METH_NOARGS),
     {NULL}
 };
@@ -34,5 +34,6 @@
 #include "types.h"
 
 PyObject *wrap_odb_backend(git_odb_backend *c_odb_backend);
+int pgit_odb_has_python_backend(git_odb *odb);
 
 #endif
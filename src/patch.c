@@ -56,6 +56,8 @@ wrap_patch(git_patch *patch, Blob *oldblob, Blob *newblob)
 
         Py_XINCREF(newblob);
         py_patch->newblob = newblob;
+
+        py_patch->owner = NULL;
     }
 
     return (PyObject*) py_patch;
@@ -67,6 +69,7 @@ Patch_dealloc(Patch *self)
     Py_CLEAR(self->oldblob);
     Py_CLEAR(self->newblob);
     git_patch_free(self->patch);
+    Py_CLEAR(self->owner);
     PyObject_Del(self);
 }
 
@@ -37,6 +37,7 @@
 #include "oid.h"
 #include "options.h"
 #include "filter.h"
+#include "index.h"
 
 PyObject *GitError;
 PyObject *AlreadyExistsError;
@@ -52,6 +53,7 @@ PyObject *ReferenceTypeEnum;
 
 extern PyTypeObject RepositoryType;
 extern PyTypeObject OdbType;
+extern PyTypeObject OdbIdsIterType;
 extern PyTypeObject OdbBackendType;
 extern PyTypeObject OdbBackendPackType;
 extern PyTypeObject OdbBackendLooseType;
@@ -60,6 +62,7 @@ extern PyTypeObject ObjectType;
 extern PyTypeObject CommitType;
 extern PyTypeObject DiffType;
 extern PyTypeObject DeltasIterType;
+extern PyTypeObject DiffPatchesIterType;
 extern PyTypeObject DiffIterType;
 extern PyTypeObject DiffDeltaType;
 extern PyTypeObject DiffFileType;
@@ -71,8 +74,10 @@ extern PyTypeObject TreeType;
 extern PyTypeObject TreeBuilderType;
 extern PyTypeObject TreeIterType;
 extern PyTypeObject BlobType;
+extern PyTypeObject BlobReaderType;
 extern PyTypeObject TagType;
 extern PyTypeObject WalkerType;
+extern PyTypeObject WalkerIdsIterType;
 extern PyTypeObject RefdbType;
 extern PyTypeObject RefdbBackendType;
 extern PyTypeObject RefdbFsBackendType;
@@ -445,6 +450,9 @@ PyMethodDef module_methods[] = {
     {"filter_register", (PyCFunction)filter_register, METH_VARARGS | METH_KEYWORDS, filter_register__doc__},
     {"filter_unregister", filter_unregister, METH_VARARGS, filter_unregister__doc__},
     {"_cache_enums", _cache_enums, METH_NOARGS, _cache_enums__doc__},
+    {"_index_add_many", index_add_many, METH_VARARGS, index_add_many__doc__},
+    {"_index_entries", (PyCFunction)index_entries, METH_VARARGS | METH_KEYWORDS, index_entries__doc__},
+    {"_index_remove_many", index_remove_many, METH_VARARGS, index_remove_many__doc__},
     {NULL}
 };
 
@@ -519,6 +527,7 @@ PyInit__pygit2(void)
     /* Odb */
     INIT_TYPE(OdbType, NULL, PyType_GenericNew)
     ADD_TYPE(m, Odb)
+    INIT_TYPE(OdbIdsIterType, NULL, NULL)
 
     INIT_TYPE(OdbBackendType, NULL, PyType_GenericNew)
     ADD_TYPE(m, OdbBackend)
@@ -545,6 +554,7 @@ PyInit__pygit2(void)
     INIT_TYPE(TreeIterType, NULL, NULL)
     INIT_TYPE(TreeBuilderType, NULL, NULL)
     INIT_TYPE(BlobType, &ObjectType, NULL)
+    INIT_TYPE(BlobReaderType, NULL, NULL)
     INIT_TYPE(TagType, &ObjectType, NULL)
     INIT_TYPE(RefsIteratorType, NULL, NULL)
     ADD_TYPE(m, Object)
@@ -574,6 +584,7 @@ PyInit__pygit2(void)
      * Log
      */
     INIT_TYPE(WalkerType, NULL, NULL)
+    INIT_TYPE(WalkerIdsIterType, NULL, NULL)
     ADD_TYPE(m, Walker);
     ADD_CONSTANT_INT(m, GIT_SORT_NONE)
     ADD_CONSTANT_INT(m, GIT_SORT_TOPOLOGICAL)
@@ -682,6 +693,7 @@ PyInit__pygit2(void)
      */
     INIT_TYPE(DiffType, NULL, NULL)
     INIT_TYPE(DeltasIterType, NULL, NULL)
+    INIT_TYPE(DiffPatchesIterType, NULL, NULL)
     INIT_TYPE(DiffIterType, NULL, NULL)
     INIT_TYPE(DiffDeltaType, NULL, NULL)
     INIT_TYPE(DiffFileType, NULL, NULL)
@@ -737,6 +749,14 @@ PyInit__pygit2(void)
     ADD_CONSTANT_INT(m, GIT_DIFF_STATS_NUMBER)
     ADD_CONSTANT_INT(m, GIT_DIFF_STATS_INCLUDE_SUMMARY)
 
+    /* Output formats for Diff.write_patch (git_diff_format_t in libgit2) */
+    ADD_CONSTANT_INT(m, GIT_DIFF_FORMAT_PATCH)
+    ADD_CONSTANT_INT(m, GIT_DIFF_FORMAT_PATCH_HEADER)
+    ADD_CONSTANT_INT(m, GIT_DIFF_FORMAT_RAW)
+    ADD_CONSTANT_INT(m, GIT_DIFF_FORMAT_NAME_ONLY)
+    ADD_CONSTANT_INT(m, GIT_DIFF_FORMAT_NAME_STATUS)
+    ADD_CONSTANT_INT(m, GIT_DIFF_FORMAT_PATCH_ID)
+
     /* Flags for Diff.find_similar (git_diff_find_t in libgit2) */
     ADD_CONSTANT_INT(m, GIT_DIFF_FIND_BY_CONFIG) /** Obey diff.renames */
     ADD_CONSTANT_INT(m, GIT_DIFF_FIND_RENAMES) /* --find-renames */
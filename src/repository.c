@@ -34,6 +34,7 @@
 #include "revspec.h"
 #include "utils.h"
 #include "odb.h"
+#include "odb_backend.h"
 #include "object.h"
 #include "oid.h"
 #include "note.h"
@@ -44,6 +45,7 @@
 #include "signature.h"
 #include "worktree.h"
 #include <git2/odb_backend.h>
+#include <git2/sys/commit_graph.h>
 #include <git2/sys/repository.h>
 
 extern PyObject *GitError;
@@ -87,6 +89,30 @@ wrap_repository(git_repository *c_repo)
     return (PyObject *)py_repo;
 }
 
+/*
+ * Whether worker threads can open the repository again by its path and see
+ * the same objects. Not when it has no path (e.g. made of custom backends),
+ * nor when some of its objects are served by Python backends.
+ */
+int
+pgit_repository_can_reopen(git_repository *repo)
+{
+    git_odb *odb;
+    int python;
+
+    if (git_repository_path(repo) == NULL)
+        return 0;
+
+    if (git_repository_odb(&odb, repo) < 0) {
+        git_error_clear();
+        return 0;
+    }
+
+    python = pgit_odb_has_python_backend(odb);
+    git_odb_free(odb);
+    return !python;
+}
+
 int
 Repository_init(Repository *self, PyObject *args, PyObject *kwds)
 {
@@ -529,7 +555,9 @@ Repository_descendant_of(Repository *self, PyObject *args)
         return NULL;
 
     // err < 0 => error, see source code of `git_graph_descendant_of`
+    Py_BEGIN_ALLOW_THREADS
     err = git_graph_descendant_of(self->repo, &oid1, &oid2);
+    Py_END_ALLOW_THREADS
     if (err < 0)
         return Error_set(err);
 
@@ -563,7 +591,9 @@ Repository_merge_base(Repository *self, PyObject *args)
     if (err < 0)
         return NULL;
 
+    Py_BEGIN_ALLOW_THREADS
     err = git_merge_base(&oid, self->repo, &oid1, &oid2);
+    Py_END_ALLOW_THREADS
 
     if (err == GIT_ENOTFOUND)
         Py_RETURN_NONE;
@@ -605,7 +635,9 @@ merge_base_xxx(Repository *self, PyObject *args, git_merge_base_xxx_t git_merge_
             goto out;
     }
 
+    Py_BEGIN_ALLOW_THREADS
     err = (*git_merge_base_xxx)(&oid, self->repo, commit_oid_count, (const git_oid*)commit_oids);
+    Py_END_ALLOW_THREADS
 
     if (err == GIT_ENOTFOUND) {
         Py_INCREF(Py_None);
@@ -650,6 +682,159 @@ Repository_merge_base_octopus(Repository *self, PyObject *args)
     return merge_base_xxx(self, args, &git_merge_base_octopus);
 }
 
+/*
+ * Load the commit-graph file of the repository into its object database, so
+ * the revision walks and graph queries (merge bases, ahead/behind, etc.) read
+ * the commits from there instead of parsing them.
+ */
+static int
+repository_load_commit_graph(Repository *self, const char *objects_dir)
+{
+    git_commit_graph *cgraph = NULL;
+    git_odb *odb;
+    int err;
+
+    err = git_repository_odb(&odb, self->repo);
+    if (err < 0)
+        return err;
+
+    if (objects_dir != NULL) {
+        err = git_commit_graph_open(&cgraph, objects_dir);
+        if (err < 0)
+            goto out;
+    }
+
+    err = git_odb_set_commit_graph(odb, cgraph);
+    if (err < 0)
+        git_commit_graph_free(cgraph);
+
+out:
+    git_odb_free(odb);
+    return err;
+}
+
+PyDoc_STRVAR(Repository_write_commit_graph__doc__,
+  "write_commit_graph()\n"
+  "\n"
+  "Write the commit-graph file (objects/info/commit-graph) with all the\n"
+  "commits reachable from the references and HEAD, and start using it.\n"
+  "\n"
+  "The commit-graph stores the parents, commit date and generation number\n"
+  "of every commit, so revision walks and graph queries such as\n"
+  "merge_base, descendant_of or ahead_behind don't need to read and parse\n"
+  "the commits from the object database. The file is not updated\n"
+  "automatically, call this method again to include new commits.");
+
+PyObject *
+Repository_write_commit_graph(Repository *self)
+{
+    git_buf objects_dir = {NULL};
+    git_revwalk *walk = NULL;
+    git_commit_graph_writer *writer = NULL;
+    git_commit_graph_writer_options opts;
+    char *info_dir = NULL;
+    int err;
+
+    err = git_repository_item_path(&objects_dir, self->repo, GIT_REPOSITORY_ITEM_OBJECTS);
+    if (err < 0)
+        return Error_set(err);
+
+    info_dir = malloc(objects_dir.size + sizeof("info"));
+    if (info_dir == NULL) {
+        git_buf_dispose(&objects_dir);
+        return PyErr_NoMemory();
+    }
+    strcpy(info_dir, objects_dir.ptr);
+    strcat(info_dir, "info");
+
+    Py_BEGIN_ALLOW_THREADS
+    err = git_revwalk_new(&walk, self->repo);
+    if (err < 0)
+        goto done;
+
+    err = git_revwalk_push_glob(walk, "*");
+    if (err < 0)
+        goto done;
+
+    err = git_revwalk_push_head(walk);
+    if (err == GIT_ENOTFOUND || err == GIT_EUNBORNBRANCH)
+        err = 0;
+    if (err < 0)
+        goto done;
+
+    err = git_commit_graph_writer_options_init(&opts, GIT_COMMIT_GRAPH_WRITER_OPTIONS_VERSION);
+    if (err < 0)
+        goto done;
+
+    err = git_commit_graph_writer_new(&writer, info_dir);
+    if (err < 0)
+        goto done;
+
+    err = git_commit_graph_writer_add_revwalk(writer, walk);
+    if (err < 0)
+        goto done;
+
+    err = git_commit_graph_writer_commit(writer, &opts);
+    if (err < 0)
+        goto done;
+
+    err = repository_load_commit_graph(self, objects_dir.ptr);
+
+done:
+    git_commit_graph_writer_free(writer);
+    git_revwalk_free(walk);
+    Py_END_ALLOW_THREADS
+
+    free(info_dir);
+    git_buf_dispose(&objects_dir);
+
+    if (err < 0)
+        return Error_set(err);
+
+    Py_RETURN_NONE;
+}
+
+PyDoc_STRVAR(Repository_use_commit_graph__doc__,
+  "use_commit_graph(enabled: bool = True)\n"
+  "\n"
+  "Switch whether revision walks and graph queries read the commits from\n"
+  "the commit-graph file. By default libgit2 uses the commit-graph file if\n"
+  "it exists when the repository is opened.\n"
+  "\n"
+  "When enabling it the commit-graph file is (re)loaded, raises KeyError if\n"
+  "the repository has no commit-graph file, see write_commit_graph.");
+
+PyObject *
+Repository_use_commit_graph(Repository *self, PyObject *args, PyObject *kwds)
+{
+    static char *kwlist[] = {"enabled", NULL};
+    git_buf objects_dir = {NULL};
+    int enabled = 1;
+    int err;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "|p", kwlist, &enabled))
+        return NULL;
+
+    if (!enabled) {
+        err = repository_load_commit_graph(self, NULL);
+        if (err < 0)
+            return Error_set(err);
+
+        Py_RETURN_NONE;
+    }
+
+    err = git_repository_item_path(&objects_dir, self->repo, GIT_REPOSITORY_ITEM_OBJECTS);
+    if (err < 0)
+        return Error_set(err);
+
+    err = repository_load_commit_graph(self, objects_dir.ptr);
+    git_buf_dispose(&objects_dir);
+    if (err < 0)
+        return Error_set(err);
+
+    Py_RETURN_NONE;
+}
+
 PyDoc_STRVAR(Repository_merge_analysis__doc__,
   "merge_analysis(their_head: Oid, our_ref: str = \"HEAD\") -> tuple[MergeAnalysis, MergePreference]\n"
   "\n"
@@ -1689,8 +1874,578 @@ Repository_compress_references(Repository *self)
     Py_RETURN_NONE;
 }
 
+/*
+ * Status. The entries are first collected into plain buffers, possibly by
+ * several threads, each with its own repository handle, and then converted
+ * into Python objects.
+ */
+
+typedef struct {
+    pgit_buf paths;     /* NUL terminated paths, one after the other */
+    pgit_buf flags;     /* unsigned int per entry */
+    pgit_buf new_paths; /* like paths, only filled if with_new_paths */
+    size_t count;
+    int with_new_paths;
+} status_entries;
+
+#define STATUS_ENTRIES_INIT {PGIT_BUF_INIT, PGIT_BUF_INIT, PGIT_BUF_INIT, 0, 0}
+
+static void
+status_entries_dispose(status_entries *entries)
+{
+    pgit_buf_dispose(&entries->paths);
+    pgit_buf_dispose(&entries->flags);
+    pgit_buf_dispose(&entries->new_paths);
+    entries->count = 0;
+}
+
+static int
+status_entries_collect(status_entries *entries, git_status_list *list)
+{
+    const git_status_entry *entry;
+    const char *path;
+    unsigned int flags;
+    size_t i, len;
+
+    len = git_status_list_entrycount(list);
+    for (i = 0; i < len; i++) {
+        entry = git_status_byindex(list, i);
+        if (entry == NULL)
+            return -1;
+
+        /* We need to choose one of the strings */
+        if (entry->head_to_index)
+            path = entry->head_to_index->old_file.path;
+        else
+            path = entry->index_to_workdir->old_file.path;
+
+        flags = entry->status;
+        if (pgit_buf_put(&entries->paths, path, strlen(path) + 1) < 0 ||
+            pgit_buf_put(&entries->flags, &flags, sizeof(flags)) < 0)
+            return -1;
+
+        if (entries->with_new_paths) {
+            /* Where the file ends up, after the renames if any */
+            if (entry->index_to_workdir)
+                path = entry->index_to_workdir->new_file.path;
+            else
+                path = entry->head_to_index->new_file.path;
+            if (pgit_buf_put(&entries->new_paths, path, strlen(path) + 1) < 0)
+                return -1;
+        }
+        entries->count++;
+    }
+
+    return 0;
+}
+
+static int
+status_entries_append(status_entries *entries, status_entries *other)
+{
+    if (pgit_buf_put(&entries->paths, other->paths.ptr, other->paths.size) < 0 ||
+        pgit_buf_put(&entries->flags, other->flags.ptr, other->flags.size) < 0 ||
+        pgit_buf_put(&entries->new_paths, other->new_paths.ptr, other->new_paths.size) < 0)
+        return -1;
+
+    entries->count += other->count;
+    return 0;
+}
+
+typedef struct {
+    const char *path;
+    const char *new_path;
+    unsigned int flags;
+} status_row;
+
+static int
+status_row_cmp(const void *a, const void *b)
+{
+    return strcmp(((const status_row*)a)->path, ((const status_row*)b)->path);
+}
+
+static int
+status_row_casecmp(const void *a, const void *b)
+{
+    int cmp = PyOS_stricmp(((const status_row*)a)->path, ((const status_row*)b)->path);
+    return cmp ? cmp : status_row_cmp(a, b);
+}
+
+/* Sort the entries by path, like libgit2 does, and drop the duplicates: the
+ * entries appended by several jobs whose pathspecs overlap */
+static int
+status_entries_sort(status_entries *entries, int ignore_case)
+{
+    status_entries sorted = STATUS_ENTRIES_INIT;
+    status_row *rows;
+    const char *path, *new_path;
+    size_t i;
+    int err = 0;
+
+    if (entries->count == 0)
+        return 0;
+
+    rows = malloc(entries->count * sizeof(status_row));
+    if (rows == NULL)
+        return -1;
+
+    path = entries->paths.ptr;
+    new_path = entries->new_paths.ptr;
+    for (i = 0; i < entries->count; i++) {
+        rows[i].path = path;
+        rows[i].new_path = new_path;
+        rows[i].flags = ((unsigned int*)entries->flags.ptr)[i];
+        path += strlen(path) + 1;
+        if (entries->with_new_paths)
+            new_path += strlen(new_path) + 1;
+    }
+    qsort(rows, entries->count, sizeof(status_row),
+          ignore_case ? status_row_casecmp : status_row_cmp);
+
+    sorted.with_new_paths = entries->with_new_paths;
+    for (i = 0; err == 0 && i < entries->count; i++) {
+        if (i > 0 && strcmp(rows[i].path, rows[i - 1].path) == 0)
+            continue;
+        if (pgit_buf_put(&sorted.paths, rows[i].path, strlen(rows[i].path) + 1) < 0 ||
+            pgit_buf_put(&sorted.flags, &rows[i].flags, sizeof(rows[i].flags)) < 0 ||
+            (sorted.with_new_paths &&
+             pgit_buf_put(&sorted.new_paths, rows[i].new_path, strlen(rows[i].new_path) + 1) < 0))
+            err = -1;
+        sorted.count++;
+    }
+    free(rows);
+
+    if (err < 0) {
+        status_entries_dispose(&sorted);
+        return -1;
+    }
+
+    status_entries_dispose(entries);
+    *entries = sorted;
+    return 0;
+}
+
+/* Turn a buffer of NUL terminated strings into a (data, offsets) tuple, as
+ * returned by Walker.next_batch */
+static PyObject *
+status_entries_paths_column(pgit_buf *paths, size_t count)
+{
+    PyObject *py_data = NULL, *py_offsets = NULL, *py_column = NULL;
+    pgit_buf offsets = PGIT_BUF_INIT;
+    unsigned long long offset = 0;
+    size_t i, len, pos = 0;
+
+    if (pgit_buf_put(&offsets, &offset, sizeof(offset)) < 0)
+        goto nomem;
+
+    /* Drop the terminators in place, the data only moves backwards */
+    for (i = 0; i < count; i++) {
+        len = strlen(paths->ptr + pos);
+        memmove(paths->ptr + offset, paths->ptr + pos, len);
+        pos += len + 1;
+        offset += len;
+        if (pgit_buf_put(&offsets, &offset, sizeof(offset)) < 0)
+            goto nomem;
+    }
+    paths->size = offset;
+
+    py_data = pgit_buf_to_bytes(paths);
+    py_offsets = pgit_buf_to_array(&offsets, "Q");
+    if (py_data != NULL && py_offsets != NULL)
+        py_column = PyTuple_Pack(2, py_data, py_offsets);
+    goto exit;
+
+nomem:
+    PyErr_NoMemory();
+exit:
+    Py_XDECREF(py_data);
+    Py_XDECREF(py_offsets);
+    pgit_buf_dispose(&offsets);
+    return py_column;
+}
+
+static PyObject *
+status_entries_to_table(status_entries *entries)
+{
+    PyObject *py_table, *py_value;
+
+    py_table = PyDict_New();
+    if (py_table == NULL)
+        return NULL;
+
+    py_value = status_entries_paths_column(&entries->paths, entries->count);
+    if (py_value == NULL || PyDict_SetItemString(py_table, "path", py_value) < 0)
+        goto error;
+    Py_DECREF(py_value);
+
+    py_value = pgit_buf_to_array(&entries->flags, "I");
+    if (py_value == NULL || PyDict_SetItemString(py_table, "flags", py_value) < 0)
+        goto error;
+    Py_DECREF(py_value);
+
+    py_value = status_entries_paths_column(&entries->new_paths, entries->count);
+    if (py_value == NULL || PyDict_SetItemString(py_table, "new_path", py_value) < 0)
+        goto error;
+    Py_DECREF(py_value);
+
+    return py_table;
+
+error:
+    Py_XDECREF(py_value);
+    Py_DECREF(py_table);
+    return NULL;
+}
+
+typedef struct {
+    const char *path;
+    const char *workdir;
+    git_index *index;
+    git_status_options opts;
+    status_entries entries;
+    int error;
+    int error_class;
+    char *error_message;
+} status_job;
+
+/* A copy of index, unsaved changes included. Reading an index from several
+ * threads is fine once its entries are sorted, but a repository given an
+ * index takes ownership of it, and drops it when freed */
+static int
+status_index_dup(git_index **out, git_index *index)
+{
+    git_index *dup = NULL;
+    size_t i, n;
+    int err;
+
+    err = git_index_open(&dup, NULL);
+    if (err == 0)
+        err = git_index_set_caps(dup, git_index_caps(index));
+
+    n = git_index_entrycount(index);
+    for (i = 0; err == 0 && i < n; i++)
+        err = git_index_add(dup, git_index_get_byindex(index, i));
+
+    if (err < 0) {
+        git_index_free(dup);
+        return err;
+    }
+
+    *out = dup;
+    return 0;
+}
+
+static void
+status_job_run(void *payload)
+{
+    status_job *job = (status_job*)payload;
+    git_repository *repo = NULL;
+    git_index *index = NULL;
+    git_status_list *list = NULL;
+    git_status_options opts = job->opts;
+    const git_error *error;
+    size_t i;
+    int err;
+
+    /* libgit2 repositories must not be shared between threads. Every job
+     * gets a copy of the index, so unsaved changes are seen */
+    err = git_repository_open_ext(&repo, job->path, GIT_REPOSITORY_OPEN_NO_SEARCH, NULL);
+    if (err == 0)
+        err = git_repository_set_workdir(repo, job->workdir, 0);
+    if (err == 0)
+        err = status_index_dup(&index, job->index);
+    if (err == 0)
+        err = git_repository_set_index(repo, index);
+
+    /* One path at a time, so libgit2 only iterates below its prefix */
+    opts.pathspec.count = 1;
+    for (i = 0; err == 0 && i < job->opts.pathspec.count; i++) {
+        opts.pathspec.strings = &job->opts.pathspec.strings[i];
+        err = git_status_list_new(&list, repo, &opts);
+        if (err == 0)
+            err = status_entries_collect(&job->entries, list);
+        git_status_list_free(list);
+        list = NULL;
+    }
+
+    if (err < 0) {
+        job->error = err;
+        error = git_error_last();
+        if (error != NULL) {
+            job->error_class = error->klass;
+            job->error_message = strdup(error->message);
+        }
+    }
+
+    git_index_free(index);
+    git_repository_free(repo);
+}
+
+static void
+free_paths(char **paths, size_t count)
+{
+    size_t i;
+
+    if (paths == NULL)
+        return;
+
+    for (i = 0; i < count; i++)
+        free(paths[i]);
+    free(paths);
+}
+
+static int
+py_paths_to_array(PyObject *py_paths, char ***out, size_t *count)
+{
+    PyObject *seq, *tvalue;
+    char **paths, *path;
+    Py_ssize_t i, n;
+
+    seq = PySequence_Fast(py_paths, "paths must be a sequence");
+    if (seq == NULL)
+        return -1;
+
+    n = PySequence_Fast_GET_SIZE(seq);
+    paths = calloc(n ? n : 1, sizeof(char*));
+    if (paths == NULL) {
+        Py_DECREF(seq);
+        PyErr_NoMemory();
+        return -1;
+    }
+
+    for (i = 0; i < n; i++) {
+        path = pgit_borrow_fsdefault(PySequence_Fast_GET_ITEM(seq, i), &tvalue);
+        if (path == NULL)
+            goto error;
+
+        paths[i] = strdup(path);
+        Py_DECREF(tvalue);
+        if (paths[i] == NULL) {
+            PyErr_NoMemory();
+            goto error;
+        }
+    }
+
+    Py_DECREF(seq);
+    *out = paths;
+    *count = (size_t)n;
+    return 0;
+
+error:
+    Py_DECREF(seq);
+    free_paths(paths, n);
+    return -1;
+}
+
+/* The top level names of the HEAD tree, the index and the worktree, sorted */
+static int
+status_top_level_paths(Repository *self, git_index *index, char ***out, size_t *count)
+{
+    PyObject *names, *os, *listing = NULL, *name, *sorted = NULL;
+    const git_index_entry *entry;
+    git_object *head = NULL;
+    const char *slash;
+    size_t i, n;
+    int err = -1;
+
+    names = PySet_New(NULL);
+    if (names == NULL)
+        return -1;
+
+    /* Staged deletions are only in the HEAD tree */
+    err = git_revparse_single(&head, self->repo, "HEAD^{tree}");
+    if (err == 0) {
+        n = git_tree_entrycount((git_tree*)head);
+        for (i = 0; i < n; i++) {
+            name = PyUnicode_DecodeFSDefault(
+                git_tree_entry_name(git_tree_entry_byindex((git_tree*)head, i)));
+            if (name == NULL || PySet_Add(names, name) < 0) {
+                Py_XDECREF(name);
+                err = -1;
+                goto exit;
+            }
+            Py_DECREF(name);
+        }
+    } else if (err != GIT_ENOTFOUND && err != GIT_EUNBORNBRANCH) {
+        Error_set(err);
+        goto exit;
+    }
+    err = -1;
+
+    n = git_index_entrycount(index);
+    for (i = 0; i < n; i++) {
+        entry = git_index_get_byindex(index, i);
+        slash = strchr(entry->path, '/');
+        name = PyUnicode_DecodeFSDefaultAndSize(
+            entry->path, slash ? slash - entry->path : (Py_ssize_t)strlen(entry->path));
+        if (name == NULL || PySet_Add(names, name) < 0) {
+            Py_XDECREF(name);
+            goto exit;
+        }
+        Py_DECREF(name);
+    }
+
+    os = PyImport_ImportModule("os");
+    if (os == NULL)
+        goto exit;
+    listing = PyObject_CallMethod(os, "listdir", "s", git_repository_workdir(self->repo));
+    Py_DECREF(os);
+    if (listing == NULL)
+        goto exit;
+
+    n = (size_t)PyList_GET_SIZE(listing);
+    for (i = 0; i < n; i++) {
+        name = PyList_GET_ITEM(listing, i);
+        if (PyUnicode_CompareWithASCIIString(name, ".git") == 0)
+            continue;
+        if (PySet_Add(names, name) < 0)
+            goto exit;
+    }
+
+    sorted = PySequence_List(names);
+    if (sorted == NULL || PyList_Sort(sorted) < 0)
+        goto exit;
+
+    err = py_paths_to_array(sorted, out, count);
+
+exit:
+    git_object_free(head);
+    Py_DECREF(names);
+    Py_XDECREF(listing);
+    Py_XDECREF(sorted);
+    return err;
+}
+
+/* Compute the status into entries, with the GIL released. With more than one
+ * worker the paths (by default the top level entries of the worktree) are
+ * split between the workers. */
+static int
+Repository_status_entries(Repository *self, git_status_options *opts,
+                          PyObject *py_paths, Py_ssize_t workers,
+                          status_entries *entries)
+{
+    git_status_list *list;
+    git_index *index = NULL;
+    status_job *jobs = NULL;
+    char **paths = NULL;
+    char ***job_paths = NULL;
+    size_t npaths = 0, njobs, i, j;
+    int err = -1;
+
+    if (py_paths != NULL && py_paths != Py_None) {
+        if (py_paths_to_array(py_paths, &paths, &npaths) < 0)
+            return -1;
+    }
+
+    /* Renames may cross the partitions, so they need a single status */
+    if (workers <= 1 || git_repository_is_bare(self->repo) || (paths && npaths == 0) ||
+        opts->flags & GIT_STATUS_OPT_RENAMES_HEAD_TO_INDEX) {
+        opts->pathspec.strings = paths;
+        opts->pathspec.count = npaths;
+
+        Py_BEGIN_ALLOW_THREADS
+        err = git_status_list_new(&list, self->repo, opts);
+        if (err == 0) {
+            err = status_entries_collect(entries, list);
+            git_status_list_free(list);
+        }
+        Py_END_ALLOW_THREADS
+
+        if (err < 0)
+            Error_set(err);
+        goto exit;
+    }
+
+    /* Soft refresh of the index, once for all the jobs */
+    err = git_repository_index(&index, self->repo);
+    if (err == 0)
+        err = git_index_read(index, 0);
+    if (err < 0) {
+        Error_set(err);
+        goto exit;
+    }
+    /* Sorts the entries, before the jobs read them */
+    git_index_get_byindex(index, 0);
+
+    if (paths == NULL) {
+        if (status_top_level_paths(self, index, &paths, &npaths) < 0)
+            goto exit;
+        /* Literal paths, so they match everything below them */
+        opts->flags |= GIT_STATUS_OPT_DISABLE_PATHSPEC_MATCH;
+    }
+    opts->flags |= GIT_STATUS_OPT_NO_REFRESH;
+
+    njobs = (size_t)workers < npaths ? (size_t)workers : npaths;
+    if (njobs == 0) {
+        err = 0;
+        goto exit;
+    }
+
+    jobs = calloc(njobs, sizeof(status_job));
+    job_paths = calloc(njobs, sizeof(char**));
+    if (jobs == NULL || job_paths == NULL) {
+        PyErr_NoMemory();
+        goto exit;
+    }
+
+    for (i = 0; i < njobs; i++) {
+        job_paths[i] = calloc(npaths / njobs + 1, sizeof(char*));
+        if (job_paths[i] == NULL) {
+            PyErr_NoMemory();
+            goto exit;
+        }
+
+        jobs[i].path = git_repository_path(self->repo);
+        jobs[i].workdir = git_repository_workdir(self->repo);
+        jobs[i].index = index;
+        jobs[i].opts = *opts;
+        jobs[i].entries.with_new_paths = entries->with_new_paths;
+        jobs[i].opts.pathspec.strings = job_paths[i];
+        for (j = i; j < npaths; j += njobs)
+            job_paths[i][jobs[i].opts.pathspec.count++] = paths[j];
+    }
+
+    Py_BEGIN_ALLOW_THREADS
+    pgit_run_parallel(status_job_run, jobs, sizeof(status_job), njobs);
+    Py_END_ALLOW_THREADS
+
+    err = 0;
+    for (i = 0; i < njobs; i++) {
+        if (err == 0 && jobs[i].error < 0) {
+            err = jobs[i].error;
+            if (jobs[i].error_message)
+                git_error_set_str(jobs[i].error_class, jobs[i].error_message);
+            Error_set(err);
+        }
+        if (err == 0 && status_entries_append(entries, &jobs[i].entries) < 0) {
+            err = -1;
+            PyErr_NoMemory();
+        }
+    }
+
+    /* The pathspecs of the jobs may match the same files */
+    if (err == 0 && status_entries_sort(
+            entries, git_index_caps(index) & GIT_INDEX_CAPABILITY_IGNORE_CASE) < 0) {
+        err = -1;
+        PyErr_NoMemory();
+    }
+
+exit:
+    if (jobs) {
+        for (i = 0; i < njobs; i++) {
+            status_entries_dispose(&jobs[i].entries);
+            free(jobs[i].error_message);
+            if (job_paths)
+                free(job_paths[i]);
+        }
+    }
+    free(jobs);
+    free(job_paths);
+    free_paths(paths, npaths);
+    git_index_free(index);
+    return err;
+}
+
 PyDoc_STRVAR(Repository_status__doc__,
-  "status(untracked_files: str = \"all\", ignored: bool = False) -> dict[str, enums.FileStatus]\n"
+  "status(untracked_files: str = \"all\", ignored: bool = False, paths: list[str] = None, workers: int = 1, renames: bool = False, as_table: bool = False, literal_paths: bool = False) -> dict[str, enums.FileStatus] | dict\n"
   "\n"
   "Reads the status of the repository and returns a dictionary with file\n"
   "paths as keys and FileStatus flags as values.\n"
@@ -1709,21 +2464,62 @@ PyDoc_STRVAR(Repository_status__doc__,
   "\n"
   "ignored\n"
   "    Whether to show ignored files with untracked files. Ignored when untracked_files == \"no\"\n"
-  "    Defaults to False.\n");
+  "    Defaults to False.\n"
+  "\n"
+  "paths\n"
+  "    Pathspecs (e.g. directories or glob patterns) to restrict the status\n"
+  "    to. Defaults to the whole worktree.\n"
+  "\n"
+  "workers\n"
+  "    Number of threads to compute the status with. The paths, or the top\n"
+  "    level entries of the worktree when no paths are given, are split\n"
+  "    between the threads; the entries are the same, in the same order, as\n"
+  "    with one. Defaults to 1.\n"
+  "\n"
+  "renames\n"
+  "    Whether to detect renames, in the index and in the worktree. Renamed\n"
+  "    entries are keyed by their old path. A single thread is used then.\n"
+  "    Defaults to False.\n"
+  "\n"
+  "as_table\n"
+  "    Instead of a dictionary, return the entries as columns, without\n"
+  "    creating a Python object per entry. The result is a dict with:\n"
+  "\n"
+  "    * path: a tuple (data, offsets) where data is the bytes of all the\n"
+  "      paths joined, and offsets is an array('Q') with n+1 items, the\n"
+  "      i-th path being data[offsets[i]:offsets[i+1]]. This is the old path\n"
+  "      of renamed entries, the same as the dictionary keys.\n"
+  "    * flags: array('I'), the FileStatus flags of every entry.\n"
+  "    * new_path: like path, the path every entry ends up at after the\n"
+  "      renames; for entries not renamed it is the same as path.\n"
+  "\n"
+  "    Defaults to False.\n"
+  "\n"
+  "literal_paths\n"
+  "    Whether paths are file or directory names rather than pathspecs:\n"
+  "    *, ? and [ in them match themselves only. Defaults to False.\n");
 
 PyObject *
 Repository_status(Repository *self, PyObject *args, PyObject *kw)
 {
+    status_entries entries = STATUS_ENTRIES_INIT;
+    const char *path;
+    const unsigned int *flags;
+    size_t i;
     int err;
-    size_t len, i;
-    git_status_list *list;
 
     char *untracked_files = "all";
-    static char *kwlist[] = {"untracked_files", "ignored", NULL};
+    static char *kwlist[] = {"untracked_files", "ignored", "paths", "workers",
+                             "renames", "as_table", "literal_paths", NULL};
 
     PyObject* ignored = Py_False;
+    PyObject* py_paths = NULL;
+    Py_ssize_t workers = 1;
+    int renames = 0, as_table = 0, literal_paths = 0;
 
-    if (!PyArg_ParseTupleAndKeywords(args, kw, "|sO", kwlist, &untracked_files, &ignored))
+    if (!PyArg_ParseTupleAndKeywords(args, kw, "|sOOnppp", kwlist, &untracked_files,
+                                     &ignored, &py_paths, &workers, &renames,
+                                     &as_table, &literal_paths))
         return NULL;
 
     git_status_options opts = GIT_STATUS_OPTIONS_INIT;
@@ -1745,49 +2541,54 @@ Repository_status(Repository *self, PyObject *args, PyObject *kw)
     if (!PyObject_IsTrue(ignored)) {
         opts.flags &= ~GIT_STATUS_OPT_INCLUDE_IGNORED;
     }
+    if (renames) {
+        opts.flags |= GIT_STATUS_OPT_RENAMES_HEAD_TO_INDEX |
+                      GIT_STATUS_OPT_RENAMES_INDEX_TO_WORKDIR;
+    }
+    if (literal_paths) {
+        opts.flags |= GIT_STATUS_OPT_DISABLE_PATHSPEC_MATCH;
+    }
 
-    err = git_status_list_new(&list, self->repo, &opts);
-    if (err < 0)
-        return Error_set(err);
+    entries.with_new_paths = as_table;
+    if (Repository_status_entries(self, &opts, py_paths, workers, &entries) < 0)
+        goto error;
+
+    if (as_table) {
+        PyObject *table = status_entries_to_table(&entries);
+        status_entries_dispose(&entries);
+        return table;
+    }
 
     PyObject *dict = PyDict_New();
     if (dict == NULL)
         goto error;
 
-    len = git_status_list_entrycount(list);
-    for (i = 0; i < len; i++) {
-        const git_status_entry *entry;
-        const char *path;
+    path = entries.paths.ptr;
+    flags = (const unsigned int*)entries.flags.ptr;
+    for (i = 0; i < entries.count; i++) {
         PyObject *status;
 
-        entry = git_status_byindex(list, i);
-        if (entry == NULL)
-            goto error;
-
-        /* We need to choose one of the strings */
-        if (entry->head_to_index)
-            path = entry->head_to_index->old_file.path;
-        else
-            path = entry->index_to_workdir->old_file.path;
-
         /* Get corresponding entry in enums.FileStatus for status int */
-        status = pygit2_enum(FileStatusEnum, entry->status);
+        status = pygit2_enum(FileStatusEnum, flags[i]);
         if (status == NULL)
-            goto error;
+            goto error_dict;
 
         err = PyDict_SetItemString(dict, path, status);
         Py_CLEAR(status);
 
         if (err < 0)
-            goto error;
+            goto error_dict;
+
+        path += strlen(path) + 1;
     }
 
-    git_status_list_free(list);
+    status_entries_dispose(&entries);
     return dict;
 
-error:
-    git_status_list_free(list);
+error_dict:
     Py_CLEAR(dict);
+error:
+    status_entries_dispose(&entries);
     return NULL;
 }
 
@@ -1818,6 +2619,536 @@ Repository_status_file(Repository *self, PyObject *value)
 }
 
 
+/*
+ * Many tree to tree diffs at once, for Repository.diff_commits. Every job
+ * takes the pairs i, i + step... and appends, for every pair, the number of
+ * changes to counts, and for every change the status char, the old path and
+ * the new path, NUL terminated, to changes.
+ */
+
+typedef struct {
+    const char *path;           /* To open a repository, if repo is NULL */
+    git_repository *repo;
+    int own_repo;
+    const git_diff_options *opts;
+    int renames;
+    const git_oid *old_ids;
+    const git_oid *new_ids;
+    size_t start;
+    size_t end;
+    size_t step;
+    pgit_buf counts;            /* size_t per pair */
+    pgit_buf changes;
+    size_t pos;                 /* Read position in changes */
+    int error;
+    int error_class;
+    char *error_message;
+} diff_trees_job;
+
+static int
+diff_trees_lookup(git_tree **out, git_repository *repo, const git_oid *oid)
+{
+    git_object *obj;
+    int err;
+
+    *out = NULL;
+    if (git_oid_is_zero(oid))
+        return 0;
+
+    err = git_object_lookup(&obj, repo, oid, GIT_OBJECT_ANY);
+    if (err < 0)
+        return err;
+
+    err = git_object_peel((git_object**)out, obj, GIT_OBJECT_TREE);
+    git_object_free(obj);
+    return err;
+}
+
+static int
+diff_trees_one(diff_trees_job *job, size_t i)
+{
+    git_diff_find_options find_opts = GIT_DIFF_FIND_OPTIONS_INIT;
+    git_tree *old_tree = NULL, *new_tree = NULL;
+    git_diff *diff = NULL;
+    const git_diff_delta *delta;
+    size_t j, n = 0;
+    char status;
+    int err;
+
+    err = diff_trees_lookup(&old_tree, job->repo, &job->old_ids[i]);
+    if (err == 0)
+        err = diff_trees_lookup(&new_tree, job->repo, &job->new_ids[i]);
+    if (err == 0)
+        err = git_diff_tree_to_tree(&diff, job->repo, old_tree, new_tree, job->opts);
+    if (err == 0 && job->renames) {
+        find_opts.flags = GIT_DIFF_FIND_RENAMES;
+        err = git_diff_find_similar(diff, &find_opts);
+    }
+
+    if (err == 0)
+        n = git_diff_num_deltas(diff);
+    for (j = 0; err == 0 && j < n; j++) {
+        delta = git_diff_get_delta(diff, j);
+        status = git_diff_status_char(delta->status);
+        if (pgit_buf_put(&job->changes, &status, 1) < 0 ||
+            pgit_buf_put(&job->changes, delta->old_file.path, strlen(delta->old_file.path) + 1) < 0 ||
+            pgit_buf_put(&job->changes, delta->new_file.path, strlen(delta->new_file.path) + 1) < 0)
+            err = GIT_ERROR;
+    }
+    if (err == 0 && pgit_buf_put(&job->counts, &n, sizeof(n)) < 0)
+        err = GIT_ERROR;
+
+    git_diff_free(diff);
+    git_tree_free(old_tree);
+    git_tree_free(new_tree);
+    return err;
+}
+
+static void
+diff_trees_job_run(void *payload)
+{
+    diff_trees_job *job = (diff_trees_job*)payload;
+    const git_error *error;
+    size_t i;
+    int err = 0;
+
+    /* libgit2 repositories must not be shared between threads */
+    if (job->repo == NULL) {
+        err = git_repository_open_ext(&job->repo, job->path,
+                                      GIT_REPOSITORY_OPEN_NO_SEARCH, NULL);
+        job->own_repo = (err == 0);
+    }
+
+    for (i = job->start; err == 0 && i < job->end; i += job->step)
+        err = diff_trees_one(job, i);
+
+    if (err < 0) {
+        job->error = err;
+        error = git_error_last();
+        if (error != NULL) {
+            job->error_class = error->klass;
+            job->error_message = strdup(error->message);
+        }
+    }
+}
+
+static PyObject *
+diff_trees_job_next(diff_trees_job *job, size_t k)
+{
+    PyObject *py_changes, *py_change, *py_old, *py_new;
+    size_t j, count;
+    const char *old_path, *new_path;
+    char status;
+
+    count = ((size_t*)job->counts.ptr)[k];
+    py_changes = PyList_New(count);
+    if (py_changes == NULL)
+        return NULL;
+
+    for (j = 0; j < count; j++) {
+        status = job->changes.ptr[job->pos];
+        old_path = job->changes.ptr + job->pos + 1;
+        new_path = old_path + strlen(old_path) + 1;
+        job->pos = (new_path + strlen(new_path) + 1) - job->changes.ptr;
+
+        py_old = PyUnicode_DecodeFSDefault(old_path);
+        if (py_old != NULL && strcmp(old_path, new_path) == 0) {
+            /* Not a rename, share the string */
+            Py_INCREF(py_old);
+            py_new = py_old;
+        } else {
+            py_new = py_old ? PyUnicode_DecodeFSDefault(new_path) : NULL;
+        }
+
+        py_change = NULL;
+        if (py_old && py_new)
+            py_change = Py_BuildValue("(s#OO)", &status, (Py_ssize_t)1, py_old, py_new);
+        Py_XDECREF(py_old);
+        Py_XDECREF(py_new);
+        if (py_change == NULL) {
+            Py_DECREF(py_changes);
+            return NULL;
+        }
+        PyList_SET_ITEM(py_changes, j, py_change);
+    }
+
+    return py_changes;
+}
+
+PyDoc_STRVAR(Repository__diff_trees__doc__,
+  "_diff_trees(old_ids: bytes, new_ids: bytes, flags: int, renames: bool, workers: int) -> list\n"
+  "\n"
+  "Engine of Repository.diff_commits. Takes two buffers of packed raw oids\n"
+  "of commits or trees, a zero oid being the empty tree, and returns the\n"
+  "list of (status, old_path, new_path) changes of every pair.");
+
+PyObject *
+Repository__diff_trees(Repository *self, PyObject *args)
+{
+    git_diff_options opts = GIT_DIFF_OPTIONS_INIT;
+    diff_trees_job *jobs = NULL;
+    git_oid *oids = NULL;
+    Py_buffer old_view, new_view;
+    PyObject *py_result = NULL, *py_changes;
+    Py_ssize_t workers;
+    size_t i, count, njobs = 0;
+    int renames, serial, err = 0;
+
+    if (!PyArg_ParseTuple(args, "y*y*Ipn", &old_view, &new_view, &opts.flags,
+                          &renames, &workers))
+        return NULL;
+
+    if (old_view.len != new_view.len || old_view.len % GIT_OID_RAWSZ) {
+        PyErr_SetString(PyExc_ValueError, "expected two buffers of as many oids");
+        goto exit;
+    }
+
+    count = old_view.len / GIT_OID_RAWSZ;
+    oids = malloc((2 * count + 1) * sizeof(git_oid));
+    if (oids == NULL) {
+        PyErr_NoMemory();
+        goto exit;
+    }
+    for (i = 0; i < count; i++) {
+        git_oid_fromraw(&oids[i], (const unsigned char*)old_view.buf + i * GIT_OID_RAWSZ);
+        git_oid_fromraw(&oids[count + i], (const unsigned char*)new_view.buf + i * GIT_OID_RAWSZ);
+    }
+
+    /* Workers reopen the repository by its path. When they cannot, diff on
+     * self->repo in this thread, keeping the GIL for its Python backends */
+    serial = !pgit_repository_can_reopen(self->repo);
+    njobs = (serial || workers < 1) ? 1 : (size_t)workers;
+    if (njobs > count)
+        njobs = count ? count : 1;
+
+    jobs = calloc(njobs, sizeof(diff_trees_job));
+    if (jobs == NULL) {
+        PyErr_NoMemory();
+        goto exit;
+    }
+
+    for (i = 0; i < njobs; i++) {
+        jobs[i].path = git_repository_path(self->repo);
+        jobs[i].repo = (njobs == 1) ? self->repo : NULL;
+        jobs[i].opts = &opts;
+        jobs[i].renames = renames;
+        jobs[i].old_ids = oids;
+        jobs[i].new_ids = oids + count;
+        jobs[i].start = i;
+        jobs[i].end = count;
+        jobs[i].step = njobs;
+    }
+
+    if (serial) {
+        diff_trees_job_run(jobs);
+    } else {
+        Py_BEGIN_ALLOW_THREADS
+        pgit_run_parallel(diff_trees_job_run, jobs, sizeof(diff_trees_job), njobs);
+        Py_END_ALLOW_THREADS
+    }
+
+    for (i = 0; i < njobs; i++) {
+        if (jobs[i].error < 0) {
+            err = jobs[i].error;
+            if (jobs[i].error_message)
+                git_error_set_str(jobs[i].error_class, jobs[i].error_message);
+            Error_set(err);
+            goto exit;
+        }
+    }
+
+    py_result = PyList_New(count);
+    if (py_result == NULL)
+        goto exit;
+
+    for (i = 0; i < count; i++) {
+        py_changes = diff_trees_job_next(&jobs[i % njobs], i / njobs);
+        if (py_changes == NULL) {
+            Py_CLEAR(py_result);
+            goto exit;
+        }
+        PyList_SET_ITEM(py_result, i, py_changes);
+    }
+
+exit:
+    if (jobs) {
+        for (i = 0; i < njobs; i++) {
+            if (jobs[i].own_repo)
+                git_repository_free(jobs[i].repo);
+            pgit_buf_dispose(&jobs[i].counts);
+            pgit_buf_dispose(&jobs[i].changes);
+            free(jobs[i].error_message);
+        }
+        free(jobs);
+    }
+    free(oids);
+    PyBuffer_Release(&old_view);
+    PyBuffer_Release(&new_view);
+    return py_result;
+}
+
+
+/*
+ * Blame of many files, or of ranges of lines of a file, in threads, see
+ * Repository.blame_iter
+ */
+
+typedef struct {
+    const char *path;           /* To open a repository, if repo is NULL */
+    git_repository *repo;
+    int own_repo;
+    const git_blame_options *opts;
+    const char **paths;
+    const size_t *lines;        /* min_line, max_line pairs */
+    git_blame **blames;
+    size_t start;
+    size_t end;
+    size_t step;
+    int error;
+    int error_class;
+    char *error_message;
+} blame_job;
+
+static void
+blame_job_run(void *payload)
+{
+    blame_job *job = (blame_job*)payload;
+    git_blame_options opts;
+    const git_error *error;
+    size_t i;
+    int err = 0;
+
+    /* libgit2 repositories must not be shared between threads */
+    if (job->repo == NULL) {
+        err = git_repository_open_ext(&job->repo, job->path,
+                                      GIT_REPOSITORY_OPEN_NO_SEARCH, NULL);
+        job->own_repo = (err == 0);
+    }
+
+    for (i = job->start; err == 0 && i < job->end; i += job->step) {
+        opts = *job->opts;
+        opts.min_line = job->lines[2 * i];
+        opts.max_line = job->lines[2 * i + 1];
+        err = git_blame_file(&job->blames[i], job->repo, job->paths[i], &opts);
+    }
+
+    if (err < 0) {
+        job->error = err;
+        error = git_error_last();
+        if (error != NULL) {
+            job->error_class = error->klass;
+            job->error_message = strdup(error->message);
+        }
+    }
+}
+
+static PyObject *
+blame_hunk_signature(const git_signature *signature)
+{
+    git_signature *copy;
+
+    if (signature == NULL)
+        Py_RETURN_NONE;
+
+    if (git_signature_dup(&copy, signature) < 0)
+        return Error_set(GIT_ERROR);
+
+    return build_signature(NULL, copy, "utf-8");
+}
+
+static PyObject *
+blame_hunks_to_python(git_blame *blame)
+{
+    const git_blame_hunk *hunk;
+    PyObject *py_hunks, *py_hunk;
+    PyObject *final_id, *final_sig, *orig_id, *orig_sig, *orig_path;
+    uint32_t i, n;
+
+    n = git_blame_get_hunk_count(blame);
+    py_hunks = PyList_New(n);
+    if (py_hunks == NULL)
+        return NULL;
+
+    for (i = 0; i < n; i++) {
+        hunk = git_blame_get_hunk_byindex(blame, i);
+        final_id = git_oid_to_python(&hunk->final_commit_id);
+        final_sig = blame_hunk_signature(hunk->final_signature);
+        orig_id = git_oid_to_python(&hunk->orig_commit_id);
+        orig_sig = blame_hunk_signature(hunk->orig_signature);
+        if (hunk->orig_path) {
+            orig_path = PyUnicode_FromString(hunk->orig_path);
+        } else {
+            orig_path = Py_None;
+            Py_INCREF(orig_path);
+        }
+
+        py_hunk = NULL;
+        if (final_id && final_sig && orig_id && orig_sig && orig_path)
+            py_hunk = Py_BuildValue("(nOnOOOnON)",
+                                    (Py_ssize_t)hunk->lines_in_hunk,
+                                    final_id,
+                                    (Py_ssize_t)hunk->final_start_line_number,
+                                    final_sig,
+                                    orig_id,
+                                    orig_path,
+                                    (Py_ssize_t)hunk->orig_start_line_number,
+                                    orig_sig,
+                                    PyBool_FromLong(hunk->boundary));
+        Py_XDECREF(final_id);
+        Py_XDECREF(final_sig);
+        Py_XDECREF(orig_id);
+        Py_XDECREF(orig_sig);
+        Py_XDECREF(orig_path);
+        if (py_hunk == NULL) {
+            Py_DECREF(py_hunks);
+            return NULL;
+        }
+        PyList_SET_ITEM(py_hunks, i, py_hunk);
+    }
+
+    return py_hunks;
+}
+
+PyDoc_STRVAR(Repository__blame__doc__,
+  "_blame(units: list[tuple[bytes, int, int]], flags: int, min_match_characters: int, newest_commit: bytes, oldest_commit: bytes, workers: int) -> list\n"
+  "\n"
+  "Engine of Repository.blame_iter. Blames every (path, min_line, max_line)\n"
+  "unit, 0 meaning the whole file, with the GIL released, and returns the\n"
+  "list of hunks of every unit, a hunk being the tuple (lines_in_hunk,\n"
+  "final_commit_id, final_start_line_number, final_committer,\n"
+  "orig_commit_id, orig_path, orig_start_line_number, orig_committer,\n"
+  "boundary). The commits are raw oids, empty for the defaults.");
+
+PyObject *
+Repository__blame(Repository *self, PyObject *args)
+{
+    git_blame_options opts = GIT_BLAME_OPTIONS_INIT;
+    blame_job *jobs = NULL;
+    git_blame **blames = NULL;
+    const char **paths = NULL;
+    size_t *lines = NULL;
+    PyObject *py_units, *py_unit, *py_result = NULL, *py_hunks;
+    const char *newest, *oldest;
+    Py_ssize_t newest_len, oldest_len, workers, min_line, max_line;
+    size_t i, count = 0, njobs = 0;
+    int serial, err = 0;
+
+    if (!PyArg_ParseTuple(args, "O!IHy#y#n", &PyList_Type, &py_units,
+                          &opts.flags, &opts.min_match_characters,
+                          &newest, &newest_len, &oldest, &oldest_len, &workers))
+        return NULL;
+
+    if ((newest_len && newest_len != GIT_OID_RAWSZ) ||
+        (oldest_len && oldest_len != GIT_OID_RAWSZ)) {
+        PyErr_SetString(PyExc_ValueError, "expected raw oids");
+        return NULL;
+    }
+    if (newest_len)
+        git_oid_fromraw(&opts.newest_commit, (const unsigned char*)newest);
+    if (oldest_len)
+        git_oid_fromraw(&opts.oldest_commit, (const unsigned char*)oldest);
+
+    /* The units are kept alive by the list, for the paths */
+    Py_INCREF(py_units);
+    count = (size_t)PyList_GET_SIZE(py_units);
+    paths = calloc(count + 1, sizeof(char*));
+    lines = calloc(2 * count + 1, sizeof(size_t));
+    blames = calloc(count + 1, sizeof(git_blame*));
+    if (paths == NULL || lines == NULL || blames == NULL) {
+        PyErr_NoMemory();
+        goto exit;
+    }
+
+    for (i = 0; i < count; i++) {
+        py_unit = PyList_GET_ITEM(py_units, i);
+        if (!PyArg_ParseTuple(py_unit, "ynn", &paths[i], &min_line, &max_line))
+            goto exit;
+        if (min_line < 0 || max_line < 0) {
+            PyErr_SetString(PyExc_ValueError, "negative line number");
+            goto exit;
+        }
+        lines[2 * i] = (size_t)min_line;
+        lines[2 * i + 1] = (size_t)max_line;
+    }
+
+    /* Workers reopen the repository by its path. When they cannot, blame
+     * on self->repo in this thread, keeping the GIL for its Python backends */
+    serial = !pgit_repository_can_reopen(self->repo);
+    njobs = (serial || workers < 1) ? 1 : (size_t)workers;
+    if (njobs > count)
+        njobs = count ? count : 1;
+
+    jobs = calloc(njobs, sizeof(blame_job));
+    if (jobs == NULL) {
+        PyErr_NoMemory();
+        goto exit;
+    }
+
+    for (i = 0; i < njobs; i++) {
+        jobs[i].path = git_repository_path(self->repo);
+        jobs[i].repo = (njobs == 1) ? self->repo : NULL;
+        jobs[i].opts = &opts;
+        jobs[i].paths = paths;
+        jobs[i].lines = lines;
+        jobs[i].blames = blames;
+        jobs[i].start = i;
+        jobs[i].end = count;
+        jobs[i].step = njobs;
+    }
+
+    if (serial) {
+        blame_job_run(jobs);
+    } else {
+        Py_BEGIN_ALLOW_THREADS
+        pgit_run_parallel(blame_job_run, jobs, sizeof(blame_job), njobs);
+        Py_END_ALLOW_THREADS
+    }
+
+    for (i = 0; i < njobs; i++) {
+        if (jobs[i].error < 0) {
+            err = jobs[i].error;
+            if (jobs[i].error_message)
+                git_error_set_str(jobs[i].error_class, jobs[i].error_message);
+            Error_set(err);
+            goto exit;
+        }
+    }
+
+    py_result = PyList_New(count);
+    if (py_result == NULL)
+        goto exit;
+
+    for (i = 0; i < count; i++) {
+        py_hunks = blame_hunks_to_python(blames[i]);
+        if (py_hunks == NULL) {
+            Py_CLEAR(py_result);
+            goto exit;
+        }
+        PyList_SET_ITEM(py_result, i, py_hunks);
+    }
+
+exit:
+    /* The blames before the repositories they were made with */
+    if (blames) {
+        for (i = 0; i < count; i++)
+            git_blame_free(blames[i]);
+        free(blames);
+    }
+    if (jobs) {
+        for (i = 0; i < njobs; i++) {
+            if (jobs[i].own_repo)
+                git_repository_free(jobs[i].repo);
+            free(jobs[i].error_message);
+        }
+        free(jobs);
+    }
+    free(paths);
+    free(lines);
+    Py_DECREF(py_units);
+    return py_result;
+}
+
+
 PyDoc_STRVAR(Repository_TreeBuilder__doc__,
   "TreeBuilder([tree]) -> TreeBuilder\n"
   "\n"
@@ -2417,6 +3748,8 @@ PyMethodDef Repository_methods[] = {
     METHOD(Repository, merge_base_many, METH_VARARGS),
     METHOD(Repository, merge_base_octopus, METH_VARARGS),
     METHOD(Repository, merge_analysis, METH_VARARGS),
+    METHOD(Repository, write_commit_graph, METH_NOARGS),
+    METHOD(Repository, use_commit_graph, METH_VARARGS | METH_KEYWORDS),
     METHOD(Repository, cherrypick, METH_O),
     METHOD(Repository, apply, METH_VARARGS | METH_KEYWORDS),
     METHOD(Repository, applies, METH_VARARGS | METH_KEYWORDS),
@@ -2450,6 +3783,8 @@ PyMethodDef Repository_methods[] = {
     METHOD(Repository, lookup_worktree, METH_VARARGS),
     METHOD(Repository, list_worktrees, METH_VARARGS),
     METHOD(Repository, _from_c, METH_VARARGS),
+    METHOD(Repository, _diff_trees, METH_VARARGS),
+    METHOD(Repository, _blame, METH_VARARGS),
     METHOD(Repository, _disown, METH_NOARGS),
     METHOD(Repository, set_odb, METH_O),
     METHOD(Repository, set_refdb, METH_O),
@@ -40,6 +40,7 @@ typedef enum {
 } git_reference_iterator_return_t;
 
 PyObject *wrap_repository(git_repository *c_repo);
+int pgit_repository_can_reopen(git_repository *repo);
 
 int  Repository_init(Repository *self, PyObject *args, PyObject *kwds);
 int  Repository_traverse(Repository *self, visitproc visit, void *arg);
@@ -72,5 +73,7 @@ PyObject* Repository_TreeBuilder(Repository *self, PyObject *args);
 PyObject* Repository_cherrypick(Repository *self, PyObject *py_oid);
 PyObject* Repository_apply(Repository *self, PyObject *py_diff, PyObject *kwds);
 PyObject* Repository_merge_analysis(Repository *self, PyObject *args);
+PyObject* Repository_write_commit_graph(Repository *self);
+PyObject* Repository_use_commit_graph(Repository *self, PyObject *args, PyObject *kwds);
 
 #endif
@@ -238,7 +238,7 @@ Tree_diff_to_workdir(Tree *self, PyObject *args)
     if (err < 0)
         return Error_set(err);
 
-    return wrap_diff(diff, self->repo);
+    return wrap_diff_with_options(diff, self->repo, &opts);
 }
 
 
@@ -314,7 +314,7 @@ Tree_diff_to_index(Tree *self, PyObject *args, PyObject *kwds)
     if (err < 0)
         return Error_set(err);
 
-    return wrap_diff(diff, self->repo);
+    return wrap_diff_with_options(diff, self->repo, &opts);
 
 error:
     Py_DECREF(py_idx_ptr);
@@ -383,7 +383,7 @@ Tree_diff_to_tree(Tree *self, PyObject *args, PyObject *kwds)
     if (err < 0)
         return Error_set(err);
 
-    return wrap_diff(diff, self->repo);
+    return wrap_diff_with_options(diff, self->repo, &opts);
 }
 
 
@@ -67,6 +67,14 @@ typedef struct {
     git_odb_backend *odb_backend;
 } OdbBackend;
 
+typedef struct pgit_odb_stream pgit_odb_stream;
+
+typedef struct {
+    PyObject_HEAD
+    pgit_odb_stream *stream;
+    int raw;
+} OdbIdsIter;
+
 typedef struct {
     OdbBackend super;
 } OdbBackendPack;
@@ -118,6 +126,15 @@ OBJECT_TYPE(Object, git_object, obj)
 OBJECT_TYPE(Commit, git_commit, commit)
 OBJECT_TYPE(Tree, git_tree, tree)
 OBJECT_TYPE(Blob, git_blob, blob)
+
+typedef struct {
+    PyObject_HEAD
+    Blob *blob;
+    git_buf filtered;
+    const char *data;
+    Py_ssize_t size;
+    Py_ssize_t pos;
+} BlobReader;
 OBJECT_TYPE(Tag, git_tag, tag)
 
 SIMPLE_TYPE(Worktree, git_worktree, worktree)
@@ -145,10 +162,23 @@ typedef struct {
     git_patch *patch;
     Blob* oldblob;
     Blob* newblob;
+    PyObject *owner;    /* Keeps alive the repository of the patch, if not
+                           the one of a Python Repository */
 } Patch;
 
 /* git_diff */
-SIMPLE_TYPE(Diff, git_diff, diff)
+typedef struct {
+    PyObject_HEAD
+    Repository *repo;
+    git_diff *diff;
+    git_diff_options opts;  /* The options the diff was made with, without
+                               the pathspec, if has_opts */
+    int has_opts;
+    PyObject *stats;        /* Cached DiffStats */
+    long long *numstat;     /* Cached insertions then deletions per delta */
+    size_t numstat_n;       /* The number of deltas of numstat */
+    size_t version;         /* Changed by merge and find_similar */
+} Diff;
 
 typedef struct {
     PyObject_HEAD
@@ -157,6 +187,17 @@ typedef struct {
     size_t n;
 } DeltasIter;
 
+typedef struct {
+    PyObject_HEAD
+    Diff *diff;
+    PyObject *workers;      /* Capsule with the worker diffs, NULL if serial */
+    git_patch **patches;    /* Patches of the current chunk */
+    size_t i;               /* Next delta */
+    size_t n;
+    size_t chunk_start;
+    size_t chunk_end;
+} DiffPatchesIter;
+
 typedef struct {
     PyObject_HEAD
     Diff *diff;
@@ -166,12 +207,13 @@ typedef struct {
 
 typedef struct {
     PyObject_HEAD
-    PyObject *id;
+    PyObject *id;         /* Created on first access, from oid */
     char *path;
-    PyObject *raw_path;
+    PyObject *raw_path;   /* Created on first access, from path */
     git_off_t size;
     uint32_t flags;
     uint16_t mode;
+    git_oid oid;
 } DiffFile;
 
 typedef struct {
@@ -180,8 +222,10 @@ typedef struct {
     uint32_t flags;
     uint16_t similarity;
     uint16_t nfiles;
-    PyObject *old_file;
-    PyObject *new_file;
+    PyObject *old_file;   /* Created on first access, from old */
+    PyObject *new_file;   /* Created on first access, from new */
+    git_diff_file old;    /* With the paths owned by the delta */
+    git_diff_file new;
 } DiffDelta;
 
 typedef struct {
@@ -220,6 +264,11 @@ typedef struct {
 /* git_reference, git_reflog */
 SIMPLE_TYPE(Walker, git_revwalk, walk)
 
+typedef struct {
+    PyObject_HEAD
+    Walker *walker;
+} WalkerIdsIter;
+
 SIMPLE_TYPE(Reference, git_reference, reference)
 
 typedef Reference Branch;
@@ -205,3 +205,149 @@ pygit2_enum(PyObject *enum_type, int value)
     PyObject *enum_instance = PyObject_CallFunction(enum_type, "(i)", value);
     return enum_instance;
 }
+
+
+/**
+ * Make sure the buffer has room for, at least, 'size' more bytes.
+ * Returns -1 (and sets an out-of-memory libgit2 error) on failure.
+ */
+int
+pgit_buf_grow(pgit_buf *buf, size_t size)
+{
+    size_t asize;
+    char *ptr;
+
+    if (buf->size + size <= buf->asize)
+        return 0;
+
+    asize = buf->asize ? buf->asize : 64;
+    while (asize < buf->size + size)
+        asize *= 2;
+
+    ptr = realloc(buf->ptr, asize);
+    if (ptr == NULL) {
+        giterr_set_oom();
+        return -1;
+    }
+
+    buf->ptr = ptr;
+    buf->asize = asize;
+    return 0;
+}
+
+int
+pgit_buf_put(pgit_buf *buf, const void *data, size_t len)
+{
+    if (pgit_buf_grow(buf, len) < 0)
+        return -1;
+
+    memcpy(buf->ptr + buf->size, data, len);
+    buf->size += len;
+    return 0;
+}
+
+void
+pgit_buf_dispose(pgit_buf *buf)
+{
+    free(buf->ptr);
+    buf->ptr = NULL;
+    buf->size = buf->asize = 0;
+}
+
+PyObject *
+pgit_buf_to_bytes(pgit_buf *buf)
+{
+    return PyBytes_FromStringAndSize(buf->ptr, buf->size);
+}
+
+/**
+ * Copy the buffer into a new array.array of the given typecode.
+ */
+PyObject *
+pgit_buf_to_array(pgit_buf *buf, const char *typecode)
+{
+    PyObject *module, *array, *view, *result;
+
+    module = PyImport_ImportModule("array");
+    if (module == NULL)
+        return NULL;
+
+    array = PyObject_CallMethod(module, "array", "s", typecode);
+    Py_DECREF(module);
+    if (array == NULL || buf->size == 0)
+        return array;
+
+    view = PyMemoryView_FromMemory(buf->ptr, buf->size, PyBUF_READ);
+    if (view == NULL)
+        goto error;
+
+    result = PyObject_CallMethod(array, "frombytes", "O", view);
+    Py_DECREF(view);
+    if (result == NULL)
+        goto error;
+
+    Py_DECREF(result);
+    return array;
+
+error:
+    Py_DECREF(array);
+    return NULL;
+}
+
+
+typedef struct {
+    pgit_job_fn fn;
+    void *job;
+    PyThread_type_lock done;
+} pgit_thread;
+
+static void
+pgit_thread_run(void *payload)
+{
+    pgit_thread *thread = (pgit_thread*)payload;
+
+    thread->fn(thread->job);
+    PyThread_release_lock(thread->done);
+}
+
+/**
+ * Run 'fn' on the 'n' jobs of the 'jobs' array, of 'job_size' bytes each.
+ * The first job runs in the calling thread, the others in new threads; if a
+ * thread cannot be started its job runs in the calling thread too. Returns
+ * when all the jobs are done.
+ */
+void
+pgit_run_parallel(pgit_job_fn fn, void *jobs, size_t job_size, size_t n)
+{
+    pgit_thread *threads;
+    size_t i;
+
+    threads = calloc(n, sizeof(pgit_thread));
+    for (i = 1; threads != NULL && i < n; i++) {
+        threads[i].fn = fn;
+        threads[i].job = (char*)jobs + i * job_size;
+        threads[i].done = PyThread_allocate_lock();
+        if (threads[i].done == NULL)
+            continue;
+
+        PyThread_acquire_lock(threads[i].done, WAIT_LOCK);
+        if (PyThread_start_new_thread(pgit_thread_run, &threads[i]) == PYTHREAD_INVALID_THREAD_ID) {
+            PyThread_free_lock(threads[i].done);
+            threads[i].done = NULL;
+        }
+    }
+
+    for (i = 0; i < n; i++) {
+        if (threads == NULL || threads[i].done == NULL)
+            fn((char*)jobs + i * job_size);
+    }
+
+    for (i = 1; threads != NULL && i < n; i++) {
+        if (threads[i].done != NULL) {
+            PyThread_acquire_lock(threads[i].done, WAIT_LOCK);
+            PyThread_free_lock(threads[i].done);
+        }
+    }
+
+    free(threads);
+}
@@ -102,6 +102,31 @@ git_otype py_object_to_otype(PyObject *py_type);
 PyObject *pygit2_enum(PyObject *enum_type, int value);
 
 
+/* Growable memory buffers, used to build columnar results without holding
+ * the GIL. The helpers that do not return Python objects may be called with
+ * the GIL released. */
+typedef struct {
+    char *ptr;
+    size_t size;
+    size_t asize;
+} pgit_buf;
+
+#define PGIT_BUF_INIT {NULL, 0, 0}
+
+int pgit_buf_grow(pgit_buf *buf, size_t size);
+int pgit_buf_put(pgit_buf *buf, const void *data, size_t len);
+void pgit_buf_dispose(pgit_buf *buf);
+PyObject *pgit_buf_to_bytes(pgit_buf *buf);
+PyObject *pgit_buf_to_array(pgit_buf *buf, const char *typecode);
+
+
+/* Run a function over an array of jobs, each one in its own thread. Must be
+ * called with the GIL released. */
+typedef void (*pgit_job_fn)(void *job);
+
+void pgit_run_parallel(pgit_job_fn fn, void *jobs, size_t job_size, size_t n);
+
+
 /* Helpers to make shorter PyMethodDef and PyGetSetDef blocks */
 #define METHOD(type, name, args)\
   {#name, (PyCFunction) type ## _ ## name, args, type ## _ ## name ## __doc__}
@@ -35,6 +35,7 @@
 #include "walker.h"
 
 extern PyTypeObject CommitType;
+extern PyTypeObject WalkerIdsIterType;
 
 void
 Walker_dealloc(Walker *self)
@@ -163,8 +164,430 @@ Walker_iternext(Walker *self)
     return wrap_object((git_object*)commit, self->repo, NULL);
 }
 
+
+PyDoc_STRVAR(Walker_iter_ids__doc__,
+  "iter_ids() -> Iterator[Oid]\n"
+  "\n"
+  "Return an iterator over the ids of the walked commits. This is faster\n"
+  "than iterating over the walker, because the commits are not read from\n"
+  "the object database.\n"
+  "\n"
+  "Example:\n"
+  "\n"
+  "  >>> walker = repo.walk(repo.head.target, SortMode.TOPOLOGICAL)\n"
+  "  >>> ids = list(walker.iter_ids())\n");
+
+PyObject *
+Walker_iter_ids(Walker *self)
+{
+    WalkerIdsIter *iter;
+
+    iter = PyObject_New(WalkerIdsIter, &WalkerIdsIterType);
+    if (iter != NULL) {
+        Py_INCREF(self);
+        iter->walker = self;
+    }
+    return (PyObject*)iter;
+}
+
+
+PyDoc_STRVAR(Walker_fill_ids__doc__,
+  "fill_ids(buffer: Buffer) -> int\n"
+  "\n"
+  "Walk as many commits as raw ids (20 bytes each) fit in the given\n"
+  "writable buffer, and write their ids to it. Returns the number of ids\n"
+  "written, which is less than the buffer capacity at the end of the walk.\n"
+  "The commits are not read from the object database, and the GIL is\n"
+  "released while walking.\n"
+  "\n"
+  "Example:\n"
+  "\n"
+  "  >>> buffer = bytearray(20 * 1024)\n"
+  "  >>> n = walker.fill_ids(buffer)\n"
+  "  >>> ids = memoryview(buffer)[:n * 20]\n");
+
+PyObject *
+Walker_fill_ids(Walker *self, PyObject *args)
+{
+    Py_buffer buffer;
+    Py_ssize_t n, count = 0;
+    unsigned char *ptr;
+    git_oid oid;
+    int err = 0;
+
+    if (!PyArg_ParseTuple(args, "w*", &buffer))
+        return NULL;
+
+    ptr = buffer.buf;
+    n = buffer.len / GIT_OID_RAWSZ;
+
+    Py_BEGIN_ALLOW_THREADS
+    while (count < n) {
+        err = git_revwalk_next(&oid, self->walk);
+        if (err < 0)
+            break;
+
+        memcpy(ptr, oid.id, GIT_OID_RAWSZ);
+        ptr += GIT_OID_RAWSZ;
+        count++;
+    }
+    Py_END_ALLOW_THREADS
+
+    PyBuffer_Release(&buffer);
+
+    if (err < 0 && err != GIT_ITEROVER)
+        return Error_set(err);
+
+    return PyLong_FromSsize_t(count);
+}
+
+
+/* Columns that can be requested from Walker.next_batch() */
+typedef enum {
+    WALKER_FIELD_BYTES,   /* raw bytes, one or more oids per commit */
+    WALKER_FIELD_ARRAY,   /* array.array, one item per commit */
+    WALKER_FIELD_STRING,  /* joined bytes plus an array of offsets */
+} walker_field_kind;
+
+typedef enum {
+    WALKER_ID,
+    WALKER_TREE_ID,
+    WALKER_PARENT_IDS,
+    WALKER_PARENT_COUNT,
+    WALKER_COMMIT_TIME,
+    WALKER_COMMIT_TIME_OFFSET,
+    WALKER_AUTHOR_TIME,
+    WALKER_AUTHOR_TIME_OFFSET,
+    WALKER_AUTHOR_NAME,
+    WALKER_AUTHOR_EMAIL,
+    WALKER_COMMITTER_NAME,
+    WALKER_COMMITTER_EMAIL,
+    WALKER_NFIELDS
+} walker_field;
+
+static const struct {
+    const char *name;
+    walker_field_kind kind;
+    const char *typecode;
+} walker_fields[WALKER_NFIELDS] = {
+    {"id", WALKER_FIELD_BYTES, NULL},
+    {"tree_id", WALKER_FIELD_BYTES, NULL},
+    {"parent_ids", WALKER_FIELD_BYTES, NULL},
+    {"parent_count", WALKER_FIELD_ARRAY, "I"},
+    {"commit_time", WALKER_FIELD_ARRAY, "q"},
+    {"commit_time_offset", WALKER_FIELD_ARRAY, "i"},
+    {"author_time", WALKER_FIELD_ARRAY, "q"},
+    {"author_time_offset", WALKER_FIELD_ARRAY, "i"},
+    {"author_name", WALKER_FIELD_STRING, "Q"},
+    {"author_email", WALKER_FIELD_STRING, "Q"},
+    {"committer_name", WALKER_FIELD_STRING, "Q"},
+    {"committer_email", WALKER_FIELD_STRING, "Q"},
+};
+
+#define WALKER_DEFAULT_FIELDS ((1 << WALKER_ID) | \
+                               (1 << WALKER_PARENT_COUNT) | \
+                               (1 << WALKER_COMMIT_TIME) | \
+                               (1 << WALKER_COMMIT_TIME_OFFSET))
+
+static int
+walker_parse_fields(PyObject *py_fields, unsigned int *mask)
+{
+    PyObject *iter, *item;
+    const char *name;
+    int i;
+
+    if (py_fields == NULL || py_fields == Py_None) {
+        *mask = WALKER_DEFAULT_FIELDS;
+        return 0;
+    }
+
+    iter = PyObject_GetIter(py_fields);
+    if (iter == NULL)
+        return -1;
+
+    *mask = 0;
+    while ((item = PyIter_Next(iter)) != NULL) {
+        name = PyUnicode_Check(item) ? PyUnicode_AsUTF8(item) : NULL;
+        if (name == NULL) {
+            if (!PyErr_Occurred())
+                Error_type_error("field name must be a str, not %.200s", item);
+            goto error;
+        }
+
+        for (i = 0; i < WALKER_NFIELDS; i++) {
+            if (strcmp(name, walker_fields[i].name) == 0)
+                break;
+        }
+        if (i == WALKER_NFIELDS) {
+            PyErr_Format(PyExc_ValueError, "unknown field '%s'", name);
+            goto error;
+        }
+
+        *mask |= 1 << i;
+        Py_DECREF(item);
+    }
+
+    Py_DECREF(iter);
+    return PyErr_Occurred() ? -1 : 0;
+
+error:
+    Py_DECREF(item);
+    Py_DECREF(iter);
+    return -1;
+}
+
+static int
+walker_put_string(pgit_buf *buf, pgit_buf *offsets, const char *value)
+{
+    unsigned long long offset;
+
+    if (pgit_buf_put(buf, value, strlen(value)) < 0)
+        return -1;
+
+    offset = buf->size;
+    return pgit_buf_put(offsets, &offset, sizeof(offset));
+}
+
+/*
+ * Append the requested fields of one commit to the column buffers. This is
+ * called with the GIL released, so it must not touch any Python object.
+ */
+static int
+walker_put_commit(pgit_buf *bufs, pgit_buf *offsets, unsigned int mask,
+                  const git_oid *oid, const git_commit *commit)
+{
+    const git_signature *author = NULL, *committer = NULL;
+    unsigned int i, j, nparents;
+    long long time;
+    int offset;
+
+    if (commit) {
+        author = git_commit_author(commit);
+        committer = git_commit_committer(commit);
+    }
+
+    for (i = 0; i < WALKER_NFIELDS; i++) {
+        pgit_buf *buf = &bufs[i];
+        int err = 0;
+
+        if (!(mask & (1 << i)))
+            continue;
+
+        switch (i) {
+            case WALKER_ID:
+                err = pgit_buf_put(buf, oid->id, GIT_OID_RAWSZ);
+                break;
+            case WALKER_TREE_ID:
+                err = pgit_buf_put(buf, git_commit_tree_id(commit)->id, GIT_OID_RAWSZ);
+                break;
+            case WALKER_PARENT_IDS:
+                nparents = git_commit_parentcount(commit);
+                for (j = 0; err == 0 && j < nparents; j++)
+                    err = pgit_buf_put(buf, git_commit_parent_id(commit, j)->id,
+                                       GIT_OID_RAWSZ);
+                break;
+            case WALKER_PARENT_COUNT:
+                nparents = git_commit_parentcount(commit);
+                err = pgit_buf_put(buf, &nparents, sizeof(nparents));
+                break;
+            case WALKER_COMMIT_TIME:
+                time = git_commit_time(commit);
+                err = pgit_buf_put(buf, &time, sizeof(time));
+                break;
+            case WALKER_COMMIT_TIME_OFFSET:
+                offset = git_commit_time_offset(commit);
+                err = pgit_buf_put(buf, &offset, sizeof(offset));
+                break;
+            case WALKER_AUTHOR_TIME:
+                time = author->when.time;
+                err = pgit_buf_put(buf, &time, sizeof(time));
+                break;
+            case WALKER_AUTHOR_TIME_OFFSET:
+                offset = author->when.offset;
+                err = pgit_buf_put(buf, &offset, sizeof(offset));
+                break;
+            case WALKER_AUTHOR_NAME:
+                err = walker_put_string(buf, &offsets[i], author->name);
+                break;
+            case WALKER_AUTHOR_EMAIL:
+                err = walker_put_string(buf, &offsets[i], author->email);
+                break;
+            case WALKER_COMMITTER_NAME:
+                err = walker_put_string(buf, &offsets[i], committer->name);
+                break;
+            case WALKER_COMMITTER_EMAIL:
+                err = walker_put_string(buf, &offsets[i], committer->email);
+                break;
+        }
+
+        if (err < 0)
+            return GIT_ERROR;
+    }
+
+    return 0;
+}
+
+static PyObject *
+walker_build_table(pgit_buf *bufs, pgit_buf *offsets, unsigned int mask)
+{
+    PyObject *py_table, *py_value, *py_data, *py_offsets;
+    int i;
+
+    py_table = PyDict_New();
+    if (py_table == NULL)
+        return NULL;
+
+    for (i = 0; i < WALKER_NFIELDS; i++) {
+        if (!(mask & (1 << i)))
+            continue;
+
+        switch (walker_fields[i].kind) {
+            case WALKER_FIELD_BYTES:
+                py_value = pgit_buf_to_bytes(&bufs[i]);
+                break;
+            case WALKER_FIELD_ARRAY:
+                py_value = pgit_buf_to_array(&bufs[i], walker_fields[i].typecode);
+                break;
+            case WALKER_FIELD_STRING:
+                py_value = NULL;
+                py_data = pgit_buf_to_bytes(&bufs[i]);
+                py_offsets = pgit_buf_to_array(&offsets[i], walker_fields[i].typecode);
+                if (py_data != NULL && py_offsets != NULL)
+                    py_value = PyTuple_Pack(2, py_data, py_offsets);
+                Py_XDECREF(py_data);
+                Py_XDECREF(py_offsets);
+                break;
+            default:
+                py_value = NULL;
+        }
+
+        if (py_value == NULL)
+            goto error;
+
+        if (PyDict_SetItemString(py_table, walker_fields[i].name, py_value) < 0) {
+            Py_DECREF(py_value);
+            goto error;
+        }
+        Py_DECREF(py_value);
+    }
+
+    return py_table;
+
+error:
+    Py_DECREF(py_table);
+    return NULL;
+}
+
+PyDoc_STRVAR(Walker_next_batch__doc__,
+  "next_batch(n: int, fields: list[str] | None = None) -> dict\n"
+  "\n"
+  "Walk up to n commits at once, and return the requested commit data as\n"
+  "columns, one item per commit in walk order. If n is negative walk to\n"
+  "the end. The GIL is released for the whole batch, and no Commit object\n"
+  "is created.\n"
+  "\n"
+  "Returns a dict mapping every requested field to its column:\n"
+  "\n"
+  "* id, tree_id: bytes, the raw oids (20 bytes each).\n"
+  "* parent_ids: bytes, the raw oids of all the parents, use parent_count\n"
+  "  to know how many belong to each commit.\n"
+  "* parent_count: array('I').\n"
+  "* commit_time, author_time: array('q'), seconds since the epoch.\n"
+  "* commit_time_offset, author_time_offset: array('i'), in minutes.\n"
+  "* author_name, author_email, committer_name, committer_email: a tuple\n"
+  "  (data, offsets) where data is the bytes of all the values joined, and\n"
+  "  offsets is an array('Q') with n+1 items, the value of the i-th commit\n"
+  "  being data[offsets[i]:offsets[i+1]].\n"
+  "\n"
+  "By default the id, parent_count, commit_time and commit_time_offset\n"
+  "fields are returned. If only the id is requested the commits are not\n"
+  "even read from the object database.\n"
+  "\n"
+  "Example:\n"
+  "\n"
+  "  >>> walker = repo.walk(repo.head.target)\n"
+  "  >>> while True:\n"
+  "  ...     batch = walker.next_batch(10000, ['id', 'commit_time'])\n"
+  "  ...     if not batch['commit_time']:\n"
+  "  ...         break\n"
+  "  ...     process(batch)\n");
+
+PyObject *
+Walker_next_batch(Walker *self, PyObject *args, PyObject *kwds)
+{
+    static char *kwlist[] = {"n", "fields", NULL};
+    pgit_buf bufs[WALKER_NFIELDS] = {PGIT_BUF_INIT};
+    pgit_buf offsets[WALKER_NFIELDS] = {PGIT_BUF_INIT};
+    PyObject *py_fields = NULL;
+    PyObject *py_table = NULL;
+    git_commit *commit = NULL;
+    unsigned long long zero = 0;
+    unsigned int mask;
+    Py_ssize_t n, count = 0;
+    git_oid oid;
+    int i, err = 0;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "n|O", kwlist, &n, &py_fields))
+        return NULL;
+
+    if (walker_parse_fields(py_fields, &mask) < 0)
+        return NULL;
+
+    for (i = 0; i < WALKER_NFIELDS; i++) {
+        if ((mask & (1 << i)) && walker_fields[i].kind == WALKER_FIELD_STRING) {
+            if (pgit_buf_put(&offsets[i], &zero, sizeof(zero)) < 0) {
+                err = GIT_ERROR;
+                goto end;
+            }
+        }
+    }
+
+    Py_BEGIN_ALLOW_THREADS
+    while (n < 0 || count < n) {
+        err = git_revwalk_next(&oid, self->walk);
+        if (err == GIT_ITEROVER) {
+            err = 0;
+            break;
+        }
+        if (err < 0)
+            break;
+
+        if (mask & ~(1 << WALKER_ID)) {
+            err = git_commit_lookup(&commit, self->repo->repo, &oid);
+            if (err < 0)
+                break;
+        }
+
+        err = walker_put_commit(bufs, offsets, mask, &oid, commit);
+        git_commit_free(commit);
+        commit = NULL;
+        if (err < 0)
+            break;
+
+        count++;
+    }
+    Py_END_ALLOW_THREADS
+
+    if (err == 0)
+        py_table = walker_build_table(bufs, offsets, mask);
+
+end:
+    for (i = 0; i < WALKER_NFIELDS; i++) {
+        pgit_buf_dispose(&bufs[i]);
+        pgit_buf_dispose(&offsets[i]);
+    }
+
+    if (err < 0)
+        return Error_set(err);
+
+    return py_table;
+}
+
 PyMethodDef Walker_methods[] = {
+    METHOD(Walker, fill_ids, METH_VARARGS),
     METHOD(Walker, hide, METH_O),
+    METHOD(Walker, iter_ids, METH_NOARGS),
+    METHOD(Walker, next_batch, METH_VARARGS | METH_KEYWORDS),
     METHOD(Walker, push, METH_O),
     METHOD(Walker, reset, METH_NOARGS),
     METHOD(Walker, simplify_first_parent, METH_NOARGS),
@@ -215,3 +638,59 @@ PyTypeObject WalkerType = {
     0,                                         /* tp_alloc          */
     0,                                         /* tp_new            */
 };
+
+
+PyObject *
+WalkerIdsIter_iternext(WalkerIdsIter *self)
+{
+    int err;
+    git_oid oid;
+
+    Py_BEGIN_ALLOW_THREADS
+    err = git_revwalk_next(&oid, self->walker->walk);
+    Py_END_ALLOW_THREADS
+
+    if (err < 0)
+        return Error_set(err);
+
+    return git_oid_to_python(&oid);
+}
+
+void
+WalkerIdsIter_dealloc(WalkerIdsIter *self)
+{
+    Py_CLEAR(self->walker);
+    PyObject_Del(self);
+}
+
+PyDoc_STRVAR(WalkerIdsIter__doc__, "Walker ids iterator object.");
+
+PyTypeObject WalkerIdsIterType = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    "_pygit2.WalkerIdsIter",                   /* tp_name           */
+    sizeof(WalkerIdsIter),                     /* tp_basicsize      */
+    0,                                         /* tp_itemsize       */
+    (destructor)WalkerIdsIter_dealloc,         /* tp_dealloc        */
+    0,                                         /* tp_print          */
+    0,                                         /* tp_getattr        */
+    0,                                         /* tp_setattr        */
+    0,                                         /* tp_compare        */
+    0,                                         /* tp_repr           */
+    0,                                         /* tp_as_number      */
+    0,                                         /* tp_as_sequence    */
+    0,                                         /* tp_as_mapping     */
+    0,                                         /* tp_hash           */
+    0,                                         /* tp_call           */
+    0,                                         /* tp_str            */
+    0,                                         /* tp_getattro       */
+    0,                                         /* tp_setattro       */
+    0,                                         /* tp_as_buffer      */
+    Py_TPFLAGS_DEFAULT,                        /* tp_flags          */
+    WalkerIdsIter__doc__,                      /* tp_doc            */
+    0,                                         /* tp_traverse       */
+    0,                                         /* tp_clear          */
+    0,                                         /* tp_richcompare    */
+    0,                                         /* tp_weaklistoffset */
+    PyObject_SelfIter,                         /* tp_iter           */
+    (iternextfunc) WalkerIdsIter_iternext,     /* tp_iternext       */
+};
@@ -40,5 +40,10 @@ PyObject* Walker_sort(Walker *self, PyObject *py_sort_mode);
 PyObject* Walker_reset(Walker *self);
 PyObject* Walker_iter(Walker *self);
 PyObject* Walker_iternext(Walker *self);
+PyObject* Walker_next_batch(Walker *self, PyObject *args, PyObject *kwds);
+PyObject* Walker_iter_ids(Walker *self);
+PyObject* Walker_fill_ids(Walker *self, PyObject *args);
+PyObject* WalkerIdsIter_iternext(WalkerIdsIter *self);
+void WalkerIdsIter_dealloc(WalkerIdsIter *self);
 
 #endif
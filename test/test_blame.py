@@ -25,10 +25,12 @@
 
 """Tests for Blame objects."""
 
+import threading
+
 import pytest
 
-from pygit2 import Signature, Oid
-from pygit2.enums import BlameFlag
+from pygit2 import Blame, Signature, Oid
+from pygit2.enums import BlameFlag, FileMode
 
 
 PATH = 'hello.txt'
@@ -158,3 +160,155 @@ def test_blame_newest(testrepo):
             assert HUNKS[i][1] == hunk.orig_start_line_number
             assert HUNKS[i][2] == hunk.orig_committer
             assert HUNKS[i][3] == hunk.boundary
+
+
+def _hunk(hunk):
+    return (
+        hunk.lines_in_hunk,
+        hunk.final_commit_id,
+        hunk.final_start_line_number,
+        hunk.final_committer,
+        hunk.orig_commit_id,
+        hunk.orig_path,
+        hunk.orig_start_line_number,
+        hunk.orig_committer,
+        hunk.boundary,
+    )
+
+
+@pytest.mark.parametrize(
+    'kwargs',
+    [{}, {'workers': 2}, {'chunk_lines': 1}, {'chunk_lines': 2, 'workers': 3}],
+)
+def test_blame_iter(testrepo, kwargs):
+    expected = [(PATH, _hunk(hunk)) for hunk in testrepo.blame(PATH)]
+    expected += [('.gitignore', _hunk(hunk)) for hunk in testrepo.blame('.gitignore')]
+
+    hunks = testrepo.blame_iter([PATH, '.gitignore'], **kwargs)
+    assert [(path, _hunk(hunk)) for path, hunk in hunks] == expected
+
+
+def test_blame_iter_joins_ranges(testrepo):
+    # Two lines of the same commit, blamed in two ranges
+    commit = testrepo[testrepo.head.target]
+    tree = testrepo.TreeBuilder(commit.tree)
+    tree.insert('two.txt', testrepo.create_blob(b'a\nb'), FileMode.BLOB)
+    signature = Signature('Alice', 'alice@example.com', 1700000000, 0)
+    testrepo.create_commit(
+        'HEAD', signature, signature, 'two', tree.write(), [commit.id]
+    )
+
+    [(path, hunk)] = testrepo.blame_iter('two.txt', chunk_lines=1)
+    assert path == 'two.txt'
+    assert hunk.lines_in_hunk == 2
+    assert hunk.final_committer == signature
+
+
+def test_blame_iter_newest(testrepo):
+    commit = testrepo.revparse_single('master^2^')
+    expected = [_hunk(hunk) for hunk in testrepo.blame(PATH, newest_commit=commit.id)]
+    hunks = testrepo.blame_iter(PATH, newest_commit=commit.id, chunk_lines=1)
+    assert [_hunk(hunk) for _, hunk in hunks] == expected
+
+
+def test_blame_iter_cancel(testrepo):
+    cancel = threading.Event()
+    hunks = testrepo.blame_iter([PATH, PATH, PATH], cancel=cancel)
+    assert next(hunks)[0] == PATH
+    cancel.set()
+    # The rest of the batch, then nothing
+    assert len(list(hunks)) == 2
+
+
+def test_blame_iter_missing(testrepo):
+    with pytest.raises(KeyError):
+        list(testrepo.blame_iter('missing.txt'))
+
+
+def test_blame_snapshot(testrepo):
+    blame = testrepo.blame(PATH)
+    assert blame.path == PATH
+    assert blame.commit_id == testrepo.head.target
+
+    data = blame.to_bytes()
+    snapshot = Blame.from_bytes(data)
+    assert snapshot.path == PATH
+    assert snapshot.commit_id == blame.commit_id
+    assert [_hunk(hunk) for hunk in snapshot] == [_hunk(hunk) for hunk in blame]
+    assert snapshot.to_bytes() == data
+
+    hunk = snapshot.for_line(2)
+    assert _hunk(hunk) == _hunk(blame.for_line(2))
+    with pytest.raises(IndexError):
+        snapshot.for_line(4)
+    with pytest.raises(IndexError):
+        snapshot[3]
+
+    with pytest.raises(ValueError):
+        Blame.from_bytes(b'not a blame')
+    with pytest.raises(ValueError):
+        Blame.from_bytes(data[:-1])
+
+
+@pytest.mark.parametrize('rev', ['master^2^^', 'master^2^', 'master^2', 'master'])
+def test_blame_base(testrepo, rev):
+    expected = [_hunk(hunk) for hunk in testrepo.blame(PATH)]
+
+    base = testrepo.blame(PATH, newest_commit=testrepo.revparse_single(rev).id)
+    blame = testrepo.blame(PATH, base=base)
+    assert blame.commit_id == testrepo.head.target
+    assert [_hunk(hunk) for hunk in blame] == expected
+
+    blame = testrepo.blame(PATH, base=base.to_bytes())
+    assert [_hunk(hunk) for hunk in blame] == expected
+
+
+def test_blame_base_range(testrepo):
+    expected = [_hunk(hunk) for hunk in testrepo.blame(PATH)]
+    commit = testrepo.revparse_single('master^2')
+    base = testrepo.blame(PATH, newest_commit=commit.id, min_line=2, max_line=2)
+    blame = testrepo.blame(PATH, base=base)
+    assert [_hunk(hunk) for hunk in blame] == expected
+
+    with pytest.raises(ValueError):
+        testrepo.blame(PATH, base=base, oldest_commit=commit.id)
+
+
+def _check_line_table(blame, nlines):
+    table = blame.line_table()
+    assert table['first_line'] == 1
+    assert len(table['commit']) == len(table['orig_line']) == nlines
+    assert len(table['commit_ids']) == 20 * len(table['committers'])
+    for i in range(nlines):
+        hunk = blame.for_line(i + 1)
+        k = table['commit'][i]
+        assert table['commit_ids'][20 * k : 20 * k + 20] == hunk.final_commit_id.raw
+        assert table['committers'][k] == hunk.final_committer
+        offset = i + 1 - hunk.final_start_line_number
+        assert table['orig_line'][i] == hunk.orig_start_line_number + offset
+
+
+def test_blame_line_table(testrepo):
+    blame = testrepo.blame(PATH)
+    _check_line_table(blame, 3)
+    _check_line_table(Blame.from_bytes(blame.to_bytes()), 3)
+
+    # The commits are listed once, the first and last lines come from the
+    # same commit
+    signature = Signature('Alice', 'alice@example.com', 1700000000, 0)
+    parents = [testrepo.head.target]
+    for content in b'a\nb\nc\n', b'a\nB\nc\n':
+        tree = testrepo.TreeBuilder(testrepo[parents[0]].tree)
+        tree.insert('abc.txt', testrepo.create_blob(content), FileMode.BLOB)
+        commit = testrepo.create_commit(
+            'HEAD', signature, signature, 'abc', tree.write(), parents
+        )
+        parents = [commit]
+
+    blame = testrepo.blame('abc.txt')
+    assert len(blame) == 3
+    table = blame.line_table()
+    assert list(table['commit']) == [0, 1, 0]
+    assert list(table['orig_line']) == [1, 2, 3]
+    assert table['commit_ids'][20:] == commit.raw
+    _check_line_table(blame, 3)
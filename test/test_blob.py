@@ -25,10 +25,9 @@
 
 """Tests for Blob objects."""
 
+import hashlib
 import io
 from pathlib import Path
-from threading import Event
-from queue import Queue
 
 import pytest
 
@@ -116,6 +115,18 @@ def test_create_blob(testrepo):
         set_content()
 
 
+def test_data_view(testrepo):
+    blob_oid = testrepo.create_blob(BLOB_NEW_CONTENT)
+    view = testrepo[blob_oid].data_view
+
+    # The view keeps the blob alive
+    assert isinstance(view, memoryview)
+    assert view.readonly
+    assert view.obj.id == blob_oid
+    assert view == BLOB_NEW_CONTENT
+    assert hashlib.sha1(view).digest() == hashlib.sha1(BLOB_NEW_CONTENT).digest()
+
+
 def test_create_blob_fromworkdir(testrepo):
     blob_oid = testrepo.create_blob_fromworkdir('bye.txt')
     blob = testrepo[blob_oid]
@@ -209,33 +220,29 @@ def test_blob_from_repo(testrepo):
     assert patch_one.text == patch_two.text
 
 
-def test_blob_write_to_queue(testrepo):
-    queue = Queue()
-    ready = Event()
-    done = Event()
+def test_blob_open_reader(testrepo):
     blob = testrepo[BLOB_SHA]
-    blob._write_to_queue(queue, ready, done)
-    assert ready.wait()
-    assert done.wait()
-    chunks = []
-    while not queue.empty():
-        chunks.append(queue.get())
-    assert BLOB_CONTENT == b''.join(chunks)
-
-
-def test_blob_write_to_queue_filtered(testrepo):
-    queue = Queue()
-    ready = Event()
-    done = Event()
+    reader = blob._open_reader()
+    assert reader.size == len(BLOB_CONTENT)
+    assert reader.read(5) == BLOB_CONTENT[:5]
+    buffer = bytearray(10)
+    assert reader.readinto(buffer) == 10
+    assert buffer == BLOB_CONTENT[5:15]
+    assert reader.read() == BLOB_CONTENT[15:]
+    assert reader.read() == b''
+    assert reader.readinto(buffer) == 0
+    assert reader.pos == reader.size
+    with pytest.raises(AttributeError):
+        reader.pos = reader.size + 10
+    with pytest.raises(AttributeError):
+        reader.size = 0
+
+
+def test_blob_open_reader_filtered(testrepo):
     blob_oid = testrepo.create_blob_fromworkdir('bye.txt')
     blob = testrepo[blob_oid]
-    blob._write_to_queue(queue, ready, done, as_path='bye.txt')
-    assert ready.wait()
-    assert done.wait()
-    chunks = []
-    while not queue.empty():
-        chunks.append(queue.get())
-    assert b'bye world\n' == b''.join(chunks)
+    reader = blob._open_reader(as_path='bye.txt')
+    assert b'bye world\n' == reader.read()
 
 
 def test_blobio(testrepo):
@@ -243,7 +250,7 @@ def test_blobio(testrepo):
     blob = testrepo[blob_oid]
     with pygit2.BlobIO(blob) as reader:
         assert b'bye world\n' == reader.read()
-    assert not reader.raw._thread.is_alive()
+    assert reader.closed
 
 
 def test_blobio_filtered(testrepo):
@@ -251,4 +258,28 @@ def test_blobio_filtered(testrepo):
     blob = testrepo[blob_oid]
     with pygit2.BlobIO(blob, as_path='bye.txt') as reader:
         assert b'bye world\n' == reader.read()
-    assert not reader.raw._thread.is_alive()
+    assert reader.closed
+
+
+def test_blobio_filtered_crlf(testrepo):
+    Path(testrepo.workdir, '.gitattributes').write_text('*.txt text eol=crlf\n')
+    blob_oid = testrepo.create_blob(b'line 1\nline 2\n')
+    blob = testrepo[blob_oid]
+    with pygit2.BlobIO(blob, as_path='new.txt') as reader:
+        assert b'line 1\r\nline 2\r\n' == reader.read()
+    with pygit2.BlobIO(blob) as reader:
+        assert b'line 1\nline 2\n' == reader.read()
+
+
+def test_blobio_readinto(testrepo):
+    data = bytes(range(256)) * 1024
+    blob = testrepo[testrepo.create_blob(data)]
+    with pygit2.BlobIO(blob, chunk_size=1000) as reader:
+        assert reader.read(10) == data[:10]
+        buffer = bytearray(len(data))
+        n = reader.readinto(buffer)
+        assert buffer[:n] == data[10 : 10 + n]
+        assert reader.read() == data[10 + n :]
+
+    with pygit2.BlobIO(blob) as reader:
+        assert reader.read() == data
@@ -25,13 +25,26 @@
 
 """Tests for Diff objects."""
 
+from array import array
+import io
 from itertools import chain
+import random
 import textwrap
+import threading
 
 import pytest
 
 import pygit2
-from pygit2.enums import DeltaStatus, DiffFlag, DiffOption, DiffStatsFormat, FileMode
+from pygit2.enums import (
+    DeltaStatus,
+    DiffFind,
+    DiffFlag,
+    DiffFormat,
+    DiffOption,
+    DiffStatsFormat,
+    FileMode,
+)
+from . import utils
 
 
 COMMIT_SHA1_1 = '5fe808e8953c12735680c257f56600cb0de44b10'
@@ -273,6 +286,114 @@ def test_diff_patch(barerepo):
     assert len(diff) == len([patch for patch in diff])
 
 
+@pytest.mark.parametrize('workers', [1, 2, 3, 100])
+def test_diff_patch_text(barerepo, workers):
+    commit_a = barerepo[COMMIT_SHA1_1]
+    commit_b = barerepo[COMMIT_SHA1_4]
+    diff = commit_a.tree.diff_to_tree(commit_b.tree, context_lines=1)
+    assert diff.patch_text(workers=workers) == diff.patch
+
+    texts = [patch.text for patch in diff]
+    patches = list(diff.patches(workers=workers))
+    assert [patch.text for patch in patches] == texts
+
+    # The patches do not depend on the diff
+    del diff
+    assert [patch.text for patch in patches] == texts
+
+
+def test_diff_patch_text_workdir(dirtyrepo):
+    head = dirtyrepo.head.peel(pygit2.Tree)
+    for diff in [
+        dirtyrepo.index.diff_to_workdir(context_lines=0),
+        head.diff_to_workdir(DiffOption.INCLUDE_UNTRACKED),
+        head.diff_to_index(dirtyrepo.index, DiffOption.REVERSE),
+    ]:
+        assert len(diff) > 1
+        assert diff.patch_text(workers=4) == diff.patch
+        assert [x.text for x in diff.patches(workers=4)] == [x.text for x in diff]
+
+
+def test_diff_patch_text_fallback(barerepo):
+    # Parsed diffs and renames are made by a single thread
+    diff = pygit2.Diff.parse_diff(PATCH)
+    assert diff.patch_text(workers=2) == diff.patch
+
+    commit_a = barerepo[COMMIT_SHA1_6]
+    commit_b = barerepo[COMMIT_SHA1_7]
+    diff = commit_a.tree.diff_to_tree(commit_b.tree, DiffOption.INCLUDE_UNMODIFIED)
+    diff.find_similar()
+    assert diff.patch_text(workers=2) == diff.patch
+    assert [x.text for x in diff.patches(workers=2)] == [x.text for x in diff]
+
+
+def test_diff_write_patch(barerepo, tmp_path):
+    commit_a = barerepo[COMMIT_SHA1_1]
+    commit_b = barerepo[COMMIT_SHA1_4]
+    diff = commit_a.tree.diff_to_tree(commit_b.tree)
+
+    out = io.BytesIO()
+    diff.write_patch(out, chunk_size=16)
+    assert out.getvalue().decode() == diff.patch
+
+    # To a file descriptor
+    path = tmp_path / 'out.patch'
+    with path.open('wb') as f:
+        diff.write_patch(f.fileno())
+    assert path.read_text() == diff.patch
+
+    out = io.BytesIO()
+    diff.write_patch(out, DiffFormat.NAME_STATUS)
+    expected = ''.join(f'{x.status_char()}\t{x.new_file.path}\n' for x in diff.deltas)
+    assert out.getvalue().decode() == expected
+
+    out = io.BytesIO()
+    diff.write_patch(out, DiffFormat.RAW)
+    assert out.getvalue().startswith(b':100644 100644 ')
+
+    stats = diff.stats.format(DiffStatsFormat.FULL, 80)
+    out = io.BytesIO()
+    diff.write_patch(out, None, DiffStatsFormat.FULL)
+    assert out.getvalue().decode() == stats
+    out = io.BytesIO()
+    diff.write_patch(out, stats=DiffStatsFormat.FULL)
+    assert out.getvalue().decode() == stats + diff.patch
+
+
+def test_diff_write_patch_error(barerepo):
+    commit_a = barerepo[COMMIT_SHA1_1]
+    commit_b = barerepo[COMMIT_SHA1_4]
+    diff = commit_a.tree.diff_to_tree(commit_b.tree)
+
+    class Full(io.RawIOBase):
+        def writable(self):
+            return True
+
+        def write(self, data):
+            raise OSError('disk full')
+
+    with pytest.raises(OSError, match='disk full'):
+        diff.write_patch(Full(), chunk_size=1)
+    with pytest.raises(TypeError):
+        diff.write_patch(True)
+
+    # Raw files may write less than asked
+    class Slow(io.RawIOBase):
+        def __init__(self):
+            self.data = b''
+
+        def writable(self):
+            return True
+
+        def write(self, data):
+            self.data += bytes(data[:3])
+            return min(3, len(data))
+
+    out = Slow()
+    diff.write_patch(out)
+    assert out.data.decode() == diff.patch
+
+
 def test_diff_ids(barerepo):
     commit_a = barerepo[COMMIT_SHA1_1]
     commit_b = barerepo[COMMIT_SHA1_2]
@@ -315,6 +436,192 @@ def test_find_similar(barerepo):
     assert any(x.delta.status_char() == 'R' for x in diff)
 
 
+def _similar(diff):
+    return sorted(
+        (d.status_char(), d.old_file.path, d.new_file.path, d.similarity)
+        for d in diff.deltas
+    )
+
+
+def _similar_trees(repo):
+    lines = [f'line {i}\n'.encode() for i in range(40)]
+    old = repo.TreeBuilder()
+    new = repo.TreeBuilder()
+    for i in range(6):
+        content = b''.join(lines[i:])
+        old.insert(f'a{i}', repo.create_blob(content), FileMode.BLOB)
+        if i % 2:
+            content += b'more\n' * i
+        new.insert(f'b{i}', repo.create_blob(content), FileMode.BLOB)
+    old.insert('small', repo.create_blob(b'x\n'), FileMode.BLOB)
+    new.insert('small', repo.create_blob(b'y\n'), FileMode.BLOB)
+    old.insert('empty', repo.create_blob(b''), FileMode.BLOB)
+    new.insert('blank', repo.create_blob(b'\n'), FileMode.BLOB)
+    return repo[old.write()], repo[new.write()]
+
+
+@pytest.mark.parametrize(
+    'flags',
+    [
+        DiffFind.FIND_RENAMES,
+        DiffFind.FIND_RENAMES | DiffFind.FIND_COPIES,
+        DiffFind.FIND_ALL,
+        DiffFind.FIND_RENAMES | DiffFind.FIND_AND_BREAK_REWRITES,
+    ],
+)
+def test_find_similar_workers(barerepo, flags):
+    old, new = _similar_trees(barerepo)
+
+    expected = old.diff_to_tree(new)
+    expected.find_similar(flags)
+    assert any(d.status_char() == 'R' and d.similarity < 100 for d in expected.deltas)
+    for workers in 1, 3, 1:
+        diff = old.diff_to_tree(new)
+        diff.find_similar(flags, workers=workers)
+        assert _similar(diff) == _similar(expected)
+
+
+def _blobs_tree(repo, files):
+    builder = repo.TreeBuilder()
+    for name, content in files.items():
+        builder.insert(name, repo.create_blob(content), FileMode.BLOB)
+    return repo[builder.write()]
+
+
+COPY_FLAGS = [
+    DiffFind.FIND_COPIES,
+    DiffFind.FIND_RENAMES | DiffFind.FIND_COPIES,
+    DiffFind.FIND_RENAMES | DiffFind.FIND_COPIES | DiffFind.FIND_COPIES_FROM_UNMODIFIED,
+    DiffFind.FIND_ALL,
+]
+
+
+@pytest.mark.parametrize('flags', COPY_FLAGS)
+def test_find_similar_workers_copies(barerepo, flags):
+    # Two adds of the content of a deleted file, and another deleted file
+    # barely similar to it: libgit2 still pairs the second add with the
+    # latter, which keeps it from being a copy
+    lines = [f'line {i}\n'.encode() for i in range(40)]
+    other = b''.join(f'other {i}\n'.encode() for i in range(100))
+    old = _blobs_tree(
+        barerepo, {'k8': other + b''.join(lines[:3]), 'o9': b''.join(lines)}
+    )
+    new = _blobs_tree(barerepo, {'a7': b''.join(lines), 'n9': b''.join(lines)})
+
+    expected = old.diff_to_tree(new)
+    expected.find_similar(flags)
+    for workers in 1, 2:
+        diff = old.diff_to_tree(new)
+        diff.find_similar(flags, workers=workers)
+        assert _similar(diff) == _similar(expected)
+
+
+@pytest.mark.parametrize('flags', COPY_FLAGS)
+def test_find_similar_workers_random(barerepo, flags):
+    rng = random.Random(0)
+    lines = [f'line {i}\n'.encode() for i in range(40)]
+
+    def content():
+        x = rng.random()
+        if x < 0.4:
+            return b''.join(lines)  # Many files of the same content
+        if x < 0.8:
+            changed = list(lines)
+            for i in rng.sample(range(40), rng.randrange(1, 25)):
+                changed[i] = f'changed {rng.randrange(1000)}\n'.encode()
+            return b''.join(changed)
+        n = rng.choice([5, 40, 120])
+        return b''.join(f'other {rng.randrange(10**6)}\n'.encode() for _ in range(n))
+
+    names = [f'{c}{i}' for c in 'aknot' for i in range(3)]
+    for _ in range(50):
+        old = {x: content() for x in rng.sample(names, rng.randrange(1, 6))}
+        new = {x: content() for x in rng.sample(names, rng.randrange(1, 6))}
+        for x in new:
+            if x in old and rng.random() < 0.4:
+                new[x] = old[x]
+        old, new = _blobs_tree(barerepo, old), _blobs_tree(barerepo, new)
+
+        diff_flags = DiffOption.NORMAL
+        if flags & DiffFind.FIND_COPIES_FROM_UNMODIFIED:
+            diff_flags = DiffOption.INCLUDE_UNMODIFIED
+        expected = old.diff_to_tree(new, flags=diff_flags)
+        expected.find_similar(flags)
+        diff = old.diff_to_tree(new, flags=diff_flags)
+        diff.find_similar(flags, workers=2)
+        assert _similar(diff) == _similar(expected)
+
+
+def test_find_similar_cache(barerepo):
+    old, new = _similar_trees(barerepo)
+    expected = old.diff_to_tree(new)
+    expected.find_similar()
+
+    cache = pygit2.SignatureCache()
+    diff = old.diff_to_tree(new)
+    diff.find_similar(cache=cache)
+    assert _similar(diff) == _similar(expected)
+    assert cache.hits == 0
+    assert cache.misses == len(cache) > 0
+
+    misses = cache.misses
+    diff = old.diff_to_tree(new)
+    diff.find_similar(cache=cache, workers=2)
+    assert _similar(diff) == _similar(expected)
+    assert (cache.hits, cache.misses) == (misses, misses)
+
+    # The signatures depend on the whitespace options
+    diff = old.diff_to_tree(new)
+    diff.find_similar(
+        DiffFind.FIND_RENAMES | DiffFind.FIND_IGNORE_WHITESPACE, cache=cache
+    )
+    assert cache.misses == 2 * misses
+
+    cache = pygit2.SignatureCache(maxsize=2)
+    old.diff_to_tree(new).find_similar(cache=cache)
+    assert len(cache) == 2
+
+    # Any mapping will do, with bytes for keys and values
+    signatures = {}
+    diff = old.diff_to_tree(new)
+    diff.find_similar(cache=signatures)
+    assert len(signatures) == misses
+    assert all(isinstance(x, bytes) for x in signatures.values())
+    diff = old.diff_to_tree(new)
+    diff.find_similar(cache=signatures)
+    assert _similar(diff) == _similar(expected)
+
+    # By default, the cache of the repository
+    barerepo.signature_cache.clear()
+    old.diff_to_tree(new).find_similar(workers=1)
+    old.diff_to_tree(new).find_similar(workers=1)
+    assert barerepo.signature_cache.hits == barerepo.signature_cache.misses == misses
+
+
+def test_find_similar_cache_store(barerepo, tmp_path):
+    old, new = _similar_trees(barerepo)
+    expected = old.diff_to_tree(new)
+    expected.find_similar()
+
+    path = tmp_path / 'signatures'
+    cache = pygit2.SignatureCache(store=pygit2.DbmSignatureStore(path))
+    old.diff_to_tree(new).find_similar(cache=cache)
+    misses = cache.misses
+    cache.close()
+
+    barerepo.signature_cache = pygit2.SignatureCache(
+        store=pygit2.DbmSignatureStore(path)
+    )
+    diff = old.diff_to_tree(new)
+    diff.find_similar(workers=1)
+    assert _similar(diff) == _similar(expected)
+    assert (barerepo.signature_cache.hits, barerepo.signature_cache.misses) == (
+        misses,
+        0,
+    )
+    barerepo.signature_cache.close()
+
+
 def test_diff_stats(barerepo):
     commit_a = barerepo[COMMIT_SHA1_1]
     commit_b = barerepo[COMMIT_SHA1_2]
@@ -330,6 +637,77 @@ def test_diff_stats(barerepo):
     assert STATS_EXPECTED == formatted
 
 
+@pytest.mark.parametrize('workers', [1, 2])
+def test_diff_numstat(barerepo, workers):
+    commit_a = barerepo[COMMIT_SHA1_1]
+    commit_b = barerepo[COMMIT_SHA1_4]
+    diff = commit_a.tree.diff_to_tree(commit_b.tree)
+    insertions, deletions = diff.numstat(workers=workers)
+    assert insertions.typecode == deletions.typecode == 'q'
+    line_stats = [patch.line_stats for patch in diff]
+    assert list(insertions) == [x[1] for x in line_stats]
+    assert list(deletions) == [x[2] for x in line_stats]
+    assert sum(insertions) == diff.stats.insertions
+    assert sum(deletions) == diff.stats.deletions
+
+    # Cached, but returned as copies
+    insertions[0] = 1000
+    assert diff.numstat()[0][0] != 1000
+    assert diff.stats is diff.stats
+
+
+def test_diff_numstat_binary(tmp_path):
+    repo = pygit2.init_repository(tmp_path, bare=True)
+
+    def tree(**files):
+        builder = repo.TreeBuilder()
+        for name, data in files.items():
+            builder.insert(name, repo.create_blob(data), FileMode.BLOB)
+        return repo[builder.write()]
+
+    old = tree(binary=b'\0\1\2', text=b'a\nb\n', same=b'x\n')
+    new = tree(binary=b'\0\1\3', text=b'a\nc\nd\n', same=b'x\n')
+    diff = old.diff_to_tree(new, DiffOption.INCLUDE_UNMODIFIED)
+    paths = [delta.new_file.path for delta in diff.deltas]
+    assert paths == ['binary', 'same', 'text']
+    insertions, deletions = diff.numstat()
+    assert list(insertions) == [-1, 0, 2]
+    assert list(deletions) == [-1, 0, 1]
+
+    empty = old.diff_to_tree(old)
+    assert empty.numstat(workers=4) == (array('q'), array('q'))
+
+
+def test_diff_cache_cleared(barerepo):
+    commit_a = barerepo[COMMIT_SHA1_6]
+    commit_b = barerepo[COMMIT_SHA1_7]
+    diff = commit_a.tree.diff_to_tree(commit_b.tree)
+    stats = diff.stats
+    insertions, _ = diff.numstat()
+    diff.find_similar()
+    assert diff.stats is not stats
+    assert len(diff.numstat()[0]) == len(diff) < len(insertions)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_diff_cache_merge_thread(barerepo, workers):
+    # The diff is changed by another thread while the cache is made
+    commit_a = barerepo[COMMIT_SHA1_1]
+    commit_b = barerepo[COMMIT_SHA1_4]
+    diff = commit_a.tree.diff_to_tree(commit_b.tree)
+    other = commit_b.tree.diff_to_tree(commit_a.tree)
+    thread = threading.Thread(
+        target=lambda: (diff.numstat(workers=workers), diff.stats)
+    )
+    thread.start()
+    diff.merge(other)
+    thread.join()
+
+    insertions, deletions = diff.numstat()
+    assert len(insertions) == len(deletions) == len(diff)
+    assert sum(insertions) == diff.stats.insertions
+
+
 def test_deltas(barerepo):
     commit_a = barerepo[COMMIT_SHA1_1]
     commit_b = barerepo[COMMIT_SHA1_2]
@@ -353,6 +731,47 @@ def test_deltas(barerepo):
         # assert delta.flags == patch_delta.flags
 
 
+def test_deltas_getitem(barerepo):
+    commit_a = barerepo[COMMIT_SHA1_1]
+    commit_b = barerepo[COMMIT_SHA1_2]
+    diff = commit_a.tree.diff_to_tree(commit_b.tree)
+    deltas = diff.deltas
+    assert len(deltas) == len(diff)
+    assert deltas[-1].new_file.path == list(diff.deltas)[-1].new_file.path
+    with pytest.raises(IndexError):
+        deltas[len(diff)]
+
+    # The delta does not depend on the diff, and its files are cached
+    delta = deltas[0]
+    del diff, deltas
+    assert delta.old_file is delta.old_file
+    assert delta.old_file.raw_path == delta.old_file.path.encode()
+    assert delta.old_file.id is delta.old_file.id
+
+
+def test_delta_table(barerepo):
+    commit_a = barerepo[COMMIT_SHA1_1]
+    commit_b = barerepo[COMMIT_SHA1_4]
+    diff = commit_a.tree.diff_to_tree(commit_b.tree)
+    deltas = list(diff.deltas)
+    table = diff.delta_table()
+
+    assert table['status'] == ''.join(x.status_char() for x in deltas).encode()
+    assert list(table['flags']) == [x.flags for x in deltas]
+    assert list(table['similarity']) == [x.similarity for x in deltas]
+    assert list(table['nfiles']) == [x.nfiles for x in deltas]
+    for side in 'old', 'new':
+        files = [getattr(x, f'{side}_file') for x in deltas]
+        assert table[f'{side}_id'] == b''.join(x.id.raw for x in files)
+        assert list(table[f'{side}_mode']) == [x.mode for x in files]
+        assert list(table[f'{side}_size']) == [x.size for x in files]
+        assert utils.table_paths(table[f'{side}_path']) == [x.path for x in files]
+
+    empty = commit_a.tree.diff_to_tree(commit_a.tree).delta_table()
+    assert empty['status'] == b''
+    assert list(empty['old_path'][1]) == [0]
+
+
 def test_diff_parse(barerepo):
     diff = pygit2.Diff.parse_diff(PATCH)
 
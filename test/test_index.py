@@ -167,6 +167,52 @@ def test_iter(testrepo):
     assert list(x.id for x in index) == entries
 
 
+def test_entries_table(testrepo):
+    index = testrepo.index
+    index.add('bye.txt')
+    n = len(index)
+
+    table = index.entries_table()
+    assert sorted(table) == ['file_size', 'id', 'mode', 'mtime', 'path', 'stage']
+    data, offsets = table['path']
+    assert len(offsets) == n + 1
+    assert offsets[0] == 0
+    assert len(table['id']) == n * 20
+    for i, entry in enumerate(index):
+        assert data[offsets[i] : offsets[i + 1]].decode() == entry.path
+        assert table['id'][i * 20 : (i + 1) * 20] == entry.id.raw
+        assert table['mode'][i] == entry.mode
+        assert table['stage'][i] == 0
+
+    i = [entry.path for entry in index].index('bye.txt')
+    stat = Path(testrepo.workdir, 'bye.txt').stat()
+    assert table['file_size'][i] == stat.st_size
+    assert table['mtime'][i] == int(stat.st_mtime)
+
+    table = index.entries_table(['mtime_ns', 'flags'])
+    assert sorted(table) == ['flags', 'mtime_ns']
+    assert len(table['flags']) == n
+    assert index.entries_table([]) == {}
+    data, offsets = pygit2.Index().entries_table(['path'])['path']
+    assert data == b''
+    assert offsets.tolist() == [0]
+
+    with pytest.raises(ValueError):
+        index.entries_table(['path', 'size'])
+    with pytest.raises(TypeError):
+        index.entries_table([1])
+
+
+def test_iter_entries(testrepo):
+    index = testrepo.index
+    expected = [(entry.path, entry.id, entry.mode) for entry in index]
+    assert list(index.iter_entries()) == expected
+    assert list(index.iter_entries(['mode', 'path'])) == [
+        (mode, path) for path, _, mode in expected
+    ]
+    assert list(pygit2.Index().iter_entries()) == []
+
+
 def test_mode(testrepo):
     """
     Testing that we can access an index entry mode.
@@ -192,6 +238,21 @@ def test_remove(testrepo):
     assert 'hello.txt' not in index
 
 
+def test_remove_many(testrepo):
+    index = testrepo.index
+    n = len(index)
+    index.add('bye.txt')
+
+    with pytest.raises(OSError):
+        index.remove_many(['bye.txt', 'not-existing'])
+    assert len(index) == n + 1
+
+    index.remove_many(['bye.txt', Path('hello.txt'), 'bye.txt'])
+    assert 'bye.txt' not in index
+    assert 'hello.txt' not in index
+    assert len(index) == n - 1
+
+
 def test_remove_all(testrepo):
     index = testrepo.index
     assert 'hello.txt' in index
@@ -215,6 +276,105 @@ def test_remove_all_aspath(testrepo):
     assert 'hello.txt' not in index
 
 
+def test_add_many(testrepo):
+    index = testrepo.index
+    expected = {entry.path: (entry.id, entry.mode) for entry in index}
+    hello_id = index['hello.txt'].id
+    ignore_id = index['.gitignore'].id
+
+    paths = ['b/x.txt', 'a.txt', Path('c.txt'), b'hello.txt', 'a.txt']
+    oids = [hello_id, str(hello_id), ignore_id, ignore_id, ignore_id]
+    modes = [
+        FileMode.BLOB,
+        FileMode.BLOB_EXECUTABLE,
+        FileMode.LINK,
+        FileMode.BLOB,
+        FileMode.BLOB,
+    ]
+    index.add_many(paths, oids, modes)
+    expected['b/x.txt'] = (hello_id, FileMode.BLOB)
+    expected['a.txt'] = (ignore_id, FileMode.BLOB)
+    expected['c.txt'] = (ignore_id, FileMode.LINK)
+    expected['hello.txt'] = (ignore_id, FileMode.BLOB)
+    assert {entry.path: (entry.id, entry.mode) for entry in index} == expected
+    assert [entry.path for entry in index] == sorted(expected)
+
+    # From the columns of another index
+    other = Index()
+    table = index.entries_table(['path', 'id', 'mode'])
+    data, offsets = table['path']
+    paths = [data[offsets[i] : offsets[i + 1]] for i in range(len(offsets) - 1)]
+    other.add_many(paths, table['id'], table['mode'])
+    assert list(other.iter_entries()) == list(index.iter_entries())
+
+
+def test_add_many_invalid(testrepo):
+    index = testrepo.index
+    entries = list(index.iter_entries())
+    hello_id = index['hello.txt'].id
+
+    with pytest.raises(ValueError):
+        index.add_many(['a.txt', 'b.txt'], [hello_id], [FileMode.BLOB] * 2)
+    with pytest.raises(ValueError):
+        index.add_many(['a.txt', 'b.txt'], [hello_id] * 2, [FileMode.BLOB])
+    with pytest.raises(ValueError):
+        index.add_many(['a.txt', 'b.txt'], [hello_id] * 2, [FileMode.BLOB, 0o40000])
+    with pytest.raises(ValueError):
+        index.add_many(['a.txt', ''], [hello_id] * 2, [FileMode.BLOB] * 2)
+    with pytest.raises(ValueError):
+        index.add_many(['a.txt', 'b.txt'], [hello_id, 'a520c24d'], [FileMode.BLOB] * 2)
+    with pytest.raises(ValueError):
+        index.add_many(['a.txt'], hello_id.raw * 2, [FileMode.BLOB])
+    with pytest.raises(TypeError):
+        index.add_many('a.txt', [hello_id], [FileMode.BLOB])
+    with pytest.raises(TypeError):
+        index.add_many(['a.txt', 1], [hello_id] * 2, [FileMode.BLOB] * 2)
+    assert list(index.iter_entries()) == entries
+
+
+@pytest.mark.parametrize(
+    'path',
+    ['y/../z', './y', '..', 'm/', '/m', 'm//n', '.git', 'x/.GIT/y'],
+)
+def test_add_many_invalid_path(testrepo, path):
+    index = testrepo.index
+    entries = list(index.iter_entries())
+    hello_id = index['hello.txt'].id
+
+    with pytest.raises(ValueError, match='invalid path'):
+        index.add_many(['x', path], [hello_id] * 2, [FileMode.BLOB] * 2)
+    assert list(index.iter_entries()) == entries
+
+
+@pytest.mark.parametrize(
+    'paths',
+    [['d', 'd-e', 'd/e'], ['hello.txt/x'], ['x'], ['x/y/z/w']],
+)
+def test_add_many_file_and_directory(testrepo, paths):
+    index = testrepo.index
+    hello_id = index['hello.txt'].id
+    index.add(pygit2.IndexEntry('x/y/z', hello_id, FileMode.BLOB))
+    entries = list(index.iter_entries())
+
+    with pytest.raises(ValueError, match='both a file and a directory'):
+        index.add_many(paths, [hello_id] * len(paths), [FileMode.BLOB] * len(paths))
+    assert list(index.iter_entries()) == entries
+
+
+def test_add_many_rollback(testrepo):
+    index = testrepo.index
+    entries = list(index.iter_entries())
+    hello_id = index['hello.txt'].id
+    ignore_id = index['.gitignore'].id
+
+    # Rejected by libgit2 (core.protectNTFS), after the others are added
+    paths = ['a.txt', 'hello.txt', 'x/git~1']
+    with pytest.raises(pygit2.GitError):
+        index.add_many(paths, [ignore_id] * 3, [FileMode.BLOB] * 3)
+    assert list(index.iter_entries()) == entries
+    assert index['hello.txt'].id == hello_id
+
+
 def test_change_attributes(testrepo):
     index = testrepo.index
     entry = index['hello.txt']
@@ -62,6 +62,30 @@ def test_iterable(odb):
     assert BLOB_HEX in odb
 
 
+def test_iter(odb):
+    ids = list(odb)
+    assert BLOB_OID in ids
+    assert len(ids) == len(set(ids))
+
+    # Stop in the middle, the producer thread must not be left blocked
+    for _ in range(100):
+        it = iter(odb)
+        next(it)
+        del it
+
+
+def test_iter_raw(odb):
+    ids = list(odb)
+    chunks = list(odb.iter_raw(chunk_size=3))
+    assert all(0 < len(x) <= 3 * 20 for x in chunks)
+    data = b''.join(chunks)
+    raw_ids = [data[i : i + 20] for i in range(0, len(data), 20)]
+    assert sorted(raw_ids) == sorted(x.raw for x in ids)
+
+    with pytest.raises(ValueError):
+        odb.iter_raw(0)
+
+
 def test_contains(odb):
     assert BLOB_HEX in odb
 
@@ -84,6 +108,45 @@ def test_read(odb):
     assert (ObjectType.BLOB, b'a contents\n') == a3
 
 
+def test_read_many(odb):
+    ids = list(odb)
+    expected = [odb.read(x) for x in ids]
+    assert odb.read_many(ids) == expected
+    assert odb.read_many([str(x) for x in ids]) == expected
+    assert odb.read_many(b''.join(x.raw for x in ids)) == expected
+    assert odb.read_many(ids, workers=4) == expected
+    assert odb.read_many([BLOB_HEX[:7]]) == [odb.read(BLOB_OID)]
+    assert odb.read_many([]) == []
+
+    with pytest.raises(KeyError):
+        odb.read_many([BLOB_OID, '1' * 40], workers=2)
+    with pytest.raises(ValueError):
+        odb.read_many(b'\0' * 21)
+    with pytest.raises(TypeError):
+        odb.read_many(BLOB_HEX)
+
+
+def test_read_header(odb):
+    assert odb.read_header(BLOB_OID) == (ObjectType.BLOB, len(b'a contents\n'))
+    assert odb.read_header(BLOB_HEX[:7]) == odb.read_header(BLOB_HEX)
+    with pytest.raises(KeyError):
+        odb.read_header('1' * 40)
+
+
+def test_read_headers(odb):
+    ids = list(odb)
+    objects = [odb.read(x) for x in ids]
+    types, sizes = odb.read_headers(ids)
+    assert types.typecode == 'b'
+    assert sizes.typecode == 'Q'
+    assert list(types) == [x[0] for x in objects]
+    assert list(sizes) == [len(x[1]) for x in objects]
+    assert odb.read_headers(b''.join(x.raw for x in ids), workers=3) == (types, sizes)
+
+    with pytest.raises(KeyError):
+        odb.read_headers([BLOB_OID, '1' * 40])
+
+
 def test_write(odb):
     data = b'hello world'
     # invalid object type
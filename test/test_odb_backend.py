@@ -27,13 +27,14 @@
 
 # Standard Library
 import binascii
+import io
 from pathlib import Path
 
 import pytest
 
 # pygit2
 import pygit2
-from pygit2.enums import ObjectType
+from pygit2.enums import DiffFind, ObjectType
 from . import utils
 
 
@@ -56,6 +57,15 @@ def test_pack(odb):
         assert obj in odb
 
 
+def test_pack_iter_raw(odb):
+    odb, path = odb
+
+    pack = pygit2.OdbBackendPack(path)
+    data = b''.join(pack.iter_raw())
+    assert len(data) == 20 * len(list(pack))
+    assert data[:20] == next(iter(pack)).raw
+
+
 def test_loose(odb):
     odb, path = odb
 
@@ -167,3 +177,125 @@ def test_repo_read(repo):
     ab = repo[BLOB_OID]
     a = repo[BLOB_HEX]
     assert ab == a
+
+
+#
+# The calls below release the GIL, the callbacks of the Python backends
+# must take it back.
+#
+
+
+@pytest.fixture
+def proxyrepo(testrepo):
+    path = Path(testrepo.path) / 'objects'
+    odb = pygit2.Odb()
+    odb.add_backend(ProxyBackend(pygit2.OdbBackendPack(path)), 1)
+    odb.add_backend(ProxyBackend(pygit2.OdbBackendLoose(path, 5, False)), 2)
+
+    repo = pygit2.Repository()
+    repo.set_odb(odb)
+    yield repo
+
+
+def test_repo_merge_base(proxyrepo):
+    a = '5ebeeebb320790caf276b9fc8b24546d63316533'
+    b = '4ec4389a8068641da2d6578db0419484972284c8'
+    base = 'acecd5ea2924a4b900e7e149496e1f4b57976e51'
+    assert proxyrepo.merge_base(a, b) == base
+    assert proxyrepo.merge_base_many([a, b]) == base
+    assert proxyrepo.descendant_of(a, base)
+    assert not proxyrepo.descendant_of(base, a)
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_repo_read_many(proxyrepo, testrepo, workers):
+    ids = list(testrepo.odb)
+    expected = [testrepo.odb.read(x) for x in ids]
+    assert proxyrepo.odb.read_many(ids, workers=workers) == expected
+    assert proxyrepo.read_many(ids[:3], workers=workers) == expected[:3]
+
+    with pytest.raises(KeyError):
+        proxyrepo.odb.read_many([ids[0], '1' * 40], workers=workers)
+
+
+def test_repo_read_header(proxyrepo, testrepo):
+    ids = list(testrepo.odb)
+    assert proxyrepo.odb.read_header(ids[0]) == testrepo.odb.read_header(ids[0])
+    assert proxyrepo.odb.read_headers(ids, workers=2) == testrepo.odb.read_headers(ids)
+
+    with pytest.raises(KeyError):
+        proxyrepo.odb.read_header('1' * 40)
+    with pytest.raises(KeyError):
+        proxyrepo.odb.read_headers([ids[0], '1' * 40])
+
+
+def _proxy_diffs(proxyrepo, testrepo):
+    a = '5470a671a80ac3789f1a6a8cefbcf43ce7af0563'
+    b = '2be5719152d4f82c7302b1c0932d8e5f0a4a0e98'
+    return proxyrepo.diff(a, b), testrepo.diff(a, b)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_repo_patch_text(proxyrepo, testrepo, workers):
+    diff, expected = _proxy_diffs(proxyrepo, testrepo)
+    assert diff.patch_text(workers=workers) == expected.patch
+    patches = diff.patches(workers=workers)
+    assert [x.text for x in patches] == [x.text for x in expected]
+
+
+def test_repo_write_patch(proxyrepo, testrepo):
+    diff, expected = _proxy_diffs(proxyrepo, testrepo)
+    out = io.BytesIO()
+    diff.write_patch(out)
+    assert out.getvalue() == expected.patch.encode()
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_repo_diff_stats(proxyrepo, testrepo, workers):
+    diff, expected = _proxy_diffs(proxyrepo, testrepo)
+    assert diff.numstat(workers=workers) == expected.numstat()
+    assert diff.stats.files_changed == expected.stats.files_changed
+    assert diff.stats.insertions == expected.stats.insertions
+    assert diff.stats.deletions == expected.stats.deletions
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_repo_diff_commits(proxyrepo, testrepo, workers):
+    head = '2be5719152d4f82c7302b1c0932d8e5f0a4a0e98'
+    commits = list(testrepo.walk(head))
+    pairs = [(c.parent_ids[0], c.id) for c in commits if c.parents]
+    expected = list(testrepo.diff_commits(pairs))
+    assert list(proxyrepo.diff_commits(pairs, workers=workers)) == expected
+
+    # Without a path nor Python backends
+    odb = pygit2.Odb()
+    odb.add_backend(pygit2.OdbBackendPack(Path(testrepo.path) / 'objects'), 1)
+    repo = pygit2.Repository()
+    repo.set_odb(odb)
+    assert list(repo.diff_commits(pairs, workers=workers)) == expected
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_repo_find_similar(proxyrepo, testrepo, workers):
+    flags = DiffFind.FIND_RENAMES | DiffFind.FIND_COPIES
+    diff, expected = _proxy_diffs(proxyrepo, testrepo)
+    diff.find_similar(flags, workers=workers, cache={})
+    expected.find_similar(flags)
+    assert [x.status_char() for x in diff.deltas] == [
+        x.status_char() for x in expected.deltas
+    ]
+    assert diff.patch == expected.patch
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_repo_blame_iter(proxyrepo, testrepo, workers):
+    def hunks(repo):
+        head = '2be5719152d4f82c7302b1c0932d8e5f0a4a0e98'
+        return [
+            (path, x.final_commit_id, x.final_start_line_number, x.lines_in_hunk)
+            for path, x in repo.blame_iter(
+                ['hello.txt', '.gitignore'], newest_commit=head, workers=workers
+            )
+        ]
+
+    assert hunks(proxyrepo) == hunks(testrepo)
@@ -0,0 +1,128 @@
+# Copyright 2010-2024 The pygit2 contributors
+#
+# This file is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License, version 2,
+# as published by the Free Software Foundation.
+#
+# In addition to the permissions in the GNU General Public License,
+# the authors give you unlimited permission to link the compiled
+# version of this file into combinations with other programs,
+# and to distribute those combinations without any restriction
+# coming from the use of this file.  (The General Public License
+# restrictions do apply in other respects; for example, they cover
+# modification of the file, and distribution when not linked into
+# a combined executable.)
+#
+# This file is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; see the file COPYING.  If not, write to
+# the Free Software Foundation, 51 Franklin Street, Fifth Floor,
+# Boston, MA 02110-1301, USA.
+
+"""Tests for the reachability index."""
+
+from pygit2 import Signature
+from pygit2.enums import SortMode
+
+
+LAST_COMMIT = '2be5719152d4f82c7302b1c0932d8e5f0a4a0e98'
+EXCLUSIVE_MASTER_COMMIT = '5ebeeebb320790caf276b9fc8b24546d63316533'
+SHARED_COMMIT = '4ec4389a8068641da2d6578db0419484972284c8'
+
+
+def test_build(testrepo):
+    reachability = testrepo.reachability
+    assert not reachability.is_built
+    assert LAST_COMMIT in reachability
+    assert reachability.is_built
+    assert '0' * 40 not in reachability
+    reachability.clear()
+    assert not reachability.is_built
+
+
+def test_descendant_of(testrepo):
+    reachability = testrepo.reachability
+    commits = [x.id for x in testrepo.walk(LAST_COMMIT)]
+    commits += [x.id for x in testrepo.walk(testrepo.branches['i18n'].target)]
+    for a in commits:
+        for b in commits:
+            expected = testrepo.descendant_of(a, b)
+            assert reachability.descendant_of(a, b) == expected
+            assert reachability.contains(a, b) == (expected or a == b)
+
+
+def test_count_and_ancestors(testrepo):
+    reachability = testrepo.reachability
+    for commit in LAST_COMMIT, SHARED_COMMIT:
+        walker = testrepo.walk(commit, SortMode.TOPOLOGICAL | SortMode.REVERSE)
+        expected = list(walker.iter_ids())
+        assert reachability.count(commit) == len(expected)
+        assert sorted(reachability.ancestors(commit)) == sorted(expected)
+
+
+def test_with_commit(testrepo):
+    reachability = testrepo.reachability
+    assert reachability.with_commit(EXCLUSIVE_MASTER_COMMIT) == ['refs/heads/master']
+    assert sorted(reachability.with_commit(SHARED_COMMIT)) == [
+        'refs/heads/i18n',
+        'refs/heads/master',
+    ]
+
+
+def test_branches_with_commit(testrepo):
+    testrepo.reachability.build()
+    branches = testrepo.branches.with_commit(EXCLUSIVE_MASTER_COMMIT)
+    assert sorted(branches) == ['master']
+    branches = testrepo.branches.with_commit(SHARED_COMMIT)
+    assert sorted(branches) == ['i18n', 'master']
+
+
+def test_new_commits(testrepo):
+    reachability = testrepo.reachability
+    reachability.build()
+
+    sig = Signature('Foo', 'foo@example.com')
+    tree = testrepo[LAST_COMMIT].tree_id
+    oid = testrepo.create_commit('HEAD', sig, sig, 'new', tree, [LAST_COMMIT])
+    assert oid not in reachability
+    assert reachability.descendant_of(oid, SHARED_COMMIT)
+    assert reachability.with_commit(oid) == ['refs/heads/master']
+    assert reachability.count(oid) == reachability.count(LAST_COMMIT) + 1
+
+    reachability.build()
+    assert oid in reachability
+    assert reachability.descendant_of(oid, SHARED_COMMIT)
+
+
+def test_long_history(testrepo):
+    # Long enough for the bitmaps to be kept for a sample of the commits only
+    sig = Signature('Foo', 'foo@example.com')
+    tree = testrepo[LAST_COMMIT].tree_id
+    main = side = LAST_COMMIT
+    commits = []
+    for i in range(300):
+        main = testrepo.create_commit(None, sig, sig, f'main {i}', tree, [main])
+        commits.append(main)
+        if i % 3 == 0:
+            side = testrepo.create_commit(None, sig, sig, f'side {i}', tree, [side])
+            commits.append(side)
+        if i % 50 == 49:
+            main = testrepo.create_commit(None, sig, sig, 'merge', tree, [main, side])
+            commits.append(main)
+    testrepo.create_branch('long', testrepo[main])
+    testrepo.create_branch('side', testrepo[side])
+
+    reachability = testrepo.reachability
+    reachability.build()
+    assert len(reachability._bitmaps) < len(commits) // 10
+    for oid in commits[::7]:
+        walker = testrepo.walk(oid, SortMode.TOPOLOGICAL)
+        assert reachability.count(oid) == len(list(walker.iter_ids()))
+        for other in commits[::37]:
+            assert reachability.descendant_of(oid, other) == testrepo.descendant_of(
+                oid, other
+            )
@@ -87,6 +87,14 @@ def test_read(barerepo):
     assert (ObjectType.BLOB, b'a contents\n') == a3
 
 
+def test_read_many(barerepo):
+    oids = [BLOB_HEX, '7f129fd57e31e935c6d60a0c794efe4e6927664b']
+    assert barerepo.read_many(oids) == [
+        (ObjectType.BLOB, b'a contents\n'),
+        (ObjectType.BLOB, b'a contents 2\n'),
+    ]
+
+
 def test_write(barerepo):
     data = b'hello world'
     # invalid object type
@@ -25,7 +25,13 @@
 
 """Tests for revision walk."""
 
-from pygit2.enums import SortMode
+from collections.abc import Mapping
+
+import pytest
+
+from pygit2 import Oid, Signature
+from pygit2.commit_graph import _bloom_filter
+from pygit2.enums import FileMode, SortMode
 
 
 # In the order given by git log
@@ -113,3 +119,204 @@ def test_default_sorting(testrepo):
     list2 = list([x.id for x in walker])
 
     assert list1 == list2
+
+
+def test_next_batch(testrepo):
+    walker = testrepo.walk(log[0], SortMode.TIME)
+    batch = walker.next_batch(3)
+    assert sorted(batch) == [
+        'commit_time',
+        'commit_time_offset',
+        'id',
+        'parent_count',
+    ]
+    ids = batch['id']
+    assert [ids[i : i + 20].hex() for i in range(0, len(ids), 20)] == log[:3]
+    commits = [testrepo[x] for x in log[:3]]
+    assert list(batch['commit_time']) == [x.commit_time for x in commits]
+    assert list(batch['commit_time_offset']) == [x.commit_time_offset for x in commits]
+    assert list(batch['parent_count']) == [len(x.parents) for x in commits]
+
+    batch = walker.next_batch(3, ['id'])
+    assert batch['id'].hex() == ''.join(log[3:])
+    batch = walker.next_batch(3, ['id'])
+    assert batch == {'id': b''}
+
+
+def test_next_batch_fields(testrepo):
+    walker = testrepo.walk(log[0], SortMode.TIME)
+    batch = walker.next_batch(
+        -1, ['tree_id', 'parent_ids', 'author_time', 'author_name']
+    )
+    commits = [testrepo[x] for x in log]
+    assert batch['tree_id'] == b''.join(x.tree_id.raw for x in commits)
+    assert batch['parent_ids'] == b''.join(p.raw for x in commits for p in x.parent_ids)
+    assert list(batch['author_time']) == [x.author.time for x in commits]
+    data, offsets = batch['author_name']
+    assert len(offsets) == len(log) + 1
+    names = [data[offsets[i] : offsets[i + 1]] for i in range(len(log))]
+    assert names == [x.author.raw_name for x in commits]
+
+
+def test_next_batch_unknown_field(testrepo):
+    walker = testrepo.walk(log[0], SortMode.TIME)
+    with pytest.raises(ValueError):
+        walker.next_batch(1, ['foo'])
+
+
+def test_walk_table(testrepo):
+    table = testrepo.walk_table(log[0], SortMode.TIME | SortMode.REVERSE, ['id'])
+    assert table['id'].hex() == ''.join(reversed(log))
+
+
+def test_iter_ids(testrepo):
+    walker = testrepo.walk(log[0], SortMode.TIME)
+    ids = list(walker.iter_ids())
+    assert all(isinstance(x, Oid) for x in ids)
+    assert ids == log
+
+
+def test_iter_ids_hide(testrepo):
+    walker = testrepo.walk(log[0], SortMode.TIME)
+    walker.hide('4ec4389a8068641da2d6578db0419484972284c8')
+    assert list(walker.iter_ids()) == log[:2]
+
+
+def test_fill_ids(testrepo):
+    walker = testrepo.walk(log[0], SortMode.TIME)
+    buffer = bytearray(20 * 3)
+    assert walker.fill_ids(buffer) == 3
+    assert buffer.hex() == ''.join(log[:3])
+    assert walker.fill_ids(buffer) == 2
+    assert buffer[:40].hex() == ''.join(log[3:])
+    assert walker.fill_ids(buffer) == 0
+
+
+def test_commit_graph(testrepo):
+    assert testrepo.read_commit_graph() is None
+    testrepo.write_commit_graph()
+
+    with testrepo.read_commit_graph() as graph:
+        commits = list(testrepo.walk(testrepo.head.target))
+        assert len(graph) >= len(commits)
+        for commit in commits:
+            entry = graph[commit.id]
+            assert entry.id == commit.id
+            assert entry.tree_id == commit.tree_id
+            assert entry.parent_ids == commit.parent_ids
+            assert entry.commit_time == commit.commit_time
+            assert entry.generation >= 1
+        assert log[0] in graph
+        assert isinstance(graph, Mapping)
+        assert list(graph.keys()) == list(graph)
+        assert [x.id for x in graph.values()] == list(graph)
+        assert dict(graph.items())[commits[0].id].id == commits[0].id
+        assert graph.get('0' * 40) is None
+        with pytest.raises(KeyError):
+            graph['0' * 40]
+
+    # Graph queries give the same results with and without the graph
+    assert testrepo.merge_base(log[0], log[4]) == log[4]
+    assert testrepo.descendant_of(log[0], log[4])
+    testrepo.use_commit_graph(False)
+    assert testrepo.descendant_of(log[0], log[4])
+    testrepo.use_commit_graph()
+    assert [x.id for x in testrepo.walk(log[0], SortMode.TIME)] == log
+
+
+def test_commit_graph_octopus(testrepo):
+    sig = Signature('Foo', 'foo@example.com')
+    tree = testrepo[log[0]].tree_id
+    parents = log[:3]
+    oid = testrepo.create_commit('HEAD', sig, sig, 'octopus', tree, parents)
+    testrepo.write_commit_graph()
+
+    with testrepo.read_commit_graph() as graph:
+        entry = graph[oid]
+        assert entry.parent_ids == parents
+        assert entry.generation > graph[log[0]].generation
+
+
+def _diff_changes(diff):
+    return [(d.status_char(), d.old_file.path, d.new_file.path) for d in diff.deltas]
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_diff_commits(testrepo, workers):
+    commits = list(testrepo.walk(log[0]))
+    result = list(testrepo.diff_commits(commits, workers=workers, chunk_size=2))
+    assert [oid for oid, changes in result] == [c.id for c in commits]
+    for commit, (oid, changes) in zip(commits, result):
+        if commit.parents:
+            diff = commit.parents[0].tree.diff_to_tree(commit.tree)
+        else:
+            diff = commit.tree.diff_to_tree(swap=True)
+        assert changes == _diff_changes(diff)
+
+
+def test_diff_commits_pairs(testrepo):
+    pairs = [(None, log[4]), (log[4], testrepo[log[0]].tree), (log[0], log[0])]
+    result = list(testrepo.diff_commits(pairs))
+    assert result[0][0] == log[4]
+    assert [status for status, old, new in result[0][1]] == ['A'] * len(
+        testrepo[log[4]].tree
+    )
+    diff = testrepo.diff(log[4], log[0])
+    assert result[1][1] == _diff_changes(diff)
+    assert result[2][1] == []
+
+
+def test_diff_commits_renames(testrepo):
+    head = testrepo[log[0]]
+    builder = testrepo.TreeBuilder(head.tree)
+    builder.insert('renamed.txt', head.tree['hello.txt'].id, FileMode.BLOB)
+    builder.remove('hello.txt')
+    tree = builder.write()
+
+    [(_, changes)] = testrepo.diff_commits([(head, tree)])
+    assert sorted(changes) == [
+        ('A', 'renamed.txt', 'renamed.txt'),
+        ('D', 'hello.txt', 'hello.txt'),
+    ]
+    [(_, changes)] = testrepo.diff_commits([(head, tree)], renames=True)
+    assert changes == [('R', 'hello.txt', 'renamed.txt')]
+
+
+def test_diff_commits_missing(testrepo):
+    with pytest.raises(KeyError):
+        list(testrepo.diff_commits([(log[0], '1' * 40)]))
+
+
+def test_log_path(testrepo):
+    expected = [log[0], log[2], log[3], log[4]]
+    assert [c.id for c in testrepo.log_path('hello.txt')] == expected
+    assert [c.id for c in testrepo.log_path(['.gitignore'])] == log[:2]
+    assert list(testrepo.log_path('nope')) == []
+
+    walk = testrepo.walk(log[2], SortMode.REVERSE, paths=['hello.txt'])
+    assert [c.id for c in walk] == [log[4], log[3], log[2]]
+
+
+def test_changed_paths(testrepo):
+    assert testrepo.read_changed_paths() is None
+    testrepo.write_changed_paths()
+
+    with testrepo.read_changed_paths() as filters:
+        assert len(filters) == 6
+        assert filters.maybe_changed(log[4], 'hello.txt')
+        assert filters.maybe_changed(log[3], 'hello.txt')
+        assert not filters.maybe_changed(log[1], 'hello.txt')
+        assert not filters.maybe_changed(log[3], 'nope')
+        assert not filters.maybe_changed(log[3], 'c/d')
+        assert filters.maybe_changed('0' * 40, 'hello.txt') is None
+
+    # Same results with the filters
+    expected = [log[0], log[2], log[3], log[4]]
+    assert [c.id for c in testrepo.log_path('hello.txt')] == expected
+    assert [c.id for c in testrepo.log_path('.gitignore')] == log[:2]
+
+
+def test_changed_paths_git_compatible():
+    # The filter of a commit changing only hello.txt, as written by
+    # "git commit-graph write --changed-paths"
+    assert _bloom_filter([b'hello.txt'], {}) == bytes.fromhex('1111')
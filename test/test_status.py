@@ -23,9 +23,14 @@
 # the Free Software Foundation, 51 Franklin Street, Fifth Floor,
 # Boston, MA 02110-1301, USA.
 
+import sys
+from pathlib import Path
+
 import pytest
 
+import pygit2
 from pygit2.enums import FileStatus
+from . import utils
 
 
 def test_status(dirtyrepo):
@@ -80,3 +85,186 @@ def test_status_ignored(dirtyrepo, ignored, expected):
     assert {
         file for file, status in git_status.items() if status & FileStatus.IGNORED
     } == expected
+
+
+@pytest.mark.parametrize('untracked_files', ['no', 'normal', 'all'])
+@pytest.mark.parametrize('ignored', [True, False])
+def test_status_workers(dirtyrepo, untracked_files, ignored):
+    expected = dirtyrepo.status(untracked_files=untracked_files, ignored=ignored)
+    for workers in 2, 3, 16:
+        git_status = dirtyrepo.status(
+            untracked_files=untracked_files, ignored=ignored, workers=workers
+        )
+        assert git_status == expected
+
+
+def test_status_paths(dirtyrepo):
+    full = dirtyrepo.status()
+    git_status = dirtyrepo.status(paths=['subdir'])
+    assert git_status
+    assert git_status == {
+        path: status for path, status in full.items() if path.startswith('subdir/')
+    }
+    assert dirtyrepo.status(paths=['subdir', '*file'], workers=2) == {
+        path: status
+        for path, status in full.items()
+        if path.startswith('subdir/') or path.endswith('file')
+    }
+    assert dirtyrepo.status(paths=[]) == full
+
+
+def test_status_workers_unsaved_index(dirtyrepo):
+    dirtyrepo.index.remove('subdir/modified_file')
+    assert dirtyrepo.status(workers=4) == dirtyrepo.status()
+
+
+@pytest.mark.parametrize('paths', [None, ['subdir', 'new_file']])
+def test_status_workers_index_usable(dirtyrepo, paths):
+    # The index of the repository is still its own afterwards
+    dirtyrepo.status(paths=paths, workers=2)
+    Path(dirtyrepo.workdir, 'q').write_text('q\n')
+    dirtyrepo.index.add('q')
+    assert dirtyrepo.status(paths=['q'], workers=2) == {'q': FileStatus.INDEX_NEW}
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_status_table(dirtyrepo, workers):
+    expected = dirtyrepo.status()
+    table = dirtyrepo.status(as_table=True, workers=workers)
+    assert table['flags'].typecode == 'I'
+    assert table['path'][1].typecode == 'Q'
+    paths = utils.table_paths(table['path'])
+    assert paths == utils.table_paths(table['new_path'])
+    assert dict(zip(paths, table['flags'])) == expected
+
+
+def test_status_table_overlapping_paths(dirtyrepo):
+    # The files matched by the pathspecs of several workers are listed once
+    paths = ['subdir', '*file', 'subdir/*']
+    expected = dirtyrepo.status(paths=paths, as_table=True)
+    table = dirtyrepo.status(paths=paths, as_table=True, workers=2)
+    assert utils.table_paths(table['path']) == utils.table_paths(expected['path'])
+    assert table['flags'] == expected['flags']
+    assert list(dirtyrepo.status(paths=paths, workers=3)) == list(
+        dirtyrepo.status(paths=paths)
+    )
+
+
+def test_status_table_renames(dirtyrepo):
+    workdir = Path(dirtyrepo.workdir)
+    (workdir / 'staged_changes').rename(workdir / 'renamed_file')
+
+    assert 'renamed_file' in dirtyrepo.status()
+    status = dirtyrepo.status(renames=True)
+    assert 'renamed_file' not in status
+    assert status['staged_changes'] & FileStatus.WT_RENAMED
+    assert status['staged_delete'] == FileStatus.INDEX_RENAMED
+
+    table = dirtyrepo.status(renames=True, as_table=True, workers=2)
+    renames = dict(
+        zip(utils.table_paths(table['path']), utils.table_paths(table['new_path']))
+    )
+    assert renames['staged_changes'] == 'renamed_file'
+    assert renames['staged_delete'] == 'staged_new'
+    assert renames['modified_file'] == 'modified_file'
+    assert list(table['flags']) == list(status.values())
+
+
+class ListChangeSource:
+    def __init__(self):
+        self.paths = []
+        self.closed = False
+
+    def changed_paths(self):
+        paths, self.paths = self.paths, []
+        return paths
+
+    def close(self):
+        self.closed = True
+
+
+def test_status_cache(dirtyrepo):
+    source = ListChangeSource()
+    with dirtyrepo.status_cache(change_source=source) as cache:
+        assert cache.status() == dirtyrepo.status()
+        assert (cache.full_scans, cache.incremental_scans) == (1, 0)
+
+        # Nothing changed
+        assert cache.status() == dirtyrepo.status()
+        assert (cache.full_scans, cache.incremental_scans) == (1, 0)
+
+        workdir = Path(dirtyrepo.workdir)
+        (workdir / 'subdir' / 'new_file_x').write_text('x')
+        (workdir / 'subdir' / 'modified_file').unlink()
+        (workdir / 'newdir').mkdir()
+        (workdir / 'newdir' / 'a').write_text('a')
+        source.paths = ['subdir/new_file_x', 'subdir/modified_file', 'newdir']
+        status = cache.status()
+        assert status == dirtyrepo.status()
+        assert status['subdir/new_file_x'] == FileStatus.WT_NEW
+        assert status['newdir/a'] == FileStatus.WT_NEW
+        assert (cache.full_scans, cache.incremental_scans) == (1, 1)
+
+        # Writing the index forces a full scan
+        dirtyrepo.index.add('newdir/a')
+        dirtyrepo.index.write()
+        assert cache.status() == dirtyrepo.status()
+        assert (cache.full_scans, cache.incremental_scans) == (2, 1)
+
+        # So does an unknown set of changes
+        source.paths = None
+        assert cache.status() == dirtyrepo.status()
+        assert cache.full_scans == 3
+
+        cache.invalidate()
+        cache.status()
+        assert cache.full_scans == 4
+
+    assert source.closed
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_status_cache_literal_paths(dirtyrepo, workers):
+    source = ListChangeSource()
+    with dirtyrepo.status_cache(change_source=source, workers=workers) as cache:
+        cache.status()
+
+        # Names, not patterns: '[ab]' would match 'a' and 'b' only
+        workdir = Path(dirtyrepo.workdir)
+        (workdir / '[ab]').write_text('x')
+        (workdir / 'a').write_text('a')
+        source.paths = ['[ab]']
+        status = cache.status()
+        assert status['[ab]'] == FileStatus.WT_NEW
+        assert 'a' not in status
+        assert cache.incremental_scans == 1
+
+        # The index of the repository can still be written
+        dirtyrepo.index.add('[ab]')
+        dirtyrepo.index.write()
+        assert dirtyrepo.status(paths=['[ab]'], literal_paths=True) == {
+            '[ab]': FileStatus.INDEX_NEW
+        }
+
+
+@pytest.mark.skipif(sys.platform != 'linux', reason='requires inotify')
+def test_status_cache_inotify(dirtyrepo):
+    with dirtyrepo.status_cache() as cache:
+        assert isinstance(cache._source, pygit2.InotifyChangeSource)
+        assert cache.status() == dirtyrepo.status()
+
+        workdir = Path(dirtyrepo.workdir)
+        (workdir / 'subdir' / 'new_file_x').write_text('x')
+        (workdir / 'newdir').mkdir()
+        (workdir / 'newdir' / 'a').write_text('a')
+        (workdir / 'newdir' / 'b').write_text('b')
+        status = cache.status()
+        assert status == dirtyrepo.status()
+        assert status['newdir/b'] == FileStatus.WT_NEW
+        assert (cache.full_scans, cache.incremental_scans) == (1, 1)
+
+        # Files created in a directory watched after the previous call
+        (workdir / 'newdir' / 'c').write_text('c')
+        (workdir / 'subdir' / 'new_file_x').unlink()
+        assert cache.status() == dirtyrepo.status()
+        assert (cache.full_scans, cache.incremental_scans) == (1, 2)
@@ -80,6 +80,12 @@ def gen_blob_sha1(data):
     return m.hexdigest()
 
 
+def table_paths(column):
+    """Return the paths of a (data, offsets) column of a table as strs."""
+    data, offsets = column
+    return [data[offsets[i] : offsets[i + 1]].decode() for i in range(len(offsets) - 1)]
+
+
 def force_rm_handle(remove_path, path, excinfo):
     path = Path(path)
     path.chmod(path.stat().st_mode | stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH)